@@ -26,6 +26,7 @@ import gtk
 import linuxcnc
 import gobject
 import hal, hal_glib
+import pollpolicy
 import gladevcp
 import time
 import shutil
@@ -1024,7 +1025,7 @@ class HandlerClass:
         self.pmx485Started = False
         self.pmx485Connected = False
         self.pmx485_check()
-        gobject.timeout_add(100, self.periodic)
+        pollpolicy.GTimer(self.periodic).start()
 
 def get_handlers(halcomp,builder,useropts):
     return [HandlerClass(halcomp,builder,useropts)]
@@ -22,6 +22,7 @@ import re, string
 
 from hal_widgets import _HalWidgetBase
 import linuxcnc
+import pollpolicy
 from hal_glib import GStat
 
 _ = lambda x: x
@@ -35,7 +36,7 @@ class _EMCStaticHolder:
 
     def get(self):
         if not self.linuxcnc:
-            self.linuxcnc = linuxcnc.command()
+            self.linuxcnc = pollpolicy.WakingCommand(linuxcnc.command())
         if not self.gstat:
             self.gstat = GStat()
         return self.linuxcnc, self.gstat.stat, self.gstat
@@ -3,6 +3,8 @@
 
 import _hal, hal, gobject
 import linuxcnc
+import statusbroker
+import pollpolicy
 import os
 import math
 
@@ -21,6 +23,8 @@ class GPin(gobject.GObject, hal.Pin):
     __gsignals__ = {'value-changed': (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ())}
 
     REGISTRY = []
+    # the pins in REGISTRY, at the same indices, read together by update_all
+    WATCH = _hal.watchset()
     UPDATE = False
 
     def __init__(self, *a, **kw):
@@ -29,6 +33,7 @@ class GPin(gobject.GObject, hal.Pin):
         self._item_wrap(self._item)
         self._prev = None
         self.REGISTRY.append(self)
+        self.WATCH.add(self._item)
         self.update_start()
 
     def update(self):
@@ -41,23 +46,19 @@ class GPin(gobject.GObject, hal.Pin):
     def update_all(self):
         if not self.UPDATE:
             return
-        kill = []
-        for p in self.REGISTRY:
-            try:
-                p.update()
-            except:
-                kill.append(p)
-                print "Error updating pin %s; Removing" % p
-        for p in kill:
-            self.REGISTRY.remove(p)
+        for i, value in self.WATCH.changed():
+            p = self.REGISTRY[i]
+            p._prev = value
+            p.emit('value-changed')
         return self.UPDATE
 
+    # timeout is the time in ms between reads of all the pins
     @classmethod
     def update_start(self, timeout=100):
         if GPin.UPDATE:
             return
         GPin.UPDATE = True
-        gobject.timeout_add(timeout, self.update_all)
+        pollpolicy.GTimer(self.update_all, pollpolicy.rates(timeout)).start()
 
     @classmethod
     def update_stop(self, timeout=100):
@@ -182,6 +183,12 @@ class _GStat(gobject.GObject):
         'forced-update': (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ()),
         }
 
+    # GStat tells the poll policy what the machine is doing, so it keeps
+    # reading the status while the machine is off: an estop reset or a
+    # command from halui or another GUI wakes the other timers within
+    # 250 ms rather than a second
+    POLL_RATES = pollpolicy.rates(100, 250, 250)
+
     STATES = { linuxcnc.STATE_ESTOP:       'state-estop'
              , linuxcnc.STATE_ESTOP_RESET: 'state-estop-reset'
              , linuxcnc.STATE_ON:          'state-on'
@@ -199,13 +206,82 @@ class _GStat(gobject.GObject):
              , linuxcnc.INTERP_IDLE: 'interp-idle'
              }
 
+    # Status values read straight from stat: key in self.old -> attribute
+    ATTRIBUTES = { 'line':               'motion_line'
+                 , 'block-delete':       'block_delete'
+                 , 'optional-stop':      'optional_stop'
+                 , 'tool-in-spindle':    'tool_in_spindle'
+                 , 'motion-mode':        'motion_mode'
+                 , 'feed-or':            'feedrate'
+                 , 'rapid-or':           'rapidrate'
+                 , 'max-velocity-or':    'max_velocity'
+                 , 'feed-hold':          'feed_hold_enabled'
+                 , 'g5x-index':          'g5x_index'
+                 , 'flood':              'flood'
+                 , 'mist':               'mist'
+                 , 'current-z-rotation': 'rotation_xy'
+                 , 'current-tool-offset':'tool_offset'
+                 }
+
+    # The status each signal is made from.  A source is only read while
+    # one of its signals has a handler; the task state, mode, interpreter
+    # state, pause, homing and file ('task') are always read.
+    SIGNAL_SOURCES = {
+        'line-changed': ('line',),
+        'block-delete-changed': ('block-delete',),
+        'optional-stop-changed': ('optional-stop',),
+        'tool-in-spindle-changed': ('tool-in-spindle',),
+        'tool-prep-changed': ('tool-prep',),
+        'motion-mode-changed': ('motion-mode',),
+        'feed-override-changed': ('feed-or',),
+        'rapid-override-changed': ('rapid-or',),
+        'max-velocity-override-changed': ('max-velocity-or',),
+        'feed-hold-enabled-changed': ('feed-hold',),
+        'user-system-changed': ('g5x-index',),
+        'flood-changed': ('flood',),
+        'mist-changed': ('mist',),
+        'current-z-rotation': ('current-z-rotation',),
+        'current-tool-offset': ('current-tool-offset',),
+        'spindle-control-changed': ('spindle',),
+        'spindle-override-changed': ('spindle',),
+        'requested-spindle-speed-changed': ('gcodes', 'spindle'),
+        'actual-spindle-speed-changed': ('actual-spindle-speed',),
+        'override-limits-changed': ('joints',),
+        'hard-limits-tripped': ('joints',),
+        'g-code-changed': ('gcodes',),
+        'metric-mode-changed': ('gcodes',),
+        'itime-mode': ('gcodes',),
+        'fpm-mode': ('gcodes',),
+        'fpr-mode': ('gcodes',),
+        'css-mode': ('gcodes',),
+        'rpm-mode': ('gcodes',),
+        'radius-mode': ('gcodes',),
+        'diameter-mode': ('gcodes',),
+        'm-code-changed': ('mcodes',),
+        'tool-info-changed': ('tool-info',),
+        'current-feed-rate': ('position',),
+        'current-x-rel-position': ('position',),
+        'current-position': ('position',),
+        }
+
+    # the order sources are read in: the requested spindle speed depends
+    # on the G codes.  'position' is not stored, it is emitted every tick.
+    SOURCES = (('task',) + tuple(sorted(ATTRIBUTES))
+               + ('tool-prep', 'actual-spindle-speed', 'gcodes', 'spindle',
+                  'joints', 'mcodes', 'tool-info'))
+
     def __init__(self, stat = None):
         gobject.GObject.__init__(self)
-        self.stat = stat or linuxcnc.stat()
-        self.cmd = linuxcnc.command()
+        self.stat = stat or statusbroker.connect()
+        self.cmd = pollpolicy.WakingCommand(linuxcnc.command())
         self._status_active = False
         self.old = {}
         self.old['tool-prep-number'] = 0
+        self._gcodes = self._mcodes = None
+        # GStat is shared, so keep what the widgets connected so far
+        # subscribed to
+        self._sources = getattr(self, '_sources', set(['task']))
+        self._sampled = [s for s in self.SOURCES if s in self._sources]
         try:
             self.stat.poll()
             self.merge()
@@ -226,67 +302,101 @@ class _GStat(gobject.GObject):
     # we put this in a function so qtvcp
     # can overide it to fix a seg fault
     def set_timer(self):
-        gobject.timeout_add(100, self.update)
+        pollpolicy.GTimer(self.update, self.POLL_RATES).start()
+
+    def connect(self, signal, *args):
+        self._subscribe(signal)
+        return gobject.GObject.connect(self, signal, *args)
+
+    def connect_after(self, signal, *args):
+        self._subscribe(signal)
+        return gobject.GObject.connect_after(self, signal, *args)
+
+    def connect_object(self, signal, *args):
+        self._subscribe(signal)
+        return gobject.GObject.connect_object(self, signal, *args)
+
+    def connect_object_after(self, signal, *args):
+        self._subscribe(signal)
+        return gobject.GObject.connect_object_after(self, signal, *args)
+
+    def _subscribe(self, signal):
+        signal = signal.split('::')[0].replace('_', '-')
+        new = [s for s in self.SIGNAL_SOURCES.get(signal, ())
+               if s not in self._sources]
+        if not new:
+            return
+        self._sources.update(new)
+        self._sampled = [s for s in self.SOURCES if s in self._sources]
+        # read the new sources now, so the next update only reports
+        # what changed after the handler was connected
+        try:
+            self._sample([s for s in self.SOURCES if s in new], {})
+        except:
+            pass
+
+    def _current(self, source, key):
+        # a value nothing subscribes to is read from the last poll
+        if source not in self._sources:
+            self._sample((source,), {})
+        return self.old[key]
 
     def merge(self):
-        self.old['state'] = self.stat.task_state
-        self.old['mode']  = self.stat.task_mode
-        self.old['interp']= self.stat.interp_state
+        self._sample(self.SOURCES, {})
+
+    def _sample(self, sources, changed):
+        for source in sources:
+            attribute = self.ATTRIBUTES.get(source)
+            if attribute is not None:
+                self._store(changed, source, getattr(self.stat, attribute))
+            else:
+                getattr(self, '_sample_' + source.replace('-', '_'))(changed)
+
+    def _store(self, changed, key, value):
+        # remember the value 'key' had before in 'changed'
+        old = self.old.get(key)
+        if value != old:
+            changed[key] = old
+            self.old[key] = value
+
+    def _sample_task(self, changed):
+        self._store(changed, 'state', self.stat.task_state)
+        self._store(changed, 'mode', self.stat.task_mode)
+        self._store(changed, 'interp', self.stat.interp_state)
         # Only update file if call level is 0, which
         # means we are not executing a subroutine/remap
         # This avoids emiting signals for bogus file names below
         if self.stat.call_level == 0:
-            self.old['file']  = self.stat.file
-        self.old['paused']= self.stat.paused
-        self.old['line']  = self.stat.motion_line
-        self.old['homed'] = self.stat.homed
-        self.old['tool-in-spindle'] = self.stat.tool_in_spindle
+            self._store(changed, 'file', self.stat.file)
+        self._store(changed, 'paused', self.stat.paused)
+        self._store(changed, 'homed', self.stat.homed)
+
+    def _sample_tool_prep(self, changed):
         try:
-            if hal.get_value('iocontrol.0.tool-prepare'):
-                self.old['tool-prep-number'] = hal.get_value('iocontrol.0.tool-prep-number')
+            prepare, number = hal.get_values(('iocontrol.0.tool-prepare',
+                                              'iocontrol.0.tool-prep-number'))
         except RuntimeError:
-             self.old['tool-prep-number'] = -1
-        self.old['motion-mode'] = self.stat.motion_mode
-        self.old['spindle-or'] = self.stat.spindle[0]['override']
-        self.old['feed-or'] = self.stat.feedrate
-        self.old['rapid-or'] = self.stat.rapidrate
-        self.old['max-velocity-or'] = self.stat.max_velocity
-        self.old['feed-hold']  = self.stat.feed_hold_enabled
-        self.old['g5x-index']  = self.stat.g5x_index
-        self.old['spindle-enabled']  = self.stat.spindle[0]['enabled']
-        self.old['spindle-direction']  = self.stat.spindle[0]['direction']
-        self.old['block-delete']= self.stat.block_delete
-        self.old['optional-stop']= self.stat.optional_stop
+            self._store(changed, 'tool-prep-number', -1)
+            return
+        if prepare:
+            self._store(changed, 'tool-prep-number', number)
+
+    def _sample_actual_spindle_speed(self, changed):
         try:
-            self.old['actual-spindle-speed'] = hal.get_value('spindle.0.speed-in') * 60
+            speed = hal.get_value('spindle.0.speed-in') * 60
         except RuntimeError:
-             self.old['actual-spindle-speed'] = 0
-        self.old['flood']= self.stat.flood
-        self.old['mist']= self.stat.mist
-        self.old['current-z-rotation'] = self.stat.rotation_xy
-        self.old['current-tool-offset'] = self.stat.tool_offset
+            speed = 0
+        self._store(changed, 'actual-spindle-speed', speed)
 
-        # override limits / hard limits
-        or_limit_list=[]
-        hard_limit_list = []
-        hard_limit = False
-        or_limit_set = False
-        for j in range(0, self.stat.joints):
-            or_limit_list.append( self.stat.joint[j]['override_limits'])
-            or_limit_set = or_limit_set or self.stat.joint[j]['override_limits']
-            min_hard_limit = self.stat.joint[j]['min_hard_limit']
-            max_hard_limit = self.stat.joint[j]['max_hard_limit']
-            hard_limit = hard_limit or min_hard_limit or max_hard_limit
-            hard_limit_list.append([min_hard_limit,max_hard_limit])
-        self.old['override-limits'] = or_limit_list
-        self.old['override-limits-set'] = bool(or_limit_set)
-        self.old['hard-limits-tripped'] = bool(hard_limit)
-        self.old['hard-limits-list'] = hard_limit_list
-
-        # active G codes
+    def _sample_gcodes(self, changed):
+        # the strings and modes are only made again when the codes change
+        gcodes = self.stat.gcodes
+        if gcodes == self._gcodes:
+            return
+        self._gcodes = gcodes
         active_gcodes = []
         codes =''
-        for i in sorted(self.stat.gcodes[1:]):
+        for i in sorted(gcodes[1:]):
             if i == -1: continue
             if i % 10 == 0:
                     active_gcodes.append("G%d" % (i/10))
@@ -294,7 +404,7 @@ class _GStat(gobject.GObject):
                     active_gcodes.append("G%d.%d" % (i/10, i%10))
         for i in active_gcodes:
             codes = codes +('%s '%i)
-        self.old['g-code'] = codes
+        self._store(changed, 'g-code', codes)
         # extract specific G code modes
         itime = fpm = fpr = css = rpm = metric = False
         radius = diameter = False
@@ -307,30 +417,61 @@ class _GStat(gobject.GObject):
             elif i == 'G21': metric = True
             elif i == 'G7': diameter  = True
             elif i == 'G8': radius = True
-        self.old['itime'] = itime
-        self.old['fpm'] = fpm
-        self.old['fpr'] = fpr
-        self.old['css'] = css
-        self.old['rpm'] = rpm
-        self.old['metric'] = metric
-        self.old['radius'] = radius
-        self.old['diameter'] = diameter
-        if css:
-            self.old['spindle-speed']= hal.get_value('spindle.0.speed-out')
+        self._store(changed, 'itime', itime)
+        self._store(changed, 'fpm', fpm)
+        self._store(changed, 'fpr', fpr)
+        self._store(changed, 'css', css)
+        self._store(changed, 'rpm', rpm)
+        self._store(changed, 'metric', metric)
+        self._store(changed, 'radius', radius)
+        self._store(changed, 'diameter', diameter)
+
+    def _sample_spindle(self, changed):
+        spindle = self.stat.spindle[0]
+        self._store(changed, 'spindle-or', spindle['override'])
+        self._store(changed, 'spindle-enabled', spindle['enabled'])
+        self._store(changed, 'spindle-direction', spindle['direction'])
+        if self.old.get('css'):
+            speed = hal.get_value('spindle.0.speed-out')
         else:
-            self.old['spindle-speed']= self.stat.spindle[0]['speed']
+            speed = spindle['speed']
+        self._store(changed, 'spindle-speed', speed)
 
-        # active M codes
+    def _sample_joints(self, changed):
+        # override limits / hard limits
+        or_limit_list=[]
+        hard_limit_list = []
+        hard_limit = False
+        or_limit_set = False
+        for j in range(0, self.stat.joints):
+            joint = self.stat.joint[j]
+            or_limit_list.append(joint['override_limits'])
+            or_limit_set = or_limit_set or joint['override_limits']
+            min_hard_limit = joint['min_hard_limit']
+            max_hard_limit = joint['max_hard_limit']
+            hard_limit = hard_limit or min_hard_limit or max_hard_limit
+            hard_limit_list.append([min_hard_limit,max_hard_limit])
+        self._store(changed, 'override-limits', or_limit_list)
+        self._store(changed, 'override-limits-set', bool(or_limit_set))
+        self._store(changed, 'hard-limits-tripped', bool(hard_limit))
+        self._store(changed, 'hard-limits-list', hard_limit_list)
+
+    def _sample_mcodes(self, changed):
+        mcodes = self.stat.mcodes
+        if mcodes == self._mcodes:
+            return
+        self._mcodes = mcodes
         active_mcodes = []
-        mcodes = ''
-        for i in sorted(self.stat.mcodes[1:]):
+        codes = ''
+        for i in sorted(mcodes[1:]):
             if i == -1: continue
             active_mcodes.append("M%d"%i )
         for i in active_mcodes:
-            mcodes = mcodes + ("%s "%i)
-            #active_mcodes.append("M%s "%i)
-        self.old['m-code'] = mcodes
-        self.old['tool-info']  = self.stat.tool_table[0]
+            codes = codes + ("%s "%i)
+        self._store(changed, 'm-code', codes)
+
+    def _sample_tool_info(self, changed):
+        self._store(changed, 'tool-info', self.stat.pocket(0))
 
     def update(self):
         try:
@@ -342,12 +483,21 @@ class _GStat(gobject.GObject):
             # Reschedule
             return True
         self._status_active = True
-        old = dict(self.old)
-        self.merge()
+        # the values before this poll of what changed
+        changed = {}
+        self._sample(self._sampled, changed)
+
+        # poll as often as what the machine is doing needs
+        if self.old['state'] != linuxcnc.STATE_ON:
+            pollpolicy.POLICY.set_activity('off')
+        elif self.old['interp'] != linuxcnc.INTERP_IDLE or not self.stat.inpos:
+            pollpolicy.POLICY.set_activity('running')
+        else:
+            pollpolicy.POLICY.set_activity('idle')
 
-        state_old = old.get('state', 0)
-        state_new = self.old['state']
-        if state_new != state_old:
+        if 'state' in changed:
+            state_old = changed['state'] or 0
+            state_new = self.old['state']
             if state_new > linuxcnc.STATE_ESTOP:
                 self.emit('state-estop-reset')
             else:
@@ -355,87 +505,65 @@ class _GStat(gobject.GObject):
             self.emit('state-off')
             self.emit('interp-idle')
 
-        if state_new != state_old:
             if state_old == linuxcnc.STATE_ON and state_new < linuxcnc.STATE_ON:
                 self.emit('state-off')
             self.emit(self.STATES[state_new])
             if state_new == linuxcnc.STATE_ON:
-                old['mode'] = 0
-                old['interp'] = 0
+                changed['mode'] = 0
+                changed['interp'] = 0
 
-        mode_old = old.get('mode', 0)
-        mode_new = self.old['mode']
-        if mode_new != mode_old:
-            self.emit(self.MODES[mode_new])
+        if 'mode' in changed:
+            self.emit(self.MODES[self.old['mode']])
 
-        interp_old = old.get('interp', 0)
-        interp_new = self.old['interp']
-        if interp_new != interp_old:
+        if 'interp' in changed:
+            interp_old = changed['interp']
             if not interp_old or interp_old == linuxcnc.INTERP_IDLE:
                 self.emit('interp-run')
-            self.emit(self.INTERP[interp_new])
+            self.emit(self.INTERP[self.old['interp']])
         # paused
-        paused_old = old.get('paused', None)
-        paused_new = self.old['paused']
-        if paused_new != paused_old:
-            self.emit('program-pause-changed',paused_new)
+        if 'paused' in changed:
+            self.emit('program-pause-changed',self.old['paused'])
         # block delete
-        block_delete_old = old.get('block-delete', None)
-        block_delete_new = self.old['block-delete']
-        if block_delete_new != block_delete_old:
-            self.emit('block-delete-changed',block_delete_new)
+        if 'block-delete' in changed:
+            self.emit('block-delete-changed',self.old['block-delete'])
         # optional_stop
-        optional_stop_old = old.get('optional-stop', None)
-        optional_stop_new = self.old['optional-stop']
-        if optional_stop_new != optional_stop_old:
-            self.emit('optional-stop-changed',optional_stop_new)
+        if 'optional-stop' in changed:
+            self.emit('optional-stop-changed',self.old['optional-stop'])
         # file changed
-        file_old = old.get('file', None)
-        file_new = self.old['file']
-        if file_new != file_old:
+        if 'file' in changed:
             # if interpreter is reading or waiting, the new file
             # is a remap procedure, with the following test we
             # partly avoid emitting a signal in that case, which would cause
             # a reload of the preview and sourceview widgets.  A signal could
             # still be emitted if aborting a program shortly after it ran an
             # external file subroutine, but that is fixed by not updating the
-            # file name if call level != 0 in the merge() function above.
+            # file name if call level != 0 in _sample_task() above.
             # do avoid that a signal is emited in that case, causing
             # a reload of the preview and sourceview widgets
             if self.stat.interp_state == linuxcnc.INTERP_IDLE:
-                self.emit('file-loaded', file_new)
+                self.emit('file-loaded', self.old['file'])
 
         #ToDo : Find a way to avoid signal when the line changed due to
         #       a remap procedure, because the signal do highlight a wrong
         #       line in the code
         # current line
-        line_old = old.get('line', None)
-        line_new = self.old['line']
-        if line_new != line_old:
-            self.emit('line-changed', line_new)
+        if 'line' in changed:
+            self.emit('line-changed', self.old['line'])
 
-        tool_old = old.get('tool-in-spindle', None)
-        tool_new = self.old['tool-in-spindle']
-        if tool_new != tool_old:
-            self.emit('tool-in-spindle-changed', tool_new)
-        tool_num_old = old.get('tool-prep-number')
-        tool_num_new = self.old['tool-prep-number']
-        if tool_num_new != tool_num_old:
-            self.emit('tool-prep-changed', tool_num_new)
+        if 'tool-in-spindle' in changed:
+            self.emit('tool-in-spindle-changed', self.old['tool-in-spindle'])
+        if 'tool-prep-number' in changed:
+            self.emit('tool-prep-changed', self.old['tool-prep-number'])
 
-        motion_mode_old = old.get('motion-mode', None)
-        motion_mode_new = self.old['motion-mode']
-        if motion_mode_new != motion_mode_old:
-            self.emit('motion-mode-changed', motion_mode_new)
+        if 'motion-mode' in changed:
+            self.emit('motion-mode-changed', self.old['motion-mode'])
 
         # if the homed status has changed
         # check number of homed joints against number of available joints
         # if they are equal send the all-homed signal
         # else send the not-all-homed signal (with a string of unhomed joint numbers)
         # if a joint is homed send 'homed' (with a string of homed joint number)
-        homed_joint_old = old.get('homed', None)
-        homed_joint_new = self.old['homed']
-        if homed_joint_new != homed_joint_old:
+        if 'homed' in changed:
             homed_joints = 0
             unhomed_joints = ""
             for joint in range(0, self.stat.joints):
@@ -453,157 +581,103 @@ class _GStat(gobject.GObject):
                 self.emit('not-all-homed', unhomed_joints)
 
         # override limts
-        or_limits_old = old.get('override-limits', None)
-        or_limits_new = self.old['override-limits']
-        or_limits_set_new = self.old['override-limits-set']
-        if or_limits_new != or_limits_old:
-            self.emit('override-limits-changed',or_limits_set_new, or_limits_new)
+        if 'override-limits' in changed:
+            self.emit('override-limits-changed',self.old['override-limits-set'], self.old['override-limits'])
         # hard limits tripped
-        t_list_old = old.get('hard-limits-list')
-        t_list_new = self.old['hard-limits-list']
-        if t_list_new != t_list_old:
-            hard_limits_tripped_new = self.old['hard-limits-tripped']
-            self.emit('hard-limits-tripped',hard_limits_tripped_new, t_list_new)
-        # current velocity
-        self.emit('current-feed-rate',self.stat.current_vel * 60.0)
-        # X relative position
-        position = self.stat.actual_position[0]
-        g5x_offset = self.stat.g5x_offset[0]
-        tool_offset = self.stat.tool_offset[0]
-        g92_offset = self.stat.g92_offset[0]
-        self.emit('current-x-rel-position',position-g5x_offset-tool_offset-g92_offset)
-
-        # calculate position offsets (native units)
-        p,rel_p,dtg = self.get_position()
-        self.emit('current_position',p, rel_p, dtg, self.stat.joint_actual_position)
+        if 'hard-limits-list' in changed:
+            self.emit('hard-limits-tripped',self.old['hard-limits-tripped'], self.old['hard-limits-list'])
+
+        if 'position' in self._sources:
+            # current velocity
+            self.emit('current-feed-rate',self.stat.current_vel * 60.0)
+            # X relative position
+            position = self.stat.actual_position[0]
+            g5x_offset = self.stat.g5x_offset[0]
+            tool_offset = self.stat.tool_offset[0]
+            g92_offset = self.stat.g92_offset[0]
+            self.emit('current-x-rel-position',position-g5x_offset-tool_offset-g92_offset)
+
+            # calculate position offsets (native units)
+            p,rel_p,dtg = self.get_position()
+            self.emit('current_position',p, rel_p, dtg, self.stat.joint_actual_position)
 
         # spindle control
-        spindle_enabled_old = old.get('spindle-enabled', None)
-        spindle_enabled_new = self.old['spindle-enabled']
-        spindle_direction_old = old.get('spindle-direction', None)
-        spindle_direction_new = self.old['spindle-direction']
-        if spindle_enabled_new != spindle_enabled_old or spindle_direction_new != spindle_direction_old:
-            self.emit('spindle-control-changed', spindle_enabled_new, spindle_direction_new)
+        if 'spindle-enabled' in changed or 'spindle-direction' in changed:
+            self.emit('spindle-control-changed', self.old['spindle-enabled'], self.old['spindle-direction'])
         # requested spindle speed
-        spindle_spd_old = old.get('spindle-speed', None)
-        spindle_spd_new = self.old['spindle-speed']
-        if spindle_spd_new != spindle_spd_old:
-            self.emit('requested-spindle-speed-changed', spindle_spd_new)
+        if 'spindle-speed' in changed:
+            self.emit('requested-spindle-speed-changed', self.old['spindle-speed'])
         # actual spindle speed
-        act_spindle_spd_old = old.get('actual-spindle-speed', None)
-        act_spindle_spd_new = self.old['actual-spindle-speed']
-        if act_spindle_spd_new != act_spindle_spd_old:
-            self.emit('actual-spindle-speed-changed', act_spindle_spd_new)
+        if 'actual-spindle-speed' in changed:
+            self.emit('actual-spindle-speed-changed', self.old['actual-spindle-speed'])
         # spindle override
-        spindle_or_old = old.get('spindle-or', None)
-        spindle_or_new = self.old['spindle-or']
-        if spindle_or_new != spindle_or_old:
-            self.emit('spindle-override-changed',spindle_or_new * 100)
+        if 'spindle-or' in changed:
+            self.emit('spindle-override-changed',self.old['spindle-or'] * 100)
         # feed override
-        feed_or_old = old.get('feed-or', None)
-        feed_or_new = self.old['feed-or']
-        if feed_or_new != feed_or_old:
-            self.emit('feed-override-changed',feed_or_new * 100)
+        if 'feed-or' in changed:
+            self.emit('feed-override-changed',self.old['feed-or'] * 100)
         # rapid override
-        rapid_or_old = old.get('rapid-or', None)
-        rapid_or_new = self.old['rapid-or']
-        if rapid_or_new != rapid_or_old:
-            self.emit('rapid-override-changed',rapid_or_new * 100)
+        if 'rapid-or' in changed:
+            self.emit('rapid-override-changed',self.old['rapid-or'] * 100)
         # max-velocity override
-        max_velocity_or_old = old.get('max-velocity-or', None)
-        max_velocity_or_new = self.old['max-velocity-or']
-        if max_velocity_or_new != max_velocity_or_old:
-            self.emit('max-velocity-override-changed',max_velocity_or_new * 60)
+        if 'max-velocity-or' in changed:
+            self.emit('max-velocity-override-changed',self.old['max-velocity-or'] * 60)
         # feed hold
-        feed_hold_old = old.get('feed-hold', None)
-        feed_hold_new = self.old['feed-hold']
-        if feed_hold_new != feed_hold_old:
-            self.emit('feed-hold-enabled-changed',feed_hold_new)
+        if 'feed-hold' in changed:
+            self.emit('feed-hold-enabled-changed',self.old['feed-hold'])
         # mist
-        mist_old = old.get('mist', None)
-        mist_new = self.old['mist']
-        if mist_new != mist_old:
-            self.emit('mist-changed',mist_new)
+        if 'mist' in changed:
+            self.emit('mist-changed',self.old['mist'])
         # flood
-        flood_old = old.get('flood', None)
-        flood_new = self.old['flood']
-        if flood_new != flood_old:
-            self.emit('flood-changed',flood_new)
+        if 'flood' in changed:
+            self.emit('flood-changed',self.old['flood'])
         # rotation around Z
-        z_rot_old = old.get('current-z-rotation', None)
-        z_rot_new = self.old['current-z-rotation']
-        if z_rot_new != z_rot_old:
-            self.emit('current-z-rotation',z_rot_new)
+        if 'current-z-rotation' in changed:
+            self.emit('current-z-rotation',self.old['current-z-rotation'])
         # current tool offsets
-        tool_off_old = old.get('current-tool-offset', None)
-        tool_off_new = self.old['current-tool-offset']
-        if tool_off_new != tool_off_old:
-               self.emit('current-tool-offset',tool_off_new)
+        if 'current-tool-offset' in changed:
+            self.emit('current-tool-offset',self.old['current-tool-offset'])
         #############################
         # Gcodes
         #############################
         # G codes
-        g_code_old = old.get('g-code', None)
-        g_code_new = self.old['g-code']
-        if g_code_new != g_code_old:
-            self.emit('g-code-changed',g_code_new)
+        if 'g-code' in changed:
+            self.emit('g-code-changed',self.old['g-code'])
         # metric mode g21
-        metric_old = old.get('metric', None)
-        metric_new = self.old['metric']
-        if metric_new != metric_old:
-            self.emit('metric-mode-changed',metric_new)
+        if 'metric' in changed:
+            self.emit('metric-mode-changed',self.old['metric'])
         # G5x (active user system)
-        g5x_index_old = old.get('g5x-index', None)
-        g5x_index_new = self.old['g5x-index']
-        if g5x_index_new != g5x_index_old:
-            self.emit('user-system-changed',g5x_index_new)
+        if 'g5x-index' in changed:
+            self.emit('user-system-changed',self.old['g5x-index'])
         # inverse time mode g93
-        itime_old = old.get('itime', None)
-        itime_new = self.old['itime']
-        if itime_new != itime_old:
-            self.emit('itime-mode',itime_new)
+        if 'itime' in changed:
+            self.emit('itime-mode',self.old['itime'])
         # feed per minute mode g94
-        fpm_old = old.get('fpm', None)
-        fpm_new = self.old['fpm']
-        if fpm_new != fpm_old:
-            self.emit('fpm-mode',fpm_new)
+        if 'fpm' in changed:
+            self.emit('fpm-mode',self.old['fpm'])
         # feed per revolution mode g95
-        fpr_old = old.get('fpr', None)
-        fpr_new = self.old['fpr']
-        if fpr_new != fpr_old:
-            self.emit('fpr-mode',fpr_new)
+        if 'fpr' in changed:
+            self.emit('fpr-mode',self.old['fpr'])
         # css mode g96
-        css_old = old.get('css', None)
-        css_new = self.old['css']
-        if css_new != css_old:
-            self.emit('css-mode',css_new)
+        if 'css' in changed:
+            self.emit('css-mode',self.old['css'])
         # rpm mode g97
-        rpm_old = old.get('rpm', None)
-        rpm_new = self.old['rpm']
-        if rpm_new != rpm_old:
-            self.emit('rpm-mode',rpm_new)
+        if 'rpm' in changed:
+            self.emit('rpm-mode',self.old['rpm'])
         # radius mode g8
-        radius_old = old.get('radius', None)
-        radius_new = self.old['radius']
-        if radius_new != radius_old:
-            self.emit('radius-mode',radius_new)
+        if 'radius' in changed:
+            self.emit('radius-mode',self.old['radius'])
         # diameter mode g7
-        diam_old = old.get('diameter', None)
-        diam_new = self.old['diameter']
-        if diam_new != diam_old:
-            self.emit('diameter-mode',diam_new)
+        if 'diameter' in changed:
+            self.emit('diameter-mode',self.old['diameter'])
         ####################################
         # Mcodes
         ####################################
         # M codes
-        m_code_old = old.get('m-code', None)
-        m_code_new = self.old['m-code']
-        if m_code_new != m_code_old:
-            self.emit('m-code-changed',m_code_new)
-        tool_info_old = old.get('tool-info', None)
-        tool_info_new = self.old['tool-info']
-        if tool_info_new != tool_info_old:
-            self.emit('tool-info-changed', tool_info_new)
+        if 'm-code' in changed:
+            self.emit('m-code-changed',self.old['m-code'])
+        if 'tool-info' in changed:
+            self.emit('tool-info-changed', self.old['tool-info'])
 
         # AND DONE... Return true to continue timeout
         self.emit('periodic')
@@ -880,7 +954,7 @@ class _GStat(gobject.GObject):
             return False
 
     def is_metric_mode(self):
-        return self.old['metric']
+        return self._current('gcodes', 'metric')
 
     def is_spindle_on(self, num = 0):
         self.stat.poll()
@@ -901,10 +975,10 @@ class _GStat(gobject.GObject):
         return self._status_active
 
     def is_limits_override_set(self):
-        return self.old['override-limits-set']
+        return self._current('joints', 'override-limits-set')
 
     def is_hard_limits_tripped(self):
-        return self.old['hard-limits-tripped']
+        return self._current('joints', 'hard-limits-tripped')
 
     def get_current_tool(self):
         self.stat.poll()
@@ -0,0 +1,193 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""How often a GUI polls the status and its HAL pins
+
+The GUIs read the status and their pins on timers.  A Timer takes its
+period from the poll policy, which picks one of the timer's rates from
+what the machine is doing:
+
+    running     a program or MDI command is running or the machine moves
+    idle        the machine is on and still
+    off         the machine is off or in estop
+    hidden      the window is hidden, whatever the machine is doing
+
+GStat tells the policy what the machine is doing each time it polls the
+status, which it does at least every 250 ms whatever the machine is
+doing, so that a change made from elsewhere is seen.  When that changes, when a command is sent through a
+WakingCommand and when a program calls wake(), every timer goes to its
+'running' rate at once and stays there for WAKE_TIME seconds, so what a
+command does is seen as soon as before.  In a program where nothing
+tells the policy what the machine is doing it is taken to be running.
+
+    timer = pollpolicy.GTimer(self.periodic, pollpolicy.rates(100))
+    timer.start()
+
+[DISPLAY]ADAPTIVE_POLLING = NO keeps every timer at its 'running' rate.
+"""
+
+import os, time
+
+WAKE_TIME = 2.
+
+def rates(running=100, idle=250, off=1000, hidden=1000):
+    """The periods in ms of a timer; none is shorter than 'running'"""
+    return {'running': running, 'idle': max(idle, running),
+            'off': max(off, running), 'hidden': max(hidden, running)}
+
+DEFAULT_RATES = rates()
+
+def _adaptive():
+    try:
+        import linuxcnc
+        ini = linuxcnc.ini(os.environ['INI_FILE_NAME'])
+        value = ini.find("DISPLAY", "ADAPTIVE_POLLING") or "YES"
+    except Exception:
+        return True
+    return value.strip().upper() not in ("NO", "FALSE", "0")
+
+class PollPolicy(object):
+    def __init__(self, adaptive=True, clock=time.time):
+        self.adaptive = adaptive
+        self.clock = clock
+        self.activity = 'running'
+        self.hidden = False
+        self.awake_until = 0
+        self.listeners = []
+
+    def period(self, rates):
+        """The period in ms for a timer with 'rates' now"""
+        if not self.adaptive:
+            return rates['running']
+        if self.hidden:
+            return rates['hidden']
+        if self.clock() < self.awake_until:
+            return rates['running']
+        return rates[self.activity]
+
+    def set_activity(self, activity):
+        """Tell what the machine is doing: 'running', 'idle' or 'off'"""
+        if activity != self.activity:
+            self.activity = activity
+            self.wake()
+
+    def set_hidden(self, hidden):
+        if hidden != self.hidden:
+            self.hidden = hidden
+            if not hidden:
+                self.wake()
+
+    def wake(self):
+        """Run every timer at its 'running' rate for a while"""
+        self.awake_until = self.clock() + WAKE_TIME
+        for listener in self.listeners[:]:
+            listener()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+POLICY = PollPolicy(_adaptive())
+
+class Timer(object):
+    """Call 'callback' at the period the policy gives for 'rates', for as
+    long as it returns a true value.  Toolkits provide _call_after and
+    _cancel."""
+
+    def __init__(self, callback, rates=None, policy=None):
+        self.callback = callback
+        self.rates = rates or DEFAULT_RATES
+        self.policy = policy or POLICY
+        # the period of the call that is waiting, None when none is
+        self.period = None
+
+    def start(self):
+        if self.period is not None: return
+        self.policy.add_listener(self._policy_changed)
+        self._schedule()
+
+    def stop(self):
+        self.policy.remove_listener(self._policy_changed)
+        if self.period is not None:
+            self._cancel()
+            self.period = None
+
+    def _schedule(self):
+        self.period = self.policy.period(self.rates)
+        self._call_after(self.period)
+
+    def _policy_changed(self):
+        if (self.period is not None
+                and self.policy.period(self.rates) < self.period):
+            self._cancel()
+            self._schedule()
+
+    def _fire(self):
+        self.period = None
+        if self.callback():
+            self._schedule()
+        else:
+            self.policy.remove_listener(self._policy_changed)
+
+class GTimer(Timer):
+    """A Timer run by the gobject main loop"""
+
+    def _call_after(self, period):
+        import gobject
+        self._source = gobject.timeout_add(period, self._run)
+
+    def _cancel(self):
+        import gobject
+        gobject.source_remove(self._source)
+
+    def _run(self):
+        self._fire()
+        return False
+
+class TkTimer(Timer):
+    """A Timer run by the Tk main loop of 'widget'"""
+
+    def __init__(self, widget, callback, rates=None, policy=None):
+        Timer.__init__(self, callback, rates, policy)
+        self.widget = widget
+
+    def _call_after(self, period):
+        self._after = self.widget.after(period, self._fire)
+
+    def _cancel(self):
+        self.widget.after_cancel(self._after)
+
+class WakingCommand(object):
+    """A linuxcnc.command that wakes the poll policy with each command, so
+    that its result is seen at the 'running' rate"""
+
+    def __init__(self, command, policy=None):
+        self._command = command
+        self._policy = policy or POLICY
+
+    def __getattr__(self, name):
+        attr = getattr(self._command, name)
+        if not callable(attr):
+            return attr
+        def call(*args, **kw):
+            self._policy.wake()
+            return attr(*args, **kw)
+        return call
+
+# vim:ts=8:sts=4:sw=4:et:
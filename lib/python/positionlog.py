@@ -0,0 +1,130 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Read the position logs written by linuxcnc.positionrecorder
+
+A log holds one record per sample: the time, the commanded and the actual
+position of the nine axes XYZABCUVW in machine units, the current velocity,
+the feed override, the motion type and the line being run.  Samples where
+nothing but the time changed are left out.
+
+With NumPy the records are mapped from the file rather than read, so a
+long log can be sliced without loading it:
+
+    log = positionlog.PositionLog("run.poslog")
+    r = log.records()
+    cut = r[(r['line'] >= 100) & (r['line'] < 200)]
+    error = cut['actual'][:,:3] - cut['commanded'][:,:3]
+
+Without NumPy a log can still be indexed and iterated; each record is then
+a Record.
+"""
+
+import os, mmap, struct
+from collections import namedtuple
+
+MAGIC = "LCNCPOS1"
+VERSION = 1
+AXES = "xyzabcuvw"
+
+HEADER = struct.Struct("=8sIIIIddQ16x")
+RECORD = struct.Struct("=d9d9dddii")
+
+Record = namedtuple("Record",
+    "time commanded actual velocity feed_override motion_type line")
+
+def dtype():
+    """The NumPy dtype of a record"""
+    import numpy
+    return numpy.dtype([
+        ('time', 'f8'),
+        ('commanded', 'f8', 9),
+        ('actual', 'f8', 9),
+        ('velocity', 'f8'),
+        ('feed_override', 'f8'),
+        ('motion_type', 'i4'),
+        ('line', 'i4')])
+
+class PositionLog(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self._map = None
+        f = open(filename, "rb")
+        try:
+            data = f.read(HEADER.size)
+        finally:
+            f.close()
+        if len(data) < HEADER.size:
+            raise ValueError("%s is not a position log" % filename)
+        (magic, version, header_size, record_size, axes,
+            self.started, self.interval, count) = HEADER.unpack(data)
+        if (magic != MAGIC or version != VERSION
+                or header_size != HEADER.size or record_size != RECORD.size
+                or axes != len(AXES)):
+            raise ValueError("%s is not a position log" % filename)
+        self.count = self._complete(count)
+
+    def _complete(self, count):
+        # the file is extended ahead of the records written into it
+        size = os.path.getsize(self.filename)
+        return min(count, (size - HEADER.size) // RECORD.size)
+
+    def refresh(self):
+        """Take in the records written since the log was opened"""
+        f = open(self.filename, "rb")
+        try:
+            count = HEADER.unpack(f.read(HEADER.size))[-1]
+        finally:
+            f.close()
+        self.count = self._complete(count)
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def records(self):
+        """The records as a NumPy record array mapped from the file"""
+        import numpy
+        if not self.count:
+            return numpy.zeros(0, dtype())
+        return numpy.memmap(self.filename, dtype(), 'r', HEADER.size,
+            (self.count,))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0: i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("record index out of range")
+        if self._map is None:
+            f = open(self.filename, "rb")
+            try:
+                self._map = mmap.mmap(f.fileno(),
+                    HEADER.size + self.count * RECORD.size,
+                    access=mmap.ACCESS_READ)
+            finally:
+                f.close()
+        v = RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+        return Record(v[0], v[1:10], v[10:19], *v[19:])
+
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield self[i]
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -5,6 +5,7 @@ import linuxcnc
 import gobject
 
 import _hal, hal
+import pollpolicy
 from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 from hal_glib import GStat
 from qtvcp.qt_istat import _IStat as IStatParent
@@ -14,10 +15,26 @@ import logger
 log = logger.getLogger(__name__)
 # log.setLevel(logger.INFO) # One of DEBUG, INFO, WARNING, ERROR, CRITICAL
 
+class QtTimer(pollpolicy.Timer):
+    """A pollpolicy.Timer run by the Qt event loop"""
+    def __init__(self, *a, **kw):
+        pollpolicy.Timer.__init__(self, *a, **kw)
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+
+    def _call_after(self, period):
+        self._timer.start(period)
+
+    def _cancel(self):
+        self._timer.stop()
+
 class QPin(hal.Pin, QObject):
     value_changed = pyqtSignal([int], [float], [bool] )
 
     REGISTRY = []
+    # the pins in REGISTRY, at the same indices, read together by update_all
+    WATCH = _hal.watchset()
     UPDATE = False
 
     def __init__(self, *a, **kw):
@@ -26,6 +43,7 @@ class QPin(hal.Pin, QObject):
         self._item_wrap(self._item)
         self._prev = None
         self.REGISTRY.append(self)
+        self.WATCH.add(self._item)
         self.update_start()
 
     def update(self):
@@ -41,26 +59,20 @@ class QPin(hal.Pin, QObject):
     def update_all(self):
         if not self.UPDATE:
             return
-        kill = []
-        for p in self.REGISTRY:
-            try:
-                p.update()
-            except Exception as e:
-                kill.append(p)
-                log.error("Error updating pin {}; Removing".format(p))
-                log.exception(e)
-        for p in kill:
-            self.REGISTRY.remove(p)
+        for i, value in self.WATCH.changed():
+            p = self.REGISTRY[i]
+            p._prev = value
+            p.value_changed.emit(value)
         return self.UPDATE
 
+    # timeout is the time in ms between reads of all the pins
     @classmethod
     def update_start(self, timeout=100):
         if QPin.UPDATE:
             return
         QPin.UPDATE = True
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_all)
-        self.timer.start(100)
+        self.timer = QtTimer(self.update_all, pollpolicy.rates(timeout))
+        self.timer.start()
 
     @classmethod
     def update_stop(self, timeout=100):
@@ -130,7 +142,7 @@ class Status(GStat):
     # seg fault without it
     def set_timer(self):
         gobject.threads_init()
-        gobject.timeout_add(100, self.update)
+        pollpolicy.GTimer(self.update, self.POLL_RATES).start()
 
 
 ################################################################
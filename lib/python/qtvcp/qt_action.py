@@ -3,6 +3,7 @@ from PyQt5.QtCore import Qt
 
 import linuxcnc
 import hal
+import pollpolicy
 
 # Set up logging
 import logger
@@ -22,7 +23,7 @@ class _Lcnc_Action(object):
         if self.__class__._instanceNum >=1:
             return
         self.__class__._instanceNum += 1
-        self.cmd = linuxcnc.command()
+        self.cmd = pollpolicy.WakingCommand(linuxcnc.command())
         self.tmp = None
         self.prefilter_path = None
         self.home_all_warning_flag = False
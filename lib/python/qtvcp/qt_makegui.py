@@ -1,6 +1,7 @@
 import os,sys
 from PyQt5 import QtGui, QtCore, QtWidgets, uic
 import traceback
+import pollpolicy
 
 # Set up logging
 import logger
@@ -101,6 +102,14 @@ class _VCPWindow(QtWidgets.QMainWindow):
     def keyreleaseEvent(self, e):
         self.keyReleaseTrap(e)
 
+    # Poll slowly while the window is hidden or minimized
+    def hideEvent(self, e):
+        pollpolicy.POLICY.set_hidden(True)
+        super(_VCPWindow, self).hideEvent(e)
+    def showEvent(self, e):
+        pollpolicy.POLICY.set_hidden(False)
+        super(_VCPWindow, self).showEvent(e)
+
     # These can get class patched by xembed library to catch events
     def keyPressTrap(self, e):
         return False
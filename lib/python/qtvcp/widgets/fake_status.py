@@ -166,7 +166,16 @@ class fakeStatus():
 (54, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0),
 (55, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0),
 )
+        self.tool_table_serial = 1
         self.velocity = 0.0
 
     def poll(self):
         return True
+
+    def pocket(self, n):
+        return self.tool_table[n]
+
+    def tool(self, toolno):
+        for t in self.tool_table[1:] + self.tool_table[:1]:
+            if toolno > 0 and t[0] == toolno: return t
+        return None
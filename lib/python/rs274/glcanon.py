@@ -15,7 +15,10 @@
 #    along with this program; if not, write to the Free Software
 #    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-from rs274 import Translated, ArcsToSegmentsMixin, OpenGLTk
+from rs274 import OpenGLTk
+from rs274.segments import SegmentStore
+from rs274.previewcanon import PreviewCanon
+from rs274 import previewcache, reparse, loadtiming, runtime
 from minigl import *
 import math
 import glnav
@@ -25,6 +28,9 @@ import array
 import gcode
 import os
 import re
+import sys
+import time
+import threading
 
 def minmax(*args):
     return min(*args), max(*args)
@@ -76,93 +82,14 @@ limiticon = array.array('B',
          255, 255,  176, 0,  152, 0,  140, 0,  134, 0,  128, 0,    0,   0,
            0,   0,    0, 0])
 
-class GLCanon(Translated, ArcsToSegmentsMixin):
-    lineno = -1
-    def __init__(self, colors, geometry, is_foam=0):
-        # traverse list - [line number, [start position], [end position], [tlo x, tlo y, tlo z]]
-        self.traverse = []; self.traverse_append = self.traverse.append
-        # feed list - [line number, [start position], [end position], feedrate, [tlo x, tlo y, tlo z]]
-        self.feed = []; self.feed_append = self.feed.append
-        # arcfeed list - [line number, [start position], [end position], feedrate, [tlo x, tlo y, tlo z]]
-        self.arcfeed = []; self.arcfeed_append = self.arcfeed.append
-        # dwell list - [line number, color, pos x, pos y, pos z, plane]
-        self.dwells = []; self.dwells_append = self.dwells.append
-        self.choice = None
-        self.feedrate = 1
-        self.lo = (0,) * 9
-        self.first_move = True
-        self.geometry = geometry
-        self.min_extents = [9e99,9e99,9e99]
-        self.max_extents = [-9e99,-9e99,-9e99]
-        self.min_extents_notool = [9e99,9e99,9e99]
-        self.max_extents_notool = [-9e99,-9e99,-9e99]
-        self.colors = colors
-        self.in_arc = 0
-        self.xo = self.yo = self.zo = self.ao = self.bo = self.co = self.uo = self.vo = self.wo = 0
-        self.dwell_time = 0
-        self.suppress = 0
-        self.g92_offset_x = 0.0
-        self.g92_offset_y = 0.0
-        self.g92_offset_z = 0.0
-        self.g92_offset_a = 0.0
-        self.g92_offset_b = 0.0
-        self.g92_offset_c = 0.0
-        self.g92_offset_u = 0.0
-        self.g92_offset_v = 0.0
-        self.g92_offset_w = 0.0
-        self.g5x_index = 1
-        self.g5x_offset_x = 0.0
-        self.g5x_offset_y = 0.0
-        self.g5x_offset_z = 0.0
-        self.g5x_offset_a = 0.0
-        self.g5x_offset_b = 0.0
-        self.g5x_offset_c = 0.0
-        self.g5x_offset_u = 0.0
-        self.g5x_offset_v = 0.0
-        self.g5x_offset_w = 0.0
-        self.is_foam = is_foam
-        self.foam_z = 0
-        self.foam_w = 1.5
-        self.notify = 0
-        self.notify_message = ""
-        self.highlight_line = None
-
-    def comment(self, arg):
-        if arg.startswith("AXIS,"):
-            parts = arg.split(",")
-            command = parts[1]
-            if command == "stop": raise KeyboardInterrupt
-            if command == "hide": self.suppress += 1
-            if command == "show": self.suppress -= 1
-            if command == "XY_Z_POS": 
-                if len(parts) > 2 :
-                    try:
-                        self.foam_z = float(parts[2])
-                        if 210 in self.state.gcodes:
-                            self.foam_z = self.foam_z / 25.4
-                    except:
-                        self.foam_z = 5.0/25.4
-            if command == "UV_Z_POS": 
-                if len(parts) > 2 :
-                    try:
-                        self.foam_w = float(parts[2])
-                        if 210 in self.state.gcodes:
-                            self.foam_w = self.foam_w / 25.4
-                    except:
-                        self.foam_w = 30.0
-            if command == "notify":
-                self.notify = self.notify + 1
-                self.notify_message = "(AXIS,notify):" + str(self.notify)
-                if len(parts) > 2:
-                    if len(parts[2]): self.notify_message = parts[2]
-
-    def message(self, message): pass
-
-    def check_abort(self): pass
-
-    def next_line(self, st):
-        self.state = st
-        self.lineno = self.state.sequence_number
+class GLCanon(PreviewCanon):
+    buffer_methods = ('draw', 'colored_lines', 'draw_lines', 'draw_dwells')
+    def can_fill_buffer(self):
+        """True if fill_buffer draws the same thing as draw"""
+        if self.overrides(self.buffer_methods, GLCanon): return False
+        for store in self.traverse, self.feed, self.arcfeed:
+            if not isinstance(store, SegmentStore): return False
+        return True
 
     def draw_lines(self, lines, for_selection, j=0, geometry=None):
         return linuxcnc.draw_lines(geometry or self.geometry, lines, for_selection)
@@ -189,121 +116,21 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
     def draw_dwells(self, dwells, alpha, for_selection, j0=0):
         return linuxcnc.draw_dwells(self.geometry, dwells, alpha, for_selection, self.is_lathe())
 
-    def calc_extents(self):
-        self.min_extents, self.max_extents, self.min_extents_notool, self.max_extents_notool = gcode.calc_extents(self.arcfeed, self.feed, self.traverse)
-        if self.is_foam:
-            min_z = min(self.foam_z, self.foam_w)
-            max_z = max(self.foam_z, self.foam_w)
-            self.min_extents = self.min_extents[0], self.min_extents[1], min_z
-            self.max_extents = self.max_extents[0], self.max_extents[1], max_z
-            self.min_extents_notool = \
-                self.min_extents_notool[0], self.min_extents_notool[1], min_z
-            self.max_extents_notool = \
-                self.max_extents_notool[0], self.max_extents_notool[1], max_z
-    def tool_offset(self, xo, yo, zo, ao, bo, co, uo, vo, wo):
-        self.first_move = True
-        x, y, z, a, b, c, u, v, w = self.lo
-        self.lo = (x - xo + self.xo, y - yo + self.yo, z - zo + self.zo, a - ao + self.ao, b - bo + self.bo, c - bo + self.bo,
-          u - uo + self.uo, v - vo + self.vo, w - wo + self.wo)
-        self.xo = xo
-        self.yo = yo
-        self.zo = zo
-        self.so = ao
-        self.bo = bo
-        self.co = co
-        self.uo = uo
-        self.vo = vo
-        self.wo = wo
-
-    def set_spindle_rate(self, arg): pass
-    def set_feed_rate(self, arg): self.feedrate = arg / 60.
-    def select_plane(self, arg): pass
-
-    def change_tool(self, arg):
-        self.first_move = True
-
-    def straight_traverse(self, x,y,z, a,b,c, u, v, w):
-        if self.suppress > 0: return
-        l = self.rotate_and_translate(x,y,z,a,b,c,u,v,w)
-        if not self.first_move:
-                self.traverse_append((self.lineno, self.lo, l, [self.xo, self.yo, self.zo]))
-        self.lo = l
-
-    def rigid_tap(self, x, y, z):
-        if self.suppress > 0: return
-        self.first_move = False
-        l = self.rotate_and_translate(x,y,z,0,0,0,0,0,0)[:3]
-        l += [self.lo[3], self.lo[4], self.lo[5],
-               self.lo[6], self.lo[7], self.lo[8]]
-        self.feed_append((self.lineno, self.lo, l, self.feedrate, [self.xo, self.yo, self.zo]))
-#        self.dwells_append((self.lineno, self.colors['dwell'], x + self.offset_x, y + self.offset_y, z + self.offset_z, 0))
-        self.feed_append((self.lineno, l, self.lo, self.feedrate, [self.xo, self.yo, self.zo]))
-
-    def arc_feed(self, *args):
-        if self.suppress > 0: return
-        self.first_move = False
-        self.in_arc = True
-        try:
-            ArcsToSegmentsMixin.arc_feed(self, *args)
-        finally:
-            self.in_arc = False
-
-    def straight_arcsegments(self, segs):
-        self.first_move = False
-        lo = self.lo
-        lineno = self.lineno
-        feedrate = self.feedrate
-        to = [self.xo, self.yo, self.zo]
-        append = self.arcfeed_append
-        for l in segs:
-            append((lineno, lo, l, feedrate, to))
-            lo = l
-        self.lo = lo
-
-    def straight_feed(self, x,y,z, a,b,c, u, v, w):
-        if self.suppress > 0: return
-        self.first_move = False
-        l = self.rotate_and_translate(x,y,z,a,b,c,u,v,w)
-        self.feed_append((self.lineno, self.lo, l, self.feedrate, [self.xo, self.yo, self.zo]))
-        self.lo = l
-    straight_probe = straight_feed
-
-    def user_defined_function(self, i, p, q):
-        if self.suppress > 0: return
-        color = self.colors['m1xx']
-        self.dwells_append((self.lineno, color, self.lo[0], self.lo[1], self.lo[2], self.state.plane/10-17))
-
-    def dwell(self, arg):
-        if self.suppress > 0: return
-        self.dwell_time += arg
-        color = self.colors['dwell']
-        self.dwells_append((self.lineno, color, self.lo[0], self.lo[1], self.lo[2], self.state.plane/10-17))
-
-
     def highlight(self, lineno, geometry):
         glLineWidth(3)
         c = self.colors['selected']
         glColor3f(*c)
         glBegin(GL_LINES)
         coords = []
-        for line in self.traverse:
-            if line[0] != lineno: continue
-            linuxcnc.line9(geometry, line[1], line[2])
-            coords.append(line[1][:3])
-            coords.append(line[2][:3])
-        for line in self.arcfeed:
-            if line[0] != lineno: continue
-            linuxcnc.line9(geometry, line[1], line[2])
-            coords.append(line[1][:3])
-            coords.append(line[2][:3])
-        for line in self.feed:
-            if line[0] != lineno: continue
-            linuxcnc.line9(geometry, line[1], line[2])
-            coords.append(line[1][:3])
-            coords.append(line[2][:3])
+        for store in (self.traverse, self.arcfeed, self.feed):
+            for i in store.segments_on_line(lineno):
+                start, end = store.endpoints(i)
+                linuxcnc.line9(geometry, start, end)
+                coords.append(start[:3])
+                coords.append(end[:3])
         glEnd()
-        for line in self.dwells:
-            if line[0] != lineno: continue
+        for i in self.dwell_line_index().items(lineno):
+            line = self.dwells[i]
             self.draw_dwells([(line[0], c) + line[2:]], 2, 0)
             coords.append(line[2:5])
         glLineWidth(1)
@@ -317,8 +144,10 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
             z = (self.min_extents[2] + self.max_extents[2])/2
         return x, y, z
 
+    def color_alpha(self, name):
+        return self.colors[name] + (self.colors.get(name+'_alpha', 1/3.),)
     def color_with_alpha(self, name):
-        glColor4f(*(self.colors[name] + (self.colors.get(name+'_alpha', 1/3.),)))
+        glColor4f(*self.color_alpha(name))
     def color(self, name):
         glColor3f(*self.colors[name])
 
@@ -336,6 +165,116 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
             self.draw_dwells(self.dwells, self.colors.get('dwell_alpha', 1/3.), for_selection, len(self.traverse) + len(self.feed) + len(self.arcfeed))
             glLineWidth(1)
 
+    def buffer_lines(self, buf, color, lines, tolerance=0, values=None,
+            ramp=None):
+        if self.is_foam:
+            buf.lines('XY', lines, self.color_alpha(color + "_xy"), self.foam_z, tolerance, values, ramp)
+            buf.lines('UV', lines, self.color_alpha(color + "_uv"), self.foam_w, tolerance, values, ramp)
+        else:
+            buf.lines(self.geometry, lines, self.color_alpha(color), 0, tolerance, values, ramp)
+
+    # coarser chord tolerance for picking arcs; 0 picks from every segment
+    select_arc_tolerance = 0
+
+    def fill_pick_index(self, index):
+        """Add what draw(1, ...) draws for selection to a linuxcnc.pickindex,
+        with traverses flagged 1"""
+        for store, flags, tol in ((self.traverse, 1, 0), (self.feed, 0, 0),
+                (self.arcfeed, 0, self.select_arc_tolerance)):
+            if self.is_foam:
+                index.lines('XY', store, self.foam_z, flags, tol)
+                index.lines('UV', store, self.foam_w, flags, tol)
+            else:
+                index.lines(self.geometry, store, 0, flags, tol)
+        index.dwells(self.geometry, self.dwells, self.is_lathe())
+
+    def fill_buffer(self, buf, no_traverse=True, tolerance=0, heat=None):
+        """Add what draw(0, no_traverse) draws to a linuxcnc.linebuffer,
+        simplified to 'tolerance' if it is not 0.  The caller enables the
+        line stipple for traverses.  'heat' colors the feeds by value: it is
+        (feed values, arcfeed values, ramp) as linebuffer.lines takes them."""
+        if not no_traverse:
+            self.buffer_lines(buf, 'traverse', self.traverse, tolerance)
+        else:
+            feed_values, arc_values, ramp = heat or (None, None, None)
+            self.buffer_lines(buf, 'straight_feed', self.feed, tolerance,
+                feed_values, ramp)
+            self.buffer_lines(buf, 'arc_feed', self.arcfeed, tolerance,
+                arc_values, ramp)
+            buf.width(2)
+            buf.dwells(self.geometry, self.dwells, self.colors.get('dwell_alpha', 1/3.), self.is_lathe())
+            buf.width(1)
+
+class PreviewLoader(threading.Thread):
+    """Run gcode.parse for a preview on a worker thread.
+
+    The canon must not touch the GUI toolkit from its callbacks.  While the
+    loader runs, the canon's segment stores fill up and may be drawn from the
+    GUI thread; see GlCanonDraw.start_preview and poll_preview."""
+    yield_interval = .02
+
+    def __init__(self, f, canon, args, key=None, previous=None):
+        threading.Thread.__init__(self, name="preview")
+        self.daemon = True
+        self.f = f
+        self.canon = canon
+        self.args = args
+        self.key = key
+        self.previous = previous
+        self.started = time.time()
+        self.started_cpu = loadtiming.cpu_time()
+        self.finished = None
+        self.result = None
+        self.exc_info = None
+        self.cancelled = False
+        self.shown = 0
+        self.shown_time = 0
+        canon.parse_yield = self.yield_interval
+
+    def run(self):
+        try:
+            self.result = reparse.parse(self.f, self.canon, self.args,
+                self.previous)
+        except KeyboardInterrupt:
+            self.cancelled = True
+        except:
+            self.exc_info = sys.exc_info()
+        self.previous = None
+        self.finished = time.time()
+
+    def cancel(self):
+        self.canon.aborted = True
+
+    def segment_count(self):
+        c = self.canon
+        return len(c.traverse) + len(c.feed) + len(c.arcfeed) + len(c.dwells)
+
+def live_plot_options(inifile):
+    """Keyword arguments for linuxcnc.positionlogger from the INI file:
+    [DISPLAY]LIVE_PLOT_POINTS is the most points the live plot keeps and
+    LIVE_PLOT_TOLERANCE how far, in machine units, it may stray from the
+    path of the tool.  A bad value is reported and the default used."""
+    options = {}
+    if inifile is None: return options
+    points = inifile.find("DISPLAY", "LIVE_PLOT_POINTS")
+    if points:
+        try:
+            points = int(points)
+        except ValueError:
+            points = 0
+        # the least linuxcnc.positionlogger accepts
+        if points < 16:
+            print "Error: invalid [DISPLAY] LIVE_PLOT_POINTS in INI file: must be a whole number of at least 16"
+        else:
+            options['capacity'] = points
+    tolerance = inifile.find("DISPLAY", "LIVE_PLOT_TOLERANCE")
+    if tolerance:
+        try:
+            options['tolerance'] = float(tolerance)
+        except ValueError:
+            print "Error: invalid [DISPLAY] LIVE_PLOT_TOLERANCE in INI file: must be a number"
+    return options
+
 def with_context(f):
     def inner(self, *args, **kw):
         self.activate()
@@ -416,6 +355,7 @@ class GlCanonDraw:
         self.lp = lp
         self.canon = g
         self._dlists = {}
+        self._buffers = {}
         self.select_buffer_size = 100
         self.cached_tool = -1
         self.initialised = 0
@@ -426,6 +366,9 @@ class GlCanonDraw:
         self.dro_mm = "% 9.3f"
         self.show_overlay = True
         self.cone_basesize = .5
+        self.preview_cache = None
+        self.arc_tolerance = self.select_arc_tolerance = 0
+        self.motion_limits = runtime.Limits()
         try:
             if os.environ["INI_FILE_NAME"]:
                 self.inifile = linuxcnc.ini(os.environ["INI_FILE_NAME"])
@@ -449,6 +392,31 @@ class GlCanonDraw:
                 size = (self.inifile.find("DISPLAY", "CONE_BASESIZE") or None)
                 if size is not None:
                     self.set_cone_basesize(float(size))
+                self.arc_tolerance = float(
+                    self.inifile.find("DISPLAY", "ARC_TOLERANCE") or 0)
+                self.select_arc_tolerance = float(
+                    self.inifile.find("DISPLAY", "SELECT_ARC_TOLERANCE") or 0)
+                cache = self.inifile.find("DISPLAY", "PREVIEW_CACHE")
+                if cache:
+                    self.set_preview_cache(cache)
+                # a program's preview may also depend on Python code
+                # and remap subroutines, which the key does not cover
+                self.preview_remapped = bool(
+                    self.inifile.find("PYTHON", "TOPLEVEL")
+                    or self.inifile.find("RS274NGC", "REMAP"))
+                compiled = self.inifile.find("DISPLAY", "COMPILED_PREVIEW")
+                if compiled and compiled.lower() in ("1", "yes", "true", "on"):
+                    self.compiled_preview = not self.preview_remapped
+                checkpoints = self.inifile.find("DISPLAY", "PREVIEW_CHECKPOINTS")
+                if checkpoints:
+                    self.preview_checkpoints = int(checkpoints)
+                log = self.inifile.find("DISPLAY", "LOAD_TIMING_LOG")
+                if log:
+                    self.load_timing_log = os.path.expanduser(log)
+                self.motion_limits = runtime.limits_from_ini(self.inifile)
+                color = self.inifile.find("DISPLAY", "PREVIEW_COLOR")
+                if color in self.preview_colors:
+                    self.preview_color = color
         except:
             # Probably started in an editor so no INI
             pass
@@ -458,6 +426,70 @@ class GlCanonDraw:
         self.cone_basesize = size
         self._redraw()
 
+    def set_preview_cache(self, cache):
+        """Enable the on-disk preview cache.  'cache' is YES/NO or the
+        cache directory"""
+        if cache.lower() in ("0", "no", "false", "off"):
+            self.preview_cache = None
+        elif cache.lower() in ("1", "yes", "true", "on"):
+            self.preview_cache = previewcache.PreviewCache()
+        else:
+            self.preview_cache = previewcache.PreviewCache(os.path.expanduser(cache))
+
+    def use_compiled_preview(self, canon):
+        """Whether the preview in 'canon' may be kept next to its program;
+        a GUI clears the canon's 'compiled_preview' for a program that is
+        the output of a filter"""
+        return self.compiled_preview and getattr(canon, 'compiled_preview', True)
+
+    def preview_cache_key(self, f, canon, args):
+        if self.preview_cache is None and not self.use_compiled_preview(canon):
+            return None
+        # a program still being written can't be keyed on its text
+        if getattr(canon, 'parse_stream', None) is not None: return None
+        return previewcache.cache_key(f, args, getattr(canon, 'tools', None),
+            getattr(canon, 'parameter_file', None), canon.arcdivision,
+            canon.is_foam, canon.arc_tolerance,
+            previewcache.file_digest(os.environ.get("INI_FILE_NAME")))
+
+    def load_cached_preview(self, f, canon, key):
+        """Fill 'canon' from the compiled preview of 'f' or the preview
+        cache; return (result, seq), or None if neither has it"""
+        if not key: return None
+        if self.use_compiled_preview(canon):
+            with self.timed("compiled_load"):
+                cached = previewcache.load_sidecar(f, key, canon)
+            if cached: return cached
+        if self.preview_cache is not None:
+            with self.timed("cache_load"):
+                return self.preview_cache.load(key, canon)
+        return None
+
+    def save_cached_preview(self, f, canon, key, result):
+        # only the preview of a program that read nothing but itself is
+        # kept: a subroutine file or remap could change without the key
+        # changing
+        record = getattr(canon, 'parse_record', None)
+        if (self.preview_remapped or gcode.subroutine_files()
+                or (record and record.files)):
+            return
+        if self.preview_cache is not None:
+            with self.timed("cache_save"):
+                self.preview_cache.save(key, canon, result)
+        if f and self.use_compiled_preview(canon):
+            with self.timed("compiled_save"):
+                previewcache.save_sidecar(f, key, canon, result)
+
+    def configure_canon(self, canon):
+        """Give 'canon' the [DISPLAY] arc tolerances, which are in machine
+        units, and the checkpoint interval for rs274.reparse"""
+        canon.checkpoint_interval = self.preview_checkpoints
+        if self.arc_tolerance:
+            canon.arc_tolerance = self.to_internal_linear_unit(self.arc_tolerance)
+        if self.select_arc_tolerance:
+            canon.select_arc_tolerance = \
+                self.to_internal_linear_unit(self.select_arc_tolerance)
+
     def init_glcanondraw(self,trajcoordinates="XYZABCUVW",kinsmodule="trivkins",msg=""):
         self.trajcoordinates = trajcoordinates.upper().replace(" ","")
         self.kinsmodule = kinsmodule
@@ -474,6 +506,8 @@ class GlCanonDraw:
 
     def set_canon(self, canon):
         self.canon = canon
+        self._heat = None
+        if canon is None: self.parsed_canon = None
 
     @with_context
     def basic_lighting(self):
@@ -488,8 +522,23 @@ class GlCanonDraw:
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
 
+    # Pick from a linuxcnc.pickindex instead of the GL selection buffer,
+    # when the canon allows it
+    use_pick_index = True
+    _pick_index = None
+
+    def pick_index(self):
+        if self._pick_index is None:
+            self._pick_index = linuxcnc.pickindex()
+            self.canon.fill_pick_index(self._pick_index)
+        return self._pick_index
+
     def select(self, x, y):
         if self.canon is None: return
+        if self.use_pick_index and self.canon.can_fill_buffer():
+            line = self.pick_index().pick(x, y, self.get_show_rapids())
+            self.set_highlight_line(line)
+            return
         pmatrix = glGetDoublev(GL_PROJECTION_MATRIX)
         glMatrixMode(GL_PROJECTION)
         glPushMatrix()
@@ -534,13 +583,126 @@ class GlCanonDraw:
         return self._dlists[name][0]
 
     def stale_dlist(self, name):
+        if name == 'select_norapids':
+            self._pick_index = None
+        if name in self._buffers:
+            for buf in self._buffers.pop(name).values():
+                buf.release()
         if name not in self._dlists: return
         base, count = self._dlists.pop(name)
         glDeleteLists(base, count)
 
+    # Draw the program preview from vertex buffers (linuxcnc.linebuffer)
+    # instead of display lists, when the canon allows it
+    use_vertex_buffers = True
+
+    def program_list(self, name):
+        """Draw 'program_rapids' or 'program_norapids'"""
+        canon = self.canon
+        if not (self.use_vertex_buffers and canon and canon.can_fill_buffer()):
+            glCallList(self.dlist(name, gen=self.make_main_list))
+            return
+        levels = self._buffers.setdefault(name, {})
+        level = self.lod_level()
+        buf = levels.get(level)
+        if buf is None:
+            if len(levels) >= self.lod_cache:
+                far = max(levels, key=lambda l: abs(l - level))
+                levels.pop(far).release()
+            buf = levels[level] = linuxcnc.linebuffer()
+            with self.timed_display():
+                canon.fill_buffer(buf, name == 'program_norapids',
+                    self.lod_tolerance(level), self.heat())
+        if name == 'program_rapids':
+            glEnable(GL_LINE_STIPPLE)
+            buf.draw()
+            glDisable(GL_LINE_STIPPLE)
+        else:
+            buf.draw()
+
+    # The program's feeds are colored by their type, by their programmed
+    # feed or by the highest velocity the machine reaches on them within
+    # motion_limits (see rs274.runtime.speeds).  Feed and velocity share a
+    # scale, from heat_colors[0] for standing still to heat_colors[-1] for
+    # the fastest feed in the program, so where the two views differ the
+    # segments are too short for the machine to reach the programmed feed.
+    # Only the vertex buffer preview is colored by feed or velocity.
+    preview_colors = ('type', 'feed', 'velocity')
+    preview_color = 'type'
+    _heat = None
+    heat_colors = ((0.20, 0.20, 1.00), (0.20, 1.00, 1.00), (0.20, 1.00, 0.20),
+        (1.00, 1.00, 0.20), (1.00, 0.20, 0.20))
+
+    @with_context
+    def set_preview_color(self, color):
+        if color not in self.preview_colors:
+            raise ValueError("unknown preview color %r" % (color,))
+        if color == self.preview_color: return
+        self.preview_color = color
+        self.stale_dlist('program_norapids')
+
+    def heat(self):
+        """The values and color ramp for fill_buffer for preview_color, or
+        None to color by type"""
+        canon = self.canon
+        color = self.preview_color
+        if color == 'type': return None
+        key = (color, len(canon.feed), len(canon.arcfeed), self.motion_limits)
+        if self._heat and self._heat[0] == key: return self._heat[1]
+        if color == 'velocity':
+            unused, feed, arc = runtime.speeds(canon, self.motion_limits)
+        else:
+            feed, arc = canon.feed.feedrate, canon.arcfeed.feedrate
+        high = max(max(canon.feed.feedrate or [0]),
+            max(canon.arcfeed.feedrate or [0]))
+        alpha = canon.color_alpha('straight_feed')[3]
+        ramp = 0, high, [c + (alpha,) for c in self.heat_colors]
+        self._heat = key, (feed, arc, ramp)
+        return self._heat[1]
+
+    # Level of detail: programs with more than lod_threshold segments are
+    # drawn simplified so that they stay within lod_pixels of the full
+    # preview at the current zoom.  Level k simplifies to 2**k * lod_unit
+    # times the size of the program, and up to lod_cache levels are kept.
+    lod_threshold = 200000
+    lod_pixels = .5
+    lod_unit = 2 ** -24
+    lod_cache = 4
+
+    def program_size(self):
+        canon = self.canon
+        return max([b - a for a, b in zip(canon.min_extents, canon.max_extents)])
+
+    def lod_level(self):
+        """The level of detail for the current view, 0 for full detail"""
+        canon = self.canon
+        if (len(canon.traverse) + len(canon.feed) + len(canon.arcfeed)
+                < self.lod_threshold):
+            return 0
+        size = self.program_size()
+        if size <= 0: return 0
+        # size of a pixel at the center of the view, for both the
+        # perspective and orthographic projections made by redraw_*
+        p = glGetDoublev(GL_PROJECTION_MATRIX)
+        h = self.winfo_height()
+        if not p[5] or not h: return 0
+        pixel = 2 * abs(p[15]) / abs(p[5] * h)
+        ratio = pixel * self.lod_pixels / (size * self.lod_unit)
+        if ratio < 2: return 0
+        return int(math.log(ratio, 2))
+
+    def lod_tolerance(self, level):
+        if not level: return 0
+        return self.program_size() * self.lod_unit * 2 ** level
+
     def __del__(self):
         for base, count in self._dlists.values():
             glDeleteLists(base, count)
+        # linebuffer leaves its GL buffer to release(), as it may be freed
+        # without the GL context current
+        for levels in self._buffers.values():
+            for buf in levels.values():
+                buf.release()
 
     def update_highlight_variable(self,line):
         self.highlight_line = line
@@ -1103,8 +1265,9 @@ class GlCanonDraw:
                 glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
             if self.get_show_rapids():
-                glCallList(self.dlist('program_rapids', gen=self.make_main_list))
-            glCallList(self.dlist('program_norapids', gen=self.make_main_list))
+                self.program_list('program_rapids')
+            self.program_list('program_norapids')
+            self.finish_load_timing()
             glCallList(self.dlist('highlight'))
 
             if self.get_program_alpha():
@@ -1813,27 +1976,175 @@ class GlCanonDraw:
     def make_main_list(self, unused=None):
         program = self.dlist('program_norapids')
         rapids = self.dlist('program_rapids')
-        glNewList(program, GL_COMPILE)
-        if self.canon: self.canon.draw(0, True)
-        glEndList()
-
-        glNewList(rapids, GL_COMPILE)
-        if self.canon: self.canon.draw(0, False)
-        glEndList()
+        with self.timed_display():
+            glNewList(program, GL_COMPILE)
+            if self.canon: self.canon.draw(0, True)
+            glEndList()
+
+            glNewList(rapids, GL_COMPILE)
+            if self.canon: self.canon.draw(0, False)
+            glEndList()
+
+    # see rs274.loadtiming
+    load_timing = None
+    load_timing_log = None
+
+    def begin_load_timing(self, filename):
+        """Start timing the load of 'filename'.  The phases done here are
+        timed until the display lists for the program have been built."""
+        if self.load_timing is not None:
+            self.load_timing.finish()
+        self.load_timing = loadtiming.LoadTiming(filename,
+            self.load_timing_log)
+        return self.load_timing
+
+    def continue_load_timing(self, filename):
+        """The LoadTiming of the load in progress, or a new one"""
+        timing = self.load_timing
+        if timing is None or timing.loaded or timing.finished is not None:
+            timing = self.begin_load_timing(filename)
+        return timing
+
+    def timed(self, name):
+        timing = self.load_timing
+        if timing is None or timing.finished is not None:
+            return loadtiming.no_phase
+        return timing.phase(name)
+
+    def timed_display(self):
+        """Time building the display of the program; while it is still
+        being parsed, that is a partial preview"""
+        timing = self.load_timing
+        if timing is None or timing.finished is not None:
+            return loadtiming.no_phase
+        return timing.phase(timing.loaded and "display" or "display_partial")
+
+    def finish_load_timing(self):
+        timing = self.load_timing
+        if timing is not None and timing.loaded and timing.has("display"):
+            timing.finish()
 
     def load_preview(self, f, canon, *args):
+        # an edited program is parsed again from where it changed
+        previous = self.parsed_canon
+        self.continue_load_timing(f)
         self.set_canon(canon)
-        result, seq = gcode.parse(f, canon, *args)
+        self.configure_canon(canon)
+        key = self.preview_cache_key(f, canon, args)
+        cached = self.load_cached_preview(f, canon, key)
+        if cached:
+            result, seq = cached
+        else:
+            with self.timed("parse"):
+                result, seq = reparse.parse(f, canon, args, previous)
+        self.finish_preview(canon, result, seq, key, cached, f)
+        return result, seq
 
+    def finish_preview(self, canon, result, seq, key=None, cached=False,
+            f=None):
+        self.parsed_canon = canon
         if result <= gcode.MIN_ERROR:
-            self.canon.progress.nextphase(1)
-            canon.calc_extents()
-            self.stale_dlist('program_rapids')
-            self.stale_dlist('program_norapids')
-            self.stale_dlist('select_rapids')
-            self.stale_dlist('select_norapids')
-
-        return result, seq
+            if not cached:
+                canon.progress.nextphase(1)
+                with self.timed("calc_extents"):
+                    canon.calc_extents()
+                if key:
+                    self.save_cached_preview(f, canon, key, (result, seq))
+            self.stale_program_dlists()
+        timing = self.load_timing
+        if timing is not None and not timing.loaded:
+            timing.result = result, seq
+            timing.count_canon(canon)
+            timing.loaded = True
+
+    def stale_program_dlists(self):
+        self.stale_dlist('program_rapids')
+        self.stale_dlist('program_norapids')
+        self.stale_dlist('select_rapids')
+        self.stale_dlist('select_norapids')
+
+    preview_loader = None
+    # the canon of the last finished load, for rs274.reparse
+    parsed_canon = None
+    # lines between rs274.reparse checkpoints; see [DISPLAY]PREVIEW_CHECKPOINTS
+    preview_checkpoints = 5000
+    # keep previews next to their programs; see [DISPLAY]COMPILED_PREVIEW
+    compiled_preview = False
+    # whether [PYTHON]TOPLEVEL or [RS274NGC]REMAP are set, so that no
+    # preview is cached
+    preview_remapped = False
+    # minimum time between rebuilding the partial preview while loading
+    preview_refresh = .5
+
+    def start_preview(self, f, canon, *args):
+        """Like load_preview, but parse on a worker thread.
+
+        The GUI must call poll_preview periodically until it returns
+        the finished loader.  Returns the PreviewLoader, which is
+        already finished on a preview cache hit."""
+        self.cancel_preview()
+        previous = self.parsed_canon
+        self.continue_load_timing(f)
+        self.set_canon(canon)
+        self.configure_canon(canon)
+        key = self.preview_cache_key(f, canon, args)
+        loader = PreviewLoader(f, canon, args, key, previous)
+        cached = self.load_cached_preview(f, canon, key)
+        if cached:
+            loader.result = cached
+            self.finish_preview(canon, cached[0], cached[1], key, True, f)
+            return loader
+        self.preview_loader = loader
+        loader.start()
+        return loader
+
+    def poll_preview(self):
+        """Process a preview being loaded by start_preview.
+
+        Returns None when no load is in progress, False when nothing
+        changed, True when the partial preview changed and should be
+        redrawn, and the PreviewLoader once it has finished.  The
+        loader's 'result' is then (result, seq), or None if the load was
+        cancelled or raised an exception (see 'exc_info')."""
+        loader = self.preview_loader
+        if loader is None: return None
+        if loader.is_alive():
+            now = time.time()
+            if now - loader.shown_time < self.preview_refresh: return False
+            count = loader.segment_count()
+            if count == loader.shown: return False
+            loader.shown = count
+            loader.shown_time = now
+            loader.canon.calc_extents()
+            self.stale_program_dlists()
+            return True
+        loader.join()
+        self.preview_loader = None
+        del loader.canon.parse_yield
+        timing = self.load_timing
+        if timing is not None and timing.finished is None:
+            timing.add("parse", loader.finished - loader.started,
+                loadtiming.cpu_time() - loader.started_cpu)
+        if loader.result is not None:
+            result, seq = loader.result
+            self.finish_preview(loader.canon, result, seq, loader.key,
+                f=loader.f)
+        else:
+            self.stale_program_dlists()
+            if timing is not None and loader.exc_info:
+                timing.fail(loader.exc_info)
+            elif timing is not None:
+                timing.error = "cancelled"
+                timing.finish()
+        return loader
+
+    def cancel_preview(self):
+        """Stop a load started by start_preview and return its loader"""
+        loader = self.preview_loader
+        if loader is None: return None
+        loader.cancel()
+        loader.join()
+        return self.poll_preview()
 
     def from_internal_units(self, pos, unit=None):
         if unit is None:
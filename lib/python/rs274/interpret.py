@@ -87,13 +87,16 @@ class Translated:
 class ArcsToSegmentsMixin:
     plane = 1
     arcdivision = 64
+    # when positive, divide arcs so that chords stay within this distance of
+    # the arc instead of using arcdivision
+    arc_tolerance = 0
 
     def set_plane(self, plane):
         self.plane = plane
 
     def arc_feed(self, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w):
         self.lo = tuple(self.lo)
-        segs = gcode.arc_to_segments(self, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w, self.arcdivision)
+        segs = gcode.arc_to_segments(self, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w, self.arcdivision, self.arc_tolerance)
         self.straight_arcsegments(segs)
 
 class PrintCanon:
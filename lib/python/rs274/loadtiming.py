@@ -0,0 +1,227 @@
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Where the time goes when a program is loaded
+
+A LoadTiming follows one program load through its phases (running the
+filter, opening the program in task, showing its text, parsing, finding
+the extents, building the display lists) and records how long each took,
+the CPU time used and how much the memory in use grew over the load, along
+with the number of segments and the preview settings.  GlCanonDraw times the phases it does
+itself; a GUI adds its own:
+
+    timing = o.begin_load_timing(filename)
+    with timing.phase("program_open"):
+        c.program_open(filename)
+
+When the load is complete, report() has the result as a dictionary, and it
+is appended as one line of JSON to [DISPLAY]LOAD_TIMING_LOG if that is set.
+A phase that raises ends the load, which is then logged with the error.
+"""
+
+import os, sys, time, json, resource, traceback
+
+def cpu_time():
+    t = os.times()
+    return t[0] + t[1]
+
+def memory():
+    """Resident set size of the process, in kB, or None if unknown"""
+    try:
+        f = open("/proc/self/statm")
+        try:
+            pages = int(f.read().split()[1])
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() // 1024
+
+def reset_peak_memory():
+    """Start peak_memory() again from the current resident set size.
+    Returns False where the kernel does not allow it."""
+    try:
+        f = open("/proc/self/clear_refs", "w")
+        try:
+            f.write("5")
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return False
+    return True
+
+def peak_memory():
+    """Largest resident set size of the process since reset_peak_memory,
+    in kB, or None if unknown"""
+    try:
+        f = open("/proc/self/status")
+        try:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+class Phase(object):
+    def __init__(self, timing, name):
+        self.timing = timing
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        self.cpu = cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.timing.add(self.name, time.time() - self.start,
+            cpu_time() - self.cpu)
+        if exc_type is not None:
+            self.timing.fail((exc_type, exc_value))
+
+class NoPhase(object):
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+
+no_phase = NoPhase()
+
+class LoadTiming(object):
+    def __init__(self, filename, log=None):
+        self.filename = filename
+        self.log = log
+        self.started = time.time()
+        self.phases = []
+        self._phase_index = {}
+        self.counts = {}
+        self.settings = {}
+        # set once the program has been parsed; the display lists built
+        # after that complete the load
+        self.loaded = False
+        self.result = None
+        self.error = None
+        self.finished = None
+        # memory is measured from here, as what was in use before belongs
+        # to the programs loaded before this one
+        self.start_memory = memory()
+        self.peak_from_start = reset_peak_memory()
+        self.peak = self.start_memory
+        self.final_memory = None
+
+    def phase(self, name):
+        """Context manager that times phase 'name'"""
+        return Phase(self, name)
+
+    def add(self, name, seconds, cpu=None):
+        """Record 'seconds' spent in phase 'name'.  A phase that happens
+        more than once is added up."""
+        i = self._phase_index.get(name)
+        if i is None:
+            i = self._phase_index[name] = len(self.phases)
+            self.phases.append({'name': name, 'seconds': 0., 'cpu': 0.,
+                'count': 0})
+        p = self.phases[i]
+        p['seconds'] += seconds
+        p['cpu'] += cpu or 0
+        p['count'] += 1
+        p['memory_kb'] = memory()
+        p['memory_growth_kb'] = self.growth(p['memory_kb'])
+        p['peak_memory_growth_kb'] = self.peak_growth()
+
+    def growth(self, kb):
+        """How much the memory in use grew from the start of the load to
+        'kb', or None if unknown"""
+        if kb is None or self.start_memory is None: return None
+        return kb - self.start_memory
+
+    def peak_growth(self):
+        """How much the most memory in use during the load grew over that
+        at its start.  Where the kernel's peak cannot be reset, it is the
+        most seen at the end of a phase."""
+        current = memory()
+        if current is not None:
+            self.peak = max(self.peak, current)
+        if self.peak_from_start:
+            peak = peak_memory()
+            if peak is not None: return self.growth(peak)
+        return self.growth(self.peak)
+
+    def has(self, name):
+        return name in self._phase_index
+
+    def count_canon(self, canon):
+        """Record the size of the preview in 'canon'"""
+        counts = self.counts
+        for name in 'traverse', 'feed', 'arcfeed', 'dwells':
+            store = getattr(canon, name, None)
+            if store is not None: counts[name] = len(store)
+        for name in 'arcdivision', 'arc_tolerance', 'checkpoint_interval':
+            value = getattr(canon, name, None)
+            if value is not None: self.settings[name] = value
+        record = getattr(canon, 'parse_record', None)
+        if record is not None:
+            counts['checkpoints'] = len(canon.checkpoints)
+            counts['resumed_at'] = record.resumed
+            counts['converged_at'] = record.converged
+        try:
+            counts['bytes'] = os.path.getsize(self.filename)
+        except (OSError, TypeError):
+            pass
+
+    def report(self):
+        end = self.finished or time.time()
+        memory_growth, peak_growth = self.final_memory or (
+            self.growth(memory()), self.peak_growth())
+        return {
+            'file': self.filename,
+            'started': self.started,
+            'seconds': end - self.started,
+            'complete': self.finished is not None,
+            'result': self.result,
+            'error': self.error,
+            'phases': self.phases,
+            'counts': self.counts,
+            'settings': self.settings,
+            'memory_growth_kb': memory_growth,
+            'peak_memory_growth_kb': peak_growth,
+        }
+
+    def fail(self, exc_info):
+        """End the load with the exception in 'exc_info', (type, value,
+        ...) as sys.exc_info gives it, and log it"""
+        if self.finished is not None: return
+        self.error = "".join(
+            traceback.format_exception_only(*exc_info[:2])).strip()
+        self.finish()
+
+    def finish(self):
+        """Mark the load complete and log it"""
+        if self.finished is not None: return
+        self.finished = time.time()
+        self.final_memory = self.growth(memory()), self.peak_growth()
+        if not self.log: return
+        try:
+            f = open(self.log, "a")
+            try:
+                f.write(json.dumps(self.report(), sort_keys=True) + "\n")
+            finally:
+                f.close()
+        except (IOError, OSError), detail:
+            print >>sys.stderr, "load timing: could not write %s: %s" % (
+                self.log, detail)
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,255 @@
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""On-disk cache of parsed program previews
+
+A cache file holds everything GlCanonDraw.load_preview produces for one
+program: the segment stores and the order of their segments, the dwells,
+the marks used by rs274.runtime, the extents, the parse result and the
+rs274.reparse checkpoints.  It is keyed on the program text and everything
+else that changes how the interpreter sees it (startup codes, tool table,
+parameter file, arcdivision, INI file), so a hit can skip gcode.parse and
+calc_extents entirely.
+
+PreviewCache keeps the files in one directory, named by their key.  A
+compiled preview is the same file kept next to the program as a sidecar
+(see sidecar_path), with its key inside; it is only used while the key
+still matches, so a change to the program or its setup makes it stale.
+
+File layout: an 8 byte magic, a little header (marshal) giving the offset
+and size of each column, then the raw column data, each section aligned to
+8 bytes.  The file is mapped to read it, and each column is copied from
+the map into its store.
+"""
+
+import os, errno, struct, marshal, mmap, hashlib, tempfile
+
+MAGIC = "LCNCPRV3"
+STORES = ('traverse', 'feed', 'arcfeed')
+COLUMNS = ('vertices', 'seg_start', 'lineno', 'feedrate', 'tool', 'tlo_table')
+MAX_ENTRIES = 16
+SIDECAR_SUFFIX = ".preview"
+
+def default_directory():
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "linuxcnc", "preview")
+
+def sidecar_path(filename):
+    """Where the compiled preview of program 'filename' is kept"""
+    return filename + SIDECAR_SUFFIX
+
+def _hash_file(h, filename):
+    try:
+        f = open(filename, "rb")
+    except (IOError, OSError, TypeError):
+        h.update("\0nofile\0")
+        return
+    try:
+        while 1:
+            block = f.read(1 << 20)
+            if not block: break
+            h.update(block)
+    finally:
+        f.close()
+    h.update("\0")
+
+def file_digest(filename):
+    """Digest of the contents of 'filename', for the 'extra' arguments of
+    cache_key"""
+    h = hashlib.sha1()
+    _hash_file(h, filename)
+    return h.hexdigest()
+
+def cache_key(filename, parse_args, tools, parameter_file, arcdivision, *extra):
+    """Return the cache key for parsing 'filename'.
+
+    'parse_args' are the extra arguments given to gcode.parse (the startup
+    codes and interpreter name).  'tools' is the tool table as seen by the
+    canon (StatMixin.tools) or the name of the tool table file."""
+    h = hashlib.sha1(MAGIC)
+    _hash_file(h, filename)
+    h.update(repr(parse_args))
+    if isinstance(tools, basestring):
+        _hash_file(h, tools)
+    else:
+        h.update(repr([tuple(t) for t in tools or ()]))
+    _hash_file(h, parameter_file)
+    h.update(repr((arcdivision,) + extra))
+    return h.hexdigest()
+
+def read_file(path, canon, key=None):
+    """Fill 'canon' from the preview file 'path' and return (result, seq),
+    or None if it is missing, damaged or, given 'key', for another key"""
+    try:
+        f = open(path, "rb")
+    except (IOError, OSError):
+        return None
+    try:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            return None
+        try:
+            return _load(m, canon, key)
+        finally:
+            m.close()
+    finally:
+        f.close()
+
+def _load(m, canon, key):
+    from rs274 import reparse
+    if m[:8] != MAGIC: return None
+    hlen, = struct.unpack("<I", m[8:12])
+    try:
+        header = marshal.loads(m[12:12+hlen])
+    except (EOFError, ValueError, TypeError):
+        return None
+    if key is not None and header['key'] != key: return None
+    base = header['base']
+    for offset, size in header['sections'].values():
+        if base + offset + size > len(m): return None
+    for name in STORES:
+        buffers = {}
+        for column in COLUMNS:
+            offset, size = header['sections'][name, column]
+            buffers[column] = buffer(m, base + offset, size)
+        getattr(canon, name).load_raw(**buffers)
+    canon.motion_order.__init__()
+    canon.motion_order.extend_raw(header['motion_order'])
+    canon.dwells[:] = header['dwells']
+    canon.dwell_time = header['dwell_time']
+    canon.motion_modes[:] = header['motion_modes']
+    canon.dwell_marks[:] = header['dwell_marks']
+    canon.tool_marks[:] = header['tool_marks']
+    canon.foam_z, canon.foam_w = header['foam']
+    (canon.min_extents, canon.max_extents,
+        canon.min_extents_notool, canon.max_extents_notool) = header['extents']
+    if header['checkpoints'] is not None:
+        reparse.restore_checkpoints(canon, header['checkpoints'])
+    return header['result']
+
+def write_file(path, key, canon, result):
+    """Write the preview in 'canon' to 'path', by way of a temporary file
+    in the same directory.  Raises EnvironmentError if it can't."""
+    from rs274 import reparse
+    sections = {}
+    chunks = []
+    offset = 0
+    for name in STORES:
+        store = getattr(canon, name)
+        for column in COLUMNS:
+            data = getattr(store, column).tostring()
+            sections[name, column] = offset, len(data)
+            pad = -len(data) % 8
+            chunks.append(data + "\0" * pad)
+            offset += len(data) + pad
+    header = {
+        'key': key,
+        'result': tuple(result),
+        'motion_order': canon.motion_order.runs.tostring(),
+        'dwells': list(canon.dwells),
+        'dwell_time': canon.dwell_time,
+        'motion_modes': list(canon.motion_modes),
+        'dwell_marks': list(canon.dwell_marks),
+        'tool_marks': list(canon.tool_marks),
+        'foam': (canon.foam_z, canon.foam_w),
+        'extents': (tuple(canon.min_extents), tuple(canon.max_extents),
+            tuple(canon.min_extents_notool), tuple(canon.max_extents_notool)),
+        'checkpoints': reparse.save_checkpoints(canon),
+        'sections': sections,
+    }
+    # the header size depends on 'base', so settle it with a fixed width
+    header['base'] = 1 << 62
+    hlen = len(marshal.dumps(header))
+    header['base'] = (12 + hlen + 7) & ~7
+    hdata = marshal.dumps(header)
+    hdata += "\0" * (header['base'] - 12 - len(hdata))
+
+    directory, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(dir=directory or ".", prefix="." + name,
+        suffix=".tmp")
+    try:
+        f = os.fdopen(fd, "wb")
+        try:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(hdata)))
+            f.write(hdata)
+            for c in chunks: f.write(c)
+        finally:
+            f.close()
+        os.rename(tmp, path)
+    except:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def load_sidecar(filename, key, canon):
+    """Fill 'canon' from the compiled preview of 'filename' if it is there
+    and has key 'key'; return (result, seq) or None"""
+    return read_file(sidecar_path(filename), canon, key)
+
+def save_sidecar(filename, key, canon, result):
+    """Write the compiled preview of 'filename'.  A program in a directory
+    that can't be written to just doesn't get one."""
+    try:
+        write_file(sidecar_path(filename), key, canon, result)
+    except (IOError, OSError), detail:
+        if detail.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+            print "compiled preview: could not save %s: %s" % (
+                sidecar_path(filename), detail)
+
+class PreviewCache:
+    def __init__(self, directory=None, max_entries=MAX_ENTRIES):
+        self.directory = directory or default_directory()
+        self.max_entries = max_entries
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".preview")
+
+    def load(self, key, canon):
+        """Fill 'canon' from the cache; return (result, seq) or None on a miss"""
+        result = read_file(self.path(key), canon)
+        if result is not None:
+            try:
+                os.utime(self.path(key), None)
+            except OSError:
+                pass
+        return result
+
+    def save(self, key, canon, result):
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            write_file(self.path(key), key, canon, result)
+        except (IOError, OSError), detail:
+            print "preview cache: could not save %s: %s" % (key, detail)
+            return
+        self.prune()
+
+    def prune(self):
+        try:
+            names = [os.path.join(self.directory, n)
+                for n in os.listdir(self.directory) if n.endswith(".preview")]
+            names.sort(key=lambda n: os.stat(n).st_mtime, reverse=True)
+            for n in names[self.max_entries:]:
+                os.unlink(n)
+        except OSError:
+            pass
+
+# vim:ts=8:sts=4:sw=4:et:
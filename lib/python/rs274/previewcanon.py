@@ -0,0 +1,292 @@
+#    This is a component of AXIS, a front-end for emc
+#    Copyright 2004, 2005, 2006 Jeff Epler <jepler@unpythonic.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Canon that records a program's toolpath for the preview
+
+PreviewCanon keeps the segments, dwells and extents that gcode.parse
+produces, without drawing anything.  glcanon.GLCanon adds the OpenGL
+drawing; programs that only need the numbers (such as gcode-report) can
+use PreviewCanon without a display.
+"""
+
+from rs274 import Translated, ArcsToSegmentsMixin
+from rs274.segments import SegmentStore, MotionOrder, LineIndex, adjacent_line
+import gcode
+
+class PreviewCanon(Translated, ArcsToSegmentsMixin):
+    lineno = -1
+    # lines between the checkpoints rs274.reparse asks gcode.parse for;
+    # 0 for none
+    checkpoint_interval = 0
+    next_checkpoint = 0
+    parse_resume = None
+    reparse = None
+    # attributes that are not part of the canon's state at a checkpoint
+    checkpoint_exclude = frozenset(['traverse', 'feed', 'arcfeed', 'dwells',
+        'motion_order', 'motion_modes', 'dwell_marks', 'tool_marks',
+        'checkpoints', 'parse_record', 'reparse', 'next_checkpoint',
+        'parse_resume', 'parse_yield', 'parse_stream', 'aborted',
+        '_motion_lines', '_motion_lines_key', 'choice', 'highlight_line',
+        'min_extents', 'max_extents', 'min_extents_notool',
+        'max_extents_notool'])
+    # methods that gcode.parse replaces with its native motion sink
+    native_methods = ('straight_traverse', 'straight_feed', 'straight_probe',
+        'rigid_tap', 'arc_feed', 'straight_arcsegments', 'rotate_and_translate')
+    def __init__(self, colors, geometry, is_foam=0):
+        # traverse segments - line number, start position, end position, tlo
+        self.traverse = SegmentStore(has_feedrate=False); self.traverse_add = self.traverse.add
+        # feed segments - line number, start position, end position, feedrate, tlo
+        self.feed = SegmentStore(); self.feed_add = self.feed.add
+        # arcfeed segments - line number, start position, end position, feedrate, tlo
+        self.arcfeed = SegmentStore(); self.arcfeed_add = self.arcfeed.add
+        # how the path goes from one of those stores to the next
+        self.motion_order = MotionOrder()
+        # dwell list - [line number, color, pos x, pos y, pos z, plane]
+        self.dwells = []; self.dwells_append = self.dwells.append
+        self._dwell_index = LineIndex()
+        self._motion_lines = []; self._motion_lines_key = None
+        self.choice = None
+        self.feedrate = 1
+        self.lo = (0,) * 9
+        self.first_move = True
+        self.geometry = geometry
+        self.min_extents = [9e99,9e99,9e99]
+        self.max_extents = [-9e99,-9e99,-9e99]
+        self.min_extents_notool = [9e99,9e99,9e99]
+        self.max_extents_notool = [-9e99,-9e99,-9e99]
+        self.colors = colors
+        self.in_arc = 0
+        self.xo = self.yo = self.zo = self.ao = self.bo = self.co = self.uo = self.vo = self.wo = 0
+        self.dwell_time = 0
+        # for rs274.runtime: where the blend mode changes, dwells and tool
+        # changes happen, counted in segments of motion_order
+        self.motion_modes = []  # (segments, mode, tolerance)
+        self.dwell_marks = []   # (segments, line number, seconds)
+        self.tool_marks = []    # ((traverse, feed, arcfeed), dwells, tool)
+        # rs274.reparse.Checkpoint list, and the Record of the last parse
+        self.checkpoints = []
+        self.parse_record = None
+        self.suppress = 0
+        self.g92_offset_x = 0.0
+        self.g92_offset_y = 0.0
+        self.g92_offset_z = 0.0
+        self.g92_offset_a = 0.0
+        self.g92_offset_b = 0.0
+        self.g92_offset_c = 0.0
+        self.g92_offset_u = 0.0
+        self.g92_offset_v = 0.0
+        self.g92_offset_w = 0.0
+        self.g5x_index = 1
+        self.g5x_offset_x = 0.0
+        self.g5x_offset_y = 0.0
+        self.g5x_offset_z = 0.0
+        self.g5x_offset_a = 0.0
+        self.g5x_offset_b = 0.0
+        self.g5x_offset_c = 0.0
+        self.g5x_offset_u = 0.0
+        self.g5x_offset_v = 0.0
+        self.g5x_offset_w = 0.0
+        self.is_foam = is_foam
+        self.foam_z = 0
+        self.foam_w = 1.5
+        self.notify = 0
+        self.notify_message = ""
+        self.highlight_line = None
+        self.aborted = False
+        # set while the program file is still being written; see gcode.parse
+        self.parse_stream = None
+        self.native_motion = self.can_use_native_motion()
+
+    def overrides(self, names, base):
+        """True if a subclass overrides any of the named methods of 'base'"""
+        for name in names:
+            if getattr(self.__class__, name).im_func \
+                    is not getattr(base, name).im_func:
+                return True
+        return False
+
+    def can_use_native_motion(self):
+        """True unless a subclass overrides how motion is recorded, in
+        which case gcode.parse must call the Python methods for every move"""
+        return not self.overrides(self.native_methods, PreviewCanon)
+
+    def comment(self, arg):
+        if arg.startswith("AXIS,"):
+            parts = arg.split(",")
+            command = parts[1]
+            if command == "stop": raise KeyboardInterrupt
+            if command == "hide": self.suppress += 1
+            if command == "show": self.suppress -= 1
+            if command == "XY_Z_POS": 
+                if len(parts) > 2 :
+                    try:
+                        self.foam_z = float(parts[2])
+                        if 210 in self.state.gcodes:
+                            self.foam_z = self.foam_z / 25.4
+                    except:
+                        self.foam_z = 5.0/25.4
+            if command == "UV_Z_POS": 
+                if len(parts) > 2 :
+                    try:
+                        self.foam_w = float(parts[2])
+                        if 210 in self.state.gcodes:
+                            self.foam_w = self.foam_w / 25.4
+                    except:
+                        self.foam_w = 30.0
+            if command == "notify":
+                self.notify = self.notify + 1
+                self.notify_message = "(AXIS,notify):" + str(self.notify)
+                if len(parts) > 2:
+                    if len(parts[2]): self.notify_message = parts[2]
+
+    def message(self, message): pass
+
+    def check_abort(self): return self.aborted
+
+    def next_line(self, st):
+        self.state = st
+        self.lineno = self.state.sequence_number
+
+    def checkpoint(self, state, lineno, offset):
+        """Called by gcode.parse at line next_checkpoint; see rs274.reparse.
+        Returns True to stop the parse."""
+        return self.reparse.checkpoint(state, lineno, offset)
+
+    def calc_extents(self):
+        self.min_extents, self.max_extents, self.min_extents_notool, self.max_extents_notool = gcode.calc_extents(self.arcfeed, self.feed, self.traverse)
+        if self.is_foam:
+            min_z = min(self.foam_z, self.foam_w)
+            max_z = max(self.foam_z, self.foam_w)
+            self.min_extents = self.min_extents[0], self.min_extents[1], min_z
+            self.max_extents = self.max_extents[0], self.max_extents[1], max_z
+            self.min_extents_notool = \
+                self.min_extents_notool[0], self.min_extents_notool[1], min_z
+            self.max_extents_notool = \
+                self.max_extents_notool[0], self.max_extents_notool[1], max_z
+    def tool_offset(self, xo, yo, zo, ao, bo, co, uo, vo, wo):
+        self.first_move = True
+        x, y, z, a, b, c, u, v, w = self.lo
+        self.lo = (x - xo + self.xo, y - yo + self.yo, z - zo + self.zo, a - ao + self.ao, b - bo + self.bo, c - bo + self.bo,
+          u - uo + self.uo, v - vo + self.vo, w - wo + self.wo)
+        self.xo = xo
+        self.yo = yo
+        self.zo = zo
+        self.so = ao
+        self.bo = bo
+        self.co = co
+        self.uo = uo
+        self.vo = vo
+        self.wo = wo
+
+    def set_spindle_rate(self, arg): pass
+    def set_feed_rate(self, arg): self.feedrate = arg / 60.
+    def select_plane(self, arg): pass
+
+    def change_tool(self, arg):
+        self.first_move = True
+        # with StatMixin the tool number is known; otherwise go by pocket
+        tool = arg
+        get_tool = getattr(self, 'get_tool', None)
+        if arg and get_tool is not None: tool = get_tool(arg)[0]
+        self.tool_marks.append(((len(self.traverse), len(self.feed),
+            len(self.arcfeed)), len(self.dwell_marks), tool))
+
+    def set_motion_control_mode(self, mode, tolerance):
+        self.motion_modes.append((self.motion_order.count, mode, tolerance))
+
+    def straight_traverse(self, x,y,z, a,b,c, u, v, w):
+        if self.suppress > 0: return
+        l = self.rotate_and_translate(x,y,z,a,b,c,u,v,w)
+        if not self.first_move:
+                self.traverse_add(self.lineno, self.lo, l, 0, (self.xo, self.yo, self.zo))
+                self.motion_order.add(MotionOrder.TRAVERSE)
+        self.lo = l
+
+    def rigid_tap(self, x, y, z):
+        if self.suppress > 0: return
+        self.first_move = False
+        l = self.rotate_and_translate(x,y,z,0,0,0,0,0,0)[:3]
+        l += [self.lo[3], self.lo[4], self.lo[5],
+               self.lo[6], self.lo[7], self.lo[8]]
+        self.feed_add(self.lineno, self.lo, l, self.feedrate, (self.xo, self.yo, self.zo))
+#        self.dwells_append((self.lineno, self.colors['dwell'], x + self.offset_x, y + self.offset_y, z + self.offset_z, 0))
+        self.feed_add(self.lineno, l, self.lo, self.feedrate, (self.xo, self.yo, self.zo))
+        self.motion_order.add(MotionOrder.FEED, 2)
+
+    def arc_feed(self, *args):
+        if self.suppress > 0: return
+        self.first_move = False
+        self.in_arc = True
+        try:
+            ArcsToSegmentsMixin.arc_feed(self, *args)
+        finally:
+            self.in_arc = False
+
+    def straight_arcsegments(self, segs):
+        self.first_move = False
+        if not segs: return
+        self.arcfeed.add_path(self.lineno, self.lo, segs, self.feedrate,
+            (self.xo, self.yo, self.zo))
+        self.motion_order.add(MotionOrder.ARCFEED, len(segs))
+        self.lo = segs[-1]
+
+    def straight_feed(self, x,y,z, a,b,c, u, v, w):
+        if self.suppress > 0: return
+        self.first_move = False
+        l = self.rotate_and_translate(x,y,z,a,b,c,u,v,w)
+        self.feed_add(self.lineno, self.lo, l, self.feedrate, (self.xo, self.yo, self.zo))
+        self.motion_order.add(MotionOrder.FEED)
+        self.lo = l
+    straight_probe = straight_feed
+
+    def user_defined_function(self, i, p, q):
+        if self.suppress > 0: return
+        color = self.colors['m1xx']
+        self.dwells_append((self.lineno, color, self.lo[0], self.lo[1], self.lo[2], self.state.plane/10-17))
+
+    def dwell(self, arg):
+        if self.suppress > 0: return
+        self.dwell_time += arg
+        self.dwell_marks.append((self.motion_order.count, self.lineno, arg))
+        color = self.colors['dwell']
+        self.dwells_append((self.lineno, color, self.lo[0], self.lo[1], self.lo[2], self.state.plane/10-17))
+
+    def dwell_line_index(self):
+        index = self._dwell_index
+        if index.count > len(self.dwells):
+            index = self._dwell_index = LineIndex()
+        if index.count < len(self.dwells):
+            index.update(d[0] for d in self.dwells[index.count:])
+        return index
+
+    def motion_lines(self):
+        """Sorted list of the line numbers that have motion or dwells"""
+        key = (len(self.traverse), len(self.feed), len(self.arcfeed),
+            len(self.dwells))
+        if key != self._motion_lines_key:
+            lines = set(self.dwell_line_index().ranges)
+            for store in self.traverse, self.feed, self.arcfeed:
+                lines.update(store.line_index().ranges)
+            self._motion_lines = sorted(lines)
+            self._motion_lines_key = key
+        return self._motion_lines
+
+    def adjacent_motion_line(self, lineno, direction):
+        """The next (direction > 0) or previous line with motion, or None"""
+        return adjacent_line(self.motion_lines(), lineno, direction)
+
+# vim:ts=8:sts=4:sw=4:et:
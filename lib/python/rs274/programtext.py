@@ -0,0 +1,331 @@
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Program text display for programs of any length
+
+ProgramFile maps a program into memory and indexes where each line starts.
+The index is built a chunk at a time, as far as it has been asked for, so
+opening a file costs the same whatever its length.  The program may be
+rewritten or truncated while it is shown, and reading a map of a file past
+its new end kills the process, so the file is checked before each access
+and opened again when it has changed.
+
+ProgramView shows a ProgramFile in a Tk text widget.  Only the lines that
+fit in the widget are ever inserted into it; scrolling replaces them.  Line
+tags (the highlighted line, the executing line, lines skipped by "run
+from here") are kept as line ranges and applied to whatever is on screen.
+"""
+
+import os, mmap, array, bisect
+
+class ProgramFile(object):
+    chunk = 1 << 22
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        self.data = ""
+        self.open()
+
+    def open(self):
+        """Map the file and start its line index again"""
+        self.close()
+        self.file = open(self.filename, "rb")
+        st = os.fstat(self.file.fileno())
+        self.stamp = st.st_size, st.st_mtime
+        self.size = st.st_size
+        if self.size:
+            # private: the program is not ours to change
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_COPY)
+        # offsets[i] is where line i+1 starts; once the whole file has been
+        # indexed the last entry is the end of the file
+        self.offsets = array.array('l', [0])
+        self.indexed = 0
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = ""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def check(self):
+        """Open the file again if it has changed since it was mapped"""
+        if self.file is None: return
+        st = os.fstat(self.file.fileno())
+        if (st.st_size, st.st_mtime) == self.stamp: return
+        try:
+            self.open()
+        except (IOError, OSError):
+            # gone: show nothing rather than what was there
+            self.close()
+            self.size = 0
+            self.offsets = array.array('l', [0])
+            self.indexed = 0
+
+    def complete(self):
+        return self.indexed >= self.size
+
+    def scan(self, nbytes=None):
+        """Extend the line index over the next nbytes of the file"""
+        self.check()
+        if self.complete(): return
+        start = self.indexed
+        stop = min(self.size, start + (nbytes or self.chunk))
+        find = self.data.find
+        append = self.offsets.append
+        pos = find("\n", start, stop)
+        while pos != -1:
+            append(pos + 1)
+            pos = find("\n", pos + 1, stop)
+        self.indexed = stop
+        if stop == self.size and self.offsets[-1] != stop:
+            append(stop)
+
+    def ensure(self, lineno):
+        """Index the file at least as far as line 'lineno'"""
+        while len(self.offsets) <= lineno and not self.complete():
+            self.scan()
+
+    def known_lines(self):
+        return len(self.offsets) - 1
+
+    def count(self):
+        """Number of lines in the file.  This indexes the whole file."""
+        while not self.complete():
+            self.scan()
+        return len(self.offsets) - 1
+
+    def estimate(self):
+        """Number of lines in the file, estimated from the part indexed"""
+        if self.complete() or not self.indexed:
+            return len(self.offsets) - 1
+        return int((len(self.offsets) - 1) * float(self.size) / self.indexed)
+
+    def line(self, lineno):
+        """Text of line 'lineno' (counting from 1) without its newline, or
+        None past the end of the file"""
+        self.check()
+        self.ensure(lineno)
+        if lineno < 1 or lineno >= len(self.offsets): return None
+        return self.data[self.offsets[lineno-1]:self.offsets[lineno]].rstrip("\r\n")
+
+    def line_at(self, pos):
+        """The line holding byte 'pos' of the file"""
+        self.check()
+        while self.indexed <= pos and not self.complete():
+            self.scan()
+        return bisect.bisect_right(self.offsets, pos)
+
+    def search(self, text, lineno=0, backwards=False):
+        """First line after 'lineno' (before it, if backwards) containing
+        'text', or None"""
+        if not text: return None
+        self.check()
+        if backwards:
+            if lineno <= 1: return None
+            self.ensure(lineno)
+            end = self.offsets[min(lineno, len(self.offsets)) - 1]
+            pos = self.data.rfind(text, 0, end)
+        else:
+            self.ensure(lineno + 1)
+            if lineno >= len(self.offsets) - 1: return None
+            pos = self.data.find(text, self.offsets[max(lineno, 0)])
+        if pos == -1: return None
+        return self.line_at(pos)
+
+class ProgramView(object):
+    # how many lines to index per idle callback while a file is open
+    idle_chunk = 1 << 20
+
+    def __init__(self, text, scrollbar=None):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.program = None
+        self.top = 1
+        self.shown = 0
+        self.tags = {}
+        self.after_id = None
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+        text.configure(yscrollcommand="")
+
+    def load(self, filename):
+        """Show the program in 'filename'.  Returns the ProgramFile."""
+        self.close()
+        self.program = ProgramFile(filename)
+        self.top = 1
+        self.render()
+        self.after_id = self.text.after_idle(self.index_more)
+        return self.program
+
+    def close(self):
+        if self.after_id is not None:
+            self.text.after_cancel(self.after_id)
+            self.after_id = None
+        if self.program is not None:
+            self.program.close()
+            self.program = None
+        self.tags.clear()
+        self.top = 1
+        self.render()
+
+    def index_more(self):
+        # Finish the line index in the background so that the scrollbar
+        # settles on the real length
+        self.after_id = None
+        program = self.program
+        if program is None or program.complete(): return
+        program.scan(self.idle_chunk)
+        self.set_scrollbar()
+        if not program.complete():
+            self.after_id = self.text.after(1, self.index_more)
+
+    def lines(self):
+        """Number of lines in the program (indexing all of it if need be)"""
+        if self.program is None: return 0
+        return self.program.count()
+
+    def line(self, lineno):
+        if self.program is None: return None
+        return self.program.line(lineno)
+
+    def search(self, text, lineno=0, backwards=False):
+        if self.program is None: return None
+        return self.program.search(text, lineno, backwards)
+
+    def rows(self):
+        """Number of lines that fit in the widget, counting a partly
+        visible last line"""
+        t = self.text
+        linespace = int(t.tk.call("font", "metrics", t.cget("font"),
+                "-linespace"))
+        height = t.winfo_height()
+        if height <= 1:
+            height = int(t.cget("height")) * linespace
+        return max(1, height // max(1, linespace) + 1)
+
+    def visible(self):
+        """Number of lines that fit entirely in the widget"""
+        return max(1, self.rows() - 1)
+
+    def total(self):
+        if self.program is None: return 0
+        return max(self.program.estimate(), self.program.known_lines())
+
+    def clamp(self, top):
+        if self.program is not None:
+            self.program.ensure(top + self.visible())
+        last = max(1, self.total() - self.visible() + 1)
+        return int(max(1, min(top, last)))
+
+    def refresh(self):
+        """Redraw, e.g. after the widget has changed size"""
+        self.top = self.clamp(self.top)
+        self.render()
+
+    def set_top(self, top):
+        top = self.clamp(top)
+        if top != self.top or self.shown == 0:
+            self.top = top
+            self.render()
+
+    def render(self):
+        t = self.text
+        state = t.cget("state")
+        t.configure(state="normal")
+        t.delete("1.0", "end")
+        code = []
+        if self.program is not None:
+            for lineno in range(self.top, self.top + self.rows()):
+                l = self.program.line(lineno)
+                if l is None: break
+                code.extend(["%6d: " % lineno, "lineno",
+                    l.expandtabs().replace("\r", "") + "\n", ""])
+        self.shown = len(code) // 4
+        if code:
+            t.insert("end", *code)
+        for tag in self.tags:
+            self.apply_tag(tag)
+        t.configure(state=state)
+        t.yview_moveto(0)
+        self.set_scrollbar()
+
+    def set_scrollbar(self):
+        if self.scrollbar is None: return
+        total = self.total()
+        if total <= 0:
+            self.scrollbar.set(0, 1)
+            return
+        first = (self.top - 1.) / total
+        last = min(1., (self.top - 1. + self.visible()) / total)
+        self.scrollbar.set(first, last)
+
+    def yview(self, *args):
+        """Scrollbar command"""
+        if not args or self.program is None: return
+        if args[0] == "moveto":
+            fraction = max(0., min(1., float(args[1])))
+            if self.program.complete():
+                top = int(fraction * self.total()) + 1
+            else:
+                top = self.program.line_at(int(fraction * self.program.size))
+            self.set_top(top)
+        elif args[0] == "scroll":
+            n = int(args[1])
+            if args[2] == "pages":
+                n = n * max(1, self.visible() - 1)
+            self.scroll(n)
+
+    def scroll(self, n):
+        self.set_top(self.top + n)
+
+    def see(self, lineno):
+        """Scroll so that 'lineno' is entirely visible"""
+        visible = self.visible()
+        if lineno < self.top:
+            self.set_top(lineno)
+        elif lineno > self.top + visible - 1:
+            self.set_top(lineno - visible + 1)
+
+    def line_at(self, x, y):
+        """The program line shown at widget coordinates x, y"""
+        i = self.text.index("@%d,%d" % (x, y))
+        return int(i.split(".")[0]) + self.top - 1
+
+    def set_tag(self, tag, first, last=None):
+        """Apply 'tag' to program lines first..last"""
+        if last is None: last = first
+        self.tags[tag] = (first, last)
+        self.apply_tag(tag)
+
+    def clear_tag(self, tag):
+        self.tags.pop(tag, None)
+        self.text.tag_remove(tag, "1.0", "end")
+
+    def apply_tag(self, tag):
+        t = self.text
+        t.tag_remove(tag, "1.0", "end")
+        first, last = self.tags[tag]
+        first = max(first, self.top)
+        last = min(last, self.top + self.shown - 1)
+        if first <= last:
+            t.tag_add(tag, "%d.0" % (first - self.top + 1),
+                           "%d.end" % (last - self.top + 1))
+
+# vim:ts=8:sts=4:sw=4:et:
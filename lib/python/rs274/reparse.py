@@ -0,0 +1,395 @@
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Incremental preview of an edited program
+
+Most of the work of parsing a long program again after a small edit gives
+the same result as last time.  parse() avoids it with checkpoints: every
+PreviewCanon.checkpoint_interval lines gcode.parse hands the interpreter's
+state to the canon, which keeps it with its own state and how much it had
+recorded by then.
+
+When the program is parsed again, its text is compared with the text of
+the last parse a chunk at a time, the chunks ending at the checkpoints.
+The new parse starts at the last checkpoint before the first changed
+chunk, with a copy of what the old canon had recorded up to there.  Each
+old checkpoint after the changed text is a place where it can stop again:
+if the interpreter and the canon are in the same state there as they were
+last time, the rest of the program comes out the same as well, so the rest
+of the old canon is copied instead, its line numbers moved by the number
+of lines the edit added or removed.
+
+    result, seq = reparse.parse(filename, canon, args, previous_canon)
+
+Only the text of the program itself is compared.  A change to anything
+else that affects how it is read (the startup codes, the tool table, the
+parameter file, a subroutine file, the arc settings) means a full parse.
+
+The checkpoints can be kept with a cached preview (see save_checkpoints),
+so that the first edit after the program is loaded from the cache does not
+need a full parse either.
+"""
+
+import os, mmap, zlib, marshal
+import gcode
+from rs274 import previewcache
+
+class Checkpoint(object):
+    """The parse after line 'lineno'; the next line starts at byte
+    'offset'.  'state' is the interpreter state from gcode.parse,
+    'canon_state' the canon's attributes (see canon_state) and 'counts'
+    how much the canon had recorded (see counts)."""
+    __slots__ = ('lineno', 'offset', 'state', 'canon_state', 'counts')
+
+    def __init__(self, lineno, offset, state, canon_state, counts):
+        self.lineno = lineno
+        self.offset = offset
+        self.state = state
+        self.canon_state = canon_state
+        self.counts = counts
+
+class Record(object):
+    """What the next parse() of the program needs to know about this one:
+    the program's size, number of lines and the crc32 of each chunk between
+    checkpoints, everything else that went into it ('context' and the
+    subroutine 'files') and the result."""
+
+    def __init__(self, filename, context, size, lines, crcs, files, result):
+        self.filename = filename
+        self.context = context
+        self.size = size
+        self.lines = lines
+        self.crcs = crcs
+        self.files = files
+        self.result = result
+        # the lines where the parse started from and stopped at a
+        # checkpoint of the one before, or None
+        self.resumed = self.converged = None
+
+def counts(canon):
+    return (len(canon.traverse), len(canon.feed), len(canon.arcfeed),
+        canon.motion_order.count, len(canon.dwells), len(canon.dwell_marks),
+        len(canon.tool_marks), len(canon.motion_modes))
+
+PLAIN = (int, long, float, bool, basestring, tuple, type(None), gcode.linecode)
+# attributes that may differ where two parses reach the same state
+VOLATILE = ('lineno', 'state', 'dwell_time')
+
+def canon_state(canon):
+    """The canon's plain attributes (numbers, strings, tuples and lists of
+    those), except the ones named in its checkpoint_exclude"""
+    result = {}
+    exclude = canon.checkpoint_exclude
+    for name, value in canon.__dict__.items():
+        if name in exclude: continue
+        if isinstance(value, list):
+            for item in value:
+                if not isinstance(item, PLAIN): break
+            else:
+                result[name] = list(value)
+        elif isinstance(value, PLAIN):
+            result[name] = value
+    return result
+
+def restore_canon_state(canon, state):
+    for name, value in state.iteritems():
+        if isinstance(value, list): value = list(value)
+        setattr(canon, name, value)
+
+def same_canon_state(a, b):
+    if len(a) != len(b): return False
+    for name, value in a.iteritems():
+        if name in VOLATILE: continue
+        if name not in b or b[name] != value: return False
+    return True
+
+def interpreter_name(args):
+    """The interpreter gcode.parse is asked to load by 'args', if any"""
+    if args and isinstance(args[0], list):
+        return len(args) > 1 and args[1]
+    return len(args) > 2 and args[2]
+
+def context_key(canon, args):
+    return previewcache.cache_key(None, args, getattr(canon, 'tools', None),
+        getattr(canon, 'parameter_file', None),
+        getattr(canon, 'arcdivision', None), canon.is_foam,
+        getattr(canon, 'arc_tolerance', None), canon.__class__.__name__)
+
+def file_stamp(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+def map_file(filename):
+    f = open(filename, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0: return ""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+def count_lines(data):
+    n = 0
+    for i in xrange(0, len(data), 1 << 22):
+        n += data[i:i + (1 << 22)].count("\n")
+    return n
+
+def crc(data, start, end):
+    return zlib.crc32(buffer(data, start, end - start))
+
+class Parse(object):
+    """One parse with checkpoints, and if it can start from a checkpoint
+    of the last parse, what it needs for that"""
+
+    def __init__(self, filename, canon, args, data):
+        self.filename = filename
+        self.canon = canon
+        self.data = data
+        self.context = context_key(canon, args)
+        self.interval = canon.checkpoint_interval
+        self.lines = count_lines(data)
+        self.old = None
+        self.candidates = []
+        self.converged = None
+        self.resumed = None
+        self.byte_delta = self.line_delta = 0
+        self.start = 0
+
+    def plan(self, old):
+        """Set up to start from a checkpoint of 'old', if possible"""
+        canon = self.canon
+        record = getattr(old, 'parse_record', None)
+        if (old is None or old is canon or record is None
+                or record.filename != self.filename
+                or record.context != self.context):
+            return
+        for name, stamp in record.files:
+            if file_stamp(name) != stamp: return
+        checkpoints = old.checkpoints
+        data = self.data
+        size = len(data)
+        bounds = [0] + [cp.offset for cp in checkpoints] + [record.size]
+        n = len(record.crcs)
+
+        # the text up to the first changed chunk is the same; with no
+        # change at all, parse the last chunk again
+        j = 0
+        while j < n:
+            start, end = bounds[j], bounds[j+1]
+            if j == n - 1 and size != record.size: break
+            if end > size or crc(data, start, end) != record.crcs[j]: break
+            j += 1
+        r = min(j, n - 1) - 1
+        if r < 0: return
+        resume = checkpoints[r]
+
+        # the text from chunk k on is the same, 'byte_delta' bytes on
+        delta = size - record.size
+        k = n
+        while k > r + 1:
+            start, end = bounds[k-1] + delta, bounds[k] + delta
+            if start < resume.offset: break
+            if crc(data, start, end) != record.crcs[k-1]: break
+            k -= 1
+
+        self.old = old
+        self.start = resume.offset
+        self.resumed = resume.lineno
+        self.byte_delta = delta
+        self.line_delta = self.lines - record.lines
+        self.candidates = checkpoints[max(k - 1, r + 1):]
+        self.candidates.reverse()
+
+        copy_prefix(canon, old, resume)
+        canon.checkpoints[:] = checkpoints[:r+1]
+        canon.parse_resume = resume.state
+
+    def schedule(self, lineno):
+        """Set the line of the next checkpoint after 'lineno'"""
+        candidates = self.candidates
+        dl = self.line_delta
+        while candidates and candidates[-1].lineno + dl <= lineno:
+            candidates.pop()
+        next = lineno + self.interval
+        if candidates:
+            next = min(next, candidates[-1].lineno + dl)
+        self.canon.next_checkpoint = next
+
+    def checkpoint(self, state, lineno, offset):
+        canon = self.canon
+        here = Checkpoint(lineno, offset, state, canon_state(canon),
+            counts(canon))
+        canon.checkpoints.append(here)
+        candidates = self.candidates
+        if candidates:
+            cp = candidates[-1]
+            if (cp.lineno + self.line_delta == lineno
+                    and cp.offset + self.byte_delta == offset
+                    and same_canon_state(here.canon_state, cp.canon_state)
+                    and gcode.checkpoint_equal(state, cp.state, self.start,
+                        cp.offset, self.byte_delta, self.line_delta)):
+                self.converged = cp
+                return True
+        self.schedule(lineno)
+        return False
+
+    def finish(self, result):
+        """Complete the canon after gcode.parse has returned 'result'"""
+        canon = self.canon
+        files = set(gcode.subroutine_files())
+        converged = None
+        if self.converged is not None:
+            converged = self.converged.lineno + self.line_delta
+            old = self.old
+            files.update(name for name, stamp in old.parse_record.files)
+            splice_tail(canon, old, self.converged,
+                self.byte_delta, self.line_delta)
+            result, seq = old.parse_record.result
+            result = result, seq + self.line_delta
+        self.old = self.candidates = self.converged = None
+        data = self.data
+        bounds = ([0] + [cp.offset for cp in canon.checkpoints]
+            + [len(data)])
+        crcs = [crc(data, bounds[i], bounds[i+1])
+            for i in range(len(bounds) - 1)]
+        canon.parse_record = Record(self.filename, self.context, len(data),
+            self.lines, crcs, [(name, file_stamp(name)) for name in files],
+            tuple(result))
+        canon.parse_record.resumed = self.resumed
+        canon.parse_record.converged = converged
+        return result
+
+def save_checkpoints(canon):
+    """The checkpoints and parse record of 'canon' as plain data that
+    marshal can write, or None if there are none or they can't be"""
+    record = getattr(canon, 'parse_record', None)
+    if record is None or not canon.checkpoints: return None
+    checkpoints = []
+    for cp in canon.checkpoints:
+        state = dict(cp.canon_state)
+        # the canon gets a new linecode before the first line after a
+        # checkpoint is run, so there is no need to keep this one
+        if 'state' in state: state['state'] = None
+        checkpoints.append((cp.lineno, cp.offset,
+            zlib.compress(gcode.checkpoint_pack(cp.state), 1),
+            state, cp.counts))
+    saved = ((record.filename, record.context, record.size, record.lines,
+        record.crcs, record.files, record.result), checkpoints)
+    try:
+        marshal.dumps(saved)
+    except ValueError:
+        return None
+    return saved
+
+def restore_checkpoints(canon, saved):
+    """Give 'canon' the checkpoints from save_checkpoints.  Returns False,
+    leaving 'canon' as it was, if they were written by another build of
+    the gcode module."""
+    record, checkpoints = saved
+    try:
+        checkpoints = [Checkpoint(lineno, offset,
+                gcode.checkpoint_unpack(zlib.decompress(state)),
+                canon_state, tuple(counts))
+            for lineno, offset, state, canon_state, counts in checkpoints]
+    except (ValueError, zlib.error):
+        return False
+    filename, context, size, lines, crcs, files, result = record
+    canon.checkpoints[:] = checkpoints
+    canon.parse_record = Record(filename, context, size, lines, list(crcs),
+        [(name, stamp and tuple(stamp)) for name, stamp in files],
+        tuple(result))
+    return True
+
+def copy_prefix(canon, old, cp):
+    """Make 'canon' what 'old' was at checkpoint 'cp'"""
+    t, f, a, order, dwells, dwell_marks, tool_marks, modes = cp.counts
+    canon.traverse.copy_from(old.traverse, t)
+    canon.feed.copy_from(old.feed, f)
+    canon.arcfeed.copy_from(old.arcfeed, a)
+    canon.motion_order.__init__()
+    canon.motion_order.extend_from(old.motion_order, 0, order)
+    canon.dwells[:] = old.dwells[:dwells]
+    canon.dwell_marks[:] = old.dwell_marks[:dwell_marks]
+    canon.tool_marks[:] = old.tool_marks[:tool_marks]
+    canon.motion_modes[:] = old.motion_modes[:modes]
+    restore_canon_state(canon, cp.canon_state)
+
+def shift_counts(counts, delta):
+    return tuple(c + d for c, d in zip(counts, delta))
+
+def splice_tail(canon, old, cp, byte_delta, line_delta):
+    """Add what 'old' recorded after checkpoint 'cp' to 'canon', which is
+    in the same state at the matching place of the edited program"""
+    mine, theirs = counts(canon), cp.counts
+    delta = tuple(m - t for m, t in zip(mine, theirs))
+    dl = line_delta
+    canon.traverse.extend_from(old.traverse, theirs[0], None, dl)
+    canon.feed.extend_from(old.feed, theirs[1], None, dl)
+    canon.arcfeed.extend_from(old.arcfeed, theirs[2], None, dl)
+    canon.motion_order.extend_from(old.motion_order, theirs[3])
+    canon.dwells.extend((d[0] + dl,) + tuple(d[1:])
+        for d in old.dwells[theirs[4]:])
+    canon.dwell_marks.extend((segments + delta[3], lineno + dl, seconds)
+        for segments, lineno, seconds in old.dwell_marks[theirs[5]:])
+    canon.tool_marks.extend((shift_counts(stores, delta[:3]),
+            dwells + delta[5], tool)
+        for stores, dwells, tool in old.tool_marks[theirs[6]:])
+    canon.motion_modes.extend((m[0] + delta[3],) + tuple(m[1:])
+        for m in old.motion_modes[theirs[7]:])
+
+    dwell_delta = canon.dwell_time - cp.canon_state.get('dwell_time', 0)
+    i = old.checkpoints.index(cp)
+    for c in old.checkpoints[i+1:]:
+        state = dict(c.canon_state)
+        state['lineno'] = state.get('lineno', 0) + dl
+        state['dwell_time'] = state.get('dwell_time', 0) + dwell_delta
+        canon.checkpoints.append(Checkpoint(c.lineno + dl,
+            c.offset + byte_delta,
+            gcode.checkpoint_shift(c.state, cp.offset, byte_delta, dl),
+            state, shift_counts(c.counts, delta)))
+
+    state = canon_state(old)
+    if 'lineno' in state: state['lineno'] += dl
+    state['dwell_time'] = old.dwell_time + dwell_delta
+    restore_canon_state(canon, state)
+
+def parse(filename, canon, args=(), previous=None):
+    """gcode.parse(filename, canon, *args), with checkpoints every
+    canon.checkpoint_interval lines, starting from a checkpoint of
+    'previous' (the canon of an earlier parse of the program) where
+    possible"""
+    if (canon.checkpoint_interval <= 0 or interpreter_name(args)
+            or getattr(canon, 'parse_stream', None) is not None):
+        return gcode.parse(filename, canon, *args)
+    data = map_file(filename)
+    try:
+        p = Parse(filename, canon, args, data)
+        p.plan(previous)
+        p.schedule(canon.checkpoints and canon.checkpoints[-1].lineno or 0)
+        canon.reparse = p
+        try:
+            result = gcode.parse(filename, canon, *args)
+        finally:
+            canon.reparse = None
+            canon.parse_resume = None
+            canon.next_checkpoint = 0
+        return p.finish(result)
+    finally:
+        if isinstance(data, mmap.mmap): data.close()
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,206 @@
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Run time estimate for a previewed program
+
+estimate(canon, limits) works out how long the program recorded by an
+rs274.previewcanon.PreviewCanon will take on a machine with the given
+velocity and acceleration limits.  The work is done by gcode.segment_times,
+which follows the path through the traverse, feed and arcfeed stores,
+slows down for corners as far as the G64 tolerance requires and
+accelerates and decelerates within each axis' limits.  Dwells add their
+time; tool changes stop the machine and can be given a time of their own.
+
+    limits = runtime.limits_from_ini(linuxcnc.ini(inifile))
+    e = runtime.estimate(canon, limits)
+    print e.total, e.by_tool(), e.by_line()[lineno]
+
+All times are in seconds.  speeds(canon, limits) follows the path the same
+way and gives the highest velocity reached on each segment, which falls
+short of the programmed feed where segments are too short to accelerate.
+"""
+
+import array
+import math
+import gcode
+
+AXES = "XYZABCUVW"
+
+class Limits(object):
+    """Machine limits for the estimate, in the units of the preview:
+    inches (degrees for ABC) per second and per second squared.  A limit of
+    0 means there is none.  'maxvel' limits the speed along the path and
+    'cycle_time' is the trajectory period: a segment takes at least that
+    long."""
+
+    def __init__(self, max_velocity=(0,)*9, max_acceleration=(0,)*9,
+            maxvel=0, cycle_time=0.001):
+        self.max_velocity = tuple(max_velocity)
+        self.max_acceleration = tuple(max_acceleration)
+        self.maxvel = maxvel
+        self.cycle_time = cycle_time
+
+linear_units = {'mm': 1/25.4, 'metric': 1/25.4,
+    'inch': 1., 'in': 1., 'imperial': 1.}
+angular_units = {'deg': 1., 'degree': 1., 'degrees': 1.,
+    'rad': 180 / math.pi, 'radian': 180 / math.pi, 'radians': 180 / math.pi,
+    'grad': .9, 'gon': .9}
+
+def unit_scale(value, table, numeric_scale):
+    """The size of the unit 'value' names, in inches or degrees: from
+    'table' for a name, or for a number of units per mm or per degree,
+    from the number of mm or degrees in an inch or degree,
+    'numeric_scale'"""
+    if not value: return 1.
+    try:
+        units = float(value)
+    except ValueError:
+        return table.get(value.lower(), 1.)
+    if units <= 0: return 1.
+    return 1 / (units * numeric_scale)
+
+def linear_units_per_mm(value):
+    """[TRAJ]LINEAR_UNITS as machine units per mm, like stat.linear_units"""
+    return 1 / (25.4 * unit_scale(value, linear_units, 25.4))
+
+def limits_from_ini(inifile):
+    """Read the limits from [AXIS_n]MAX_VELOCITY and MAX_ACCELERATION,
+    [TRAJ]MAX_LINEAR_VELOCITY and [EMCMOT]SERVO_PERIOD.  'inifile' is a
+    linuxcnc.ini object."""
+    def number(section, name, default=0.):
+        value = inifile.find(section, name)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+    # numeric LINEAR_UNITS are units per mm, ANGULAR_UNITS units per degree
+    linear = unit_scale(inifile.find("TRAJ", "LINEAR_UNITS"),
+        linear_units, 25.4)
+    angular = unit_scale(inifile.find("TRAJ", "ANGULAR_UNITS"),
+        angular_units, 1.)
+    velocity = []
+    acceleration = []
+    for letter in AXES:
+        scale = letter in "ABC" and angular or linear
+        section = "AXIS_%s" % letter
+        velocity.append(number(section, "MAX_VELOCITY") * scale)
+        acceleration.append(number(section, "MAX_ACCELERATION") * scale)
+    maxvel = number("TRAJ", "MAX_LINEAR_VELOCITY",
+        number("TRAJ", "MAX_VELOCITY")) * linear
+    cycle_time = number("EMCMOT", "SERVO_PERIOD", 1000000) * 1e-9
+    return Limits(velocity, acceleration, maxvel, cycle_time)
+
+class Estimate(object):
+    """The result of estimate().  'traverse', 'feed' and 'arcfeed' are
+    arrays of the time of each segment of the canon's stores of the same
+    name; the other attributes are totals."""
+
+    def __init__(self, canon, times, tool_change_time):
+        self.canon = canon
+        self.traverse, self.feed, self.arcfeed = times
+        self.tool_change_time = tool_change_time
+        self.traverse_time = sum(self.traverse)
+        self.feed_time = sum(self.feed)
+        self.arc_time = sum(self.arcfeed)
+        self.dwell_time = sum(m[2] for m in canon.dwell_marks)
+        self.tool_changes_time = tool_change_time * len(canon.tool_marks)
+        self.total = (self.traverse_time + self.feed_time + self.arc_time
+            + self.dwell_time + self.tool_changes_time)
+
+    def by_line(self):
+        """Dictionary of the time spent on each line with motion or dwells.
+        Tool change time is not counted against a line."""
+        result = {}
+        stores = self.canon.traverse, self.canon.feed, self.canon.arcfeed
+        for store, times in zip(stores, (self.traverse, self.feed, self.arcfeed)):
+            for lineno, runs in store.line_index().ranges.iteritems():
+                t = 0
+                for first, end in runs:
+                    t += sum(times[first:end])
+                result[lineno] = result.get(lineno, 0) + t
+        for count, lineno, seconds in self.canon.dwell_marks:
+            result[lineno] = result.get(lineno, 0) + seconds
+        return result
+
+    def by_tool(self):
+        """List of (tool, time) for each tool in the order they are used.
+        The time before the first tool change, if any, is given with the
+        tool None: it belongs to whatever tool is in the spindle."""
+        canon = self.canon
+        times = self.traverse, self.feed, self.arcfeed
+        end = ((len(self.traverse), len(self.feed), len(self.arcfeed)),
+            len(canon.dwell_marks), None)
+        marks = [((0, 0, 0), 0, None)] + canon.tool_marks + [end]
+        result = []
+        for (first, d0, tool), (last, d1, unused) in zip(marks, marks[1:]):
+            t = sum(sum(times[i][first[i]:last[i]]) for i in range(3))
+            t += sum(m[2] for m in canon.dwell_marks[d0:d1])
+            if tool is None:
+                if t == 0: continue
+            else:
+                t += self.tool_change_time
+            result.append((tool, t))
+        return result
+
+def motion(canon):
+    """The arguments gcode.segment_times and segment_speeds take to follow
+    the path recorded by 'canon', before the limits"""
+    stores = canon.traverse, canon.feed, canon.arcfeed
+    order = canon.motion_order
+    if order.count == sum(len(s) for s in stores):
+        runs = order.runs
+        stops = sorted([m[0] for m in canon.dwell_marks]
+            + [sum(m[0]) for m in canon.tool_marks])
+        stops = array.array('i', stops)
+        modes = array.array('d')
+        for mark in canon.motion_modes:
+            modes.extend(mark)
+    else:
+        # A canon that records motion itself (see
+        # PreviewCanon.native_methods) may not keep the order; go through
+        # each store in turn, without the blend modes and stops
+        runs = array.array('i')
+        for i, s in enumerate(stores):
+            if s: runs.extend((i, len(s)))
+        stops = array.array('i')
+        modes = array.array('d')
+    return stores, runs, stops, modes
+
+def per_segment(raw):
+    result = []
+    for r in raw:
+        a = array.array('d')
+        a.fromstring(r)
+        result.append(a)
+    return result
+
+def estimate(canon, limits, tool_change_time=0):
+    """Estimate the run time of the program recorded by 'canon'"""
+    raw = gcode.segment_times(*motion(canon) + (
+        limits.max_velocity, limits.max_acceleration,
+        limits.maxvel, limits.cycle_time))
+    return Estimate(canon, per_segment(raw), tool_change_time)
+
+def speeds(canon, limits):
+    """The highest velocity reached on each segment of the program recorded
+    by 'canon', as arrays for the traverse, feed and arcfeed stores.  A
+    segment that does not move has a velocity of NaN."""
+    raw = gcode.segment_speeds(*motion(canon) + (
+        limits.max_velocity, limits.max_acceleration,
+        limits.maxvel, limits.cycle_time))
+    return per_segment(raw)
+
+# vim:ts=8:sts=4:sw=4:et:
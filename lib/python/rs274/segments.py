@@ -0,0 +1,298 @@
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import array
+import bisect
+import itertools
+
+class LineIndex(object):
+    """Map source line numbers to the items recorded for them.
+
+    Items are appended in program order, so the items of one line form a
+    few contiguous runs (more than one when a subroutine or loop comes
+    back to it).  'ranges' maps each line number to its list of
+    (first, end) runs.  The index is brought up to date incrementally by
+    update(), so it can be kept current while a program is being parsed.
+    """
+
+    def __init__(self):
+        self.ranges = {}
+        self.count = 0
+        self._lines = None
+
+    def update(self, linenos):
+        """Index the line numbers of the items from 'count' on"""
+        i = self.count
+        ranges = self.ranges
+        for lineno, group in itertools.groupby(linenos):
+            j = i + sum(1 for _ in group)
+            runs = ranges.get(lineno)
+            if runs is None:
+                ranges[lineno] = [(i, j)]
+                self._lines = None
+            elif runs[-1][1] == i:
+                runs[-1] = runs[-1][0], j
+            else:
+                runs.append((i, j))
+            i = j
+        self.count = i
+
+    def items(self, lineno):
+        result = []
+        for first, end in self.ranges.get(lineno, ()):
+            result.extend(xrange(first, end))
+        return result
+
+    def lines(self):
+        """Sorted list of the line numbers that have items"""
+        if self._lines is None:
+            self._lines = sorted(self.ranges)
+        return self._lines
+
+def adjacent_line(lines, lineno, direction):
+    """Return the line of the sorted list 'lines' after (direction > 0) or
+    before 'lineno', staying on the first or last line at either end"""
+    if not lines: return None
+    if lineno is None:
+        if direction > 0: return lines[0]
+        return lines[-1]
+    if direction > 0:
+        i = bisect.bisect_right(lines, lineno)
+        return lines[min(i, len(lines)-1)]
+    i = bisect.bisect_left(lines, lineno)
+    return lines[max(i-1, 0)]
+
+class MotionOrder(object):
+    """The order in which segments went into a canon's traverse, feed and
+    arcfeed stores.
+
+    Each store keeps its own segments in program order, but the path as
+    the machine follows it moves from one store to the next.  'runs' holds
+    (store, count) pairs, flattened, for each run of consecutive segments
+    that went to the same store (TRAVERSE, FEED or ARCFEED).
+    """
+    TRAVERSE, FEED, ARCFEED = range(3)
+
+    def __init__(self):
+        self.runs = array.array('i')
+        self.count = 0
+
+    def add(self, which, n=1):
+        if n <= 0: return
+        runs = self.runs
+        if runs and runs[-2] == which:
+            runs[-1] += n
+        else:
+            runs.extend((which, n))
+        self.count += n
+
+    def extend_raw(self, runs):
+        """Append runs given as a raw buffer, as produced by the native
+        motion sink in gcode.parse"""
+        a = array.array('i')
+        a.fromstring(runs)
+        for i in xrange(0, len(a), 2):
+            self.add(a[i], a[i+1])
+
+    def extend_from(self, other, first=0, last=None):
+        """Append the runs of segments first..last of 'other'"""
+        if last is None: last = other.count
+        runs = other.runs
+        i = 0
+        for j in xrange(0, len(runs), 2):
+            n = runs[j+1]
+            lo, hi = max(first, i), min(last, i + n)
+            if lo < hi: self.add(runs[j], hi - lo)
+            i += n
+            if i >= last: break
+
+class SegmentStore(object):
+    """Compact columnar storage for the preview segments of one move type.
+
+    Segment i runs from vertex seg_start[i] to vertex seg_start[i]+1 of
+    'vertices' (9 doubles per vertex, XYZABCUVW).  Consecutive segments that
+    meet share a vertex, so a continuous toolpath costs one vertex per
+    segment.  Tool length offsets are stored once in 'tlo_table' (3 doubles
+    per entry) and referenced by index from 'tool'.
+
+    linuxcnc.draw_lines and gcode.calc_extents read these arrays directly
+    through the buffer interface.  Indexing or iterating a store still
+    yields the old (lineno, start, end, [feedrate,] tlo) tuples for callers
+    that have not been converted.
+    """
+
+    def __init__(self, has_feedrate=True):
+        self.has_feedrate = has_feedrate
+        self.vertices = array.array('d')
+        self.seg_start = array.array('i')
+        self.lineno = array.array('i')
+        self.feedrate = array.array('d')
+        self.tool = array.array('i')
+        self.tlo_table = array.array('d')
+        self._tlo_index = {}
+        self._last_end = None
+        self._nvertices = 0
+        self._line_index = LineIndex()
+
+    def __len__(self):
+        return len(self.seg_start)
+
+    def __nonzero__(self):
+        return len(self.seg_start) != 0
+
+    def tool_index(self, tlo):
+        key = tuple(tlo[:3])
+        idx = self._tlo_index.get(key)
+        if idx is None:
+            idx = self._tlo_index[key] = len(self._tlo_index)
+            self.tlo_table.extend(key)
+        return idx
+
+    def add(self, lineno, start, end, feedrate, tlo):
+        last = self._last_end
+        if last is None or (start is not last and list(start) != list(last)):
+            self.vertices.extend(start)
+            self._nvertices += 1
+        self.vertices.extend(end)
+        self._nvertices += 1
+        self._last_end = end
+        self.lineno.append(lineno)
+        self.feedrate.append(feedrate)
+        self.tool.append(self.tool_index(tlo))
+        # last, so that a reader on another thread never sees a partial segment
+        self.seg_start.append(self._nvertices - 2)
+
+    def add_path(self, lineno, start, points, feedrate, tlo):
+        """Add a connected run of segments start->points[0]->points[1]..."""
+        for end in points:
+            self.add(lineno, start, end, feedrate, tlo)
+            start = end
+
+    def append(self, item):
+        """Add a segment given as an old-style glcanon tuple"""
+        if self.has_feedrate:
+            lineno, start, end, feedrate, tlo = item
+        else:
+            lineno, start, end, tlo = item
+            feedrate = 0
+        self.add(lineno, start, end, feedrate, tlo)
+
+    def tail(self):
+        """Return the vertex count and the last end point (or None)"""
+        return self._nvertices, self._last_end
+
+    def extend_raw(self, vertices, seg_start, lineno, feedrate, tool):
+        """Append columns given as raw buffers, as produced by the native
+        motion sink in gcode.parse.  seg_start and tool must already refer
+        to this store's vertices and tlo_table."""
+        self.vertices.fromstring(vertices)
+        self.lineno.fromstring(lineno)
+        self.feedrate.fromstring(feedrate)
+        self.tool.fromstring(tool)
+        self.seg_start.fromstring(seg_start)
+        self._nvertices = len(self.vertices) // 9
+        if self._nvertices:
+            self._last_end = self.vertices[-9:].tolist()
+
+    def load_raw(self, vertices, seg_start, lineno, feedrate, tool, tlo_table):
+        """Replace the contents of the store with the given raw columns"""
+        self.__init__(self.has_feedrate)
+        self.tlo_table.fromstring(tlo_table)
+        for i in range(len(self.tlo_table) // 3):
+            self._tlo_index[tuple(self.tlo_table[3*i:3*i+3])] = i
+        self.extend_raw(vertices, seg_start, lineno, feedrate, tool)
+
+    def copy_from(self, other, count):
+        """Make this store a copy of the first 'count' segments of 'other'"""
+        self.__init__(self.has_feedrate)
+        self.tlo_table.extend(other.tlo_table)
+        self._tlo_index.update(other._tlo_index)
+        self.extend_from(other, 0, count)
+
+    def extend_from(self, other, first=0, last=None, line_delta=0):
+        """Append segments first..last of 'other', moving their line
+        numbers by 'line_delta'"""
+        if last is None: last = len(other)
+        if first >= last: return
+        v0 = other.seg_start[first]
+        v1 = other.seg_start[last-1] + 2
+        base = self._nvertices - v0
+        tool_map = [self.tool_index(other.tlo_table[3*i:3*i+3])
+            for i in range(len(other.tlo_table) // 3)]
+        lineno = other.lineno[first:last]
+        if line_delta:
+            lineno = array.array('i', [l + line_delta for l in lineno])
+        seg_start = other.seg_start[first:last]
+        if base:
+            seg_start = array.array('i', [s + base for s in seg_start])
+        self.vertices.extend(other.vertices[9*v0:9*v1])
+        self.lineno.extend(lineno)
+        self.feedrate.extend(other.feedrate[first:last])
+        tool = other.tool[first:last]
+        if tool_map != range(len(tool_map)):
+            tool = array.array('i', [tool_map[t] for t in tool])
+        self.tool.extend(tool)
+        # last, so that a reader on another thread never sees a partial segment
+        self.seg_start.extend(seg_start)
+        self._nvertices = len(self.vertices) // 9
+        self._last_end = self.vertices[-9:].tolist()
+
+    def start(self, i):
+        j = 9 * self.seg_start[i]
+        return self.vertices[j:j+9].tolist()
+
+    def end(self, i):
+        j = 9 * self.seg_start[i] + 9
+        return self.vertices[j:j+9].tolist()
+
+    def endpoints(self, i):
+        j = 9 * self.seg_start[i]
+        v = self.vertices[j:j+18].tolist()
+        return v[:9], v[9:]
+
+    def tlo(self, i):
+        j = 3 * self.tool[i]
+        return self.tlo_table[j:j+3].tolist()
+
+    def line_index(self):
+        """Return the LineIndex of the segments, updated to the current size"""
+        index = self._line_index
+        n = len(self.seg_start)
+        if index.count < n:
+            index.update(self.lineno[index.count:n])
+        return index
+
+    def segments_on_line(self, lineno):
+        return self.line_index().items(lineno)
+
+    def __getitem__(self, i):
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self): raise IndexError(i)
+        start, end = self.endpoints(i)
+        if self.has_feedrate:
+            return self.lineno[i], start, end, self.feedrate[i], self.tlo(i)
+        return self.lineno[i], start, end, self.tlo(i)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.vertices,
+            self.seg_start, self.lineno, self.feedrate, self.tool,
+            self.tlo_table))
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,326 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Share one poll of the LinuxCNC status among many programs
+
+A Broker polls linuxcnc.stat at a fixed rate and sends what changed since
+the last poll to every program connected to its Unix socket; a program
+that connects is first sent the whole status.  The status-broker program
+runs one, and linuxcnc starts it when [DISPLAY]STATUS_BROKER_RATE is set.
+
+stat is a client that reads like linuxcnc.stat: poll() takes in the
+changes the broker sent since the last poll, and the status fields are
+attributes.  If the broker goes away, poll() connects to a new one if
+one has been started and polls the status itself until then.
+
+connect() returns a client if LINUXCNC_STATUS_SOCKET is set in the
+environment and a broker is listening on it, and a linuxcnc.stat
+otherwise, so a program uses the broker of its own session when there is
+one.  linuxcnc sets LINUXCNC_STATUS_SOCKET when it starts the broker:
+
+    s = statusbroker.connect()
+    s.poll()
+    print s.task_state, s.actual_position
+
+A broker or client made without a socket path uses LINUXCNC_STATUS_SOCKET,
+or a socket for the user in TMPDIR if that is not set.
+"""
+
+import os, time, errno, socket, select, struct, marshal
+from collections import namedtuple
+import linuxcnc
+
+FRAME = struct.Struct("!I")
+
+# a client that stops reading is dropped once this much is waiting for it
+MAX_PENDING = 4 << 20
+
+# tool_table holds these; the same fields as linuxcnc's tool_result
+tool_result = namedtuple("tool_result",
+    "id xoffset yoffset zoffset aoffset boffset coffset uoffset voffset"
+    " woffset diameter frontangle backangle orientation")
+
+_UNSET = object()
+
+def socket_path():
+    return os.environ.get("LINUXCNC_STATUS_SOCKET") or os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), "linuxcnc-status-%d" % os.getuid())
+
+def _plain(value):
+    # marshal takes tuples, not the struct sequences of tool_table
+    if isinstance(value, tuple):
+        return tuple([_plain(v) for v in value])
+    return value
+
+def _frame(values):
+    data = marshal.dumps(values)
+    return FRAME.pack(len(data)) + data
+
+class _Client(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self.pending = ""
+
+class Broker(object):
+    def __init__(self, path=None, interval=.05, stat=None):
+        self.path = path or socket_path()
+        self.interval = interval
+        self.stat = stat or linuxcnc.stat()
+        self.clients = []
+        self.names = None
+        # the last object stat gave for each field, and what was sent
+        self._raw = {}
+        self.values = {'_error': "no status yet"}
+        self.listener = None
+
+    def listen(self):
+        """Make the socket; fails if another broker is using it"""
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.connect(self.path)
+        except socket.error, detail:
+            if detail.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                raise
+            if detail.errno == errno.ECONNREFUSED:
+                os.unlink(self.path)
+        else:
+            s.close()
+            raise RuntimeError("a status broker is already running on %s"
+                % self.path)
+        s.close()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(16)
+        self.listener.setblocking(0)
+
+    def close(self):
+        for c in self.clients[:]:
+            self.drop(c)
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def sample(self):
+        """Poll the status, returning the fields that changed"""
+        changed = {}
+        try:
+            self.stat.poll()
+        except linuxcnc.error, detail:
+            error = str(detail) or "status is not available"
+            if self.values['_error'] != error:
+                self.values['_error'] = changed['_error'] = error
+            return changed
+        if self.values['_error'] is not None:
+            self.values['_error'] = changed['_error'] = None
+        if self.names is None:
+            self.names = [n for n in dir(self.stat) if not n.startswith("_")
+                and not callable(getattr(self.stat, n))]
+        raw = self._raw
+        values = self.values
+        for name in self.names:
+            value = getattr(self.stat, name)
+            # stat gives the same tool_table until the table changes
+            if value is raw.get(name, _UNSET):
+                continue
+            raw[name] = value
+            value = _plain(value)
+            if name not in values or values[name] != value:
+                values[name] = changed[name] = value
+        return changed
+
+    def publish(self, changed):
+        if not changed: return
+        frame = _frame(changed)
+        for c in self.clients[:]:
+            self.send(c, frame)
+
+    def send(self, client, data):
+        client.pending += data
+        try:
+            n = client.sock.send(client.pending)
+        except socket.error, detail:
+            if detail.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.drop(client)
+                return
+            n = 0
+        client.pending = client.pending[n:]
+        if len(client.pending) > MAX_PENDING:
+            self.drop(client)
+
+    def accept(self):
+        try:
+            sock, address = self.listener.accept()
+        except socket.error:
+            return
+        sock.setblocking(0)
+        client = _Client(sock)
+        self.clients.append(client)
+        self.send(client, _frame(self.values))
+
+    def drop(self, client):
+        if client in self.clients:
+            self.clients.remove(client)
+        client.sock.close()
+
+    def serve(self):
+        """Poll and publish until the broker is closed"""
+        next_poll = time.time()
+        while self.listener is not None:
+            timeout = max(0, next_poll - time.time())
+            readers = [self.listener] + [c.sock for c in self.clients]
+            writers = [c.sock for c in self.clients if c.pending]
+            try:
+                r, w, x = select.select(readers, writers, [], timeout)
+            except select.error, detail:
+                if detail.args[0] == errno.EINTR: continue
+                raise
+            if self.listener in r:
+                self.accept()
+            for c in self.clients[:]:
+                if c.sock in w:
+                    self.send(c, "")
+                if c.sock in r:
+                    # clients only ever close the connection
+                    try:
+                        data = c.sock.recv(4096)
+                    except socket.error:
+                        data = ""
+                    if not data:
+                        self.drop(c)
+            now = time.time()
+            if now >= next_poll:
+                self.publish(self.sample())
+                next_poll = max(next_poll + self.interval, now)
+
+class stat(object):
+    """A linuxcnc.stat that reads the status from a broker"""
+
+    def __init__(self, path=None):
+        self._path = path or socket_path()
+        self._sock = None
+        # the status polled here while there is no broker
+        self._local = None
+        self._open()
+
+    def _open(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self._path)
+            self._buffer = ""
+            self._values = {}
+            # the broker sends the whole status first
+            while not self._values:
+                data = sock.recv(65536)
+                if not data:
+                    raise linuxcnc.error("status broker closed the connection")
+                self._buffer += data
+                self._take()
+        except:
+            sock.close()
+            raise
+        sock.setblocking(0)
+        self._sock = sock
+
+    def _lost(self):
+        """Use a new broker if one is running, or else poll the status here"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        try:
+            self._open()
+        except (socket.error, linuxcnc.error):
+            if self._local is None:
+                self._local = linuxcnc.stat()
+            self._local.poll()
+            return False
+        self._local = None
+        return True
+
+    def _take(self):
+        buf = self._buffer
+        offset = 0
+        while len(buf) - offset >= FRAME.size:
+            size, = FRAME.unpack_from(buf, offset)
+            end = offset + FRAME.size + size
+            if len(buf) < end: break
+            changed = marshal.loads(buf[offset + FRAME.size:end])
+            tools = changed.get('tool_table')
+            if tools is not None:
+                changed['tool_table'] = tuple([tool_result(*t) for t in tools])
+            self._values.update(changed)
+            offset = end
+        self._buffer = buf[offset:]
+
+    def poll(self):
+        if self._sock is None and not self._lost():
+            return
+        while 1:
+            try:
+                data = self._sock.recv(1 << 20)
+            except socket.error, detail:
+                if detail.errno in (errno.EAGAIN, errno.EWOULDBLOCK): break
+                if detail.errno == errno.EINTR: continue
+                data = ""
+            if not data:
+                if not self._lost():
+                    return
+                continue
+            self._buffer += data
+        self._take()
+        error = self._values.get('_error')
+        if error:
+            raise linuxcnc.error(error)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._local is not None:
+            return getattr(self._local, name)
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError("'stat' object has no attribute '%s'" % name)
+
+    def pocket(self, n):
+        if not 0 <= n < len(self.tool_table):
+            raise IndexError("pocket out of range")
+        return self.tool_table[n]
+
+    def tool(self, toolno):
+        if toolno <= 0:
+            return None
+        table = self.tool_table
+        for t in table[1:] + table[:1]:
+            if t.id == toolno:
+                return t
+        return None
+
+def connect(path=None):
+    """A stat client of the broker, or a linuxcnc.stat if none is running
+    or none was started for this session"""
+    path = path or os.environ.get("LINUXCNC_STATUS_SOCKET")
+    if not path:
+        return linuxcnc.stat()
+    try:
+        return stat(path)
+    except (socket.error, linuxcnc.error):
+        return linuxcnc.stat()
+
+# vim:ts=8:sts=4:sw=4:et:
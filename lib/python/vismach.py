@@ -18,6 +18,7 @@ import rs274.OpenGLTk, Tkinter, signal, hal
 from minigl import *
 from math import *
 import glnav
+import pollpolicy
 import hal
 
 class Collection(object):
@@ -1051,8 +1052,17 @@ def main(model, tool, work, size=10, hud=0, rotation_vectors=None, lat=0, lon=0)
 	if new_plotclear and not old_plotclear:
 	    t.plotclear()
 	old_plotclear=new_plotclear
-	t.after(100, update)
-    update()
+	return True
+    pollpolicy.TkTimer(t, update).start()
+
+    # redraw slowly while the window is iconified; the toplevel also gets
+    # the Map and Unmap events of its children, which are left alone
+    top = t.winfo_toplevel()
+    def set_hidden(event, hidden):
+	if event.widget is top:
+	    pollpolicy.POLICY.set_hidden(hidden)
+    top.bind("<Map>", lambda e: set_hidden(e, False), add="+")
+    top.bind("<Unmap>", lambda e: set_hidden(e, True), add="+")
 
     def quit(*args):
 	raise SystemExit
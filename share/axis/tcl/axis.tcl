@@ -331,6 +331,10 @@ setup_menu_accel .menu.view end [_ "Show program r_apids"]
 	-command toggle_program_alpha
 setup_menu_accel .menu.view end [_ "Alpha-_blend program"]
 
+.menu.view add cascade \
+	-menu .menu.view.color
+setup_menu_accel .menu.view end [_ "Color program b_y"]
+
 .menu.view add checkbutton \
 	-variable show_live_plot \
 	-command toggle_show_live_plot
@@ -434,6 +438,26 @@ setup_menu_accel .menu.view end [_ "Joint mode"]
         -command set_teleop_mode
 setup_menu_accel .menu.view end [_ "World mode"]
 
+menu .menu.view.color
+
+.menu.view.color add radiobutton \
+        -value type \
+        -variable preview_color \
+        -command set_preview_color
+setup_menu_accel .menu.view.color end [_ "_Type of move"]
+
+.menu.view.color add radiobutton \
+        -value feed \
+        -variable preview_color \
+        -command set_preview_color
+setup_menu_accel .menu.view.color end [_ "Programmed _feed"]
+
+.menu.view.color add radiobutton \
+        -value velocity \
+        -variable preview_color \
+        -command set_preview_color
+setup_menu_accel .menu.view.color end [_ "Reachable _velocity"]
+
 menu .menu.view.grid
 
 .menu.view.grid add radiobutton \
@@ -1392,14 +1416,13 @@ text ${pane_bottom}.t.text \
 	-highlightthickness 0 \
 	-relief flat \
 	-takefocus 0 \
-	-undo 0 \
-	-yscrollcommand [list ${pane_bottom}.t.sb set]
+	-undo 0
 ${pane_bottom}.t.text insert end {}
 bind ${pane_bottom}.t.text <Configure> { goto_sensible_line }
 
+# scrolled by the ProgramView in axis.py
 scrollbar ${pane_bottom}.t.sb \
 	-borderwidth 0 \
-	-command [list ${pane_bottom}.t.text yview] \
 	-highlightthickness 0
 
 # Pack widget ${pane_bottom}.t.text
@@ -2076,16 +2099,6 @@ proc show_all text {
     $text configure -height [expr {ceil($ch/$fy)}]
 }
 
-proc delete_all text {
-    set nl [lindex [split [$text index end] .] 0]
-    while {$nl >= 1500} {
-      $text delete 1.0 1000.end
-      incr nl -1000
-    }
-
-    $text delete 1.0 end
-}
-
 proc size_combobox_to_entries c {
     set fo [$c cget -font]
     set wi [font measure $fo 0]
@@ -551,6 +551,8 @@ void load_tool(int pocket) {
         // just copy the desired tool to the spindle
         emcioStatus.tool.toolTable[0] = emcioStatus.tool.toolTable[pocket];
     }
+    // tell status readers that the table is not what it was
+    emcioStatus.tool.toolTableSerial++;
 }
 
 void reload_tool_number(int toolno) {
@@ -700,6 +702,7 @@ int main(int argc, char *argv[])
 		ttcomments, random_toolchanger)) {
 	rcs_print_error("can't load tool table.\n");
     }
+    emcioStatus.tool.toolTableSerial++;
 
     done = 0;
 
@@ -772,6 +775,7 @@ int main(int argc, char *argv[])
 	    rtapi_print_msg(RTAPI_MSG_DBG, "EMC_TOOL_INIT\n");
 	    loadToolTable(tool_table_file, emcioStatus.tool.toolTable,
 		    ttcomments, random_toolchanger);
+	    emcioStatus.tool.toolTableSerial++;
 	    reload_tool_number(emcioStatus.tool.toolInSpindle);
 	    break;
 
@@ -865,6 +869,7 @@ int main(int argc, char *argv[])
 		    emcioStatus.status = RCS_ERROR;
 		else
 		    reload_tool_number(emcioStatus.tool.toolInSpindle);
+		emcioStatus.tool.toolTableSerial++;
 	    }
 	    break;
 
@@ -897,6 +902,7 @@ int main(int argc, char *argv[])
                 if (emcioStatus.tool.toolInSpindle == t) {
                     emcioStatus.tool.toolTable[0] = emcioStatus.tool.toolTable[p];
                 }                    
+                emcioStatus.tool.toolTableSerial++;
             }
 	    if (0 != saveToolTable(tool_table_file, emcioStatus.tool.toolTable, ttcomments, random_toolchanger))
 		emcioStatus.status = RCS_ERROR;
@@ -903,6 +903,7 @@ void EMC_TOOL_STAT::update(CMS * cms)
     cms->update(toolInSpindle);
     for (int i_toolTable = 0; i_toolTable < CANON_POCKETS_MAX; i_toolTable++)
 	CANON_TOOL_TABLE_update(cms, &(toolTable[i_toolTable]));
+    cms->update(toolTableSerial);
 
 }
 
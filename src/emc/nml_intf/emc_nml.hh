@@ -1662,6 +1662,7 @@ class EMC_TOOL_STAT:public EMC_TOOL_STAT_MSG {
     int pocketPrepped;		// pocket ready for loading from
     int toolInSpindle;		// tool loaded, 0 is no tool
     CANON_TOOL_TABLE toolTable[CANON_POCKETS_MAX];
+    int toolTableSerial;	// changes whenever toolTable does
 };
 
 // EMC_AUX type declarations
@@ -158,6 +158,7 @@ EMC_TOOL_STAT_MSG(EMC_TOOL_STAT_TYPE, sizeof(EMC_TOOL_STAT))
 
     pocketPrepped = 0;
     toolInSpindle = 0;
+    toolTableSerial = 0;
 
     for (t = 0; t < CANON_POCKETS_MAX; t++) {
 	toolTable[t].toolno = 0;
@@ -211,6 +212,7 @@ EMC_TOOL_STAT EMC_TOOL_STAT::operator =(EMC_TOOL_STAT s)
 
     pocketPrepped = s.pocketPrepped;
     toolInSpindle = s.toolInSpindle;
+    toolTableSerial = s.toolTableSerial;
 
     for (t = 0; t < CANON_POCKETS_MAX; t++) {
 	toolTable[t].toolno = s.toolTable[t].toolno;
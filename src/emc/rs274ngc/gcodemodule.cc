@@ -18,12 +18,18 @@
 
 #include <Python.h>
 #include <structmember.h>
+#include <vector>
+#include <memory>
+#include <set>
+#include <string>
 
 #include "rs274ngc.hh"
 #include "rs274ngc_interp.hh"
 #include "interp_return.hh"
 #include "canon.hh"
 #include "config.h"		// LINELEN
+#include "segmentstore.hh"
+#include "interp_queue.hh"
 
 int _task = 0; // control preview behaviour when remapping
 
@@ -146,28 +152,359 @@ EmcPose tool_offset;
 
 static InterpBase *pinterp;
 
-#define callmethod(o, m, f, ...) PyObject_CallMethod((o), (char*)(m), (char*)(f), ## __VA_ARGS__)
+static void native_before_call();
+
+// callmethod is for canon calls that may change canon state; querymethod is
+// for the GET_EXTERNAL_* style calls that only read it.
+#define querymethod(o, m, f, ...) PyObject_CallMethod((o), (char*)(m), (char*)(f), ## __VA_ARGS__)
+#define callmethod(o, m, f, ...) (native_before_call(), querymethod(o, m, f, ## __VA_ARGS__))
+
+/* Native motion sink
+ *
+ * When the canon sets 'native_motion' (rs274.glcanon.GLCanon does unless a
+ * subclass changes how motion is recorded), straight and arc motion never
+ * reaches Python.  The G92/G5x/XY rotation transform is done here and the
+ * segments are collected in native buffers, which are handed over to the
+ * canon's rs274.segments.SegmentStore objects as buffer objects (no
+ * per-segment Python objects are created).
+ *
+ * Python stays the owner of the canon state.  Before any other canon call,
+ * buffered segments are flushed, 'lo' and 'first_move' are written back and
+ * the pending next_line is delivered; after it, the state is re-read before
+ * the next motion.
+ *
+ * The order in which segments went to the three stores is kept as runs of
+ * (column, count) and handed to the canon's rs274.segments.MotionOrder, so
+ * that the path can be followed through all of them (see segment_times).
+ */
+struct NativeColumn {
+    PyObject *store;
+    std::vector<double> vertices;
+    std::vector<int> seg_start, lineno, tool;
+    std::vector<double> feedrate;
+    int nvertices;
+    bool have_last;
+    double last[9];
+    int tool_index;
+    int which;
+    std::vector<int> *order;
+
+    void add(int line, const double *start, const double *end, double feed) {
+        if(!have_last || memcmp(start, last, sizeof(last))) {
+            vertices.insert(vertices.end(), start, start+9);
+            nvertices++;
+        }
+        seg_start.push_back(nvertices - 1);
+        vertices.insert(vertices.end(), end, end+9);
+        nvertices++;
+        memcpy(last, end, sizeof(last));
+        have_last = true;
+        lineno.push_back(line);
+        feedrate.push_back(feed);
+        tool.push_back(tool_index);
+        if(order) {
+            if(!order->empty() && (*order)[order->size()-2] == which)
+                order->back()++;
+            else {
+                order->push_back(which);
+                order->push_back(1);
+            }
+        }
+    }
+};
 
-static void maybe_new_line(int sequence_number=pinterp->sequence_number());
-static void maybe_new_line(int sequence_number) {
-    if(!pinterp) return;
-    if(interp_error) return;
-    if(sequence_number == last_sequence_number)
-        return;
+struct NativeSink {
+    bool active, dirty, line_pending, in_call;
+    NativeColumn columns[3];
+    PyObject *order_store;
+    std::vector<int> order;
+    double lo[9], g5x[9], g92[9], feedrate, rotation_cos, rotation_sin;
+    double tlo[3];
+    bool first_move;
+    int suppress, plane, arcdivision;
+    double arc_tolerance;
+};
+
+enum { NATIVE_TRAVERSE, NATIVE_FEED, NATIVE_ARCFEED };
+static const char *native_column_names[3] = { "traverse", "feed", "arcfeed" };
+
+static NativeSink native;
+
+static PyObject *buffer_of(const void *ptr, size_t sz) {
+    return PyBuffer_FromMemory(const_cast<void*>(ptr), sz);
+}
+
+template<class T>
+static PyObject *buffer_of(const std::vector<T> &v) {
+    return buffer_of(v.empty() ? NULL : &v[0], v.size() * sizeof(T));
+}
+
+static bool native_flush_column(NativeColumn &col) {
+    if(col.seg_start.empty()) return true;
+    PyObject *result = PyObject_CallMethod(col.store, (char*)"extend_raw",
+            (char*)"NNNNN",
+            buffer_of(col.vertices), buffer_of(col.seg_start),
+            buffer_of(col.lineno), buffer_of(col.feedrate),
+            buffer_of(col.tool));
+    col.vertices.clear();
+    col.seg_start.clear();
+    col.lineno.clear();
+    col.feedrate.clear();
+    col.tool.clear();
+    if(!result) return false;
+    Py_DECREF(result);
+    return true;
+}
+
+static bool native_flush_order() {
+    if(native.order.empty()) return true;
+    PyObject *result = PyObject_CallMethod(native.order_store,
+            (char*)"extend_raw", (char*)"N", buffer_of(native.order));
+    native.order.clear();
+    if(!result) return false;
+    Py_DECREF(result);
+    return true;
+}
+
+static bool get_number(PyObject *o, const char *attr_name, double *v) {
+    PyObject *attr = PyObject_GetAttrString(o, attr_name);
+    if(!attr) return false;
+    *v = PyFloat_AsDouble(attr);
+    Py_DECREF(attr);
+    return !PyErr_Occurred();
+}
+
+static bool get_number(PyObject *o, const char *attr_name, int *v) {
+    PyObject *attr = PyObject_GetAttrString(o, attr_name);
+    if(!attr) return false;
+    *v = PyInt_AsLong(attr);
+    Py_DECREF(attr);
+    return !PyErr_Occurred();
+}
+
+static bool get_point(PyObject *o, double p[9]) {
+    PyObject *seq = PySequence_Fast(o, "expected a sequence of 9 coordinates");
+    if(!seq) return false;
+    bool ok = PySequence_Fast_GET_SIZE(seq) == 9;
+    for(int i=0; ok && i<9; i++) {
+        p[i] = PyFloat_AsDouble(PySequence_Fast_GET_ITEM(seq, i));
+        if(PyErr_Occurred()) ok = false;
+    }
+    if(ok == false && !PyErr_Occurred())
+        PyErr_SetString(PyExc_ValueError, "expected a sequence of 9 coordinates");
+    Py_DECREF(seq);
+    return ok;
+}
+
+// Re-read the canon state that motion depends on
+static bool native_sync_in() {
+    static const char *axes = "xyzabcuvw";
+    char name[32];
+    PyObject *lo = PyObject_GetAttrString(callback, "lo");
+    if(!lo) return false;
+    bool ok = get_point(lo, native.lo);
+    Py_DECREF(lo);
+    if(!ok) return false;
+
+    PyObject *first_move = PyObject_GetAttrString(callback, "first_move");
+    if(!first_move) return false;
+    native.first_move = PyObject_IsTrue(first_move);
+    Py_DECREF(first_move);
+
+    double rotation_xy;
+    if(!get_number(callback, "suppress", &native.suppress)) return false;
+    if(!get_number(callback, "plane", &native.plane)) return false;
+    if(!get_number(callback, "arcdivision", &native.arcdivision)) return false;
+    if(!get_number(callback, "arc_tolerance", &native.arc_tolerance)) return false;
+    if(!get_number(callback, "feedrate", &native.feedrate)) return false;
+    if(!get_number(callback, "rotation_xy", &rotation_xy)) return false;
+    native.rotation_cos = cos(rotation_xy * M_PI / 180);
+    native.rotation_sin = sin(rotation_xy * M_PI / 180);
+    if(!get_number(callback, "xo", &native.tlo[0])) return false;
+    if(!get_number(callback, "yo", &native.tlo[1])) return false;
+    if(!get_number(callback, "zo", &native.tlo[2])) return false;
+    for(int i=0; i<9; i++) {
+        snprintf(name, sizeof(name), "g5x_offset_%c", axes[i]);
+        if(!get_number(callback, name, &native.g5x[i])) return false;
+        snprintf(name, sizeof(name), "g92_offset_%c", axes[i]);
+        if(!get_number(callback, name, &native.g92[i])) return false;
+    }
+
+    for(int i=0; i<3; i++) {
+        NativeColumn &col = native.columns[i];
+        PyObject *tail = PyObject_CallMethod(col.store, (char*)"tail", (char*)"");
+        if(!tail) return false;
+        PyObject *last;
+        ok = PyArg_ParseTuple(tail, "iO:tail", &col.nvertices, &last);
+        if(ok) {
+            col.have_last = last != Py_None;
+            if(col.have_last) ok = get_point(last, col.last);
+        }
+        Py_DECREF(tail);
+        if(!ok) return false;
+        PyObject *result = PyObject_CallMethod(col.store, (char*)"tool_index",
+                (char*)"((ddd))", native.tlo[0], native.tlo[1], native.tlo[2]);
+        if(!result) return false;
+        col.tool_index = PyInt_AsLong(result);
+        Py_DECREF(result);
+        if(PyErr_Occurred()) return false;
+    }
+    native.dirty = false;
+    return true;
+}
+
+static void deliver_new_line() {
     LineCode *new_line_code =
         (LineCode*)(PyObject_New(LineCode, &LineCodeType));
     pinterp->active_settings(new_line_code->settings);
     pinterp->active_g_codes(new_line_code->gcodes);
     pinterp->active_m_codes(new_line_code->mcodes);
-    new_line_code->gcodes[0] = sequence_number;
-    last_sequence_number = sequence_number;
+    new_line_code->gcodes[0] = last_sequence_number;
     PyObject *result = 
-        callmethod(callback, "next_line", "O", new_line_code);
+        querymethod(callback, "next_line", "O", new_line_code);
     Py_DECREF(new_line_code);
     if(result == NULL) interp_error ++;
     Py_XDECREF(result);
 }
 
+// Hand everything recorded natively back to the canon
+static bool native_sync_out() {
+    for(int i=0; i<3; i++)
+        if(!native_flush_column(native.columns[i])) return false;
+    if(!native_flush_order()) return false;
+    if(!native.dirty) {
+        PyObject *lo = Py_BuildValue("(ddddddddd)",
+            native.lo[0], native.lo[1], native.lo[2],
+            native.lo[3], native.lo[4], native.lo[5],
+            native.lo[6], native.lo[7], native.lo[8]);
+        if(!lo) return false;
+        int r = PyObject_SetAttrString(callback, "lo", lo);
+        Py_DECREF(lo);
+        if(r < 0) return false;
+        if(PyObject_SetAttrString(callback, "first_move",
+                native.first_move ? Py_True : Py_False) < 0)
+            return false;
+    }
+    if(native.line_pending) {
+        native.line_pending = false;
+        deliver_new_line();
+        if(interp_error) return false;
+    }
+    native.dirty = true;
+    return true;
+}
+
+static void native_before_call() {
+    if(!native.active || native.in_call || interp_error) return;
+    native.in_call = true;
+    if(!native_sync_out()) interp_error++;
+    native.in_call = false;
+}
+
+static bool native_begin() {
+    PyObject *flag = PyObject_GetAttrString(callback, "native_motion");
+    if(!flag) { PyErr_Clear(); return false; }
+    bool wanted = PyObject_IsTrue(flag) == 1;
+    Py_DECREF(flag);
+    if(!wanted) return false;
+    for(int i=0; i<3; i++) {
+        NativeColumn &col = native.columns[i];
+        col.store = PyObject_GetAttrString(callback, native_column_names[i]);
+        if(!col.store || !is_segment_store(col.store)) {
+            for(int j=0; j<=i; j++) Py_CLEAR(native.columns[j].store);
+            PyErr_Clear();
+            return false;
+        }
+        col.which = i;
+    }
+    // optional: a canon without it just doesn't get the order recorded
+    native.order_store = PyObject_GetAttrString(callback, "motion_order");
+    if(!native.order_store) PyErr_Clear();
+    for(int i=0; i<3; i++)
+        native.columns[i].order = native.order_store ? &native.order : NULL;
+    native.active = true;
+    native.dirty = true;
+    native.line_pending = false;
+    native.in_call = false;
+    return true;
+}
+
+static void native_end(bool flush) {
+    if(!native.active) return;
+    if(flush) native_before_call();
+    native.active = false;
+    for(int i=0; i<3; i++) {
+        NativeColumn &col = native.columns[i];
+        Py_CLEAR(col.store);
+        col.vertices.clear();
+        col.seg_start.clear();
+        col.lineno.clear();
+        col.feedrate.clear();
+        col.tool.clear();
+    }
+    Py_CLEAR(native.order_store);
+    native.order.clear();
+}
+
+static bool native_prepare_motion() {
+    if(native.dirty && !native_sync_in()) { interp_error++; return false; }
+    return native.suppress <= 0;
+}
+
+static void native_rotate_and_translate(double p[9]) {
+    for(int i=0; i<9; i++) p[i] += native.g92[i];
+    if(native.rotation_sin != 0 || native.rotation_cos != 1) {
+        double rotx = p[0] * native.rotation_cos - p[1] * native.rotation_sin;
+        p[1] = p[0] * native.rotation_sin + p[1] * native.rotation_cos;
+        p[0] = rotx;
+    }
+    for(int i=0; i<9; i++) p[i] += native.g5x[i];
+}
+
+static void native_straight(int which,
+        double x, double y, double z, double a, double b, double c,
+        double u, double v, double w) {
+    if(!native_prepare_motion()) return;
+    double l[9] = {x, y, z, a, b, c, u, v, w};
+    native_rotate_and_translate(l);
+    if(which == NATIVE_FEED) {
+        native.first_move = false;
+        native.columns[which].add(last_sequence_number, native.lo, l, native.feedrate);
+    } else if(!native.first_move) {
+        native.columns[which].add(last_sequence_number, native.lo, l, 0);
+    }
+    memcpy(native.lo, l, sizeof(l));
+}
+
+static void native_rigid_tap(double x, double y, double z) {
+    if(!native_prepare_motion()) return;
+    native.first_move = false;
+    double l[9] = {x, y, z, 0, 0, 0, 0, 0, 0};
+    native_rotate_and_translate(l);
+    for(int i=3; i<9; i++) l[i] = native.lo[i];
+    NativeColumn &col = native.columns[NATIVE_FEED];
+    col.add(last_sequence_number, native.lo, l, native.feedrate);
+    col.add(last_sequence_number, l, native.lo, native.feedrate);
+}
+
+static void native_arc_feed(double x1, double y1, double cx, double cy,
+        int rot, double z1, double a, double b, double c,
+        double u, double v, double w);
+
+static void maybe_new_line(int sequence_number=pinterp->sequence_number());
+static void maybe_new_line(int sequence_number) {
+    if(!pinterp) return;
+    if(interp_error) return;
+    if(sequence_number == last_sequence_number)
+        return;
+    last_sequence_number = sequence_number;
+    if(native.active) {
+        native.line_pending = true;
+        return;
+    }
+    deliver_new_line();
+}
+
 void NURBS_FEED(int line_number, std::vector<CONTROL_POINT> nurbs_control_points, unsigned int k) {
     double u = 0.0;
     unsigned int n = nurbs_control_points.size() - 1;
@@ -204,6 +541,12 @@ void ARC_FEED(int line_number,
     }
     maybe_new_line(line_number);
     if(interp_error) return;
+    if(native.active) {
+        native_arc_feed(first_end, second_end, first_axis, second_axis,
+                rotation, axis_end_point, a_position, b_position, c_position,
+                u_position, v_position, w_position);
+        return;
+    }
     PyObject *result =
         callmethod(callback, "arc_feed", "ffffifffffff",
                             first_end, second_end, first_axis, second_axis,
@@ -224,6 +567,10 @@ void STRAIGHT_FEED(int line_number,
     if(metric) { x /= 25.4; y /= 25.4; z /= 25.4; u /= 25.4; v /= 25.4; w /= 25.4; }
     maybe_new_line(line_number);
     if(interp_error) return;
+    if(native.active) {
+        native_straight(NATIVE_FEED, x, y, z, a, b, c, u, v, w);
+        return;
+    }
     PyObject *result =
         callmethod(callback, "straight_feed", "fffffffff",
                             x, y, z, a, b, c, u, v, w);
@@ -241,6 +588,10 @@ void STRAIGHT_TRAVERSE(int line_number,
     if(metric) { x /= 25.4; y /= 25.4; z /= 25.4; u /= 25.4; v /= 25.4; w /= 25.4; }
     maybe_new_line(line_number);
     if(interp_error) return;
+    if(native.active) {
+        native_straight(NATIVE_TRAVERSE, x, y, z, a, b, c, u, v, w);
+        return;
+    }
     PyObject *result =
         callmethod(callback, "straight_traverse", "fffffffff",
                             x, y, z, a, b, c, u, v, w);
@@ -423,7 +774,7 @@ extern bool GET_BLOCK_DELETE(void) {
     int bd = 0;
     if(interp_error) return 0;
     PyObject *result =
-        callmethod(callback, "get_block_delete", "");
+        querymethod(callback, "get_block_delete", "");
     if(result == NULL) {
         interp_error++;
     } else {
@@ -477,6 +828,10 @@ void STRAIGHT_PROBE(int line_number,
     if(metric) { x /= 25.4; y /= 25.4; z /= 25.4; u /= 25.4; v /= 25.4; w /= 25.4; }
     maybe_new_line(line_number);
     if(interp_error) return;
+    if(native.active) {
+        native_straight(NATIVE_FEED, x, y, z, a, b, c, u, v, w);
+        return;
+    }
     PyObject *result =
         callmethod(callback, "straight_probe", "fffffffff",
                             x, y, z, a, b, c, u, v, w);
@@ -489,6 +844,10 @@ void RIGID_TAP(int line_number,
     if(metric) { x /= 25.4; y /= 25.4; z /= 25.4; }
     maybe_new_line(line_number);
     if(interp_error) return;
+    if(native.active) {
+        native_rigid_tap(x, y, z);
+        return;
+    }
     PyObject *result =
         callmethod(callback, "rigid_tap", "fff",
             x, y, z);
@@ -536,7 +895,7 @@ CANON_TOOL_TABLE GET_EXTERNAL_TOOL_TABLE(int pocket) {
     CANON_TOOL_TABLE t = {-1,-1,{{0,0,0},0,0,0,0,0,0},0,0,0,0};
     if(interp_error) return t;
     PyObject *result =
-        callmethod(callback, "get_tool", "i", pocket);
+        querymethod(callback, "get_tool", "i", pocket);
     if(result == NULL ||
        !PyArg_ParseTuple(result, "iddddddddddddi", &t.toolno, &t.offset.tran.x, &t.offset.tran.y, &t.offset.tran.z,
                           &t.offset.a, &t.offset.b, &t.offset.c, &t.offset.u, &t.offset.v, &t.offset.w,
@@ -599,7 +958,7 @@ EmcPose GET_EXTERNAL_OFFSETS() {
 int GET_EXTERNAL_AXIS_MASK() {
     if(interp_error) return 7;
     PyObject *result =
-        callmethod(callback, "get_axis_mask", "");
+        querymethod(callback, "get_axis_mask", "");
     if(!result) { interp_error ++; return 7 /* XYZABC */; }
     if(!PyInt_Check(result)) { interp_error ++; return 7 /* XYZABC */; }
     int mask = PyInt_AsLong(result);
@@ -651,7 +1010,7 @@ static bool PyFloat_CheckAndError(const char *func, PyObject *p)  {
 
 double GET_EXTERNAL_ANGLE_UNITS() {
     PyObject *result =
-        callmethod(callback, "get_external_angular_units", "");
+        querymethod(callback, "get_external_angular_units", "");
     if(result == NULL) interp_error++;
 
     double dresult = 1.0;
@@ -666,7 +1025,7 @@ double GET_EXTERNAL_ANGLE_UNITS() {
 
 double GET_EXTERNAL_LENGTH_UNITS() {
     PyObject *result =
-        callmethod(callback, "get_external_length_units", "");
+        querymethod(callback, "get_external_length_units", "");
     if(result == NULL) interp_error++;
 
     double dresult = 0.03937007874016;
@@ -692,23 +1051,577 @@ static bool check_abort() {
     return 0;
 }
 
+// A program that a filter is still writing (see FilterStream in axis.py)
+// is parsed as it arrives.  The canon's parse_stream says how many bytes of
+// whole lines are in the file so far ('written') and whether the filter has
+// finished.  The interpreter takes the end of the file for the end of the
+// program, so it must not read at or past 'written' until then.  A
+// negative 'pos' waits for the filter to finish.
+static bool stream_wait(PyObject *stream, long pos) {
+    while(1) {
+        int finished;
+        double written;
+        if(!get_number(stream, "finished", &finished)) return false;
+        if(finished) return true;
+        if(!get_number(stream, "written", &written)) return false;
+        if(pos >= 0 && pos < written) return true;
+        if(check_abort()) return false;
+        native_before_call();
+        Py_BEGIN_ALLOW_THREADS
+        usleep(5000);
+        Py_END_ALLOW_THREADS
+    }
+}
+
+// Wait until the next read() of the program file will find a whole line
+static bool stream_ready(PyObject *stream, const char *f) {
+    auto interp = dynamic_cast<Interp*>(pinterp);
+    if(!interp) return stream_wait(stream, -1);
+    FILE *fp = interp->_setup.file_pointer;
+    // subroutine files are not being written
+    if(!fp || strcmp(interp->_setup.filename, f)) return true;
+    if(!stream_wait(stream, ftell(fp))) return false;
+    // stdio remembers hitting the old end of the file
+    clearerr(fp);
+    return true;
+}
+
 USER_DEFINED_FUNCTION_TYPE USER_DEFINED_FUNCTION[USER_DEFINED_FUNCTION_NUM];
 
 CANON_MOTION_MODE motion_mode;
-void SET_MOTION_CONTROL_MODE(CANON_MOTION_MODE mode, double tolerance) { motion_mode = mode; }
+// The canon is told about blending only if it asks (rs274.previewcanon does,
+// for the cycle time estimate)
+void SET_MOTION_CONTROL_MODE(CANON_MOTION_MODE mode, double tolerance) {
+    motion_mode = mode;
+    maybe_new_line();
+    if(interp_error) return;
+    if(!PyObject_HasAttrString(callback, "set_motion_control_mode")) return;
+    if(metric) tolerance /= 25.4;
+    PyObject *result =
+        callmethod(callback, "set_motion_control_mode", "if", (int)mode, tolerance);
+    if(result == NULL) interp_error ++;
+    Py_XDECREF(result);
+}
 void SET_MOTION_CONTROL_MODE(double tolerance) { }
 void SET_MOTION_CONTROL_MODE(CANON_MOTION_MODE mode) { motion_mode = mode; }
 CANON_MOTION_MODE GET_EXTERNAL_MOTION_CONTROL_MODE() { return motion_mode; }
 void SET_NAIVECAM_TOLERANCE(double tolerance) { }
 
+/* Preview checkpoints
+ *
+ * A canon with a 'next_checkpoint' line number gets checkpoints while the
+ * preview is parsed.  Once the interpreter has finished a line of the main
+ * program at or past that line, with no subroutine call, skipped block or
+ * cutter compensation move pending, its state is copied and handed to the
+ * canon's checkpoint(state, lineno, offset) as an opaque capsule; 'offset'
+ * is where the next line starts in the file.  If checkpoint() returns true
+ * the parse stops there.  'next_checkpoint' is read again after each call.
+ *
+ * A later parse of the same program, after an edit, can start from one of
+ * these: with the capsule as the canon's 'parse_resume', the state is put
+ * back after the interpreter is initialized and reading continues from the
+ * checkpoint's offset.  rs274.reparse does the bookkeeping on the Python
+ * side, including the canon's own state.
+ *
+ * Only state that outlasts a line is kept: positions, offsets, modal state,
+ * numbered and global named parameters, o-word labels, the tool table and
+ * this module's own canon state.
+ */
+#define CHECKPOINT_FIELDS(X) \
+    X(AA_axis_offset) X(AA_current) X(AA_origin_offset) \
+    X(BB_axis_offset) X(BB_current) X(BB_origin_offset) \
+    X(CC_axis_offset) X(CC_current) X(CC_origin_offset) \
+    X(u_axis_offset) X(u_current) X(u_origin_offset) \
+    X(v_axis_offset) X(v_current) X(v_origin_offset) \
+    X(w_axis_offset) X(w_current) X(w_origin_offset) \
+    X(arc_not_allowed) X(axis_offset_x) X(axis_offset_y) X(axis_offset_z) \
+    X(control_mode) X(current_pocket) \
+    X(current_x) X(current_y) X(current_z) \
+    X(cutter_comp_radius) X(cutter_comp_orientation) X(cutter_comp_side) \
+    X(cycle_cc) X(cycle_i) X(cycle_j) X(cycle_k) X(cycle_l) X(cycle_p) \
+    X(cycle_q) X(cycle_r) X(cycle_il) X(cycle_il_flag) \
+    X(distance_mode) X(ijk_distance_mode) X(feed_mode) X(feed_override) \
+    X(feed_rate) X(flood) X(length_units) X(mist) X(motion_mode) \
+    X(origin_index) X(origin_offset_x) X(origin_offset_y) X(origin_offset_z) \
+    X(rotation_xy) X(percent_flag) X(plane) X(probe_flag) X(input_flag) \
+    X(toolchange_flag) X(input_index) X(input_digital) \
+    X(cutter_comp_firstmove) X(program_x) X(program_y) X(program_z) \
+    X(retract_mode) X(selected_pocket) X(selected_tool) X(active_spindle) \
+    X(speed) X(spindle_mode) X(speed_feed_mode) X(speed_override) \
+    X(spindle_turning) X(tool_offset) X(pockets_max) X(traverse_rate) \
+    X(doing_continue) X(doing_break) X(executed_if) X(test_value) \
+    X(return_value) X(value_returned) X(adaptive_feed) X(feed_hold) \
+    X(lathe_diameter_mode)
+
+// M70..M73 state saved at the top level
+#define CHECKPOINT_CONTEXT_FIELDS(X) X(saved_params) X(context_status)
+
+// Arrays whose first element is the line number they were written at
+#define CHECKPOINT_CODE_FIELDS(X) \
+    X(active_g_codes) X(active_m_codes) X(active_settings)
+#define CHECKPOINT_CONTEXT_CODE_FIELDS(X) \
+    X(saved_g_codes) X(saved_m_codes) X(saved_settings)
+
+typedef std::vector<double> ParameterArray;
+typedef std::vector<CANON_TOOL_TABLE> ToolTable;
+
+struct InterpCheckpoint {
+    std::string filename;
+    long offset;
+    int sequence_number;
+#define X(f) decltype(setup::f) f;
+    CHECKPOINT_FIELDS(X)
+    CHECKPOINT_CODE_FIELDS(X)
+#undef X
+    struct {
+#define X(f) decltype(context::f) f;
+    CHECKPOINT_CONTEXT_FIELDS(X)
+    CHECKPOINT_CONTEXT_CODE_FIELDS(X)
+#undef X
+    } context;
+    // usually the same from one checkpoint to the next, so shared
+    std::shared_ptr<const ParameterArray> parameters;
+    std::shared_ptr<const ToolTable> tool_table;
+    parameter_map named_params;
+    offset_map_type offset_map;
+    // this module's canon state
+    int last_sequence_number;
+    bool metric;
+    CANON_MOTION_MODE canon_motion_mode;
+    EmcPose canon_tool_offset;
+    double pos[9];
+};
+
+static const char *checkpoint_capsule_name = "gcode.checkpoint";
+// files other than the program that the last parse read subroutines from
+static std::set<std::string> subroutine_files;
+static std::shared_ptr<const ParameterArray> last_checkpoint_parameters;
+static std::shared_ptr<const ToolTable> last_checkpoint_tool_table;
+
+static bool same_tool(const CANON_TOOL_TABLE &a, const CANON_TOOL_TABLE &b) {
+    return a.toolno == b.toolno && a.pocketno == b.pocketno
+        && !memcmp(&a.offset, &b.offset, sizeof(a.offset))
+        && a.diameter == b.diameter && a.frontangle == b.frontangle
+        && a.backangle == b.backangle && a.orientation == b.orientation;
+}
+
+static bool same_tool_table(const ToolTable &a, const ToolTable &b) {
+    if(a.size() != b.size()) return false;
+    for(size_t i=0; i<a.size(); i++)
+        if(!same_tool(a[i], b[i])) return false;
+    return true;
+}
+
+template<class T, size_t N>
+static bool same_codes(const T (&a)[N], const T (&b)[N]) {
+    return !memcmp(a + 1, b + 1, sizeof(T) * (N - 1));
+}
+
+static bool checkpoint_possible(Interp *interp) {
+    setup &s = interp->_setup;
+    return s.file_pointer && s.call_level == 0 && s.remap_level == 0
+        && !s.defining_sub && !s.skipping_o && !s.skipping_to_sub
+        && !s.doing_break && !s.doing_continue && qc().empty();
+}
+
+static InterpCheckpoint *checkpoint_save(Interp *interp) {
+    setup &s = interp->_setup;
+    InterpCheckpoint *cp = new InterpCheckpoint;
+    cp->filename = s.filename;
+    cp->offset = ftell(s.file_pointer);
+    cp->sequence_number = s.sequence_number;
+#define X(f) memcpy(&cp->f, &s.f, sizeof(cp->f));
+    CHECKPOINT_FIELDS(X)
+    CHECKPOINT_CODE_FIELDS(X)
+#undef X
+#define X(f) memcpy(&cp->context.f, &s.sub_context[0].f, sizeof(cp->context.f));
+    CHECKPOINT_CONTEXT_FIELDS(X)
+    CHECKPOINT_CONTEXT_CODE_FIELDS(X)
+#undef X
+    const ParameterArray *last = last_checkpoint_parameters.get();
+    if(!last || memcmp(&(*last)[0], s.parameters, sizeof(s.parameters)))
+        last_checkpoint_parameters.reset(new ParameterArray(s.parameters,
+            s.parameters + interp_param_global::RS274NGC_MAX_PARAMETERS));
+    cp->parameters = last_checkpoint_parameters;
+    ToolTable tools(s.tool_table, s.tool_table + s.pockets_max);
+    if(!last_checkpoint_tool_table
+            || !same_tool_table(*last_checkpoint_tool_table, tools))
+        last_checkpoint_tool_table.reset(new ToolTable(tools));
+    cp->tool_table = last_checkpoint_tool_table;
+    cp->named_params = s.sub_context[0].named_params;
+    cp->offset_map = s.offset_map;
+    cp->last_sequence_number = last_sequence_number;
+    cp->metric = metric;
+    cp->canon_motion_mode = motion_mode;
+    cp->canon_tool_offset = tool_offset;
+    double pos[9] = {_pos_x, _pos_y, _pos_z, _pos_a, _pos_b, _pos_c,
+        _pos_u, _pos_v, _pos_w};
+    memcpy(cp->pos, pos, sizeof(pos));
+    return cp;
+}
+
+static void checkpoint_restore(Interp *interp, const InterpCheckpoint *cp) {
+    setup &s = interp->_setup;
+#define X(f) memcpy(&s.f, &cp->f, sizeof(s.f));
+    CHECKPOINT_FIELDS(X)
+    CHECKPOINT_CODE_FIELDS(X)
+#undef X
+#define X(f) memcpy(&s.sub_context[0].f, &cp->context.f, sizeof(cp->context.f));
+    CHECKPOINT_CONTEXT_FIELDS(X)
+    CHECKPOINT_CONTEXT_CODE_FIELDS(X)
+#undef X
+    memcpy(s.parameters, &(*cp->parameters)[0], sizeof(s.parameters));
+    std::copy(cp->tool_table->begin(), cp->tool_table->end(), s.tool_table);
+    s.sub_context[0].named_params = cp->named_params;
+    s.offset_map = cp->offset_map;
+    s.sequence_number = cp->sequence_number;
+    fseek(s.file_pointer, cp->offset, SEEK_SET);
+    last_sequence_number = cp->last_sequence_number;
+    metric = cp->metric;
+    motion_mode = cp->canon_motion_mode;
+    tool_offset = cp->canon_tool_offset;
+    _pos_x = cp->pos[0]; _pos_y = cp->pos[1]; _pos_z = cp->pos[2];
+    _pos_a = cp->pos[3]; _pos_b = cp->pos[4]; _pos_c = cp->pos[5];
+    _pos_u = cp->pos[6]; _pos_v = cp->pos[7]; _pos_w = cp->pos[8];
+}
+
+// How the main program's text changed between two parses: the old text
+// from 'start' up to 'end' was replaced, so a place in it from 'end' on
+// moves by 'byte_delta' bytes and 'line_delta' lines
+struct TextShift {
+    const char *filename;
+    long start, end, byte_delta;
+    int line_delta;
+
+    bool in_file(const offset &o) const {
+        return o.filename && !strcmp(o.filename, filename);
+    }
+    bool changed(const offset &o) const {
+        return in_file(o) && o.offset >= start && o.offset < end;
+    }
+    bool applies(const offset &o) const {
+        return in_file(o) && o.offset >= end;
+    }
+    long shifted_offset(const offset &o) const {
+        return applies(o) ? o.offset + byte_delta : o.offset;
+    }
+    int shifted_line(const offset &o) const {
+        return applies(o) ? o.sequence_number + line_delta : o.sequence_number;
+    }
+};
+
+static bool checkpoint_equal(const InterpCheckpoint *a,
+        const InterpCheckpoint *b, const TextShift &shift) {
+#define X(f) if(memcmp(&a->f, &b->f, sizeof(a->f))) return false;
+    CHECKPOINT_FIELDS(X)
+#undef X
+#define X(f) if(memcmp(&a->context.f, &b->context.f, sizeof(a->context.f))) return false;
+    CHECKPOINT_CONTEXT_FIELDS(X)
+#undef X
+#define X(f) if(!same_codes(a->f, b->f)) return false;
+    CHECKPOINT_CODE_FIELDS(X)
+#undef X
+#define X(f) if(!same_codes(a->context.f, b->context.f)) return false;
+    CHECKPOINT_CONTEXT_CODE_FIELDS(X)
+#undef X
+    if(a->parameters != b->parameters && *a->parameters != *b->parameters)
+        return false;
+    if(a->tool_table != b->tool_table
+            && !same_tool_table(*a->tool_table, *b->tool_table))
+        return false;
+    if(a->metric != b->metric || a->canon_motion_mode != b->canon_motion_mode
+            || memcmp(&a->canon_tool_offset, &b->canon_tool_offset,
+                sizeof(a->canon_tool_offset))
+            || memcmp(a->pos, b->pos, sizeof(a->pos)))
+        return false;
+    if(a->named_params.size() != b->named_params.size()) return false;
+    for(parameter_map::const_iterator i = a->named_params.begin(),
+            j = b->named_params.begin(); i != a->named_params.end(); ++i, ++j) {
+        if(strcasecmp(i->first, j->first)
+                || memcmp(&i->second.value, &j->second.value, sizeof(double))
+                || i->second.attr != j->second.attr)
+            return false;
+    }
+    if(a->offset_map.size() != b->offset_map.size()) return false;
+    for(offset_map_type::const_iterator i = a->offset_map.begin(),
+            j = b->offset_map.begin(); i != a->offset_map.end(); ++i, ++j) {
+        const offset &x = i->second, &y = j->second;
+        // an o-word in the replaced text may not mean the same any more
+        if(shift.changed(y)) return false;
+        if(strcasecmp(i->first, j->first) || x.type != y.type
+                || x.repeat_count != y.repeat_count
+                || (x.filename != y.filename && (!x.filename || !y.filename
+                    || strcmp(x.filename, y.filename)))
+                || x.offset != shift.shifted_offset(y)
+                || x.sequence_number != shift.shifted_line(y))
+            return false;
+    }
+    return true;
+}
+
+static void checkpoint_destroy(PyObject *capsule) {
+    delete (InterpCheckpoint *)PyCapsule_GetPointer(capsule,
+            checkpoint_capsule_name);
+}
+
+static PyObject *checkpoint_capsule(InterpCheckpoint *cp) {
+    PyObject *capsule = PyCapsule_New(cp, checkpoint_capsule_name,
+            checkpoint_destroy);
+    if(!capsule) delete cp;
+    return capsule;
+}
+
+static InterpCheckpoint *checkpoint_from(PyObject *o) {
+    return (InterpCheckpoint *)PyCapsule_GetPointer(o,
+            checkpoint_capsule_name);
+}
+
+// Returns 1 if the canon wants the parse to stop, -1 on error
+static int take_checkpoint(Interp *interp, int *next_checkpoint) {
+    PyObject *capsule = checkpoint_capsule(checkpoint_save(interp));
+    if(!capsule) return -1;
+    InterpCheckpoint *cp = checkpoint_from(capsule);
+    PyObject *result = callmethod(callback, "checkpoint", "Oil",
+            capsule, cp->sequence_number, cp->offset);
+    Py_DECREF(capsule);
+    if(!result) return -1;
+    int stop = PyObject_IsTrue(result);
+    Py_DECREF(result);
+    if(stop < 0) return -1;
+    if(!get_number(callback, "next_checkpoint", next_checkpoint)) return -1;
+    return stop;
+}
+
+static PyObject *rs274_checkpoint_equal(PyObject *self, PyObject *args) {
+    PyObject *ao, *bo;
+    TextShift shift = {0, LONG_MAX, LONG_MAX, 0, 0};
+    if(!PyArg_ParseTuple(args, "OO|llli:checkpoint_equal", &ao, &bo,
+                &shift.start, &shift.end, &shift.byte_delta, &shift.line_delta))
+        return NULL;
+    InterpCheckpoint *a = checkpoint_from(ao), *b = checkpoint_from(bo);
+    if(!a || !b) return NULL;
+    shift.filename = b->filename.c_str();
+    return PyBool_FromLong(a->filename == b->filename
+        && checkpoint_equal(a, b, shift));
+}
+
+static PyObject *rs274_checkpoint_shift(PyObject *self, PyObject *args) {
+    PyObject *o;
+    TextShift shift = {0, 0, 0, 0, 0};
+    if(!PyArg_ParseTuple(args, "Olli:checkpoint_shift", &o,
+                &shift.end, &shift.byte_delta, &shift.line_delta))
+        return NULL;
+    InterpCheckpoint *cp = checkpoint_from(o);
+    if(!cp) return NULL;
+    shift.filename = cp->filename.c_str();
+    shift.start = shift.end;
+    InterpCheckpoint *result = new InterpCheckpoint(*cp);
+    if(result->offset >= shift.end) {
+        result->offset += shift.byte_delta;
+        result->sequence_number += shift.line_delta;
+        result->last_sequence_number += shift.line_delta;
+        result->active_g_codes[0] += shift.line_delta;
+        result->active_m_codes[0] += shift.line_delta;
+        result->active_settings[0] += shift.line_delta;
+    }
+    for(offset_map_type::iterator i = result->offset_map.begin();
+            i != result->offset_map.end(); ++i) {
+        i->second.sequence_number = shift.shifted_line(i->second);
+        i->second.offset = shift.shifted_offset(i->second);
+    }
+    return checkpoint_capsule(result);
+}
+
+/* A checkpoint as a string, so that it can be kept with a compiled preview
+ * and used by a later session.  The fields are written as they are in
+ * memory, so a string is only good for the build that wrote it: it starts
+ * with the sizes of the structures involved, and checkpoint_unpack refuses
+ * one where they differ.  Names are put back in the interpreter's string
+ * store, which is where the o-word and named parameter maps expect them.
+ */
+static const char checkpoint_magic[4] = {'G', 'C', 'C', 'P'};
+static const uint32_t checkpoint_layout[] = {
+    sizeof(InterpCheckpoint), sizeof(setup), sizeof(CANON_TOOL_TABLE),
+    sizeof(parameter_value), sizeof(offset),
+    interp_param_global::RS274NGC_MAX_PARAMETERS,
+};
+static const uint32_t no_string = 0xffffffff;
+
+struct CheckpointWriter {
+    std::string data;
+    void raw(const void *p, size_t n) { data.append((const char *)p, n); }
+    template<class T> void put(const T &v) { raw(&v, sizeof(v)); }
+    void put_string(const char *s) {
+        uint32_t n = s ? strlen(s) : no_string;
+        put(n);
+        if(s) raw(s, n);
+    }
+};
+
+struct CheckpointReader {
+    const char *p, *end;
+    bool raw(void *d, size_t n) {
+        if((size_t)(end - p) < n) return false;
+        memcpy(d, p, n);
+        p += n;
+        return true;
+    }
+    template<class T> bool get(T &v) { return raw(&v, sizeof(v)); }
+    // a string from strstore, or NULL
+    bool get_string(const char *&s) {
+        uint32_t n;
+        if(!get(n)) return false;
+        if(n == no_string) { s = 0; return true; }
+        if((size_t)(end - p) < n) return false;
+        s = strstore(std::string(p, n).c_str());
+        p += n;
+        return true;
+    }
+};
+
+static PyObject *rs274_checkpoint_pack(PyObject *self, PyObject *args) {
+    PyObject *o;
+    if(!PyArg_ParseTuple(args, "O:checkpoint_pack", &o)) return NULL;
+    InterpCheckpoint *cp = checkpoint_from(o);
+    if(!cp) return NULL;
+    CheckpointWriter w;
+    w.put(checkpoint_magic);
+    w.put(checkpoint_layout);
+    w.put_string(cp->filename.c_str());
+    w.put(cp->offset);
+    w.put(cp->sequence_number);
+#define X(f) w.put(cp->f);
+    CHECKPOINT_FIELDS(X)
+    CHECKPOINT_CODE_FIELDS(X)
+#undef X
+#define X(f) w.put(cp->context.f);
+    CHECKPOINT_CONTEXT_FIELDS(X)
+    CHECKPOINT_CONTEXT_CODE_FIELDS(X)
+#undef X
+    w.raw(&(*cp->parameters)[0], sizeof(double) * cp->parameters->size());
+    w.put((uint32_t)cp->tool_table->size());
+    if(!cp->tool_table->empty())
+        w.raw(&(*cp->tool_table)[0],
+                sizeof(CANON_TOOL_TABLE) * cp->tool_table->size());
+    w.put((uint32_t)cp->named_params.size());
+    for(parameter_map::const_iterator i = cp->named_params.begin();
+            i != cp->named_params.end(); ++i) {
+        w.put_string(i->first);
+        w.put(i->second.value);
+        w.put(i->second.attr);
+    }
+    w.put((uint32_t)cp->offset_map.size());
+    for(offset_map_type::const_iterator i = cp->offset_map.begin();
+            i != cp->offset_map.end(); ++i) {
+        const offset &x = i->second;
+        w.put_string(i->first);
+        w.put(x.type);
+        w.put_string(x.filename);
+        w.put(x.offset);
+        w.put(x.sequence_number);
+        w.put(x.repeat_count);
+    }
+    w.put(cp->last_sequence_number);
+    w.put(cp->metric);
+    w.put(cp->canon_motion_mode);
+    w.put(cp->canon_tool_offset);
+    w.put(cp->pos);
+    return PyString_FromStringAndSize(w.data.data(), w.data.size());
+}
+
+// checkpoints unpacked one after another usually share these, as the ones
+// from checkpoint_save do
+static std::shared_ptr<const ParameterArray> last_unpacked_parameters;
+static std::shared_ptr<const ToolTable> last_unpacked_tool_table;
+
+static bool checkpoint_read(CheckpointReader &r, InterpCheckpoint *cp) {
+    char magic[sizeof(checkpoint_magic)];
+    uint32_t layout[sizeof(checkpoint_layout) / sizeof(uint32_t)];
+    if(!r.get(magic) || memcmp(magic, checkpoint_magic, sizeof(magic))
+            || !r.get(layout)
+            || memcmp(layout, checkpoint_layout, sizeof(layout)))
+        return false;
+    const char *filename;
+    if(!r.get_string(filename) || !filename) return false;
+    cp->filename = filename;
+    if(!r.get(cp->offset) || !r.get(cp->sequence_number)) return false;
+#define X(f) if(!r.get(cp->f)) return false;
+    CHECKPOINT_FIELDS(X)
+    CHECKPOINT_CODE_FIELDS(X)
+#undef X
+#define X(f) if(!r.get(cp->context.f)) return false;
+    CHECKPOINT_CONTEXT_FIELDS(X)
+    CHECKPOINT_CONTEXT_CODE_FIELDS(X)
+#undef X
+
+    ParameterArray parameters(interp_param_global::RS274NGC_MAX_PARAMETERS);
+    if(!r.raw(&parameters[0], sizeof(double) * parameters.size()))
+        return false;
+    if(!last_unpacked_parameters || *last_unpacked_parameters != parameters)
+        last_unpacked_parameters.reset(new ParameterArray(parameters));
+    cp->parameters = last_unpacked_parameters;
+
+    uint32_t n;
+    if(!r.get(n) || n > CANON_POCKETS_MAX) return false;
+    ToolTable tools(n);
+    if(n && !r.raw(&tools[0], sizeof(CANON_TOOL_TABLE) * n)) return false;
+    if(!last_unpacked_tool_table
+            || !same_tool_table(*last_unpacked_tool_table, tools))
+        last_unpacked_tool_table.reset(new ToolTable(tools));
+    cp->tool_table = last_unpacked_tool_table;
+
+    if(!r.get(n)) return false;
+    for(uint32_t i = 0; i < n; i++) {
+        const char *name;
+        parameter_value value;
+        if(!r.get_string(name) || !name
+                || !r.get(value.value) || !r.get(value.attr))
+            return false;
+        cp->named_params[name] = value;
+    }
+    if(!r.get(n)) return false;
+    for(uint32_t i = 0; i < n; i++) {
+        const char *name;
+        offset x;
+        if(!r.get_string(name) || !name || !r.get(x.type)
+                || !r.get_string(x.filename) || !r.get(x.offset)
+                || !r.get(x.sequence_number) || !r.get(x.repeat_count))
+            return false;
+        cp->offset_map[name] = x;
+    }
+    return r.get(cp->last_sequence_number) && r.get(cp->metric)
+        && r.get(cp->canon_motion_mode) && r.get(cp->canon_tool_offset)
+        && r.get(cp->pos) && r.p == r.end;
+}
+
+static PyObject *rs274_checkpoint_unpack(PyObject *self, PyObject *args) {
+    const char *data;
+    int size;
+    if(!PyArg_ParseTuple(args, "s#:checkpoint_unpack", &data, &size))
+        return NULL;
+    CheckpointReader r = {data, data + size};
+    InterpCheckpoint *cp = new InterpCheckpoint;
+    if(!checkpoint_read(r, cp)) {
+        delete cp;
+        PyErr_SetString(PyExc_ValueError,
+                "not a checkpoint packed by this build of gcode");
+        return NULL;
+    }
+    return checkpoint_capsule(cp);
+}
+
 #define RESULT_OK (result == INTERP_OK || result == INTERP_EXECUTE_FINISH)
 static PyObject *parse_file(PyObject *self, PyObject *args) {
     char *f;
     char *unitcode=0, *initcode=0, *interpname=0;
     PyObject *initcodes=0;
     int error_line_offset = 0;
-    struct timeval t0, t1;
+    struct timeval t0, t1, ty;
     int wait = 1;
+    double yield_interval = 0;
+    PyObject *stream = 0;
+    int next_checkpoint = 0;
+    PyObject *resume = 0;
 
     if(!PyArg_ParseTuple(args, "sOO!|s:new-parse",
             &f, &callback, &PyList_Type, &initcodes, &interpname))
@@ -732,7 +1645,60 @@ static PyObject *parse_file(PyObject *self, PyObject *args) {
     for(int i=0; i<USER_DEFINED_FUNCTION_NUM; i++) 
         USER_DEFINED_FUNCTION[i] = user_defined_function;
 
+    // A canon parsed on a worker thread sets parse_yield: every so often
+    // the segments parsed so far are handed over and the GIL is released
+    // briefly, so that the GUI thread can draw them.
+    if(PyObject_HasAttrString(callback, "parse_yield")
+            && !get_number(callback, "parse_yield", &yield_interval))
+        return NULL;
+
+    if(PyObject_HasAttrString(callback, "parse_stream")) {
+        stream = PyObject_GetAttrString(callback, "parse_stream");
+        if(!stream) return NULL;
+        if(stream == Py_None) Py_CLEAR(stream);
+    }
+    // Checkpoints need this module's own interpreter reading from a file
+    Interp *checkpoint_interp = stream ? 0 : dynamic_cast<Interp*>(pinterp);
+    if(checkpoint_interp && PyObject_HasAttrString(callback, "next_checkpoint")
+            && !get_number(callback, "next_checkpoint", &next_checkpoint))
+        return NULL;
+    if(PyObject_HasAttrString(callback, "parse_resume")) {
+        resume = PyObject_GetAttrString(callback, "parse_resume");
+        if(!resume) { Py_XDECREF(stream); return NULL; }
+        if(resume == Py_None) Py_CLEAR(resume);
+        else if(!checkpoint_interp) {
+            PyErr_SetString(PyExc_ValueError, "can only resume a parse of "
+                    "a file by the built-in interpreter");
+            Py_DECREF(resume);
+            Py_XDECREF(stream);
+            return NULL;
+        }
+        else if(!checkpoint_from(resume)) {
+            Py_DECREF(resume);
+            Py_XDECREF(stream);
+            return NULL;
+        }
+        // check before the file is opened, so that nothing needs closing
+        else if(checkpoint_from(resume)->filename != f) {
+            PyErr_Format(PyExc_ValueError, "checkpoint is for %s, not %s",
+                    checkpoint_from(resume)->filename.c_str(), f);
+            Py_DECREF(resume);
+            Py_XDECREF(stream);
+            return NULL;
+        }
+    }
+    last_checkpoint_parameters.reset();
+    last_checkpoint_tool_table.reset();
+
+    // The interpreter reads the first line when it opens the file
+    if(stream && !stream_wait(stream,
+                dynamic_cast<Interp*>(pinterp) ? 0 : -1)) {
+        Py_DECREF(stream);
+        return NULL;
+    }
+
     gettimeofday(&t0, NULL);
+    ty = t0;
 
     metric=false;
     interp_error = 0;
@@ -744,6 +1710,22 @@ static PyObject *parse_file(PyObject *self, PyObject *args) {
     pinterp->init();
     pinterp->open(f);
 
+    if(resume) {
+        if(!checkpoint_interp->_setup.file_pointer) {
+            PyErr_Format(PyExc_IOError, "can't open %s", f);
+            Py_DECREF(resume);
+            Py_XDECREF(stream);
+            pinterp->close();
+            return NULL;
+        }
+        checkpoint_restore(checkpoint_interp, checkpoint_from(resume));
+        Py_CLEAR(resume);
+        // the initialization codes are part of the restored state
+        initcodes = nullptr;
+        unitcode = initcode = 0;
+    }
+
+    native_begin();
     maybe_new_line();
 
     int result = INTERP_OK;
@@ -751,9 +1733,9 @@ static PyObject *parse_file(PyObject *self, PyObject *args) {
         for(int i=0; i<PyList_Size(initcodes) && RESULT_OK; i++)
         {
             PyObject *item = PyList_GetItem(initcodes, i);
-            if(!item) return NULL;
+            if(!item) { native_end(false); Py_XDECREF(stream); return NULL; }
             char *code = PyString_AsString(item);
-            if(!code) return NULL;
+            if(!code) { native_end(false); Py_XDECREF(stream); return NULL; }
             result = pinterp->read(code);
             if(!RESULT_OK) goto out_error;
             result = pinterp->execute();
@@ -771,20 +1753,55 @@ static PyObject *parse_file(PyObject *self, PyObject *args) {
     }
     while(!interp_error && RESULT_OK) {
         error_line_offset = 1;
+        if(stream && !stream_ready(stream, f)) {
+            interp_error = 1;
+            goto out_error;
+        }
         result = pinterp->read();
         gettimeofday(&t1, NULL);
         if(t1.tv_sec > t0.tv_sec + wait) {
-            if(check_abort()) return NULL;
+            if(check_abort()) {
+                interp_error = 1;
+                goto out_error;
+            }
             t0 = t1;
         }
+        if(yield_interval > 0 && (t1.tv_sec - ty.tv_sec)
+                + (t1.tv_usec - ty.tv_usec) * 1e-6 > yield_interval) {
+            native_before_call();
+            Py_BEGIN_ALLOW_THREADS
+            usleep(1000);
+            Py_END_ALLOW_THREADS
+            ty = t1;
+        }
         if(!RESULT_OK) break;
         error_line_offset = 0;
         result = pinterp->execute();
+        if(next_checkpoint > 0 && result == INTERP_OK && !interp_error
+                && checkpoint_interp->_setup.sequence_number >= next_checkpoint
+                && checkpoint_possible(checkpoint_interp)) {
+            int stop = take_checkpoint(checkpoint_interp, &next_checkpoint);
+            if(stop < 0) {
+                interp_error = 1;
+                goto out_error;
+            }
+            if(stop) break;
+        }
     }
 out_error:
+    Py_CLEAR(stream);
+    native_end(!interp_error);
     if(pinterp)
     {
         auto interp = dynamic_cast<Interp*>(pinterp);
+        if(interp) {
+            subroutine_files.clear();
+            for(offset_map_type::const_iterator i
+                    = interp->_setup.offset_map.begin();
+                    i != interp->_setup.offset_map.end(); ++i)
+                if(i->second.filename && strcmp(i->second.filename, f))
+                    subroutine_files.insert(i->second.filename);
+        }
         if(interp) interp->_setup.use_lazy_close = false;
         pinterp->close();
     }
@@ -823,6 +1840,30 @@ static PyObject *rs274_calc_extents(PyObject *self, PyObject *args) {
     for(int i=0; i<PySequence_Length(args); i++) {
         PyObject *si = PyTuple_GetItem(args, i);
         if(!si) return NULL;
+        if(is_segment_store(si)) {
+            SegmentStoreView v;
+            if(!segment_store_view(si, &v)) return NULL;
+            for(Py_ssize_t k=0; k<v.nsegs; k++) {
+                const double *t = v.tlo(k);
+                const double *ends[2] = { v.start(k), v.end(k) };
+                for(int e=0; e<2; e++) {
+                    const double *p = ends[e];
+                    max_x = std::max(max_x, p[0]);
+                    max_y = std::max(max_y, p[1]);
+                    max_z = std::max(max_z, p[2]);
+                    min_x = std::min(min_x, p[0]);
+                    min_y = std::min(min_y, p[1]);
+                    min_z = std::min(min_z, p[2]);
+                    max_xt = std::max(max_xt, p[0]+t[0]);
+                    max_yt = std::max(max_yt, p[1]+t[1]);
+                    max_zt = std::max(max_zt, p[2]+t[2]);
+                    min_xt = std::min(min_xt, p[0]+t[0]);
+                    min_yt = std::min(min_yt, p[1]+t[1]);
+                    min_zt = std::min(min_zt, p[2]+t[2]);
+                }
+            }
+            continue;
+        }
         int j;
         double xs, ys, zs, xe, ye, ze, xt, yt, zt;
         for(j=0; j<PySequence_Length(si); j++) {
@@ -878,6 +1919,246 @@ static PyObject *rs274_calc_extents(PyObject *self, PyObject *args) {
         min_xt, min_yt, min_zt,  max_xt, max_yt, max_zt);
 }
 
+/* Cycle time estimate
+ *
+ * segment_times((traverse, feed, arcfeed), order, stops, modes,
+ *         max_velocity, max_acceleration, maxvel, cycle_time)
+ *
+ * Follows the path through the three segment stores in the order given by
+ * 'order' (the runs of an rs274.segments.MotionOrder) and works out how
+ * long each segment takes, honouring the per-axis velocity and acceleration
+ * limits the way the trajectory planner does in outline: the velocity at
+ * each corner is what a blend arc within the G64 tolerance allows, a
+ * lookahead pass makes sure every corner can be reached and left again
+ * within the acceleration limit, and each segment is then a trapezoidal
+ * (or triangular) velocity profile.  The machine comes to a stop at
+ * G61/G61.1 corners, where the path is not continuous, and before the
+ * segments whose global index is listed in 'stops'.  'modes' holds
+ * (index, mode, tolerance) triples, as doubles, for the blend mode in
+ * effect from segment 'index' on.
+ *
+ * Units are those of the preview: inches and degrees, per second.  A limit
+ * of 0 means "no limit".  Returns one string of native doubles per store,
+ * the time of each of its segments.
+ *
+ * segment_speeds takes the same arguments and returns the highest velocity
+ * reached on each segment instead, or NaN for segments that do not move.
+ */
+namespace {
+struct TimedSegment {
+    const double *start;
+    int which;
+    int index;
+    double length, vmax, amax;
+    double tolerance;   // G64 tolerance at the end, or -1 to stop there
+    double v0;          // velocity at the start
+};
+}
+
+static double path_length(const double *s, const double *e) {
+    // like the trajectory planner: XYZ if they move, else UVW, else ABC
+    double d[9];
+    for(int i=0; i<9; i++) d[i] = e[i] - s[i];
+    double l = sqrt(d[0]*d[0] + d[1]*d[1] + d[2]*d[2]);
+    if(l > 1e-9) return l;
+    l = sqrt(d[6]*d[6] + d[7]*d[7] + d[8]*d[8]);
+    if(l > 1e-9) return l;
+    l = sqrt(d[3]*d[3] + d[4]*d[4] + d[5]*d[5]);
+    if(l > 1e-9) return l;
+    return 0;
+}
+
+// The path limit that keeps every axis within its own limit
+static double path_limit(const double *s, const double *e, double length,
+        const double limit[9]) {
+    double result = HUGE_VAL;
+    for(int i=0; i<9; i++) {
+        double scale = fabs(e[i] - s[i]) / length;
+        if(limit[i] > 0 && scale > 1e-12)
+            result = std::min(result, limit[i] / scale);
+    }
+    return result;
+}
+
+static double junction_velocity(const TimedSegment &p, const TimedSegment &n) {
+    const double *ps = p.start, *pe = p.start + 9, *ns = n.start, *ne = n.start + 9;
+    double dot = 0, pp = 0, nn = 0;
+    for(int i=0; i<9; i++) {
+        double a = pe[i] - ps[i], b = ne[i] - ns[i];
+        dot += a * b; pp += a * a; nn += b * b;
+    }
+    double v = std::min(p.vmax, n.vmax);
+    double cos_turn = dot / sqrt(pp * nn);
+    if(cos_turn > 1 - 1e-12) return v;
+    if(cos_turn < -1 + 1e-9) return 0;
+    double half = acos(cos_turn) / 2;
+    // The blend arc may use up to half of the shorter segment ...
+    double radius = std::min(p.length, n.length) / 2 / tan(half);
+    // ... and must stay within the G64 tolerance of the corner
+    if(p.tolerance > 0)
+        radius = std::min(radius, p.tolerance * cos(half) / (1 - cos(half)));
+    if(!(radius > 0)) return 0;
+    return std::min(v, sqrt(std::min(p.amax, n.amax) * radius));
+}
+
+static double segment_peak(const TimedSegment &s, double v1) {
+    double vmax = s.vmax, a = s.amax, v0 = s.v0, l = s.length;
+    if(!(vmax > 0) || std::isinf(vmax)) return 0;
+    if(std::isinf(a)) return vmax;
+    double da = (vmax*vmax - v0*v0) / (2*a), dd = (vmax*vmax - v1*v1) / (2*a);
+    if(da + dd <= l) return vmax;
+    return std::min(vmax, sqrt((2*a*l + v0*v0 + v1*v1) / 2));
+}
+
+static double segment_time(const TimedSegment &s, double v1) {
+    double vmax = s.vmax, a = s.amax, v0 = s.v0, l = s.length;
+    if(!(vmax > 0) || std::isinf(vmax)) return 0;
+    if(std::isinf(a)) return l / vmax;
+    double da = (vmax*vmax - v0*v0) / (2*a), dd = (vmax*vmax - v1*v1) / (2*a);
+    if(da + dd <= l)
+        return (vmax - v0) / a + (vmax - v1) / a + (l - da - dd) / vmax;
+    double vp = sqrt((2*a*l + v0*v0 + v1*v1) / 2);
+    return std::max(0., (vp - v0) / a + (vp - v1) / a);
+}
+
+static bool read_buffer(PyObject *o, const void **buf, Py_ssize_t *count,
+        Py_ssize_t itemsize) {
+    Py_ssize_t len;
+    if(PyObject_AsReadBuffer(o, buf, &len) < 0) return false;
+    *count = len / itemsize;
+    return true;
+}
+
+static PyObject *plan_segments(PyObject *args, const char *format,
+        bool peak) {
+    PyObject *stores[3], *order_o, *stops_o, *modes_o;
+    double vlimit[9], alimit[9], maxvel, cycle_time;
+    if(!PyArg_ParseTuple(args, format,
+            &stores[0], &stores[1], &stores[2], &order_o, &stops_o, &modes_o,
+            &vlimit[0], &vlimit[1], &vlimit[2], &vlimit[3], &vlimit[4],
+            &vlimit[5], &vlimit[6], &vlimit[7], &vlimit[8],
+            &alimit[0], &alimit[1], &alimit[2], &alimit[3], &alimit[4],
+            &alimit[5], &alimit[6], &alimit[7], &alimit[8],
+            &maxvel, &cycle_time))
+        return NULL;
+
+    SegmentStoreView views[3];
+    for(int i=0; i<3; i++) {
+        if(!is_segment_store(stores[i])) {
+            PyErr_SetString(PyExc_TypeError, "segment_times and segment_speeds need SegmentStores");
+            return NULL;
+        }
+        if(!segment_store_view(stores[i], &views[i])) return NULL;
+    }
+    const int *order, *stops;
+    const double *modes;
+    Py_ssize_t norder, nstops, nmodes;
+    if(!read_buffer(order_o, (const void **)&order, &norder, 2*sizeof(int))
+            || !read_buffer(stops_o, (const void **)&stops, &nstops, sizeof(int))
+            || !read_buffer(modes_o, (const void **)&modes, &nmodes, 3*sizeof(double)))
+        return NULL;
+
+    std::vector<TimedSegment> segs;
+    std::vector<double> times[3];
+    for(int i=0; i<3; i++)
+        times[i].resize(views[i].nsegs, peak ? NAN : 0.);
+
+    int next[3] = {0, 0, 0};
+    long g = 0;
+    Py_ssize_t sp = 0, mp = 0;
+    int mode = CANON_CONTINUOUS;
+    double tolerance = 0;
+    bool stop = true;
+    for(Py_ssize_t r=0; r<norder; r++) {
+        int which = order[2*r], count = order[2*r+1];
+        if(which < 0 || which > 2) {
+            PyErr_SetString(PyExc_ValueError, "bad motion order");
+            return NULL;
+        }
+        const SegmentStoreView &v = views[which];
+        for(int j=0; j<count && next[which] < v.nsegs; j++, g++) {
+            int idx = next[which]++;
+            while(mp < nmodes && modes[3*mp] <= g) {
+                mode = (int)modes[3*mp+1];
+                tolerance = modes[3*mp+2];
+                mp++;
+            }
+            while(sp < nstops && stops[sp] <= g) { stop = true; sp++; }
+            const double *s = v.start(idx), *e = v.end(idx);
+            double length = path_length(s, e);
+            if(length == 0) continue;
+
+            TimedSegment t;
+            t.start = s;
+            t.which = which;
+            t.index = idx;
+            t.length = length;
+            t.vmax = path_limit(s, e, length, vlimit);
+            if(maxvel > 0) t.vmax = std::min(t.vmax, maxvel);
+            if(which != 0 && v.feedrate[idx] > 0)
+                t.vmax = std::min(t.vmax, v.feedrate[idx]);
+            // a segment takes at least one trajectory cycle
+            if(cycle_time > 0) t.vmax = std::min(t.vmax, length / cycle_time);
+            t.amax = path_limit(s, e, length, alimit);
+            t.tolerance = mode == CANON_CONTINUOUS ? tolerance : -1;
+            t.v0 = 0;
+            if(!stop && !segs.empty()) {
+                TimedSegment &p = segs.back();
+                const double *pe = p.start + 9;
+                bool joined = p.tolerance >= 0;
+                for(int i=0; i<9 && joined; i++)
+                    joined = fabs(pe[i] - s[i]) < 1e-9;
+                if(joined) t.v0 = junction_velocity(p, t);
+            }
+            stop = false;
+            segs.push_back(t);
+        }
+    }
+
+    // Lookahead: every corner must be reachable from the one before and
+    // must allow stopping (or slowing for the next corner) in time
+    Py_ssize_t n = segs.size();
+    for(Py_ssize_t k=n-1; k>=0; k--) {
+        TimedSegment &t = segs[k];
+        double v1 = k+1 < n ? segs[k+1].v0 : 0;
+        if(!std::isinf(t.amax))
+            t.v0 = std::min(t.v0, sqrt(v1*v1 + 2 * t.amax * t.length));
+    }
+    for(Py_ssize_t k=0; k+1<n; k++) {
+        TimedSegment &t = segs[k];
+        if(!std::isinf(t.amax))
+            segs[k+1].v0 = std::min(segs[k+1].v0,
+                    sqrt(t.v0*t.v0 + 2 * t.amax * t.length));
+    }
+    for(Py_ssize_t k=0; k<n; k++) {
+        TimedSegment &t = segs[k];
+        double v1 = k+1 < n ? segs[k+1].v0 : 0;
+        times[t.which][t.index] = peak ? segment_peak(t, v1)
+            : segment_time(t, v1);
+    }
+
+    PyObject *result = PyTuple_New(3);
+    if(!result) return NULL;
+    for(int i=0; i<3; i++) {
+        PyObject *s = PyString_FromStringAndSize(
+                times[i].empty() ? "" : (const char *)&times[i][0],
+                times[i].size() * sizeof(double));
+        if(!s) { Py_DECREF(result); return NULL; }
+        PyTuple_SET_ITEM(result, i, s);
+    }
+    return result;
+}
+
+static PyObject *rs274_segment_times(PyObject *self, PyObject *args) {
+    return plan_segments(args,
+        "(OOO)OOO(ddddddddd)(ddddddddd)dd:segment_times", false);
+}
+
+static PyObject *rs274_segment_speeds(PyObject *self, PyObject *args) {
+    return plan_segments(args,
+        "(OOO)OOO(ddddddddd)(ddddddddd)dd:segment_speeds", true);
+}
+
 #if PY_VERSION_HEX < 0x02050000
 #define PyObject_GetAttrString(o,s) \
     PyObject_GetAttrString((o),const_cast<char*>((s)))
@@ -930,41 +2211,38 @@ static void rotate(double &x, double &y, double c, double s) {
     x = tx;
 }
 
-static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
-    PyObject *canon;
-    double x1, y1, cx, cy, z1, a, b, c, u, v, w;
-    double o[9], n[9], g5xoffset[9], g92offset[9];
-    int rot, plane;
-    int X, Y, Z;
-    double rotation_cos, rotation_sin;
-    int max_segments = 128;
+// upper bound on the segments of one arc when they are chosen by tolerance
+#define MAX_ARC_STEPS (10000)
+
+// Number of segments for an arc through 'theta' radians.  With a positive
+// chord tolerance, use as few segments as keep the chords within it of the
+// true arc; otherwise divide a half circle into 'max_segments' parts.
+static int arc_steps(double theta, double radius, int max_segments,
+        double tolerance) {
+    theta = fabs(theta);
+    if(tolerance <= 0)
+        return std::max(3, int(max_segments * theta / M_PI));
+    // at least one segment per 120 degrees, so a full circle stays a circle
+    int min_steps = std::max(1, int(ceil(theta / (2*M_PI/3))));
+    if(radius <= tolerance) return min_steps;
+    double step = 2 * acos(1 - tolerance / radius);
+    double steps = ceil(theta / step);
+    if(steps > MAX_ARC_STEPS) return MAX_ARC_STEPS;
+    return std::max(min_steps, int(steps));
+}
 
-    if(!PyArg_ParseTuple(args, "Oddddiddddddd|i:arcs_to_segments",
-        &canon, &x1, &y1, &cx, &cy, &rot, &z1, &a, &b, &c, &u, &v, &w, &max_segments)) return NULL;
-    if(!get_attr(canon, "lo", "ddddddddd:arcs_to_segments lo", &o[0], &o[1], &o[2],
-                    &o[3], &o[4], &o[5], &o[6], &o[7], &o[8]))
-        return NULL;
-    if(!get_attr(canon, "plane", &plane)) return NULL;
-    if(!get_attr(canon, "rotation_cos", &rotation_cos)) return NULL;
-    if(!get_attr(canon, "rotation_sin", &rotation_sin)) return NULL;
-    if(!get_attr(canon, "g5x_offset_x", &g5xoffset[0])) return NULL;
-    if(!get_attr(canon, "g5x_offset_y", &g5xoffset[1])) return NULL;
-    if(!get_attr(canon, "g5x_offset_z", &g5xoffset[2])) return NULL;
-    if(!get_attr(canon, "g5x_offset_a", &g5xoffset[3])) return NULL;
-    if(!get_attr(canon, "g5x_offset_b", &g5xoffset[4])) return NULL;
-    if(!get_attr(canon, "g5x_offset_c", &g5xoffset[5])) return NULL;
-    if(!get_attr(canon, "g5x_offset_u", &g5xoffset[6])) return NULL;
-    if(!get_attr(canon, "g5x_offset_v", &g5xoffset[7])) return NULL;
-    if(!get_attr(canon, "g5x_offset_w", &g5xoffset[8])) return NULL;
-    if(!get_attr(canon, "g92_offset_x", &g92offset[0])) return NULL;
-    if(!get_attr(canon, "g92_offset_y", &g92offset[1])) return NULL;
-    if(!get_attr(canon, "g92_offset_z", &g92offset[2])) return NULL;
-    if(!get_attr(canon, "g92_offset_a", &g92offset[3])) return NULL;
-    if(!get_attr(canon, "g92_offset_b", &g92offset[4])) return NULL;
-    if(!get_attr(canon, "g92_offset_c", &g92offset[5])) return NULL;
-    if(!get_attr(canon, "g92_offset_u", &g92offset[6])) return NULL;
-    if(!get_attr(canon, "g92_offset_v", &g92offset[7])) return NULL;
-    if(!get_attr(canon, "g92_offset_w", &g92offset[8])) return NULL;
+// Break an arc into straight segments in the canon's (translated and rotated)
+// coordinate system.  'o' is the translated start point; emit(p) is called
+// for each segment end point, the last one being the arc end point itself.
+template<class F>
+static void arc_segments(const double lo[9],
+        double x1, double y1, double cx, double cy, int rot, double z1,
+        double a, double b, double c, double u, double v, double w,
+        int plane, const double g5xoffset[9], const double g92offset[9],
+        double rotation_cos, double rotation_sin, int max_segments,
+        double tolerance, F emit) {
+    double o[9], n[9];
+    int X, Y, Z;
 
     if(plane == 1) {
         X=0; Y=1; Z=2;
@@ -982,7 +2260,7 @@ static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
     n[6] = u;
     n[7] = v;
     n[8] = w;
-    for(int ax=0; ax<9; ax++) o[ax] -= g5xoffset[ax];
+    for(int ax=0; ax<9; ax++) o[ax] = lo[ax] - g5xoffset[ax];
     unrotate(o[0], o[1], rotation_cos, rotation_sin);
     for(int ax=0; ax<9; ax++) o[ax] -= g92offset[ax];
 
@@ -999,9 +2277,9 @@ static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
     if(rot < -1) theta2 += 2*M_PI*(rot+1);
     if(rot > 1) theta2 += 2*M_PI*(rot-1);
 
-    int steps = std::max(3, int(max_segments * fabs(theta1 - theta2) / M_PI));
+    int steps = arc_steps(theta2 - theta1, hypot(o[X]-cx, o[Y]-cy),
+            max_segments, tolerance);
     double rsteps = 1. / steps;
-    PyObject *segs = PyList_New(steps);
 
     double dtheta = theta2 - theta1;
     double d[9] = {0, 0, 0, n[3]-o[3], n[4]-o[4], n[5]-o[5], n[6]-o[6], n[7]-o[7], n[8]-o[8]};
@@ -1024,23 +2302,117 @@ static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
         for(int ax=0; ax<9; ax++) p[ax] += g92offset[ax];
         rotate(p[0], p[1], rotation_cos, rotation_sin);
         for(int ax=0; ax<9; ax++) p[ax] += g5xoffset[ax];
-        PyList_SET_ITEM(segs, i,
-            Py_BuildValue("ddddddddd", p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8]));
+        emit(p);
     }
     for(int ax=0; ax<9; ax++) n[ax] += g92offset[ax];
     rotate(n[0], n[1], rotation_cos, rotation_sin);
     for(int ax=0; ax<9; ax++) n[ax] += g5xoffset[ax];
-    PyList_SET_ITEM(segs, steps-1,
-        Py_BuildValue("ddddddddd", n[0], n[1], n[2], n[3], n[4], n[5], n[6], n[7], n[8]));
+    emit(n);
+}
+
+static void native_arc_feed(double x1, double y1, double cx, double cy,
+        int rot, double z1, double a, double b, double c,
+        double u, double v, double w) {
+    if(!native_prepare_motion()) return;
+    native.first_move = false;
+    NativeColumn &col = native.columns[NATIVE_ARCFEED];
+    double *lo = native.lo;
+    arc_segments(native.lo, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w,
+        native.plane, native.g5x, native.g92,
+        native.rotation_cos, native.rotation_sin, native.arcdivision,
+        native.arc_tolerance, [&](const double *p) {
+            col.add(last_sequence_number, lo, p, native.feedrate);
+            lo = col.last;
+        });
+    memcpy(native.lo, col.last, sizeof(native.lo));
+}
+
+static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
+    PyObject *canon;
+    double x1, y1, cx, cy, z1, a, b, c, u, v, w;
+    double o[9], g5xoffset[9], g92offset[9];
+    int rot, plane;
+    double rotation_cos, rotation_sin;
+    int max_segments = 128;
+    double tolerance = 0;
+
+    if(!PyArg_ParseTuple(args, "Oddddiddddddd|id:arcs_to_segments",
+        &canon, &x1, &y1, &cx, &cy, &rot, &z1, &a, &b, &c, &u, &v, &w,
+        &max_segments, &tolerance)) return NULL;
+    if(!get_attr(canon, "lo", "ddddddddd:arcs_to_segments lo", &o[0], &o[1], &o[2],
+                    &o[3], &o[4], &o[5], &o[6], &o[7], &o[8]))
+        return NULL;
+    if(!get_attr(canon, "plane", &plane)) return NULL;
+    if(!get_attr(canon, "rotation_cos", &rotation_cos)) return NULL;
+    if(!get_attr(canon, "rotation_sin", &rotation_sin)) return NULL;
+    if(!get_attr(canon, "g5x_offset_x", &g5xoffset[0])) return NULL;
+    if(!get_attr(canon, "g5x_offset_y", &g5xoffset[1])) return NULL;
+    if(!get_attr(canon, "g5x_offset_z", &g5xoffset[2])) return NULL;
+    if(!get_attr(canon, "g5x_offset_a", &g5xoffset[3])) return NULL;
+    if(!get_attr(canon, "g5x_offset_b", &g5xoffset[4])) return NULL;
+    if(!get_attr(canon, "g5x_offset_c", &g5xoffset[5])) return NULL;
+    if(!get_attr(canon, "g5x_offset_u", &g5xoffset[6])) return NULL;
+    if(!get_attr(canon, "g5x_offset_v", &g5xoffset[7])) return NULL;
+    if(!get_attr(canon, "g5x_offset_w", &g5xoffset[8])) return NULL;
+    if(!get_attr(canon, "g92_offset_x", &g92offset[0])) return NULL;
+    if(!get_attr(canon, "g92_offset_y", &g92offset[1])) return NULL;
+    if(!get_attr(canon, "g92_offset_z", &g92offset[2])) return NULL;
+    if(!get_attr(canon, "g92_offset_a", &g92offset[3])) return NULL;
+    if(!get_attr(canon, "g92_offset_b", &g92offset[4])) return NULL;
+    if(!get_attr(canon, "g92_offset_c", &g92offset[5])) return NULL;
+    if(!get_attr(canon, "g92_offset_u", &g92offset[6])) return NULL;
+    if(!get_attr(canon, "g92_offset_v", &g92offset[7])) return NULL;
+    if(!get_attr(canon, "g92_offset_w", &g92offset[8])) return NULL;
+
+    PyObject *segs = PyList_New(0);
+    if(!segs) return NULL;
+    bool ok = true;
+    arc_segments(o, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w,
+        plane, g5xoffset, g92offset, rotation_cos, rotation_sin, max_segments,
+        tolerance, [&](const double *p) {
+            if(!ok) return;
+            PyObject *t = Py_BuildValue("ddddddddd",
+                p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8]);
+            if(!t || PyList_Append(segs, t) < 0) ok = false;
+            Py_XDECREF(t);
+        });
+    if(!ok) { Py_DECREF(segs); return NULL; }
     return segs;
 }
 
+static PyObject *rs274_subroutine_files(PyObject *self, PyObject *args) {
+    PyObject *result = PyTuple_New(subroutine_files.size());
+    if(!result) return NULL;
+    int i = 0;
+    for(std::set<std::string>::const_iterator it = subroutine_files.begin();
+            it != subroutine_files.end(); ++it, ++i) {
+        PyObject *s = PyString_FromString(it->c_str());
+        if(!s) { Py_DECREF(result); return NULL; }
+        PyTuple_SET_ITEM(result, i, s);
+    }
+    return result;
+}
+
 static PyMethodDef gcode_methods[] = {
     {"parse", (PyCFunction)parse_file, METH_VARARGS, "Parse a G-Code file"},
     {"strerror", (PyCFunction)rs274_strerror, METH_VARARGS,
         "Convert a numeric error to a string"},
     {"calc_extents", (PyCFunction)rs274_calc_extents, METH_VARARGS,
         "Calculate information about extents of gcode"},
+    {"segment_times", (PyCFunction)rs274_segment_times, METH_VARARGS,
+        "Estimate the time taken by each preview segment"},
+    {"segment_speeds", (PyCFunction)rs274_segment_speeds, METH_VARARGS,
+        "Estimate the highest velocity reached on each preview segment"},
+    {"checkpoint_equal", (PyCFunction)rs274_checkpoint_equal, METH_VARARGS,
+        "Compare two preview checkpoints"},
+    {"checkpoint_shift", (PyCFunction)rs274_checkpoint_shift, METH_VARARGS,
+        "Move a preview checkpoint by a number of bytes and lines"},
+    {"checkpoint_pack", (PyCFunction)rs274_checkpoint_pack, METH_VARARGS,
+        "Pack a preview checkpoint into a string"},
+    {"checkpoint_unpack", (PyCFunction)rs274_checkpoint_unpack, METH_VARARGS,
+        "Make a preview checkpoint from a string made by checkpoint_pack"},
+    {"subroutine_files", (PyCFunction)rs274_subroutine_files, METH_NOARGS,
+        "Files the last parse read subroutines from"},
     {"arc_to_segments", (PyCFunction)rs274_arc_to_segments, METH_VARARGS,
         "Convert an arc to straight segments"},
     {NULL}
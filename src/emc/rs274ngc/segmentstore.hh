@@ -0,0 +1,87 @@
+//    This is a component of AXIS, a front-end for LinuxCNC
+//
+//    This program is free software; you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation; either version 2 of the License, or
+//    (at your option) any later version.
+//
+//    This program is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License
+//    along with this program; if not, write to the Free Software
+//    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#ifndef SEGMENTSTORE_HH
+#define SEGMENTSTORE_HH
+
+#include <algorithm>
+
+// Read-only view of an rs274.segments.SegmentStore.  The pointers refer to
+// the store's own array buffers, so a view is only valid while the store is
+// alive and not being appended to.
+//
+// A store may be filled by another thread (see glcanon.PreviewLoader).  The
+// store appends seg_start last, so the segments counted by the shortest
+// per-segment column are always complete.
+
+struct SegmentStoreView {
+    const double *vertices;
+    Py_ssize_t nvertices;
+    const int *seg_start;
+    const int *lineno;
+    const double *feedrate;
+    const int *tool;
+    Py_ssize_t nsegs;
+    const double *tlo_table;
+    Py_ssize_t ntlo;
+
+    const double *start(Py_ssize_t i) const { return vertices + 9 * seg_start[i]; }
+    const double *end(Py_ssize_t i) const { return vertices + 9 * seg_start[i] + 9; }
+    const double *tlo(Py_ssize_t i) const { return tlo_table + 3 * tool[i]; }
+};
+
+static inline bool is_segment_store(PyObject *o) {
+    return !PyList_Check(o) && !PyTuple_Check(o)
+        && PyObject_HasAttrString(o, "seg_start");
+}
+
+static inline bool segment_store_buffer(PyObject *o, const char *name,
+        const void **buf, Py_ssize_t *count, Py_ssize_t itemsize) {
+    PyObject *attr = PyObject_GetAttrString(o, name);
+    if(!attr) return false;
+    Py_ssize_t len;
+    int r = PyObject_AsReadBuffer(attr, buf, &len);
+    Py_DECREF(attr);
+    if(r < 0) return false;
+    *count = len / itemsize;
+    return true;
+}
+
+static inline bool segment_store_view(PyObject *o, SegmentStoreView *v) {
+    Py_ssize_t nlineno, nfeed, ntool, nstart;
+    if(!segment_store_buffer(o, "vertices", (const void **)&v->vertices,
+                &v->nvertices, 9 * sizeof(double))) return false;
+    if(!segment_store_buffer(o, "seg_start", (const void **)&v->seg_start,
+                &nstart, sizeof(int))) return false;
+    if(!segment_store_buffer(o, "lineno", (const void **)&v->lineno,
+                &nlineno, sizeof(int))) return false;
+    if(!segment_store_buffer(o, "feedrate", (const void **)&v->feedrate,
+                &nfeed, sizeof(double))) return false;
+    if(!segment_store_buffer(o, "tool", (const void **)&v->tool,
+                &ntool, sizeof(int))) return false;
+    if(!segment_store_buffer(o, "tlo_table", (const void **)&v->tlo_table,
+                &v->ntlo, 3 * sizeof(double))) return false;
+    v->nsegs = std::min(std::min(nstart, nlineno), std::min(nfeed, ntool));
+    for(Py_ssize_t i = 0; i < v->nsegs; i++) {
+        if(v->seg_start[i] < 0 || v->seg_start[i] + 1 >= v->nvertices
+                || v->tool[i] < 0 || v->tool[i] >= v->ntlo) {
+            PyErr_SetString(PyExc_ValueError, "segment store index out of range");
+            return false;
+        }
+    }
+    return true;
+}
+
+#endif
@@ -473,6 +473,7 @@ BOOST_PYTHON_MODULE(emctask) {
     class_ <EMC_TOOL_STAT, noncopyable>("EMC_TOOL_STAT",no_init)
 	.def_readwrite("pocketPrepped", &EMC_TOOL_STAT::pocketPrepped )
 	.def_readwrite("toolInSpindle", &EMC_TOOL_STAT::toolInSpindle )
+	.def_readwrite("toolTableSerial", &EMC_TOOL_STAT::toolTableSerial )
 	.add_property( "toolTable",
 		       bp::make_function( tool_w(&tool_wrapper),
 					  bp::with_custodian_and_ward_postcall< 0, 1 >()))
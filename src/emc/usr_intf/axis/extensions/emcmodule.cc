@@ -22,6 +22,11 @@
 #include <pthread.h>
 #include <structmember.h>
 #include <inttypes.h>
+#include <errno.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
 #include "config.h"
 #include "rcs.hh"
 #include "emc.hh"
@@ -32,6 +37,7 @@
 #include "timer.hh"
 #include "nml_oi.hh"
 #include "rcs_print.hh"
+#include "segmentstore.hh"
 
 #include <cmath>
 
@@ -84,6 +90,8 @@ struct pyStatChannel {
     PyObject_HEAD
     RCS_STAT_CHANNEL *c;
     EMC_STAT status;
+    // stat.tool_table, kept until the tool table changes
+    PyObject *tool_table;
 };
 
 struct pyCommandChannel {
@@ -272,6 +280,7 @@ static int Stat_init(pyStatChannel *self, PyObject *a, PyObject *k) {
 
 static void Stat_dealloc(PyObject *self) {
     delete ((pyStatChannel*)self)->c;
+    Py_XDECREF(((pyStatChannel*)self)->tool_table);
     PyObject_Del(self);
 }
 
@@ -283,18 +292,38 @@ static bool check_stat(RCS_STAT_CHANNEL *emcStatusBuffer) {
     return true;
 }
 
+// Whether a tool table read from 'a' is still the one in 'b'.  The io
+// controller counts changes to the table in toolTableSerial; if it leaves
+// that at 0, the tables themselves are compared.
+static bool same_tool_table(const EMC_TOOL_STAT &a, const EMC_TOOL_STAT &b) {
+    if(a.toolTableSerial != b.toolTableSerial) return false;
+    return a.toolTableSerial
+        || !memcmp(a.toolTable, b.toolTable, sizeof(a.toolTable));
+}
+
 static PyObject *poll(pyStatChannel *s, PyObject *o) {
     if(!check_stat(s->c)) return NULL;
     if(s->c->peek() == EMC_STAT_TYPE) {
         EMC_STAT *emcStatus = static_cast<EMC_STAT*>(s->c->get_address());
+        if(s->tool_table && !same_tool_table(s->status.io.tool, emcStatus->io.tool))
+            Py_CLEAR(s->tool_table);
         memcpy(&s->status, emcStatus, sizeof(EMC_STAT));
     }
     Py_INCREF(Py_None);
     return Py_None;
 }
 
+static PyObject *Stat_pocket(pyStatChannel *s, PyObject *o);
+static PyObject *Stat_tool(pyStatChannel *s, PyObject *o);
+
 static PyMethodDef Stat_methods[] = {
     {"poll", (PyCFunction)poll, METH_NOARGS, "Update current machine state"},
+    {"pocket", (PyCFunction)Stat_pocket, METH_VARARGS,
+        "pocket(n) -> the tool_result for pocket n of the tool table; pocket 0\n"
+        "is the spindle"},
+    {"tool", (PyCFunction)Stat_tool, METH_VARARGS,
+        "tool(toolno) -> the tool_result for tool number toolno, or None if it\n"
+        "is not in the tool table"},
     {NULL}
 };
 
@@ -379,6 +408,9 @@ static PyMemberDef Stat_members[] = {
     {(char*)"tool_in_spindle", T_INT, O(io.tool.toolInSpindle), READONLY,
         (char*)"The tool number of the currently loaded tool, or 0 if no tool is loaded."
     },
+    {(char*)"tool_table_serial", T_INT, O(io.tool.toolTableSerial), READONLY,
+        (char*)"A number that changes whenever the tool table does."
+    },
 
 // EMC_COOLANT_STAT io.cooland
     {(char*)"mist", T_INT, O(io.coolant.mist), READONLY},
@@ -657,31 +689,77 @@ static PyStructSequence_Desc tool_result_desc = {
 
 static PyTypeObject ToolResultType;
 
+static PyObject *tool_result(const struct CANON_TOOL_TABLE &t) {
+    PyObject *tool = PyStructSequence_New(&ToolResultType);
+    if(!tool) return NULL;
+    PyStructSequence_SET_ITEM(tool, 0, PyInt_FromLong(t.toolno));
+    PyStructSequence_SET_ITEM(tool, 1, PyFloat_FromDouble(t.offset.tran.x));
+    PyStructSequence_SET_ITEM(tool, 2, PyFloat_FromDouble(t.offset.tran.y));
+    PyStructSequence_SET_ITEM(tool, 3, PyFloat_FromDouble(t.offset.tran.z));
+    PyStructSequence_SET_ITEM(tool, 4, PyFloat_FromDouble(t.offset.a));
+    PyStructSequence_SET_ITEM(tool, 5, PyFloat_FromDouble(t.offset.b));
+    PyStructSequence_SET_ITEM(tool, 6, PyFloat_FromDouble(t.offset.c));
+    PyStructSequence_SET_ITEM(tool, 7, PyFloat_FromDouble(t.offset.u));
+    PyStructSequence_SET_ITEM(tool, 8, PyFloat_FromDouble(t.offset.v));
+    PyStructSequence_SET_ITEM(tool, 9, PyFloat_FromDouble(t.offset.w));
+    PyStructSequence_SET_ITEM(tool, 10, PyFloat_FromDouble(t.diameter));
+    PyStructSequence_SET_ITEM(tool, 11, PyFloat_FromDouble(t.frontangle));
+    PyStructSequence_SET_ITEM(tool, 12, PyFloat_FromDouble(t.backangle));
+    PyStructSequence_SET_ITEM(tool, 13, PyInt_FromLong(t.orientation));
+    return tool;
+}
+
+// The table is the same from one poll to the next nearly all the time, so
+// it is made once and handed out again until it changes
 static PyObject *Stat_tool_table(pyStatChannel *s) {
-    PyObject *res = PyTuple_New(CANON_POCKETS_MAX);
-    int j=0;
-    for(int i=0; i<CANON_POCKETS_MAX; i++) {
-        struct CANON_TOOL_TABLE &t = s->status.io.tool.toolTable[i];
-        PyObject *tool = PyStructSequence_New(&ToolResultType);
-        PyStructSequence_SET_ITEM(tool, 0, PyInt_FromLong(t.toolno));
-        PyStructSequence_SET_ITEM(tool, 1, PyFloat_FromDouble(t.offset.tran.x));
-        PyStructSequence_SET_ITEM(tool, 2, PyFloat_FromDouble(t.offset.tran.y));
-        PyStructSequence_SET_ITEM(tool, 3, PyFloat_FromDouble(t.offset.tran.z));
-        PyStructSequence_SET_ITEM(tool, 4, PyFloat_FromDouble(t.offset.a));
-        PyStructSequence_SET_ITEM(tool, 5, PyFloat_FromDouble(t.offset.b));
-        PyStructSequence_SET_ITEM(tool, 6, PyFloat_FromDouble(t.offset.c));
-        PyStructSequence_SET_ITEM(tool, 7, PyFloat_FromDouble(t.offset.u));
-        PyStructSequence_SET_ITEM(tool, 8, PyFloat_FromDouble(t.offset.v));
-        PyStructSequence_SET_ITEM(tool, 9, PyFloat_FromDouble(t.offset.w));
-        PyStructSequence_SET_ITEM(tool, 10, PyFloat_FromDouble(t.diameter));
-        PyStructSequence_SET_ITEM(tool, 11, PyFloat_FromDouble(t.frontangle));
-        PyStructSequence_SET_ITEM(tool, 12, PyFloat_FromDouble(t.backangle));
-        PyStructSequence_SET_ITEM(tool, 13, PyInt_FromLong(t.orientation));
-        PyTuple_SetItem(res, j, tool);
-        j++;
-    }
-    _PyTuple_Resize(&res, j);
-    return res;
+    if(!s->tool_table) {
+        PyObject *res = PyTuple_New(CANON_POCKETS_MAX);
+        if(!res) return NULL;
+        for(int i=0; i<CANON_POCKETS_MAX; i++) {
+            PyObject *tool = tool_result(s->status.io.tool.toolTable[i]);
+            if(!tool) { Py_DECREF(res); return NULL; }
+            PyTuple_SET_ITEM(res, i, tool);
+        }
+        s->tool_table = res;
+    }
+    Py_INCREF(s->tool_table);
+    return s->tool_table;
+}
+
+static PyObject *pocket_result(pyStatChannel *s, int pocket) {
+    if(s->tool_table) {
+        PyObject *tool = PyTuple_GET_ITEM(s->tool_table, pocket);
+        Py_INCREF(tool);
+        return tool;
+    }
+    return tool_result(s->status.io.tool.toolTable[pocket]);
+}
+
+static PyObject *Stat_pocket(pyStatChannel *s, PyObject *o) {
+    int pocket;
+    if(!PyArg_ParseTuple(o, "i:pocket", &pocket)) return NULL;
+    if(pocket < 0 || pocket >= CANON_POCKETS_MAX) {
+        PyErr_Format(PyExc_IndexError, "pocket %d out of range", pocket);
+        return NULL;
+    }
+    return pocket_result(s, pocket);
+}
+
+static PyObject *Stat_tool(pyStatChannel *s, PyObject *o) {
+    int toolno;
+    if(!PyArg_ParseTuple(o, "i:tool", &toolno)) return NULL;
+    if(toolno > 0) {
+        // on a random toolchanger the tool in the spindle is only in
+        // pocket 0; otherwise it is also in its own pocket
+        for(int i=1; i<CANON_POCKETS_MAX; i++) {
+            if(s->status.io.tool.toolTable[i].toolno == toolno)
+                return pocket_result(s, i);
+        }
+        if(s->status.io.tool.toolTable[0].toolno == toolno)
+            return pocket_result(s, 0);
+    }
+    Py_INCREF(Py_None);
+    return Py_None;
 }
 
 static PyObject *Stat_axes(pyStatChannel *s) {
@@ -1553,6 +1631,9 @@ static PyTypeObject Error_Type = {
 };
 
 #include <GL/gl.h>
+#include <GL/glx.h>
+#include <vector>
+#include <stddef.h>
 
 static void rotate_z(double pt[3], double a) {
     double theta = a * M_PI / 180;
@@ -1622,7 +1703,10 @@ static void glvertex9(const double pt[9], const char *geometry) {
 #define max(a,b) ((a) < (b) ? (b) : (a))
 #define max3(a,b,c) (max((a),max((b),(c))))
 
-static void line9(const double p1[9], const double p2[9], const char *geometry) {
+// Call emit for each point after p1 on the line from p1 to p2, subdividing
+// moves of the rotary axes so that they are drawn as curves
+template<class T>
+static void line9_points(const double p1[9], const double p2[9], T emit) {
     if(p1[3] != p2[3] || p1[4] != p2[4] || p1[5] != p2[5]) {
         double dc = max3(
             fabs(p2[3] - p1[3]),
@@ -1636,13 +1720,18 @@ static void line9(const double p1[9], const double p2[9], const char *geometry)
             double v = 1.0 - t;
             double pt[9];
             for(int j=0; j<9; j++) { pt[j] = t * p2[j] + v * p1[j]; }
-            glvertex9(pt, geometry);
+            emit(pt);
         }
     } else {
-        glvertex9(p2, geometry);
+        emit(p2);
     }
 }
 
+static void line9(const double p1[9], const double p2[9], const char *geometry) {
+    line9_points(p1, p2,
+        [geometry](const double *pt) { glvertex9(pt, geometry); });
+}
+
 static void line9b(const double p1[9], const double p2[9], const char *geometry) {
     glvertex9(p1, geometry);
     if(p1[3] != p2[3] || p1[4] != p2[4] || p1[5] != p2[5]) {
@@ -1700,7 +1789,35 @@ static PyObject *pyvertex9(PyObject *s, PyObject *o) {
     return Py_BuildValue("(ddd)", &pt[0], &pt[1], &pt[2]);
 }
 
+static void draw_store_lines(const SegmentStoreView &v, const char *geometry,
+        int for_selection) {
+    int first = 1;
+    int nl = -1;
+    const double *pl = NULL;
+
+    for(Py_ssize_t i=0; i<v.nsegs; i++) {
+        const double *p1 = v.start(i), *p2 = v.end(i);
+        int n = v.lineno[i];
+        if(first || (p1 != pl && memcmp(p1, pl, 9*sizeof(double)))
+                || (for_selection && n != nl)) {
+            if(!first) glEnd();
+            if(for_selection && n != nl) {
+                glLoadName(n);
+                nl = n;
+            }
+            glBegin(GL_LINE_STRIP);
+            glvertex9(p1, geometry);
+            first = 0;
+        }
+        line9(p1, p2, geometry);
+        pl = p2;
+    }
+
+    if(!first) glEnd();
+}
+
 static PyObject *pydraw_lines(PyObject *s, PyObject *o) {
+    PyObject *lines;
     PyListObject *li;
     int for_selection = 0;
     int i;
@@ -1709,9 +1826,24 @@ static PyObject *pydraw_lines(PyObject *s, PyObject *o) {
     double p1[9], p2[9], pl[9];
     char *geometry;
 
-    if(!PyArg_ParseTuple(o, "sO!|i:draw_lines",
-			    &geometry, &PyList_Type, &li, &for_selection))
+    if(!PyArg_ParseTuple(o, "sO|i:draw_lines",
+			    &geometry, &lines, &for_selection))
+        return NULL;
+
+    if(is_segment_store(lines)) {
+        SegmentStoreView v;
+        if(!segment_store_view(lines, &v)) return NULL;
+        draw_store_lines(v, geometry, for_selection);
+        Py_RETURN_NONE;
+    }
+
+    if(!PyList_Check(lines)) {
+        PyErr_Format(PyExc_TypeError,
+            "draw_lines: expected list or segment store, got %s",
+            lines->ob_type->tp_name);
         return NULL;
+    }
+    li = (PyListObject*)lines;
 
     for(i=0; i<PyList_GET_SIZE(li); i++) {
         PyObject *it = PyList_GET_ITEM(li, i);
@@ -1748,6 +1880,43 @@ static PyObject *pydraw_lines(PyObject *s, PyObject *o) {
     return Py_None;
 }
 
+// Call emit for the 8 vertices (4 lines) of the cross marking a dwell
+template<class T>
+static void dwell_cross(double x, double y, double z, int axis, double delta,
+        T emit) {
+    if (axis == 0) {
+        emit(x-delta,y-delta,z);
+        emit(x+delta,y+delta,z);
+        emit(x-delta,y+delta,z);
+        emit(x+delta,y-delta,z);
+
+        emit(x+delta,y+delta,z);
+        emit(x-delta,y-delta,z);
+        emit(x+delta,y-delta,z);
+        emit(x-delta,y+delta,z);
+    } else if (axis == 1) {
+        emit(x-delta,y,z-delta);
+        emit(x+delta,y,z+delta);
+        emit(x-delta,y,z+delta);
+        emit(x+delta,y,z-delta);
+
+        emit(x+delta,y,z+delta);
+        emit(x-delta,y,z-delta);
+        emit(x+delta,y,z-delta);
+        emit(x-delta,y,z+delta);
+    } else {
+        emit(x,y-delta,z-delta);
+        emit(x,y+delta,z+delta);
+        emit(x,y+delta,z-delta);
+        emit(x,y-delta,z+delta);
+
+        emit(x,y+delta,z+delta);
+        emit(x,y-delta,z-delta);
+        emit(x,y-delta,z+delta);
+        emit(x,y+delta,z-delta);
+    }
+}
+
 static PyObject *pydraw_dwells(PyObject *s, PyObject *o) {
     PyListObject *li;
     int for_selection = 0, is_lathe = 0, i, n;
@@ -1777,37 +1946,8 @@ static PyObject *pydraw_dwells(PyObject *s, PyObject *o) {
         if (is_lathe == 1)
             axis = 1;
 
-        if (axis == 0) {
-            glVertex3f(x-delta,y-delta,z);
-            glVertex3f(x+delta,y+delta,z);
-            glVertex3f(x-delta,y+delta,z);
-            glVertex3f(x+delta,y-delta,z);
-
-            glVertex3f(x+delta,y+delta,z);
-            glVertex3f(x-delta,y-delta,z);
-            glVertex3f(x+delta,y-delta,z);
-            glVertex3f(x-delta,y+delta,z);
-        } else if (axis == 1) {
-            glVertex3f(x-delta,y,z-delta);
-            glVertex3f(x+delta,y,z+delta);
-            glVertex3f(x-delta,y,z+delta);
-            glVertex3f(x+delta,y,z-delta);
-
-            glVertex3f(x+delta,y,z+delta);
-            glVertex3f(x-delta,y,z-delta);
-            glVertex3f(x+delta,y,z-delta);
-            glVertex3f(x-delta,y,z+delta);
-        } else {
-            glVertex3f(x,y-delta,z-delta);
-            glVertex3f(x,y+delta,z+delta);
-            glVertex3f(x,y+delta,z-delta);
-            glVertex3f(x,y-delta,z+delta);
-
-            glVertex3f(x,y+delta,z+delta);
-            glVertex3f(x,y-delta,z-delta);
-            glVertex3f(x,y-delta,z+delta);
-            glVertex3f(x,y+delta,z-delta);
-        }
+        dwell_cross(x, y, z, axis, delta,
+            [](double vx, double vy, double vz) { glVertex3f(vx, vy, vz); });
         if (for_selection == 1)
             glEnd();
     }
@@ -1837,32 +1977,72 @@ struct logger_point {
 };
 
 #define NUMCOLORS (6)
-#define MAX_POINTS (10000)
+// default number of points kept by the live plot
+#define MAX_POINTS (100000)
+// samples merged into the newest line of the plot that are checked against
+// the tolerance when it is extended again
+#define MAX_PENDING (64)
+// how far the tolerance may be coarsened when the plot is full; past this
+// the oldest points are dropped instead, so the plot never strays more
+// than this many times the tolerance from the path of the tool
+#define MAX_COARSEN (4)
+
+struct pending_point {
+    float x, y, z;
+    float rx, ry, rz;
+};
+
+/* The live plot is a ring of at most mpts points; the oldest is at head
+ * and npts are in use.  A new position extends the newest line of the plot
+ * instead of adding a point while every position merged into that line is
+ * within the tolerance of it, so straight lines and gentle arcs cost a
+ * point or two however long they take to run.  When the ring is full the
+ * whole plot is decimated again at twice the tolerance, up to MAX_COARSEN
+ * times the tolerance given; when that does not make enough room the
+ * oldest points are dropped. */
 typedef struct {
     PyObject_HEAD
     int npts, mpts, lpts;
+    int head;
     struct logger_point *p;
     struct color colors[NUMCOLORS];
-    bool exit, clear, changed;
+    bool exit, clear;
     char *geometry;
     int is_xyuv;
     double foam_z, foam_w;
+    double tolerance, coarsen;
+    int npending;
+    struct pending_point pending[MAX_PENDING];
     pyStatChannel *st;
 } pyPositionLogger;
 
-static const double epsilon = 1e-4; // 1-cos(1 deg) ~= 1e-4
 static const double tiny = 1e-10;
 
-static inline bool colinear(float xa, float ya, float za, float xb, float yb, float zb, float xc, float yc, float zc) {
-    double dx1 = xa-xb, dx2 = xb-xc;
-    double dy1 = ya-yb, dy2 = yb-yc;
-    double dz1 = za-zb, dz2 = zb-zc;
-    double dp = sqrt(dx1*dx1 + dy1*dy1 + dz1*dz1);
-    double dq = sqrt(dx2*dx2 + dy2*dy2 + dz2*dz2);
-    if( fabs(dp) < tiny || fabs(dq) < tiny ) return true;
-    double dot = (dx1*dx2 + dy1*dy2 + dz1*dz2) / dp / dq;
-    if( fabs(1-dot) < epsilon) return true;
-    return false;
+static inline struct logger_point &logger_at(pyPositionLogger *s, int i) {
+    return s->p[(s->head + i) % s->mpts];
+}
+
+// squared distance from p to the segment from a to b
+static double segment_dist2(double ax, double ay, double az,
+        double bx, double by, double bz, double px, double py, double pz) {
+    double dx = bx-ax, dy = by-ay, dz = bz-az;
+    double qx = px-ax, qy = py-ay, qz = pz-az;
+    double l2 = dx*dx + dy*dy + dz*dz;
+    if(l2 > tiny) {
+        double t = (qx*dx + qy*dy + qz*dz) / l2;
+        if(t > 1) t = 1;
+        if(t > 0) { qx -= t*dx; qy -= t*dy; qz -= t*dz; }
+    }
+    return qx*qx + qy*qy + qz*qz;
+}
+
+static inline bool within(pyPositionLogger *s, const logger_point &a,
+        const logger_point &b, double px, double py, double pz,
+        double prx, double pry, double prz, double tol2) {
+    if(segment_dist2(a.x, a.y, a.z, b.x, b.y, b.z, px, py, pz) > tol2)
+        return false;
+    return !s->is_xyuv || segment_dist2(a.rx, a.ry, a.rz,
+            b.rx, b.ry, b.rz, prx, pry, prz) <= tol2;
 }
 
 static pthread_mutex_t mutex = PTHREAD_MUTEX_INITIALIZER;
@@ -1871,28 +2051,47 @@ static void LOCK() { pthread_mutex_lock(&mutex); }
 static void UNLOCK() { pthread_mutex_unlock(&mutex); }
 
 static int Logger_init(pyPositionLogger *self, PyObject *a, PyObject *k) {
+    static const char *kwlist[] = {"stat", "jog", "traverse", "feed", "arc",
+        "toolchange", "probe", "geometry", "is_xyuv", "capacity", "tolerance",
+        NULL};
     char *geometry;
+    pyStatChannel *st;
     struct color *c = self->colors;
-    self->p = (logger_point*)malloc(0);
-    self->npts = self->mpts = 0;
-    self->exit = self->clear = 0;
-    self->changed = 1;
-    self->st = 0;
+    int capacity = MAX_POINTS;
     self->is_xyuv = 0;
-    self->foam_z = 0;
-    self->foam_w = 1.5;  // temporarily hard-code
-    if(!PyArg_ParseTuple(a, "O!(BBBB)(BBBB)(BBBB)(BBBB)(BBBB)(BBBB)s|i",
-            &Stat_Type, &self->st,
+    self->tolerance = 0;
+    if(!PyArg_ParseTupleAndKeywords(a, k,
+            "O!(BBBB)(BBBB)(BBBB)(BBBB)(BBBB)(BBBB)s|iid", (char**)kwlist,
+            &Stat_Type, &st,
             &c[0].r,&c[0].g, &c[0].b, &c[0].a,
             &c[1].r,&c[1].g, &c[1].b, &c[1].a,
             &c[2].r,&c[2].g, &c[2].b, &c[2].a,
             &c[3].r,&c[3].g, &c[3].b, &c[3].a,
             &c[4].r,&c[4].g, &c[4].b, &c[4].a,
             &c[5].r,&c[5].g, &c[5].b, &c[5].a,
-            &geometry, &self->is_xyuv
+            &geometry, &self->is_xyuv, &capacity, &self->tolerance
             ))
         return -1;
-    Py_INCREF(self->st);
+    if(capacity < 16) {
+        PyErr_SetString(PyExc_ValueError,
+                "positionlogger capacity must be at least 16");
+        return -1;
+    }
+    self->p = (logger_point*)malloc(sizeof(struct logger_point) * capacity);
+    if(!self->p) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    self->mpts = capacity;
+    self->npts = self->lpts = self->head = 0;
+    self->npending = 0;
+    self->coarsen = 1;
+    self->exit = self->clear = 0;
+    self->foam_z = 0;
+    self->foam_w = 1.5;  // temporarily hard-code
+    // only now, so that dealloc does not release a stat it never held
+    Py_INCREF(st);
+    self->st = st;
     self->geometry = strdup(geometry);
     return 0;
 }
@@ -1913,10 +2112,118 @@ static PyObject *Logger_set_depth(pyPositionLogger *s, PyObject *o) {
     return Py_None;
 }
 
-static double dist2(double x1, double y1, double x2, double y2) {
-    double dx = x2-x1;
-    double dy = y2-y1;
-    return dx*dx + dy*dy;
+// whether the points from a to j, in order in q, can be drawn as one line
+static bool logger_mergeable(pyPositionLogger *s, const logger_point *q,
+        int a, int j, double tol2) {
+    for(int i=a+1; i<=j; i++)
+        if(q[i].c != q[a].c) return false;
+    for(int i=a+1; i<j; i++)
+        if(!within(s, q[a], q[j], q[i].x, q[i].y, q[i].z,
+                    q[i].rx, q[i].ry, q[i].rz, tol2))
+            return false;
+    return true;
+}
+
+// decimate the whole plot at tolerance tol, leaving it unwrapped
+static void logger_compact(pyPositionLogger *s, double tol) {
+    int n = s->npts;
+    if(n < 3) return;
+    logger_point *q = (logger_point*)malloc(sizeof(struct logger_point) * n);
+    if(!q) return;
+    for(int i=0; i<n; i++) q[i] = logger_at(s, i);
+    double tol2 = tol * tol;
+    int out = 0, a = 0;
+    s->p[out++] = q[0];
+    while(a < n-1) {
+        int j = a+1;
+        while(j+1 < n && j+1-a <= MAX_PENDING
+                && logger_mergeable(s, q, a, j+1, tol2))
+            j++;
+        s->p[out++] = q[j];
+        a = j;
+    }
+    free(q);
+    s->head = 0;
+    s->npts = s->lpts = out;
+    s->npending = 0;
+}
+
+// make room for need more points in a full plot
+static void logger_make_room(pyPositionLogger *s, double tol, int need) {
+    if(s->coarsen < MAX_COARSEN) {
+        s->coarsen *= 2;
+        logger_compact(s, tol * s->coarsen);
+    }
+    if(s->npts + need <= s->mpts - s->mpts / 8) return;
+    int adjust = s->mpts / 10;
+    if(adjust < need) adjust = need;
+    s->head = (s->head + adjust) % s->mpts;
+    s->npts -= adjust;
+    s->lpts -= adjust;
+    if(s->lpts < 0) s->lpts = 0;
+}
+
+static void logger_add(pyPositionLogger *s, struct color c,
+        double x, double y, double z, double rx, double ry, double rz,
+        double tol) {
+    int n = s->npts;
+    if(n >= 2 && c == logger_at(s, n-1).c) {
+        logger_point &op = logger_at(s, n-1);
+        logger_point &oop = logger_at(s, n-2);
+        double dx = x - op.x, dy = y - op.y, dz = z - op.z;
+        double dr = s->is_xyuv ? fabs(rx - op.rx) + fabs(ry - op.ry) : 0;
+        bool moved = dx*dx + dy*dy + dz*dz > tiny || dr > tiny;
+        if(moved) {
+            double t = tol * s->coarsen, tol2 = t * t;
+            if(s->npending == MAX_PENDING) {
+                // keep every other sample, spread over the whole line
+                for(int i=0; i<MAX_PENDING/2; i++)
+                    s->pending[i] = s->pending[2*i+1];
+                s->npending = MAX_PENDING/2;
+            }
+            logger_point end = op;
+            end.x = x; end.y = y; end.z = z;
+            end.rx = rx; end.ry = ry; end.rz = rz;
+            moved = !within(s, oop, end, op.x, op.y, op.z,
+                    op.rx, op.ry, op.rz, tol2);
+            for(int i=0; !moved && i<s->npending; i++) {
+                const pending_point &q = s->pending[i];
+                moved = !within(s, oop, end, q.x, q.y, q.z,
+                        q.rx, q.ry, q.rz, tol2);
+            }
+            if(!moved) {
+                pending_point &q = s->pending[s->npending++];
+                q.x = op.x; q.y = op.y; q.z = op.z;
+                q.rx = op.rx; q.ry = op.ry; q.rz = op.rz;
+            }
+        }
+        if(!moved) {
+            op.x = x; op.y = y; op.z = z;
+            op.rx = rx; op.ry = ry; op.rz = rz;
+            return;
+        }
+    }
+
+    bool changed_color = n && c != logger_at(s, n-1).c;
+    int need = changed_color ? 2 : 1;
+    if(n + need > s->mpts) {
+        logger_make_room(s, tol, need);
+        n = s->npts;
+    }
+    if(changed_color) {
+        logger_point &op = logger_at(s, n-1);
+        logger_point &np = logger_at(s, n);
+        np.x = op.x; np.y = op.y; np.z = op.z;
+        np.rx = rx; np.ry = ry; np.rz = rz;
+        np.c = np.c2 = c;
+        n++;
+    }
+    logger_point &np = logger_at(s, n);
+    np.x = x; np.y = y; np.z = z;
+    np.rx = rx; np.ry = ry; np.rz = rz;
+    np.c = np.c2 = c;
+    s->npts = n + 1;
+    s->npending = 0;
 }
 
 static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
@@ -1931,14 +2238,21 @@ static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
 
     s->exit = 0;
     s->clear = 0;
-    s->npts = 0;
+    LOCK();
+    s->npts = s->lpts = s->head = 0;
+    s->npending = 0;
+    s->coarsen = 1;
+    UNLOCK();
 
     Py_BEGIN_ALLOW_THREADS
     while(!s->exit) {
         if(s->clear) {
-            s->npts = 0;
-            s->lpts = 0;
+            LOCK();
+            s->npts = s->lpts = s->head = 0;
+            s->npending = 0;
+            s->coarsen = 1;
             s->clear = 0;
+            UNLOCK();
         }
         if(s->st->c->valid() && s->st->c->peek() == EMC_STAT_TYPE) {
             EMC_STAT *status = static_cast<EMC_STAT*>(s->st->c->get_address());
@@ -1946,9 +2260,6 @@ static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
             colornum = status->motion.traj.motion_type;
             if(colornum < 0 || colornum > NUMCOLORS) colornum = 0;
             struct color c = s->colors[colornum];
-            struct logger_point *op = &s->p[s->npts-1];
-            struct logger_point *oop = &s->p[s->npts-2];
-            bool add_point = s->npts < 2 || c != op->c;
             double x, y, z, rx, ry, rz;
             if(s->is_xyuv) {
                 x = status->motion.traj.position.tran.x - status->task.toolOffset.tran.x,
@@ -1957,18 +2268,6 @@ static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
                 rx = status->motion.traj.position.u - status->task.toolOffset.u,
                 ry = status->motion.traj.position.v - status->task.toolOffset.v,
                 rz = s->foam_w;
-                /* TODO .01, the distance at which a preview line is dropped,
-                 * should either be dependent on units or configurable, because
-                 * 0.1 is inappropriate for mm systems
-                 */
-                add_point = add_point || (dist2(x, y, oop->x, oop->y) > .01)
-                    || (dist2(rx, ry, oop->rx, oop->ry) > .01);
-                add_point = add_point || !colinear( x, y, z,
-                                op->x, op->y, op->z,
-                                oop->x, oop->y, oop->z);
-                add_point = add_point || !colinear( rx, ry, rz,
-                                op->rx, op->ry, op->rz,
-                                oop->rx, oop->ry, oop->rz);
             } else {
                 double pt[9] = {
                     status->motion.traj.position.tran.x - status->task.toolOffset.tran.x,
@@ -1985,59 +2284,16 @@ static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
                 vertex9(pt, p, s->geometry);
                 x = p[0]; y = p[1]; z = p[2];
                 rx = pt[3]; ry = -pt[4]; rz = pt[5];
-
-                add_point = add_point || !colinear( x, y, z,
-                                op->x, op->y, op->z,
-                                oop->x, oop->y, oop->z);
             }
-            if(add_point) {
-                // 1 or 2 points may be added, make room whenever
-                // fewer than 2 are left
-                bool changed_color = s->npts && c != op->c;
-                if(s->npts+2 > s->mpts) {
-                    LOCK();
-                    if(s->mpts >= MAX_POINTS) {
-                        int adjust = MAX_POINTS / 10;
-                        if(adjust < 2) adjust = 2;
-                        s->npts -= adjust;
-                        memmove(s->p, s->p + adjust,
-                                sizeof(struct logger_point) * s->npts);
-                    } else {
-                        s->mpts = 2 * s->mpts + 2;
-                        s->changed = 1;
-                        s->p = (struct logger_point*) realloc(s->p,
-                                    sizeof(struct logger_point) * s->mpts);
-                    }
-                    UNLOCK();
-                    op = &s->p[s->npts-1];
-                    oop = &s->p[s->npts-2];
-                }
-                if(changed_color) {
-                    {
-                    struct logger_point &np = s->p[s->npts];
-                    np.x = op->x; np.y = op->y; np.z = op->z;
-                    np.rx = rx; np.ry = ry; np.rz = rz;
-                    np.c = np.c2 = c;
-                    }
-                    {
-                    struct logger_point &np = s->p[s->npts+1];
-                    np.x = x; np.y = y; np.z = z;
-                    np.rx = rx; np.ry = ry; np.rz = rz;
-                    np.c = np.c2 = c;
-                    }
-                    s->npts += 2;
-                } else {
-                    struct logger_point &np = s->p[s->npts];
-                    np.x = x; np.y = y; np.z = z;
-                    np.rx = rx; np.ry = ry; np.rz = rz;
-                    np.c = np.c2 = c;
-                    s->npts++;
-                }
-            } else {
-                struct logger_point &np = s->p[s->npts-1];
-                np.x = x; np.y = y; np.z = z;
-                np.rx = rx; np.ry = ry; np.rz = rz;
+            // without a tolerance, use .001 inch in machine units
+            double tol = s->tolerance;
+            if(tol <= 0) {
+                double units = status->motion.traj.linearUnits;
+                tol = units > 0 ? .0254 * units : .001;
             }
+            LOCK();
+            logger_add(s, c, x, y, z, rx, ry, rz, tol);
+            UNLOCK();
         }
         nanosleep(&ts, NULL);
     }
@@ -2062,31 +2318,37 @@ static PyObject* Logger_stop(pyPositionLogger *s, PyObject *o) {
 static PyObject* Logger_call(pyPositionLogger *s, PyObject *o) {
     if(!s->clear) {
         LOCK();
+        // the points from head to the end of the ring, then any that
+        // wrapped around to the start of it
+        int first = s->head, n = s->npts;
+        int wrapped = first + n - s->mpts;
+        if(wrapped < 0) wrapped = 0;
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT);
         if(s->is_xyuv) {
-            if(s->changed) {
-                glVertexPointer(3, GL_FLOAT,
-                        sizeof(struct logger_point)/2, &s->p->x);
-                glColorPointer(4, GL_UNSIGNED_BYTE,
-                        sizeof(struct logger_point)/2, &s->p->c);
-                glEnableClientState(GL_COLOR_ARRAY);
-                glEnableClientState(GL_VERTEX_ARRAY);
-                s->changed = 0;
-            }
-            s->lpts = s->npts;
-            glDrawArrays(GL_LINES, 0, 2*s->npts);
+            glVertexPointer(3, GL_FLOAT,
+                    sizeof(struct logger_point)/2, &s->p->x);
+            glColorPointer(4, GL_UNSIGNED_BYTE,
+                    sizeof(struct logger_point)/2, &s->p->c);
+            glEnableClientState(GL_COLOR_ARRAY);
+            glEnableClientState(GL_VERTEX_ARRAY);
+            glDrawArrays(GL_LINES, 2*first, 2*(n - wrapped));
+            if(wrapped) glDrawArrays(GL_LINES, 0, 2*wrapped);
         } else {
-            if(s->changed) {
-                glVertexPointer(3, GL_FLOAT,
-                        sizeof(struct logger_point), &s->p->x);
-                glColorPointer(4, GL_UNSIGNED_BYTE,
-                        sizeof(struct logger_point), &s->p->c);
-                glEnableClientState(GL_COLOR_ARRAY);
-                glEnableClientState(GL_VERTEX_ARRAY);
-                s->changed = 0;
+            glVertexPointer(3, GL_FLOAT,
+                    sizeof(struct logger_point), &s->p->x);
+            glColorPointer(4, GL_UNSIGNED_BYTE,
+                    sizeof(struct logger_point), &s->p->c);
+            glEnableClientState(GL_COLOR_ARRAY);
+            glEnableClientState(GL_VERTEX_ARRAY);
+            glDrawArrays(GL_LINE_STRIP, first, n - wrapped);
+            if(wrapped) {
+                GLuint seam[2] = { (GLuint)s->mpts - 1, 0 };
+                glDrawElements(GL_LINES, 2, GL_UNSIGNED_INT, seam);
+                glDrawArrays(GL_LINE_STRIP, 0, wrapped);
             }
-            s->lpts = s->npts;
-            glDrawArrays(GL_LINE_STRIP, 0, s->npts);
         }
+        glPopClientAttrib();
+        s->lpts = n;
         UNLOCK();
     }
     Py_INCREF(Py_None);
@@ -2104,7 +2366,7 @@ static PyObject *Logger_last(pyPositionLogger *s, PyObject *o) {
         result = Py_None;
     } else {
         result = PyTuple_New(6);
-        struct logger_point &p = s->p[idx-1];
+        struct logger_point &p = logger_at(s, idx-1);
         PyTuple_SET_ITEM(result, 0, PyFloat_FromDouble(p.x));
         PyTuple_SET_ITEM(result, 1, PyFloat_FromDouble(p.y));
         PyTuple_SET_ITEM(result, 2, PyFloat_FromDouble(p.z));
@@ -2116,8 +2378,27 @@ static PyObject *Logger_last(pyPositionLogger *s, PyObject *o) {
     return result;
 }
 
+static PyObject *Logger_snapshot(pyPositionLogger *s, PyObject *o) {
+    LOCK();
+    int first = s->head, n = s->npts;
+    int wrapped = first + n - s->mpts;
+    if(wrapped < 0) wrapped = 0;
+    size_t size = sizeof(struct logger_point);
+    PyObject *result = PyString_FromStringAndSize(NULL, n * size);
+    if(result) {
+        char *buf = PyString_AS_STRING(result);
+        memcpy(buf, s->p + first, (n - wrapped) * size);
+        memcpy(buf + (n - wrapped) * size, s->p, wrapped * size);
+    }
+    UNLOCK();
+    return result;
+}
+
 static PyMemberDef Logger_members[] = {
     {(char*)"npts", T_INT, offsetof(pyPositionLogger, npts), READONLY},
+    {(char*)"capacity", T_INT, offsetof(pyPositionLogger, mpts), READONLY},
+    {(char*)"tolerance", T_DOUBLE, offsetof(pyPositionLogger, tolerance), 0},
+    {(char*)"coarsen", T_DOUBLE, offsetof(pyPositionLogger, coarsen), READONLY},
     {0, 0, 0, 0},
 };
 
@@ -2134,6 +2415,10 @@ static PyMethodDef Logger_methods[] = {
         "set the Z and W depths for foam cutter"},
     {"last", (PyCFunction)Logger_last, METH_VARARGS,
         "Return the most recent point on the plot or None"},
+    {"snapshot", (PyCFunction)Logger_snapshot, METH_NOARGS,
+        "Return the points of the plot, oldest first, as a string of records\n"
+        "laid out as point_format: x y z as float, the colour as 4 bytes,\n"
+        "then a b c (u v w on a foam cutter) and a second colour"},
     {NULL, NULL, 0, NULL},
 };
 
@@ -2182,6 +2467,1163 @@ static PyTypeObject PositionLoggerType = {
     0,                      /*tp_is_gc*/
 };
 
+/* linuxcnc.positionrecorder appends the commanded and actual position of
+ * the machine to a file at a fixed rate, for comparing the path that was
+ * run with the one that was programmed afterwards.  The file is a
+ * recorder_header followed by recorder_records; it is extended a chunk at
+ * a time and written through a memory map, and the header's count says how
+ * many records are complete, so it can be read while it is being written.
+ * Each chunk is allocated on the disk before it is mapped: a write to a
+ * hole in a map of a full disk would kill the process with SIGBUS rather
+ * than fail.
+ * lib/python/positionlog.py reads it. */
+#define RECORDER_MAGIC "LCNCPOS1"
+#define RECORDER_VERSION (1)
+#define RECORDER_CHUNK (4096)
+#define RECORDER_AXES (9)
+
+struct recorder_header {
+    char magic[8];
+    uint32_t version, header_size, record_size, axes;
+    double started, interval;
+    uint64_t count;
+    char reserved[16];
+};
+
+struct recorder_record {
+    double time;
+    double commanded[RECORDER_AXES], actual[RECORDER_AXES];
+    double velocity, feed_override;
+    int32_t motion_type, line;
+};
+
+typedef struct {
+    PyObject_HEAD
+    int fd;
+    char *filename;
+    struct recorder_header *header;
+    char *map;
+    off_t map_offset;
+    size_t map_length;
+    long long count;
+    bool exit;
+    int error;
+    pyStatChannel *st;
+} pyPositionRecorder;
+
+static void pose_array(const EmcPose &p, double *a) {
+    a[0] = p.tran.x; a[1] = p.tran.y; a[2] = p.tran.z;
+    a[3] = p.a; a[4] = p.b; a[5] = p.c;
+    a[6] = p.u; a[7] = p.v; a[8] = p.w;
+}
+
+static off_t recorder_end(long long count) {
+    return sizeof(struct recorder_header)
+        + count * sizeof(struct recorder_record);
+}
+
+static void recorder_unmap(pyPositionRecorder *s) {
+    if(s->map) munmap(s->map, s->map_length);
+    s->map = 0;
+    s->map_length = 0;
+}
+
+// trim the file to the records written and stop mapping it
+static void recorder_sync(pyPositionRecorder *s) {
+    recorder_unmap(s);
+    if(s->fd >= 0 && ftruncate(s->fd, recorder_end(s->count)) < 0)
+        s->error = errno;
+}
+
+// map the file from the next record on, extending it by a chunk
+static bool recorder_map(pyPositionRecorder *s) {
+    recorder_unmap(s);
+    off_t page = sysconf(_SC_PAGESIZE);
+    off_t start = recorder_end(s->count);
+    off_t offset = start - start % page;
+    off_t end = recorder_end(s->count + RECORDER_CHUNK);
+    int result = posix_fallocate(s->fd, start, end - start);
+    if(result) {
+        s->error = result;
+        return false;
+    }
+    void *map = mmap(0, end - offset, PROT_READ | PROT_WRITE, MAP_SHARED,
+            s->fd, offset);
+    if(map == MAP_FAILED) {
+        s->error = errno;
+        return false;
+    }
+    s->map = (char*)map;
+    s->map_offset = offset;
+    s->map_length = end - offset;
+    return true;
+}
+
+static bool recorder_append(pyPositionRecorder *s,
+        const struct recorder_record &r) {
+    off_t start = recorder_end(s->count);
+    if(!s->map || start + (off_t)sizeof(r)
+            > s->map_offset + (off_t)s->map_length) {
+        if(!recorder_map(s)) return false;
+    }
+    memcpy(s->map + (start - s->map_offset), &r, sizeof(r));
+    s->count++;
+    s->header->count = s->count;
+    return true;
+}
+
+static int Recorder_init(pyPositionRecorder *self, PyObject *a, PyObject *k) {
+    static const char *kwlist[] = {"stat", "filename", NULL};
+    char *filename;
+    pyStatChannel *channel;
+    self->fd = -1;
+    if(!PyArg_ParseTupleAndKeywords(a, k, "O!s:positionrecorder",
+            (char**)kwlist, &Stat_Type, &channel, &filename))
+        return -1;
+
+    int fd = open(filename, O_RDWR | O_CREAT, 0666);
+    if(fd < 0) {
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+        return -1;
+    }
+    struct stat st;
+    if(fstat(fd, &st) < 0) {
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+        close(fd);
+        return -1;
+    }
+    struct recorder_header h;
+    memset(&h, 0, sizeof(h));
+    if(st.st_size == 0) {
+        memcpy(h.magic, RECORDER_MAGIC, sizeof(h.magic));
+        h.version = RECORDER_VERSION;
+        h.header_size = sizeof(struct recorder_header);
+        h.record_size = sizeof(struct recorder_record);
+        h.axes = RECORDER_AXES;
+        if(write(fd, &h, sizeof(h)) != (ssize_t)sizeof(h)) {
+            PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+            close(fd);
+            return -1;
+        }
+    } else if(read(fd, &h, sizeof(h)) != (ssize_t)sizeof(h)
+            || memcmp(h.magic, RECORDER_MAGIC, sizeof(h.magic))
+            || h.version != RECORDER_VERSION
+            || h.header_size != sizeof(struct recorder_header)
+            || h.record_size != sizeof(struct recorder_record)
+            || h.axes != RECORDER_AXES) {
+        PyErr_Format(PyExc_ValueError, "%s is not a position log", filename);
+        close(fd);
+        return -1;
+    }
+
+    void *header = mmap(0, sizeof(struct recorder_header),
+            PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    if(header == MAP_FAILED) {
+        PyErr_SetFromErrnoWithFilename(PyExc_IOError, filename);
+        close(fd);
+        return -1;
+    }
+    self->fd = fd;
+    self->header = (struct recorder_header*)header;
+    self->map = 0;
+    self->map_length = 0;
+    // records past count were not finished when the log was last written,
+    // and a count past the end of the file was never written at all
+    self->count = self->header->count;
+    if(st.st_size > 0 && self->count > (st.st_size - (off_t)sizeof(h))
+            / (off_t)sizeof(struct recorder_record)) {
+        self->count = (st.st_size - sizeof(h))
+            / sizeof(struct recorder_record);
+        self->header->count = self->count;
+    }
+    self->exit = 0;
+    self->error = 0;
+    recorder_sync(self);
+    // only now, so that dealloc does not release a stat it never held
+    Py_INCREF(channel);
+    self->st = channel;
+    self->filename = strdup(filename);
+    return 0;
+}
+
+static void Recorder_dealloc(pyPositionRecorder *s) {
+    recorder_sync(s);
+    if(s->header) munmap(s->header, sizeof(struct recorder_header));
+    if(s->fd >= 0) close(s->fd);
+    Py_XDECREF(s->st);
+    free(s->filename);
+    PyObject_Del(s);
+}
+
+static PyObject *Recorder_start(pyPositionRecorder *s, PyObject *o) {
+    double interval;
+    struct timespec ts;
+
+    if(!PyArg_ParseTuple(o, "d:recorder.start", &interval)) return NULL;
+    ts.tv_sec = (int)interval;
+    ts.tv_nsec = (long int)(1e9 * (interval - ts.tv_sec));
+
+    Py_INCREF(s->st);
+
+    s->exit = 0;
+    s->error = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+    struct timespec now;
+    clock_gettime(CLOCK_REALTIME, &now);
+    if(!s->header->count)
+        s->header->started = now.tv_sec + now.tv_nsec * 1e-9;
+    s->header->interval = interval;
+
+    // a record that is the same as the last one apart from the time is
+    // left out, so an idle machine does not fill the disk
+    struct recorder_record last;
+    bool have_last = false;
+    while(!s->exit && !s->error) {
+        if(s->st->c->valid() && s->st->c->peek() == EMC_STAT_TYPE) {
+            EMC_STAT *status = static_cast<EMC_STAT*>(s->st->c->get_address());
+            struct recorder_record r;
+            memset(&r, 0, sizeof(r));
+            pose_array(status->motion.traj.position, r.commanded);
+            pose_array(status->motion.traj.actualPosition, r.actual);
+            r.velocity = status->motion.traj.current_vel;
+            r.feed_override = status->motion.traj.scale;
+            r.motion_type = status->motion.traj.motion_type;
+            r.line = status->task.motionLine;
+            if(!have_last || memcmp(&r.commanded, &last.commanded,
+                        sizeof(r) - offsetof(struct recorder_record, commanded))) {
+                clock_gettime(CLOCK_REALTIME, &now);
+                r.time = now.tv_sec + now.tv_nsec * 1e-9;
+                if(recorder_append(s, r)) {
+                    last = r;
+                    have_last = true;
+                }
+            }
+        }
+        nanosleep(&ts, NULL);
+    }
+    recorder_sync(s);
+    Py_END_ALLOW_THREADS
+    Py_DECREF(s->st);
+    if(s->error) {
+        errno = s->error;
+        return PyErr_SetFromErrnoWithFilename(PyExc_IOError, s->filename);
+    }
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject* Recorder_stop(pyPositionRecorder *s, PyObject *o) {
+    s->exit = true;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyMemberDef Recorder_members[] = {
+    {(char*)"count", T_LONGLONG, offsetof(pyPositionRecorder, count), READONLY},
+    {(char*)"filename", T_STRING, offsetof(pyPositionRecorder, filename), READONLY},
+    {0, 0, 0, 0},
+};
+
+static PyMethodDef Recorder_methods[] = {
+    {"start", (PyCFunction)Recorder_start, METH_VARARGS,
+        "Start recording and record every ARG seconds until stopped"},
+    {"stop", (PyCFunction)Recorder_stop, METH_NOARGS,
+        "Stop recording"},
+    {NULL, NULL, 0, NULL},
+};
+
+static PyTypeObject PositionRecorderType = {
+    PyObject_HEAD_INIT(NULL)
+    0,                      /*ob_size*/
+    "linuxcnc.positionrecorder",   /*tp_name*/
+    sizeof(pyPositionRecorder), /*tp_basicsize*/
+    0,                      /*tp_itemsize*/
+    /* methods */
+    (destructor)Recorder_dealloc, /*tp_dealloc*/
+    0,                      /*tp_print*/
+    0,                      /*tp_getattr*/
+    0,                      /*tp_setattr*/
+    0,                      /*tp_compare*/
+    0,                      /*tp_repr*/
+    0,                      /*tp_as_number*/
+    0,                      /*tp_as_sequence*/
+    0,                      /*tp_as_mapping*/
+    0,                      /*tp_hash*/
+    0,                      /*tp_call*/
+    0,                      /*tp_str*/
+    0,                      /*tp_getattro*/
+    0,                      /*tp_setattro*/
+    0,                      /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT,     /*tp_flags*/
+    0,                      /*tp_doc*/
+    0,                      /*tp_traverse*/
+    0,                      /*tp_clear*/
+    0,                      /*tp_richcompare*/
+    0,                      /*tp_weaklistoffset*/
+    0,                      /*tp_iter*/
+    0,                      /*tp_iternext*/
+    Recorder_methods,       /*tp_methods*/
+    Recorder_members,       /*tp_members*/
+    0,                      /*tp_getset*/
+    0,                      /*tp_base*/
+    0,                      /*tp_dict*/
+    0,                      /*tp_descr_get*/
+    0,                      /*tp_descr_set*/
+    0,                      /*tp_dictoffset*/
+    (initproc)Recorder_init,  /*tp_init*/
+    0,                      /*tp_alloc*/
+    PyType_GenericNew,      /*tp_new*/
+    0,                      /*tp_free*/
+    0,                      /*tp_is_gc*/
+};
+
+static bool store_view_arg(PyObject *store, SegmentStoreView *v,
+        const char *fname) {
+    if(!is_segment_store(store)) {
+        PyErr_Format(PyExc_TypeError, "%s: expected segment store, got %s",
+            fname, store->ob_type->tp_name);
+        return false;
+    }
+    return segment_store_view(store, v);
+}
+
+// Call emit(p1, p2, i) for each straight piece of segment i of a store, for
+// all its segments, in 3d coordinates, with rotary moves subdivided as line9
+// does
+template<class T>
+static void store_line_pairs(const SegmentStoreView &v, const char *geometry,
+        T emit) {
+    for(Py_ssize_t i=0; i<v.nsegs; i++) {
+        double prev[3], cur[3];
+        vertex9(v.start(i), prev, geometry);
+        line9_points(v.start(i), v.end(i), [&](const double *pt) {
+            vertex9(pt, cur, geometry);
+            emit(prev, cur, i);
+            memcpy(prev, cur, sizeof(prev));
+        });
+    }
+}
+
+// A linebuffer holds the vertices of a program preview as GL_LINES with a
+// color per vertex.  It is drawn from a vertex buffer object when the GL
+// has them (1.5 or newer) and from client side vertex arrays otherwise, so
+// filling it is much cheaper than compiling the same lines into a display
+// list, and the data is uploaded to the card only once.
+
+struct linebuffer_vertex {
+    float x, y, z;
+    struct color c;
+};
+
+struct linebuffer_batch {
+    int first, count;
+    float width;
+};
+
+typedef struct {
+    PyObject_HEAD
+    std::vector<linebuffer_vertex> *v;
+    std::vector<linebuffer_batch> *batches;
+    GLuint vbo;
+    bool uploaded;
+} pyLineBuffer;
+
+typedef void (*glGenBuffers_t)(GLsizei, GLuint *);
+typedef void (*glDeleteBuffers_t)(GLsizei, const GLuint *);
+typedef void (*glBindBuffer_t)(GLenum, GLuint);
+typedef void (*glBufferData_t)(GLenum, GLsizeiptr, const GLvoid *, GLenum);
+
+static glGenBuffers_t p_glGenBuffers;
+static glDeleteBuffers_t p_glDeleteBuffers;
+static glBindBuffer_t p_glBindBuffer;
+static glBufferData_t p_glBufferData;
+
+// Must be called with a current context
+static bool have_vbo() {
+    static int result = -1;
+    if(result != -1) return result;
+    result = 0;
+    const char *version = (const char *)glGetString(GL_VERSION);
+    int major = 0, minor = 0;
+    if(!version || sscanf(version, "%d.%d", &major, &minor) != 2) return false;
+    if(major < 1 || (major == 1 && minor < 5)) return false;
+    p_glGenBuffers = (glGenBuffers_t)
+        glXGetProcAddressARB((const GLubyte *)"glGenBuffers");
+    p_glDeleteBuffers = (glDeleteBuffers_t)
+        glXGetProcAddressARB((const GLubyte *)"glDeleteBuffers");
+    p_glBindBuffer = (glBindBuffer_t)
+        glXGetProcAddressARB((const GLubyte *)"glBindBuffer");
+    p_glBufferData = (glBufferData_t)
+        glXGetProcAddressARB((const GLubyte *)"glBufferData");
+    result = p_glGenBuffers && p_glDeleteBuffers
+        && p_glBindBuffer && p_glBufferData;
+    return result;
+}
+
+static void LineBuffer_release(pyLineBuffer *s) {
+    if(s->vbo) p_glDeleteBuffers(1, &s->vbo);
+    s->vbo = 0;
+    s->uploaded = false;
+}
+
+static void LineBuffer_add(pyLineBuffer *s, const double p[3], double z,
+        const struct color &c) {
+    linebuffer_vertex lv = { (float)p[0], (float)p[1], (float)(p[2] + z), c };
+    s->v->push_back(lv);
+    s->batches->back().count++;
+    s->uploaded = false;
+}
+
+static int LineBuffer_init(pyLineBuffer *s, PyObject *a, PyObject *k) {
+    if(!PyArg_ParseTuple(a, ":linebuffer")) return -1;
+    delete s->v;
+    delete s->batches;
+    s->v = new std::vector<linebuffer_vertex>;
+    s->batches = new std::vector<linebuffer_batch>;
+    linebuffer_batch b = { 0, 0, 0 };
+    s->batches->push_back(b);
+    s->vbo = 0;
+    s->uploaded = false;
+    return 0;
+}
+
+static void LineBuffer_dealloc(pyLineBuffer *s) {
+    // the context may be gone; release() deletes the vbo while it is current
+    delete s->v;
+    delete s->batches;
+    PyObject_Del(s);
+}
+
+static bool parse_color(PyObject *o, struct color &c) {
+    double r, g, b, a = 1;
+    if(!PyArg_ParseTuple(o, "ddd|d", &r, &g, &b, &a)) return false;
+    c.r = (unsigned char)(r * 255 + .5);
+    c.g = (unsigned char)(g * 255 + .5);
+    c.b = (unsigned char)(b * 255 + .5);
+    c.a = (unsigned char)(a * 255 + .5);
+    return true;
+}
+
+static double dist2_point_segment(const double p[3], const double a[3],
+        const double b[3]) {
+    double d[3], e[3], l2 = 0, t = 0;
+    for(int i=0; i<3; i++) { d[i] = b[i] - a[i]; e[i] = p[i] - a[i]; }
+    for(int i=0; i<3; i++) { l2 += d[i] * d[i]; t += d[i] * e[i]; }
+    t = l2 > 0 ? std::min(1., (std::max)(0., t / l2)) : 0;
+    double r = 0;
+    for(int i=0; i<3; i++) { double q = e[i] - t * d[i]; r += q * q; }
+    return r;
+}
+
+// Douglas-Peucker simplification of the polyline 'pts' (3 doubles per
+// point), as in rs274.author.douglas but without its arc fitting and
+// without recursion: set keep[i] for the points that must stay so that the
+// path is never more than 'tolerance' from the original.
+static void douglas(const std::vector<double> &pts, std::vector<char> &keep,
+        double tolerance) {
+    size_t n = pts.size() / 3;
+    keep.assign(n, 0);
+    if(n == 0) return;
+    keep[0] = keep[n-1] = 1;
+    std::vector<std::pair<size_t, size_t> > stack;
+    stack.push_back(std::make_pair(0, n-1));
+    double tol2 = tolerance * tolerance;
+    while(!stack.empty()) {
+        size_t first = stack.back().first, last = stack.back().second;
+        stack.pop_back();
+        double worst_dist = 0;
+        size_t worst = 0;
+        for(size_t i=first+1; i<last; i++) {
+            double dist = dist2_point_segment(&pts[3*i], &pts[3*first], &pts[3*last]);
+            if(dist > worst_dist) { worst_dist = dist; worst = i; }
+        }
+        if(worst_dist > tol2) {
+            keep[worst] = 1;
+            stack.push_back(std::make_pair(first, worst));
+            stack.push_back(std::make_pair(worst, last));
+        }
+    }
+}
+
+// longest run of points simplified at once, to bound the cost of douglas()
+#define DOUGLAS_MAX_RUN (16384)
+
+// number of colors a ramp is cut into when the path is simplified: each
+// change of color ends a run of the path, so a continuous ramp would leave
+// almost nothing for douglas() to join
+#define RAMP_BINS (32)
+
+// A color ramp: values from low to high are spread evenly over the stops.
+// With 'bins', the ramp is cut into that many steps of one color each.
+struct color_ramp {
+    double low, high;
+    std::vector<struct color> stops;
+
+    struct color at(double value, int bins=0) const {
+        double t = high > low ? (value - low) / (high - low) : 1;
+        t = std::min(1., (std::max)(0., t));
+        if(bins > 0) t = (std::min(std::floor(t * bins), bins - 1.) + .5) / bins;
+        t *= stops.size() - 1;
+        size_t k = std::min((size_t)t, stops.size() - 1);
+        if(k + 1 == stops.size()) return stops[k];
+        double f = t - k;
+        const struct color &a = stops[k], &b = stops[k+1];
+        struct color c = {
+            (unsigned char)(a.r + f * (b.r - a.r) + .5),
+            (unsigned char)(a.g + f * (b.g - a.g) + .5),
+            (unsigned char)(a.b + f * (b.b - a.b) + .5),
+            (unsigned char)(a.a + f * (b.a - a.a) + .5) };
+        return c;
+    }
+};
+
+static bool parse_ramp(PyObject *o, color_ramp &r) {
+    PyObject *stops;
+    if(!PyArg_ParseTuple(o, "ddO:color ramp", &r.low, &r.high, &stops))
+        return false;
+    PyObject *fast = PySequence_Fast(stops, "color ramp stops must be a sequence");
+    if(!fast) return false;
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(fast);
+    r.stops.resize(n);
+    for(Py_ssize_t i=0; i<n; i++) {
+        if(!parse_color(PySequence_Fast_GET_ITEM(fast, i), r.stops[i])) {
+            Py_DECREF(fast);
+            return false;
+        }
+    }
+    Py_DECREF(fast);
+    if(r.stops.empty()) {
+        PyErr_SetString(PyExc_ValueError, "color ramp has no stops");
+        return false;
+    }
+    return true;
+}
+
+static PyObject *LineBuffer_lines(pyLineBuffer *s, PyObject *o) {
+    const char *geometry;
+    PyObject *store, *color_obj, *values_obj = Py_None, *ramp_obj = Py_None;
+    double z = 0, tolerance = 0;
+    struct color c;
+    SegmentStoreView v;
+    const double *values = NULL;
+    color_ramp ramp;
+
+    if(!PyArg_ParseTuple(o, "sOO|ddOO:linebuffer.lines",
+                &geometry, &store, &color_obj, &z, &tolerance,
+                &values_obj, &ramp_obj))
+        return NULL;
+    if(!parse_color(color_obj, c)) return NULL;
+    if(!store_view_arg(store, &v, "linebuffer.lines")) return NULL;
+    if(values_obj != Py_None) {
+        Py_ssize_t len;
+        if(PyObject_AsReadBuffer(values_obj, (const void **)&values, &len) < 0)
+            return NULL;
+        if(len < (Py_ssize_t)(v.nsegs * sizeof(double))) {
+            PyErr_SetString(PyExc_ValueError,
+                    "linebuffer.lines: fewer values than segments");
+            return NULL;
+        }
+        if(!parse_ramp(ramp_obj, ramp)) return NULL;
+    }
+    // the color of segment i: from the ramp if there are values, except
+    // for those that are NaN; a simplified path uses RAMP_BINS colors
+    int bins = tolerance > 0 ? RAMP_BINS : 0;
+    auto segment_color = [&](Py_ssize_t i) {
+        if(!values || std::isnan(values[i])) return c;
+        return ramp.at(values[i], bins);
+    };
+
+    if(tolerance > 0) {
+        // simplify each connected run of the path of one color
+        std::vector<double> run;
+        std::vector<char> keep;
+        struct color run_color = c;
+        auto flush = [&]() {
+            douglas(run, keep, tolerance);
+            const double *prev = NULL;
+            for(size_t i=0; i<keep.size(); i++) {
+                if(!keep[i]) continue;
+                if(prev) {
+                    LineBuffer_add(s, prev, z, run_color);
+                    LineBuffer_add(s, &run[3*i], z, run_color);
+                }
+                prev = &run[3*i];
+            }
+            run.clear();
+        };
+        store_line_pairs(v, geometry,
+            [&](const double *p1, const double *p2, Py_ssize_t i) {
+                struct color sc = segment_color(i);
+                size_t n = run.size();
+                if(n && (memcmp(&run[n-3], p1, 3 * sizeof(double))
+                            || n >= 3 * DOUGLAS_MAX_RUN || sc != run_color))
+                    flush();
+                run_color = sc;
+                if(run.empty()) run.insert(run.end(), p1, p1 + 3);
+                run.insert(run.end(), p2, p2 + 3);
+            });
+        flush();
+        Py_RETURN_NONE;
+    }
+
+    s->v->reserve(s->v->size() + 2 * v.nsegs);
+    store_line_pairs(v, geometry,
+        [&](const double *p1, const double *p2, Py_ssize_t i) {
+            struct color sc = segment_color(i);
+            LineBuffer_add(s, p1, z, sc);
+            LineBuffer_add(s, p2, z, sc);
+        });
+    Py_RETURN_NONE;
+}
+
+static PyObject *LineBuffer_dwells(pyLineBuffer *s, PyObject *o) {
+    PyListObject *li;
+    int is_lathe = 0, n;
+    double alpha;
+    char *geometry;
+    double delta = 0.015625;
+
+    if(!PyArg_ParseTuple(o, "sO!di:linebuffer.dwells",
+                &geometry, &PyList_Type, &li, &alpha, &is_lathe))
+        return NULL;
+
+    for(Py_ssize_t i=0; i<PyList_GET_SIZE(li); i++) {
+        PyObject *it = PyList_GET_ITEM(li, i);
+        double red, green, blue, x, y, z;
+        int axis;
+        if(!PyArg_ParseTuple(it, "i(ddd)dddi", &n, &red, &green, &blue, &x, &y, &z, &axis))
+            return NULL;
+        struct color c = {
+            (unsigned char)(red * 255 + .5), (unsigned char)(green * 255 + .5),
+            (unsigned char)(blue * 255 + .5), (unsigned char)(alpha * 255 + .5) };
+        if (is_lathe == 1)
+            axis = 1;
+        dwell_cross(x, y, z, axis, delta,
+            [&](double vx, double vy, double vz) {
+                double p[3] = { vx, vy, vz };
+                LineBuffer_add(s, p, 0, c);
+            });
+    }
+    Py_RETURN_NONE;
+}
+
+static PyObject *LineBuffer_width(pyLineBuffer *s, PyObject *o) {
+    double width;
+    if(!PyArg_ParseTuple(o, "d:linebuffer.width", &width)) return NULL;
+    linebuffer_batch b = { (int)s->v->size(), 0, (float)width };
+    if(s->batches->back().count == 0) s->batches->back() = b;
+    else s->batches->push_back(b);
+    Py_RETURN_NONE;
+}
+
+static PyObject *LineBuffer_clear(pyLineBuffer *s, PyObject *o) {
+    s->v->clear();
+    s->batches->clear();
+    linebuffer_batch b = { 0, 0, 0 };
+    s->batches->push_back(b);
+    s->uploaded = false;
+    Py_RETURN_NONE;
+}
+
+static PyObject *LineBuffer_release_py(pyLineBuffer *s, PyObject *o) {
+    LineBuffer_release(s);
+    Py_RETURN_NONE;
+}
+
+static PyObject *LineBuffer_draw(pyLineBuffer *s, PyObject *o) {
+    if(s->v->empty()) Py_RETURN_NONE;
+
+    const char *base = (const char *)&(*s->v)[0];
+    bool vbo = have_vbo();
+
+    glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT);
+    if(vbo) {
+        if(!s->vbo) p_glGenBuffers(1, &s->vbo);
+        p_glBindBuffer(GL_ARRAY_BUFFER, s->vbo);
+        if(!s->uploaded) {
+            p_glBufferData(GL_ARRAY_BUFFER,
+                s->v->size() * sizeof(linebuffer_vertex), base, GL_STATIC_DRAW);
+            s->uploaded = true;
+        }
+        base = 0;
+    }
+    glVertexPointer(3, GL_FLOAT, sizeof(linebuffer_vertex),
+            base + offsetof(linebuffer_vertex, x));
+    glColorPointer(4, GL_UNSIGNED_BYTE, sizeof(linebuffer_vertex),
+            base + offsetof(linebuffer_vertex, c));
+    glEnableClientState(GL_VERTEX_ARRAY);
+    glEnableClientState(GL_COLOR_ARRAY);
+
+    GLfloat width;
+    glGetFloatv(GL_LINE_WIDTH, &width);
+    for(size_t i=0; i<s->batches->size(); i++) {
+        const linebuffer_batch &b = (*s->batches)[i];
+        if(!b.count) continue;
+        glLineWidth(b.width ? b.width : width);
+        glDrawArrays(GL_LINES, b.first, b.count);
+    }
+    glLineWidth(width);
+
+    if(vbo) p_glBindBuffer(GL_ARRAY_BUFFER, 0);
+    glPopClientAttrib();
+    Py_RETURN_NONE;
+}
+
+static PyObject *LineBuffer_npts(pyLineBuffer *s, void *) {
+    return PyInt_FromSsize_t(s->v->size());
+}
+
+static PyGetSetDef LineBuffer_getset[] = {
+    {(char*)"npts", (getter)LineBuffer_npts, NULL,
+        (char*)"Number of vertices in the buffer"},
+    {NULL},
+};
+
+static PyMethodDef LineBuffer_methods[] = {
+    {"lines", (PyCFunction)LineBuffer_lines, METH_VARARGS,
+        "Add the segments of a segment store: "
+        "lines(geometry, store, color, z=0, tolerance=0, values=None, "
+        "ramp=None); with a tolerance, the path is simplified to stay within "
+        "it of the original.  'values' is a buffer of one double per segment "
+        "and 'ramp' is (low, high, colors): segments are then colored by "
+        "their value, spread over the colors from low to high, and those "
+        "whose value is NaN get 'color'"},
+    {"dwells", (PyCFunction)LineBuffer_dwells, METH_VARARGS,
+        "Add dwell markers in the 'rs274.glcanon' format"},
+    {"width", (PyCFunction)LineBuffer_width, METH_VARARGS,
+        "Draw the lines added after this with the given width (0: current width)"},
+    {"clear", (PyCFunction)LineBuffer_clear, METH_NOARGS,
+        "Remove all lines"},
+    {"release", (PyCFunction)LineBuffer_release_py, METH_NOARGS,
+        "Free the GL buffer object; needs the GL context to be current"},
+    {"draw", (PyCFunction)LineBuffer_draw, METH_NOARGS,
+        "Draw the lines"},
+    {NULL, NULL, 0, NULL},
+};
+
+static PyTypeObject LineBufferType = {
+    PyObject_HEAD_INIT(NULL)
+    0,                      /*ob_size*/
+    "linuxcnc.linebuffer",  /*tp_name*/
+    sizeof(pyLineBuffer),   /*tp_basicsize*/
+    0,                      /*tp_itemsize*/
+    /* methods */
+    (destructor)LineBuffer_dealloc, /*tp_dealloc*/
+    0,                      /*tp_print*/
+    0,                      /*tp_getattr*/
+    0,                      /*tp_setattr*/
+    0,                      /*tp_compare*/
+    0,                      /*tp_repr*/
+    0,                      /*tp_as_number*/
+    0,                      /*tp_as_sequence*/
+    0,                      /*tp_as_mapping*/
+    0,                      /*tp_hash*/
+    0,                      /*tp_call*/
+    0,                      /*tp_str*/
+    0,                      /*tp_getattro*/
+    0,                      /*tp_setattro*/
+    0,                      /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT,     /*tp_flags*/
+    0,                      /*tp_doc*/
+    0,                      /*tp_traverse*/
+    0,                      /*tp_clear*/
+    0,                      /*tp_richcompare*/
+    0,                      /*tp_weaklistoffset*/
+    0,                      /*tp_iter*/
+    0,                      /*tp_iternext*/
+    LineBuffer_methods,     /*tp_methods*/
+    0,                      /*tp_members*/
+    LineBuffer_getset,      /*tp_getset*/
+    0,                      /*tp_base*/
+    0,                      /*tp_dict*/
+    0,                      /*tp_descr_get*/
+    0,                      /*tp_descr_set*/
+    0,                      /*tp_dictoffset*/
+    (initproc)LineBuffer_init, /*tp_init*/
+    0,                      /*tp_alloc*/
+    PyType_GenericNew,      /*tp_new*/
+    0,                      /*tp_free*/
+    0,                      /*tp_is_gc*/
+};
+
+// A pickindex answers "which program line is under the mouse" on the CPU.
+// It keeps the preview as 3d line pieces in a bounding volume hierarchy,
+// and a pick walks the hierarchy in the current GL view transform, so the
+// cost of a click no longer grows with the size of the program the way
+// replaying the selection display list in GL_SELECT mode does.
+
+struct pick_segment {
+    float p[2][3];
+    int lineno;
+    int flags;
+};
+
+struct pick_node {
+    float lo[3], hi[3];
+    int first, count;   // leaf: count segments from first
+    int right;          // inner: the left child is the next node
+};
+
+#define PICK_LEAF_SIZE (8)
+#define PICK_RAPID (1)
+
+typedef struct {
+    PyObject_HEAD
+    std::vector<pick_segment> *segs;
+    std::vector<pick_node> *nodes;
+} pyPickIndex;
+
+static void pick_add(pyPickIndex *s, const double *p1, const double *p2,
+        double z, int lineno, int flags) {
+    pick_segment ps = {
+        {{(float)p1[0], (float)p1[1], (float)(p1[2] + z)},
+         {(float)p2[0], (float)p2[1], (float)(p2[2] + z)}},
+        lineno, flags };
+    s->segs->push_back(ps);
+    s->nodes->clear();
+}
+
+// Adds line pieces to a pickindex, merging connected pieces of the same
+// line while a single chord stays within 'tol' of all of them
+struct pick_simplifier {
+    pyPickIndex *s;
+    double z, tol;
+    int flags;
+    bool open;
+    int lineno;
+    double anchor[3], last[3];
+    std::vector<double> mid;
+
+    pick_simplifier(pyPickIndex *s, double z, double tol, int flags)
+        : s(s), z(z), tol(tol), flags(flags), open(false), lineno(0) {}
+
+    void flush() {
+        if(open) pick_add(s, anchor, last, z, lineno, flags);
+        open = false;
+        mid.clear();
+    }
+
+    bool fits(const double *end) const {
+        for(size_t i=0; i<mid.size(); i+=3)
+            if(dist2_point_segment(&mid[i], anchor, end) > tol * tol)
+                return false;
+        return true;
+    }
+
+    void add(const double *p1, const double *p2, int n) {
+        if(open && n == lineno && !memcmp(p1, last, sizeof(last))
+                && mid.size() < 3 * PICK_LEAF_SIZE * 4) {
+            mid.insert(mid.end(), last, last + 3);
+            if(fits(p2)) {
+                memcpy(last, p2, sizeof(last));
+                return;
+            }
+            mid.resize(mid.size() - 3);
+        }
+        flush();
+        open = true;
+        lineno = n;
+        memcpy(anchor, p1, sizeof(anchor));
+        memcpy(last, p2, sizeof(last));
+    }
+};
+
+static int pick_build(std::vector<pick_segment> &segs,
+        std::vector<pick_node> &nodes, int first, int count) {
+    int idx = nodes.size();
+    nodes.push_back(pick_node());
+    pick_node n;
+    for(int j=0; j<3; j++) { n.lo[j] = 1e30; n.hi[j] = -1e30; }
+    for(int i=first; i<first+count; i++) {
+        for(int k=0; k<2; k++) for(int j=0; j<3; j++) {
+            n.lo[j] = std::min(n.lo[j], segs[i].p[k][j]);
+            n.hi[j] = (std::max)(n.hi[j], segs[i].p[k][j]);
+        }
+    }
+    n.first = first;
+    n.right = 0;
+    if(count <= PICK_LEAF_SIZE) {
+        n.count = count;
+        nodes[idx] = n;
+        return idx;
+    }
+    int axis = 0;
+    for(int j=1; j<3; j++)
+        if(n.hi[j] - n.lo[j] > n.hi[axis] - n.lo[axis]) axis = j;
+    int half = count / 2;
+    std::nth_element(segs.begin() + first, segs.begin() + first + half,
+        segs.begin() + first + count,
+        [axis](const pick_segment &a, const pick_segment &b) {
+            return a.p[0][axis] + a.p[1][axis] < b.p[0][axis] + b.p[1][axis];
+        });
+    n.count = 0;
+    pick_build(segs, nodes, first, half);
+    n.right = pick_build(segs, nodes, first + half, count - half);
+    nodes[idx] = n;
+    return idx;
+}
+
+struct pick_query {
+    double m[16];       // projection * modelview, column major
+    double vp[4];
+    double x, y, tol;
+    int mask;
+    double best;
+    int lineno;
+
+    // transform to clip coordinates
+    void clip(const float p[3], double c[4]) const {
+        for(int i=0; i<4; i++)
+            c[i] = m[i] * p[0] + m[4+i] * p[1] + m[8+i] * p[2] + m[12+i];
+    }
+
+    // clip coordinates to window x, y and depth
+    void window(const double c[4], double w[3]) const {
+        w[0] = vp[0] + (c[0] / c[3] + 1) * vp[2] / 2;
+        w[1] = vp[1] + (c[1] / c[3] + 1) * vp[3] / 2;
+        w[2] = (c[2] / c[3] + 1) / 2;
+    }
+
+    bool node_hit(const pick_node &n) const {
+        double xlo = 1e30, xhi = -1e30, ylo = 1e30, yhi = -1e30, zlo = 1e30;
+        for(int i=0; i<8; i++) {
+            float p[3] = { i & 1 ? n.hi[0] : n.lo[0],
+                           i & 2 ? n.hi[1] : n.lo[1],
+                           i & 4 ? n.hi[2] : n.lo[2] };
+            double c[4], w[3];
+            clip(p, c);
+            // a box reaching behind the eye cannot be bounded on screen
+            if(c[3] <= 1e-9 || c[2] < -c[3]) return true;
+            window(c, w);
+            xlo = std::min(xlo, w[0]); xhi = (std::max)(xhi, w[0]);
+            ylo = std::min(ylo, w[1]); yhi = (std::max)(yhi, w[1]);
+            zlo = std::min(zlo, w[2]);
+        }
+        return x >= xlo - tol && x <= xhi + tol
+            && y >= ylo - tol && y <= yhi + tol && zlo < best;
+    }
+
+    void segment(const pick_segment &s) {
+        if(s.flags & ~mask) return;
+        double c1[4], c2[4], w1[3], w2[3];
+        clip(s.p[0], c1);
+        clip(s.p[1], c2);
+        // clip to the near plane
+        double d1 = c1[2] + c1[3], d2 = c2[2] + c2[3];
+        if(d1 < 0 && d2 < 0) return;
+        if(d1 < 0 || d2 < 0) {
+            double t = d1 / (d1 - d2);
+            double c[4];
+            for(int i=0; i<4; i++) c[i] = c1[i] + t * (c2[i] - c1[i]);
+            if(d1 < 0) memcpy(c1, c, sizeof(c)); else memcpy(c2, c, sizeof(c));
+        }
+        if(c1[3] <= 1e-9 || c2[3] <= 1e-9) return;
+        window(c1, w1);
+        window(c2, w2);
+        double dx = w2[0] - w1[0], dy = w2[1] - w1[1];
+        double l2 = dx*dx + dy*dy, t = 0;
+        if(l2 > 0) t = (std::max)(0., std::min(1.,
+                    ((x - w1[0]) * dx + (y - w1[1]) * dy) / l2));
+        double px = w1[0] + t * dx - x, py = w1[1] + t * dy - y;
+        if(px*px + py*py > tol*tol) return;
+        double depth = w1[2] + t * (w2[2] - w1[2]);
+        if(depth < 0 || depth >= best) return;
+        best = depth;
+        lineno = s.lineno;
+    }
+
+    void walk(const std::vector<pick_node> &nodes,
+            const std::vector<pick_segment> &segs, int idx) {
+        const pick_node &n = nodes[idx];
+        if(!node_hit(n)) return;
+        if(n.count) {
+            for(int i=n.first; i<n.first+n.count; i++) segment(segs[i]);
+            return;
+        }
+        walk(nodes, segs, idx + 1);
+        walk(nodes, segs, n.right);
+    }
+};
+
+static int PickIndex_init(pyPickIndex *s, PyObject *a, PyObject *k) {
+    if(!PyArg_ParseTuple(a, ":pickindex")) return -1;
+    delete s->segs;
+    delete s->nodes;
+    s->segs = new std::vector<pick_segment>;
+    s->nodes = new std::vector<pick_node>;
+    return 0;
+}
+
+static void PickIndex_dealloc(pyPickIndex *s) {
+    delete s->segs;
+    delete s->nodes;
+    PyObject_Del(s);
+}
+
+static PyObject *PickIndex_lines(pyPickIndex *s, PyObject *o) {
+    const char *geometry;
+    PyObject *store;
+    double z = 0, tolerance = 0;
+    int flags = 0;
+    SegmentStoreView v;
+
+    if(!PyArg_ParseTuple(o, "sO|did:pickindex.lines",
+                &geometry, &store, &z, &flags, &tolerance))
+        return NULL;
+    if(!store_view_arg(store, &v, "pickindex.lines")) return NULL;
+
+    if(tolerance > 0) {
+        pick_simplifier simplifier(s, z, tolerance, flags);
+        store_line_pairs(v, geometry,
+            [&](const double *p1, const double *p2, Py_ssize_t i) {
+                simplifier.add(p1, p2, v.lineno[i]);
+            });
+        simplifier.flush();
+        Py_RETURN_NONE;
+    }
+
+    s->segs->reserve(s->segs->size() + v.nsegs);
+    store_line_pairs(v, geometry,
+        [&](const double *p1, const double *p2, Py_ssize_t i) {
+            pick_add(s, p1, p2, z, v.lineno[i], flags);
+        });
+    Py_RETURN_NONE;
+}
+
+static PyObject *PickIndex_dwells(pyPickIndex *s, PyObject *o) {
+    PyListObject *li;
+    int is_lathe = 0, n;
+    char *geometry;
+    double delta = 0.015625;
+
+    if(!PyArg_ParseTuple(o, "sO!i:pickindex.dwells",
+                &geometry, &PyList_Type, &li, &is_lathe))
+        return NULL;
+
+    for(Py_ssize_t i=0; i<PyList_GET_SIZE(li); i++) {
+        PyObject *it = PyList_GET_ITEM(li, i);
+        double red, green, blue, x, y, z;
+        int axis, k = 0;
+        double pts[2][3];
+        if(!PyArg_ParseTuple(it, "i(ddd)dddi", &n, &red, &green, &blue, &x, &y, &z, &axis))
+            return NULL;
+        if (is_lathe == 1)
+            axis = 1;
+        dwell_cross(x, y, z, axis, delta,
+            [&](double vx, double vy, double vz) {
+                pts[k][0] = vx; pts[k][1] = vy; pts[k][2] = vz;
+                if(++k == 2) {
+                    pick_add(s, pts[0], pts[1], 0, n, 0);
+                    k = 0;
+                }
+            });
+    }
+    Py_RETURN_NONE;
+}
+
+static PyObject *PickIndex_pick(pyPickIndex *s, PyObject *o) {
+    pick_query q;
+    double pm[16], mm[16];
+    GLint vp[4];
+    int rapids = 1;
+    q.tol = 3;
+
+    if(!PyArg_ParseTuple(o, "dd|id:pickindex.pick",
+                &q.x, &q.y, &rapids, &q.tol))
+        return NULL;
+    if(s->segs->empty()) Py_RETURN_NONE;
+    if(s->nodes->empty())
+        pick_build(*s->segs, *s->nodes, 0, s->segs->size());
+
+    glGetDoublev(GL_PROJECTION_MATRIX, pm);
+    glGetDoublev(GL_MODELVIEW_MATRIX, mm);
+    glGetIntegerv(GL_VIEWPORT, vp);
+    for(int i=0; i<4; i++) for(int j=0; j<4; j++) {
+        double t = 0;
+        for(int k=0; k<4; k++) t += pm[k*4+i] * mm[j*4+k];
+        q.m[j*4+i] = t;
+    }
+    for(int i=0; i<4; i++) q.vp[i] = vp[i];
+    q.y = vp[3] - q.y;
+    q.mask = rapids ? PICK_RAPID : 0;
+    q.best = 1;
+    q.lineno = -1;
+
+    q.walk(*s->nodes, *s->segs, 0);
+
+    if(q.lineno < 0) Py_RETURN_NONE;
+    return PyInt_FromLong(q.lineno);
+}
+
+static PyObject *PickIndex_nsegs(pyPickIndex *s, void *) {
+    return PyInt_FromSsize_t(s->segs->size());
+}
+
+static PyGetSetDef PickIndex_getset[] = {
+    {(char*)"nsegs", (getter)PickIndex_nsegs, NULL,
+        (char*)"Number of line pieces in the index"},
+    {NULL},
+};
+
+static PyMethodDef PickIndex_methods[] = {
+    {"lines", (PyCFunction)PickIndex_lines, METH_VARARGS,
+        "Add the segments of a segment store: "
+        "lines(geometry, store, z=0, flags=0, tolerance=0); with a tolerance, "
+        "connected pieces of a line are merged while they stay within it"},
+    {"dwells", (PyCFunction)PickIndex_dwells, METH_VARARGS,
+        "Add dwell markers in the 'rs274.glcanon' format"},
+    {"pick", (PyCFunction)PickIndex_pick, METH_VARARGS,
+        "Return the line number drawn nearest the viewer at window position "
+        "x, y in the current GL view, or None: pick(x, y, rapids=1, tolerance=3)"},
+    {NULL, NULL, 0, NULL},
+};
+
+static PyTypeObject PickIndexType = {
+    PyObject_HEAD_INIT(NULL)
+    0,                      /*ob_size*/
+    "linuxcnc.pickindex",   /*tp_name*/
+    sizeof(pyPickIndex),    /*tp_basicsize*/
+    0,                      /*tp_itemsize*/
+    /* methods */
+    (destructor)PickIndex_dealloc, /*tp_dealloc*/
+    0,                      /*tp_print*/
+    0,                      /*tp_getattr*/
+    0,                      /*tp_setattr*/
+    0,                      /*tp_compare*/
+    0,                      /*tp_repr*/
+    0,                      /*tp_as_number*/
+    0,                      /*tp_as_sequence*/
+    0,                      /*tp_as_mapping*/
+    0,                      /*tp_hash*/
+    0,                      /*tp_call*/
+    0,                      /*tp_str*/
+    0,                      /*tp_getattro*/
+    0,                      /*tp_setattro*/
+    0,                      /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT,     /*tp_flags*/
+    0,                      /*tp_doc*/
+    0,                      /*tp_traverse*/
+    0,                      /*tp_clear*/
+    0,                      /*tp_richcompare*/
+    0,                      /*tp_weaklistoffset*/
+    0,                      /*tp_iter*/
+    0,                      /*tp_iternext*/
+    PickIndex_methods,      /*tp_methods*/
+    0,                      /*tp_members*/
+    PickIndex_getset,       /*tp_getset*/
+    0,                      /*tp_base*/
+    0,                      /*tp_dict*/
+    0,                      /*tp_descr_get*/
+    0,                      /*tp_descr_set*/
+    0,                      /*tp_dictoffset*/
+    (initproc)PickIndex_init, /*tp_init*/
+    0,                      /*tp_alloc*/
+    PyType_GenericNew,      /*tp_new*/
+    0,                      /*tp_free*/
+    0,                      /*tp_is_gc*/
+};
+
 static PyMethodDef emc_methods[] = {
 #define METH(name, doc) { #name, (PyCFunction) py##name, METH_VARARGS, doc }
 METH(draw_lines, "Draw a bunch of lines in the 'rs274.glcanon' format"),
@@ -2220,7 +3662,19 @@ initlinuxcnc(void) {
     PyModule_AddObject(m, "error", error);
 
     PyType_Ready(&PositionLoggerType);
+    {
+        PyObject *point_format = PyString_FromString("=3f4B3f4B");
+        PyDict_SetItemString(PositionLoggerType.tp_dict, "point_format",
+            point_format);
+        Py_XDECREF(point_format);
+    }
     PyModule_AddObject(m, "positionlogger", (PyObject*)&PositionLoggerType);
+    PyType_Ready(&PositionRecorderType);
+    PyModule_AddObject(m, "positionrecorder", (PyObject*)&PositionRecorderType);
+    PyType_Ready(&LineBufferType);
+    PyModule_AddObject(m, "linebuffer", (PyObject*)&LineBufferType);
+    PyType_Ready(&PickIndexType);
+    PyModule_AddObject(m, "pickindex", (PyObject*)&PickIndexType);
     pthread_mutex_init(&mutex, NULL);
 
     PyModule_AddStringConstant(m, "PREFIX", EMC2_HOME);
@@ -20,12 +20,15 @@
 """\
 axis-remote: trigger commands in a running AXIS GUI
 
-Usage: axis-remote --clear|--ping|--reload|--quit|--mdi command|filename
-       axis-remote -c|-p|-r|-q|-m command|filename"""
+Usage: axis-remote --clear|--ping|--reload|--quit|--timing|--mdi command|filename
+       axis-remote -c|-p|-r|-q|-t|-m command|filename
+
+--timing prints how long each phase of loading the last program took, as
+JSON."""
 
 import sys, getopt, Tkinter, os
 
-UNSPECIFIED, OPEN, RELOAD, PING, CLEAR, MDI, QUIT = range(7)
+UNSPECIFIED, OPEN, RELOAD, PING, CLEAR, MDI, QUIT, TIMING = range(8)
 mode = UNSPECIFIED
 
 def usage(exitval=0):
@@ -33,8 +36,9 @@ def usage(exitval=0):
     raise SystemExit, exitval
 
 try:
-    opts, args = getopt.getopt(sys.argv[1:], "h?prqcm",
-                        ['help','ping', 'reload', 'quit', 'clear', 'mdi'])
+    opts, args = getopt.getopt(sys.argv[1:], "h?prqcmt",
+                        ['help','ping', 'reload', 'quit', 'clear', 'mdi',
+                         'timing'])
 except getopt.GetoptError, detail:
     print detail
     usage(99)
@@ -62,6 +66,10 @@ for o, a in opts:
         if mode != UNSPECIFIED:
             usage(99)
         mode = MDI
+    elif o in ('-t', '--timing'):
+        if mode != UNSPECIFIED:
+            usage(99)
+        mode = TIMING
 if mode == UNSPECIFIED:
     mode = OPEN
 
@@ -96,6 +104,8 @@ try:
         msg = t.tk.call("send", "axis", ("remote","clear_live_plot"))
     elif mode == QUIT:
         msg = t.tk.call("send", "axis", ("remote","destroy"))
+    elif mode == TIMING:
+        print t.tk.call("send", "axis", ("remote","load_timing"))
 except Tkinter.TclError,detail:
     raise SystemExit,detail
 
@@ -33,7 +33,9 @@ sys.excepthook = sys.__excepthook__
 import gettext;
 gettext.install("linuxcnc", localedir=os.path.join(BASE, "share", "locale"), unicode=True)
 
-import array, time, atexit, tempfile, shutil, errno, thread, select, re, getopt
+import array, time, atexit, tempfile, shutil, errno, thread, threading, select, re, getopt
+import json
+import signal
 import traceback
 
 # Print Tk errors to stdout. python.org/sf/639266
@@ -59,7 +61,9 @@ import gcode
 sys.setdlopenflags(old_flags)
 from rs274.OpenGLTk import *
 from rs274.interpret import StatMixin
-from rs274.glcanon import GLCanon, GlCanonDraw
+from rs274.glcanon import GLCanon, GlCanonDraw, live_plot_options
+from rs274.programtext import ProgramView
+from rs274 import runtime
 from hershey import Hershey
 from propertywindow import properties
 import rs274.options
@@ -114,6 +118,7 @@ if sys.argv[1] != "-ini":
     raise SystemExit, "-ini must be first argument"
 
 inifile = linuxcnc.ini(sys.argv[2])
+time_limits = runtime.limits_from_ini(inifile)
 
 ap = AxisPreferences()
 
@@ -466,13 +471,13 @@ class MyOpengl(GlCanonDraw, Opengl):
 
     def set_current_line(self, line):
         if line == vars.running_line.get(): return
-        t.tag_remove("executing", "0.0", "end")
+        program_view.clear_tag("executing")
         if line is not None and line > 0:
             vupdate(vars.running_line, line)
             if vars.highlight_line.get() <= 0:
-                t.see("%d.0" % (line+2))
-                t.see("%d.0" % line)
-            t.tag_add("executing", "%d.0" % line, "%d.end" % line)
+                program_view.see(line+2)
+                program_view.see(line)
+            program_view.set_tag("executing", line)
         else:
             vupdate(vars.running_line, 0)
 
@@ -482,11 +487,11 @@ class MyOpengl(GlCanonDraw, Opengl):
     def set_highlight_line(self, line):
         if line == self.get_highlight_line(): return
         GlCanonDraw.set_highlight_line(self, line)
-        t.tag_remove("sel", "0.0", "end")
+        program_view.clear_tag("sel")
         if line is not None and line > 0:
-            t.see("%d.0" % (line+2))
-            t.see("%d.0" % line)
-            t.tag_add("sel", "%d.0" % line, "%d.end" % line)
+            program_view.see(line+2)
+            program_view.see(line)
+            program_view.set_tag("sel", line)
             vupdate(vars.highlight_line, line)
         else:
             vupdate(vars.highlight_line, -1)
@@ -634,8 +639,7 @@ def toggle_perspective(e):
     o.tkRedraw()
 
 def select_line(event):
-    i = t.index("@%d,%d" % (event.x, event.y))
-    i = int(i.split('.')[0])
+    i = program_view.line_at(event.x, event.y)
     o.set_highlight_line(i)
     o.tkRedraw()
     return "break"
@@ -647,26 +651,32 @@ def release_select_line(event):
     return "break"
 
 def select_prev(event):
-    if o.highlight_line is None:
-        i = o.last_line
-    else:
-        i = max(1, o.highlight_line - 1)
+    i = o.canon and o.canon.adjacent_motion_line(o.highlight_line, -1)
+    if not i:
+        if o.highlight_line is None:
+            i = o.last_line
+        else:
+            i = max(1, o.highlight_line - 1)
     o.set_highlight_line(i)
     o.tkRedraw()
 
 def select_next(event):
-    if o.highlight_line is None:
-        i = 1
-    else:
-        i = min(o.last_line, o.highlight_line + 1)
+    i = o.canon and o.canon.adjacent_motion_line(o.highlight_line, 1)
+    if not i:
+        if o.highlight_line is None:
+            i = 1
+        else:
+            i = min(o.last_line, o.highlight_line + 1)
     o.set_highlight_line(i)
     o.tkRedraw()
 
 def scroll_up(event):
-    t.yview_scroll(-2, "units")
+    program_view.scroll(-2)
+    return "break"
 
 def scroll_down(event):
-    t.yview_scroll(2, "units")
+    program_view.scroll(2)
+    return "break"
 
 current_tool = None
 
@@ -688,6 +698,7 @@ class LivePlotter:
         self.lastpts = -1
         self.last_speed = -1
         self.last_limit = None
+        self.recorder = None
         self.last_motion_mode = None
         self.last_joint_position = None
         self.notifications_clear = False
@@ -716,9 +727,18 @@ class LivePlotter:
             C('backplotarc'),
             C('backplottoolchange'),
             C('backplotprobing'),
-            geometry, foam
+            geometry, foam, **live_plot_options(inifile)
         )
         o.after_idle(lambda: thread.start_new_thread(self.logger.start, (.01,)))
+        if position_record:
+            try:
+                self.recorder = linuxcnc.positionrecorder(linuxcnc.stat(),
+                    position_record)
+            except (IOError, ValueError), detail:
+                print >>sys.stderr, "position record:", detail
+            else:
+                thread.start_new_thread(self.recorder.start,
+                    (position_record_interval,))
 
         global feedrate_blackout, rapidrate_blackout, spindlerate_blackout, maxvel_blackout
         feedrate_blackout=rapidrate_blackout=spindlerate_blackout=maxvel_blackout=time.time()+1
@@ -735,6 +755,9 @@ class LivePlotter:
             self.win.after_cancel(self.error_after)
             self.error_after = None
         self.logger.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
         self.running.set(True)
 
     def error_task(self):
@@ -793,7 +816,7 @@ class LivePlotter:
         limits = soft_limits()
 
         if (   self.stat.tool_offset   != o.last_tool_offset
-            or self.stat.tool_table[0] != o.last_tool):
+            or self.stat.pocket(0) != o.last_tool):
             o.redraw_dro()
         if (self.logger.npts != self.lastpts
                 or limits != o.last_limits
@@ -806,7 +829,7 @@ class LivePlotter:
                 or self.stat.rotation_xy != o.last_rotation_xy
                 or self.stat.limit != o.last_limit
                 or self.stat.tool_offset != o.last_tool_offset
-                or self.stat.tool_table[0] != o.last_tool
+                or self.stat.pocket(0) != o.last_tool
                 or self.stat.motion_mode != self.last_motion_mode
                 or abs(speed - self.last_speed) > .01):
             o.redraw_soon()
@@ -819,7 +842,7 @@ class LivePlotter:
             o.last_g5x_index = self.stat.g5x_index
             o.last_rotation_xy = self.stat.rotation_xy
             self.last_motion_mode = self.stat.motion_mode
-            o.last_tool = self.stat.tool_table[0]
+            o.last_tool = self.stat.pocket(0)
             o.last_tool_offset = self.stat.tool_offset
             o.last_joint_position = self.stat.joint_actual_position
             self.last_speed = speed
@@ -884,7 +907,7 @@ class LivePlotter:
                 break
         vupdate(vars.on_any_limit, on_any_limit)
         global current_tool
-        current_tool = self.stat.tool_table[0]
+        current_tool = self.stat.pocket(0)
         if current_tool:
             tool_data = {'tool': current_tool[0], 'zo': current_tool[3], 'xo': current_tool[1], 'dia': current_tool[10]}
         if current_tool is None:
@@ -1034,6 +1057,8 @@ class Progress:
                 "-text", text)
 
 class AxisCanon(GLCanon, StatMixin):
+    checkpoint_exclude = GLCanon.checkpoint_exclude | frozenset(['pending_notify'])
+
     def __init__(self, widget, text, linecount, progress, arcdivision):
         GLCanon.__init__(self, widget.colors, geometry, foam)
         StatMixin.__init__(self, s, random_toolchanger)
@@ -1042,6 +1067,7 @@ class AxisCanon(GLCanon, StatMixin):
         self.progress = progress
         self.aborted = False
         self.arcdivision = arcdivision
+        self.pending_notify = []
 
     def change_tool(self, pocket):
         GLCanon.change_tool(self, pocket)
@@ -1052,17 +1078,23 @@ class AxisCanon(GLCanon, StatMixin):
     def do_cancel(self, event):
         self.aborted = True
 
+    # The preview is parsed on a worker thread (see open_file_guts), so
+    # these must not call into Tk; the GUI thread picks up lineno and
+    # pending_notify while it waits.
     def check_abort(self):
-        root_window.update()
         if self.aborted: raise KeyboardInterrupt
 
     def next_line(self, st):
         GLCanon.next_line(self, st)
-        self.progress.update(self.lineno)
         if self.notify:
-            notifications.add("info",self.notify_message)
+            self.pending_notify.append(self.notify_message)
             self.notify = 0
 
+    def show_progress(self):
+        self.progress.update(self.lineno)
+        while self.pending_notify:
+            notifications.add("info", self.pending_notify.pop(0))
+
 
 progress_re = re.compile("^FILTER_PROGRESS=(\\d*)$")
 def filter_program(program_filter, infilename, outfilename):
@@ -1102,6 +1134,104 @@ def filter_program(program_filter, infilename, outfilename):
     finally:
         progress.done()
 
+class FilterStream:
+    """Run a filter program, saving its output to 'outfilename' while the
+    preview parses it (the canon's parse_stream; see gcode.parse).
+
+    'written' is how many bytes of whole lines have been saved.  It stays
+    0 until a line with something on it has arrived, because the
+    interpreter reads up to the first such line when it opens the file.
+    'finished' is set once the filter has closed its output.  'opened' is
+    set once task has opened the output."""
+    def __init__(self, program_filter, infilename, outfilename):
+        import subprocess
+        self.outfile = open(outfilename, "w")
+        infilename_q = infilename.replace("'", "'\\''")
+        env = dict(os.environ)
+        env['AXIS_PROGRESS_BAR'] = '1'
+        self.p = subprocess.Popen(
+                ["sh", "-c", "%s '%s'" % (program_filter, infilename_q)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                preexec_fn=os.setsid)
+        self.p.stdin.close()  # No input for you
+        self.written = 0
+        self.finished = False
+        self.opened = False
+        self.stderr_text = []
+        self.thread = threading.Thread(target=self.copy, name="filter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def copy(self):
+        fd = self.p.stdout.fileno()
+        size = 0
+        head = ""
+        try:
+            while 1:
+                data = os.read(fd, 65536)
+                if not data: break
+                self.outfile.write(data)
+                size += len(data)
+                nl = data.rfind("\n")
+                if nl == -1:
+                    if head is not None: head += data
+                    continue
+                if head is not None:
+                    if not (head + data[:nl]).strip():
+                        head = data[nl+1:]
+                        continue
+                    head = None
+                self.outfile.flush()
+                self.written = size - (len(data) - nl - 1)
+        finally:
+            self.outfile.close()
+            self.written = size
+            self.finished = True
+
+    def poll(self, progress):
+        """Show FILTER_PROGRESS and pass on anything else on stderr"""
+        while select.select([self.p.stderr], [], [], 0)[0]:
+            line = self.p.stderr.readline()
+            if not line: break
+            self.stderr_line(line, progress)
+
+    def stderr_line(self, line, progress=None):
+        m = progress_re.match(line)
+        if m:
+            if progress: progress.update(int(m.group(1)), 1)
+        else:
+            self.stderr_text.append(line)
+            sys.stderr.write(line)
+
+    def cancel(self):
+        # the filter may be more than one process; stop them all so that
+        # its output is closed
+        if self.p.poll() is None:
+            try:
+                os.killpg(self.p.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def finish(self):
+        """Wait for the filter to exit; returns the exit code and the
+        text it wrote to stderr"""
+        self.thread.join()
+        for line in self.p.stderr:
+            self.stderr_line(line)
+        self.p.wait()
+        return self.p.returncode, "".join(self.stderr_text)
+
+def filter_failed(program_filter, exitcode, stderr):
+    root_window.tk.call("nf_dialog", (".error", "-ext", stderr),
+            _("Filter failed"),
+            _("The program %(program)r exited with code %(code)d.  "
+            "Any error messages it produced are shown below:")
+                % {'program': program_filter, 'code': exitcode},
+            "error",0,_("OK"))
+
 def get_filter(filename):
     ext = os.path.splitext(filename)[1]
     if ext:
@@ -1126,7 +1256,11 @@ def cancel_open(event=None):
         o.canon.aborted = True
 
 loaded_file = None
-def open_file_guts(f, filtered=False, addrecent=True):
+def open_file_guts(f, filtered=False, addrecent=True, stream=None):
+    if filtered:
+        timing = o.continue_load_timing(f)
+    else:
+        timing = o.begin_load_timing(f)
     s.poll()
     save_task_mode = s.task_mode
     ensure_mode(linuxcnc.MODE_MANUAL)
@@ -1134,52 +1268,62 @@ def open_file_guts(f, filtered=False, addrecent=True):
         add_recent_file(f)
     if not filtered:
         global loaded_file
+        previous_file = loaded_file
         loaded_file = f
         program_filter = get_filter(f)
         if program_filter:
             tempfile = os.path.join(tempdir, os.path.basename(f))
-            exitcode, stderr = filter_program(program_filter, f, tempfile)
+            # the filter rewrites tempfile, which may be the program shown
+            program_view.close()
+            if filter_streaming:
+                ensure_mode(save_task_mode)
+                stream = FilterStream(program_filter, f, tempfile)
+                open_file_guts(tempfile, True, False, stream)
+                if not stream.opened:
+                    # task still has the program it had before, so show
+                    # no program rather than one that would not be run
+                    loaded_file = previous_file
+                    o.set_canon(None)
+                    o.stale_program_dlists()
+                    program_view.close()
+                return
+            with timing.phase("filter"):
+                exitcode, stderr = filter_program(program_filter, f, tempfile)
             if exitcode:
-                root_window.tk.call("nf_dialog", (".error", "-ext", stderr),
-                        _("Filter failed"),
-                        _("The program %(program)r exited with code %(code)d.  "
-                        "Any error messages it produced are shown below:")
-                            % {'program': program_filter, 'code': exitcode},
-                        "error",0,_("OK"))
+                loaded_file = previous_file
+                filter_failed(program_filter, exitcode, stderr)
                 return
             ensure_mode(save_task_mode)
             return open_file_guts(tempfile, True, False)
 
     ensure_mode(save_task_mode)
     set_first_line(0)
-    t0 = time.time()
 
     canon = None
     o.deselect(None) # remove highlight line from last program
     try:
         # Force a sync of the interpreter, which writes out the var file.
-        c.task_plan_synch()
-        c.wait_complete()
-        c.program_open(f)
-        lines = open(f).readlines()
-        progress = Progress(2, len(lines))
-        t.configure(state="normal")
-        t.tk.call("delete_all", t)
-        code = []
-        i = 0
-        for i, l in enumerate(lines):
-            l = l.expandtabs().replace("\r", "")
-            #t.insert("end", "%6d: " % (i+1), "lineno", l)
-            code.extend(["%6d: " % (i+1), "lineno", l, ""])
-            if i % 1000 == 0:
-                t.insert("end", *code)
-                del code[:]
-                progress.update(i)
-        if code:
-            t.insert("end", *code)
-        progress.nextphase(len(lines))
+        with timing.phase("synch"):
+            c.task_plan_synch()
+            c.wait_complete()
         f = os.path.abspath(f)
-        o.canon = canon = AxisCanon(o, widgets.text, i, progress, arcdivision)
+        if stream is None:
+            with timing.phase("program_open"):
+                c.program_open(f)
+            with timing.phase("text"):
+                program = program_view.load(f)
+            progress = Progress(1, program.estimate())
+            o.canon = canon = AxisCanon(o, widgets.text, program.estimate(),
+                                        progress, arcdivision)
+            # the output of a filter is a temporary file
+            canon.compiled_preview = not filtered
+        else:
+            # task opens the program once the filter has finished with it
+            progress = Progress(1, 100)
+            progress.set_text(_("Filtering..."))
+            o.canon = canon = AxisCanon(o, widgets.text, 0, DummyProgress(),
+                                        arcdivision)
+            canon.parse_stream = stream
         root_window.bind_class(".info.progress", "<Escape>", cancel_open)
 
         parameter = inifile.find("RS274NGC", "PARAMETER_FILE")
@@ -1235,10 +1379,52 @@ def open_file_guts(f, filtered=False, addrecent=True):
                 if i in (0,1): continue
                 if m == -1: continue
                 initcodes.append("M%d" % m)
+        loader = o.start_preview(f, canon, initcodes, interpname)
         try:
-            result, seq = o.load_preview(f, canon, initcodes, interpname)
-        except KeyboardInterrupt:
-            result, seq = 0, 0
+            while 1:
+                done = o.poll_preview()
+                if done is not False and done is not True: break
+                if done: o.tkRedraw()
+                root_window.update()
+                if stream: stream.poll(progress)
+                canon.show_progress()
+                time.sleep(.02)
+            if stream:
+                # the rest of the time the filter takes after the parse
+                with timing.phase("filter"):
+                    while not stream.finished and not canon.aborted:
+                        root_window.update()
+                        stream.poll(progress)
+                        time.sleep(.02)
+        finally:
+            o.cancel_preview()
+            if stream and (canon.aborted or loader.exc_info):
+                stream.cancel()
+        canon.show_progress()
+        if stream:
+            with timing.phase("filter"):
+                exitcode, stderr = stream.finish()
+            canon.parse_stream = None
+            if loader.exc_info:
+                pass    # raised and reported below
+            elif canon.aborted:
+                notifications.add("info",
+                    _("Opening %s was cancelled") % os.path.basename(loaded_file))
+                return
+            elif exitcode:
+                o.set_canon(None)
+                o.stale_program_dlists()
+                filter_failed(get_filter(loaded_file), exitcode, stderr)
+                return
+            else:
+                with timing.phase("program_open"):
+                    c.program_open(f)
+                stream.opened = True
+                with timing.phase("text"):
+                    program_view.load(f)
+        if loader.exc_info:
+            raise loader.exc_info[0], loader.exc_info[1], loader.exc_info[2]
+        result, seq = loader.result or (0, 0)
         # According to the documentation, MIN_ERROR is the largest value that is
         # not an error.  Crazy though that sounds...
         if result > gcode.MIN_ERROR:
@@ -1248,11 +1434,11 @@ def open_file_guts(f, filtered=False, addrecent=True):
                     _("Near line %(seq)d of %(f)s:\n%(error_str)s") % {'seq': seq, 'f': f, 'error_str': error_str},
                     "error",0,_("OK"))
 
-        t.configure(state="disabled")
         o.lp.set_depth(from_internal_linear_unit(o.get_foam_z()),
                        from_internal_linear_unit(o.get_foam_w()))
 
     except Exception, e:
+        if o.load_timing is not None: o.load_timing.fail(sys.exc_info())
         notifications.add("error", str(e))
     finally:
         # Before unbusying, I update again, so that any keystroke events
@@ -1262,7 +1448,6 @@ def open_file_guts(f, filtered=False, addrecent=True):
         # widget is destroyed and focus has passed to some other widget,
         # which will handle the keystrokes instead, leading to the
         # R-while-loading bug.
-        #print "load_time", time.time() - t0
         root_window.update()
         root_window.tk.call("destroy", ".info.progress")
         root_window.tk.call("grab", "release", ".info.progress")
@@ -1286,6 +1471,7 @@ widget_list=[
        ("help_window", Toplevel, ".keys"),
        ("about_window", Toplevel, ".about"),
        ("text", Text, pane_bottom + ".t.text"),
+       ("text_scroll", Scrollbar, pane_bottom + ".t.sb"),
        ("preview_frame", Frame, tabs_preview),
        ("numbers_text", Text, tabs_numbers + ".text"),
        ("tabs", bwidget.NoteBook, pane_top + ".tabs"),
@@ -1396,9 +1582,9 @@ def activate_ja_widget(i, force=0):
 def set_first_line(lineno):
     global program_start_line
     program_start_line = lineno
-    t.tag_remove("ignored", "0.0", "end")
-    if lineno > 0:
-        t.tag_add("ignored", "0.0", "%d.end" % (lineno-1))
+    program_view.clear_tag("ignored")
+    if lineno > 1:
+        program_view.set_tag("ignored", 1, lineno-1)
 
 def parse_increment(jogincr):
     if jogincr.endswith("mm"):
@@ -1757,7 +1943,8 @@ property_names = [
     ('name', _("Name:")), ('size', _("Size:")),
     ('tools', _("Tool order:")), ('g0', _("Rapid distance:")),
     ('g1', _("Feed distance:")), ('g', _("Total distance:")),
-    ('run', _("Run time:")), ('x', _("X bounds:")),
+    ('run', _("Run time:")), ('slow', _("Longest lines:")),
+    ('x', _("X bounds:")),
     ('y', _("Y bounds:")), ('z', _("Z bounds:")),
     ('a', _("A bounds:")), ('b', _("B bounds:")),
     ('c', _("C bounds:"))
@@ -1766,6 +1953,11 @@ property_names = [
 def dist((x,y,z),(p,q,r)):
     return ((x-p)**2 + (y-q)**2 + (z-r)**2) ** .5
 
+def format_time(t):
+    if t > 120:
+        return _("%.1f minutes") % (t/60)
+    return _("%d seconds") % (int(t))
+
 # returns units/sec
 def get_jog_speed(a):
     if vars.teleop_mode.get():
@@ -1976,7 +2168,7 @@ class TclCommands(nf.TclCommands):
                 props['name'] = name
 
             size = os.stat(loaded_file).st_size
-            lines = int(widgets.text.index("end").split(".")[0])-2
+            lines = program_view.lines()
             props['size'] = _("%(size)s bytes\n%(lines)s gcode lines") % {'size': size, 'lines': lines}
 
             if vars.metric.get():
@@ -1988,24 +2180,26 @@ class TclCommands(nf.TclCommands):
                 units = _("in")
                 fmt = "%.4f"
 
-            mf = vars.max_speed.get()
-            #print o.canon.traverse[0]
-
             g0 = sum(dist(l[1][:3], l[2][:3]) for l in o.canon.traverse)
             g1 = (sum(dist(l[1][:3], l[2][:3]) for l in o.canon.feed) +
                 sum(dist(l[1][:3], l[2][:3]) for l in o.canon.arcfeed))
-            gt = (sum(dist(l[1][:3], l[2][:3])/min(mf, l[3]) for l in o.canon.feed) +
-                sum(dist(l[1][:3], l[2][:3])/min(mf, l[3])  for l in o.canon.arcfeed) +
-                sum(dist(l[1][:3], l[2][:3])/mf  for l in o.canon.traverse) +
-                o.canon.dwell_time
-                )
+            estimate = runtime.estimate(o.canon, time_limits)
 
             props['g0'] = "%f %s".replace("%f", fmt) % (from_internal_linear_unit(g0, conv), units)
             props['g1'] = "%f %s".replace("%f", fmt) % (from_internal_linear_unit(g1, conv), units)
-            if gt > 120:
-                props['run'] = _("%.1f minutes") % (gt/60)
-            else:
-                props['run'] = _("%d seconds") % (int(gt))
+            props['run'] = format_time(estimate.total)
+            tools = []
+            for tool, secs in estimate.by_tool():
+                if tool is None: tool = s.tool_in_spindle
+                tools.append(_("T%(tool)d: %(time)s") % {'tool': tool,
+                    'time': format_time(secs)})
+            if tools:
+                props['tools'] = "\n".join(tools)
+            by_line = estimate.by_line()
+            slow = sorted(by_line, key=by_line.get, reverse=True)[:5]
+            if slow:
+                props['slow'] = "\n".join(_("%(line)d: %(time)s") % {
+                    'line': l, 'time': format_time(by_line[l])} for l in slow)
 
             min_extents = from_internal_units(o.canon.min_extents, conv)
             max_extents = from_internal_units(o.canon.max_extents, conv)
@@ -2060,7 +2254,7 @@ class TclCommands(nf.TclCommands):
         if vars.running_line.get() != -1: line = vars.running_line.get()
         if vars.highlight_line.get() != -1: line = vars.highlight_line.get()
         if line == -1: return
-        selection.set_value(t.get("%d.8" % line, "%d.end" % line))
+        selection.set_value(program_view.line(line) or "")
 
     def task_run_line(*args):
         line = vars.highlight_line.get()
@@ -2178,6 +2372,9 @@ class TclCommands(nf.TclCommands):
         if cmd == "clear_live_plot":
             commands.clear_live_plot()
             return ""
+        if cmd == "load_timing":
+            if o.load_timing is None: return "{}"
+            return json.dumps(o.load_timing.report(), sort_keys=True)
         if running():
             return _("axis cannot accept remote command while running")
         if cmd == "open_file_name":
@@ -2275,7 +2472,7 @@ class TclCommands(nf.TclCommands):
         ensure_mode(linuxcnc.MODE_AUTO)
         c.auto(linuxcnc.AUTO_RUN, program_start_line)
         program_start_line = 0
-        t.tag_remove("ignored", "0.0", "end")
+        program_view.clear_tag("ignored")
         o.set_highlight_line(None)
 
     def task_step(*event):
@@ -2551,6 +2748,11 @@ class TclCommands(nf.TclCommands):
         ap.putpref("grid_size", vars.grid_size.get(), type=float)
         o.tkRedraw()
 
+    def set_preview_color(*event):
+        ap.putpref("preview_color", vars.preview_color.get(), type=str)
+        o.set_preview_color(vars.preview_color.get())
+        o.tkRedraw()
+
     def set_grid_size_custom(*event):
         if vars.metric.get(): unit_str = " " + _("mm")
         else: unit_str = " " + _("in")
@@ -2895,9 +3097,10 @@ class TclCommands(nf.TclCommands):
     def goto_sensible_line():
         line = o.get_highlight_line()
         if not line: line = vars.running_line.get()
+        program_view.refresh()
         if line is not None and line > 0:
-            t.see("%d.0" % (line+2))
-            t.see("%d.0" % line)
+            program_view.see(line+2)
+            program_view.see(line)
 
     def dynamic_tab(name, text):
         return _dynamic_tab(name,text) # caller: make a frame and pack
@@ -2942,6 +3145,7 @@ vars = nf.Variables(root_window,
     ("dro_large_font", IntVar),
     ("show_pyvcppanel", IntVar),
     ("show_rapids", IntVar),
+    ("preview_color", StringVar),
     ("feedrate", IntVar),
     ("rapidrate", IntVar),
     ("spindlerate", IntVar),
@@ -3262,6 +3466,7 @@ vars.machine.set(inifile.find("EMC", "MACHINE"))
 extensions = inifile.findall("FILTER", "PROGRAM_EXTENSION")
 extensions = [e.split(None, 1) for e in extensions]
 extensions = tuple([(v, tuple(k.split(","))) for k, v in extensions])
+filter_streaming = int(inifile.find("FILTER", "STREAMING") or 0)
 postgui_halfile = inifile.find("HAL", "POSTGUI_HALFILE")
 max_feed_override = float(inifile.find("DISPLAY", "MAX_FEED_OVERRIDE") or 1.0)
 max_spindle_override = float(inifile.find("DISPLAY", "MAX_SPINDLE_OVERRIDE") or max_feed_override)
@@ -3408,6 +3613,11 @@ coordinate_display = inifile.find("DISPLAY", "POSITION_UNITS")
 lathe = bool(inifile.find("DISPLAY", "LATHE"))
 lathe_backtool = bool(inifile.find("DISPLAY", "BACK_TOOL_LATHE"))
 foam = bool(inifile.find("DISPLAY", "FOAM"))
+position_record = inifile.find("DISPLAY", "POSITION_RECORD")
+if position_record:
+    position_record = os.path.expanduser(position_record)
+position_record_interval = float(
+    inifile.find("DISPLAY", "POSITION_RECORD_INTERVAL") or .01)
 editor = inifile.find("DISPLAY", "EDITOR")
 vars.has_editor.set(editor is not None)
 tooleditor = inifile.find("DISPLAY", "TOOL_EDITOR") or "tooledit"
@@ -3713,6 +3923,11 @@ c.wait_complete()
 o = MyOpengl(widgets.preview_frame, width=400, height=300, double=1, depth=1)
 o.last_line = 1
 o.pack(fill="both", expand=1)
+vars.preview_color.set(ap.getpref("preview_color", o.preview_color, type=str))
+if vars.preview_color.get() in o.preview_colors:
+    o.preview_color = vars.preview_color.get()
+else:
+    vars.preview_color.set(o.preview_color)
 
 def match_grid_size(v):
     for idx in range(3, widgets.menu_grid.index("end")+1):
@@ -3792,6 +4007,7 @@ def rClicker(e):
     return "break"
 
 t = widgets.text
+program_view = ProgramView(t, widgets.text_scroll)
 t.bind('<Button-3>', rClicker) #allow right-click to select start from line
 t.tag_configure("ignored", background="#ffffff", foreground="#808080")
 t.tag_configure("lineno", foreground="#808080")
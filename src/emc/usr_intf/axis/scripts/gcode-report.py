@@ -0,0 +1,350 @@
+#!/usr/bin/env python2
+#    This is a component of AXIS, a front-end for LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""\
+gcode-report: parse G-code programs without a GUI and report on them
+
+Usage: gcode-report [options] INIFILE PROGRAM|DIRECTORY...
+
+Each program is parsed as AXIS would preview it on the machine described
+by INIFILE.  Directories are searched for programs with the given
+extensions.  The report gives each program's extents, any soft limit it
+goes past, segment counts, tool changes, dwells, parse errors and an
+estimate of the run time, in total and for each tool, from the velocity
+and acceleration limits in INIFILE.
+
+Options:
+    -j, --jobs N            parse N programs at once (default: one per CPU)
+    -f, --format json|csv   output format (default: json)
+    -o, --output FILE       write the report to FILE instead of stdout
+    -e, --extensions LIST   comma separated extensions to look for in
+                            directories (default: .ngc,.nc,.tap)
+    -b, --block-delete      honour block delete (/) as AXIS does when it
+                            is switched on
+    -t, --tool-change SECS  add SECS to the run time for each tool change
+    -l, --line-times        give the run time of each line (json only)"""
+
+import sys, os, getopt, time, shutil, tempfile, signal, json, csv
+import multiprocessing
+import linuxcnc
+import gcode
+from rs274.previewcanon import PreviewCanon
+from rs274.interpret import StatMixin
+from rs274 import runtime
+
+def usage(exitval=0):
+    print __doc__
+    raise SystemExit, exitval
+
+EMPTY_TOOL = (-1, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0)
+
+def read_tool_table(filename, random_toolchanger):
+    """Read a tool table file into the pocket-indexed list that
+    linuxcnc.stat.tool_table would give, as loadToolTable does"""
+    tools = [EMPTY_TOOL]
+    if not filename or not os.path.exists(filename): return tools
+    fakepocket = 0
+    for line in open(filename):
+        line = line.split(";", 1)[0]
+        toolno, pocket = -1, None
+        offset = [0.0] * 9
+        diameter = frontangle = backangle = 0.0
+        orientation = 0
+        try:
+            for word in line.split():
+                letter, value = word[0].upper(), word[1:]
+                if letter == 'T': toolno = int(value)
+                elif letter == 'P': pocket = int(value)
+                elif letter == 'D': diameter = float(value)
+                elif letter == 'I': frontangle = float(value)
+                elif letter == 'J': backangle = float(value)
+                elif letter == 'Q': orientation = int(value)
+                elif letter in "XYZABCUVW":
+                    offset["XYZABCUVW".index(letter)] = float(value)
+        except ValueError:
+            continue
+        if pocket is None: continue
+        if not random_toolchanger:
+            fakepocket += 1
+            pocket = fakepocket
+        if pocket < 0: continue
+        while len(tools) <= pocket:
+            tools.append(EMPTY_TOOL)
+        tools[pocket] = tuple([toolno] + offset +
+                [diameter, frontangle, backangle, orientation])
+    return tools
+
+class Machine:
+    """What the report needs to know about the machine, from the ini
+    file.  It stands in for linuxcnc.stat for StatMixin."""
+    def __init__(self, inifile):
+        self.inifile = inifile
+        inidir = os.path.dirname(os.path.abspath(inifile))
+        ini = linuxcnc.ini(inifile)
+        def path(name):
+            if name: return os.path.join(inidir, os.path.expanduser(name))
+        # machine units per mm, like stat.linear_units
+        self.linear_units = runtime.linear_units_per_mm(
+            ini.find("TRAJ", "LINEAR_UNITS") or "inch")
+        self.metric = abs(self.linear_units - 1) < 1e-6
+        self.angular_units = 1.0
+        self.block_delete = 0
+        coordinates = (ini.find("TRAJ", "COORDINATES") or "XYZ").upper()
+        self.axis_mask = 0
+        self.limits = []
+        for i, letter in enumerate("XYZABCUVW"):
+            if letter not in coordinates: continue
+            self.axis_mask |= 1 << i
+            if i >= 3: continue
+            lo = ini.find("AXIS_%s" % letter, "MIN_LIMIT")
+            hi = ini.find("AXIS_%s" % letter, "MAX_LIMIT")
+            self.limits.append((i, lo and float(lo), hi and float(hi)))
+        self.random_toolchanger = \
+            int(ini.find("EMCIO", "RANDOM_TOOLCHANGER") or 0)
+        self.tool_table = read_tool_table(
+            path(ini.find("EMCIO", "TOOL_TABLE")), self.random_toolchanger)
+        self.parameter_file = path(ini.find("RS274NGC", "PARAMETER_FILE"))
+        self.interpname = ini.find("TASK", "INTERPRETER") or ""
+        self.arcdivision = int(ini.find("DISPLAY", "ARCDIVISION") or 64)
+        self.geometry = (ini.find("DISPLAY", "GEOMETRY") or "XYZ").upper()
+        self.lathe = bool(ini.find("DISPLAY", "LATHE"))
+        self.time_limits = runtime.limits_from_ini(ini)
+        self.tool_change_time = 0
+        self.line_times = False
+        initcode = ini.find("EMC", "RS274NGC_STARTUP_CODE") \
+            or ini.find("RS274NGC", "RS274NGC_STARTUP_CODE") or ""
+        self.initcodes = []
+        if initcode: self.initcodes.append(initcode)
+        if not self.interpname:
+            self.initcodes.append("G%d" % (20 + self.metric))
+            self.initcodes.append("G90")
+
+    def to_machine(self, pos):
+        """Convert preview (inch) coordinates to machine units"""
+        scale = 25.4 * self.linear_units
+        return [round(p * scale, 6) for p in pos]
+
+class ReportCanon(PreviewCanon, StatMixin):
+    def __init__(self, machine):
+        PreviewCanon.__init__(self,
+            {'dwell': (1.0, 0.5, 0.5), 'm1xx': (0.5, 0.5, 1.0)},
+            machine.geometry)
+        StatMixin.__init__(self, machine, machine.random_toolchanger)
+        self.machine = machine
+        self.arcdivision = machine.arcdivision
+        self.tool_changes = []
+        self.messages = []
+
+    def is_lathe(self): return self.machine.lathe
+
+    def change_tool(self, pocket):
+        PreviewCanon.change_tool(self, pocket)
+        StatMixin.change_tool(self, pocket)
+        self.tool_changes.append(self.tools[0][0])
+
+    def message(self, message):
+        self.messages.append(message)
+
+machine = None
+
+def init_worker(inifile, bd, tool_change_time, line_times):
+    global machine
+    # ^C is for the parent; it stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    machine = Machine(inifile)
+    machine.block_delete = bd
+    machine.tool_change_time = tool_change_time
+    machine.line_times = line_times
+
+def report_file(filename):
+    report = {'file': filename, 'status': 'ok', 'error': None,
+        'error_line': None}
+    canon = ReportCanon(machine)
+    # the interpreter writes the parameter file back when it is done
+    tempdir = tempfile.mkdtemp(prefix="gcode-report")
+    try:
+        if machine.parameter_file and os.path.exists(machine.parameter_file):
+            canon.parameter_file = os.path.join(tempdir,
+                os.path.basename(machine.parameter_file))
+            shutil.copy(machine.parameter_file, canon.parameter_file)
+        t0 = time.time()
+        try:
+            result, seq = gcode.parse(filename, canon,
+                list(machine.initcodes), machine.interpname)
+            if result > gcode.MIN_ERROR:
+                report['status'] = 'error'
+                report['error'] = gcode.strerror(result)
+                report['error_line'] = seq
+        except KeyboardInterrupt:
+            # (AXIS,stop) in the program
+            report['status'] = 'stopped'
+        except Exception, detail:
+            report['status'] = 'error'
+            report['error'] = str(detail)
+        report['parse_time'] = round(time.time() - t0, 3)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    report['units'] = machine.metric and "mm" or "inch"
+    moved = len(canon.traverse) or len(canon.feed) or len(canon.arcfeed)
+    if moved:
+        canon.calc_extents()
+        report['min_extents'] = machine.to_machine(canon.min_extents)
+        report['max_extents'] = machine.to_machine(canon.max_extents)
+        report['min_extents_notool'] = \
+            machine.to_machine(canon.min_extents_notool)
+        report['max_extents_notool'] = \
+            machine.to_machine(canon.max_extents_notool)
+    else:
+        report['min_extents'] = report['max_extents'] = None
+        report['min_extents_notool'] = report['max_extents_notool'] = None
+    violations = []
+    if moved:
+        # as AXIS's run_warn: the _notool extents are the ones that
+        # include the tool length offset, so they are where the machine goes
+        lowest = report['min_extents_notool']
+        highest = report['max_extents_notool']
+        for i, lo, hi in machine.limits:
+            letter = "XYZ"[i]
+            if lo is not None and lowest[i] < lo:
+                violations.append({'axis': letter, 'limit': lo,
+                    'extent': lowest[i]})
+            if hi is not None and highest[i] > hi:
+                violations.append({'axis': letter, 'limit': hi,
+                    'extent': highest[i]})
+    report['limit_violations'] = violations
+    report['traverse_segments'] = len(canon.traverse)
+    report['feed_segments'] = len(canon.feed)
+    report['arc_segments'] = len(canon.arcfeed)
+    report['tool_changes'] = len(canon.tool_changes)
+    report['tools'] = canon.tool_changes
+    report['dwells'] = len(canon.dwells)
+    report['dwell_time'] = canon.dwell_time
+    report['messages'] = canon.messages
+    estimate = runtime.estimate(canon, machine.time_limits,
+        machine.tool_change_time)
+    report['run_time'] = round(estimate.total, 3)
+    report['traverse_time'] = round(estimate.traverse_time, 3)
+    report['feed_time'] = round(estimate.feed_time + estimate.arc_time, 3)
+    report['tool_times'] = [[tool, round(t, 3)]
+        for tool, t in estimate.by_tool()]
+    if machine.line_times:
+        report['line_times'] = dict((str(l), round(t, 3))
+            for l, t in estimate.by_line().iteritems())
+    return report
+
+def find_programs(args, extensions):
+    for arg in args:
+        if not os.path.isdir(arg):
+            yield os.path.abspath(arg)
+            continue
+        for dirpath, dirnames, filenames in os.walk(arg):
+            dirnames.sort()
+            for f in sorted(filenames):
+                if os.path.splitext(f)[1].lower() in extensions:
+                    yield os.path.abspath(os.path.join(dirpath, f))
+
+csv_fields = ['file', 'status', 'error', 'error_line', 'parse_time', 'units',
+    'min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z',
+    'limit_violations', 'traverse_segments', 'feed_segments',
+    'arc_segments', 'tool_changes', 'tools', 'dwells', 'dwell_time',
+    'run_time', 'traverse_time', 'feed_time', 'tool_times']
+
+def csv_row(report):
+    row = dict((k, report.get(k)) for k in csv_fields)
+    for k in 'min', 'max':
+        extents = report[k + '_extents'] or (None, None, None)
+        for letter, v in zip("xyz", extents):
+            row['%s_%s' % (k, letter)] = v
+    row['limit_violations'] = " ".join("%s%s" % (v['axis'], v['extent'])
+        for v in report['limit_violations'])
+    row['tools'] = " ".join(str(t) for t in report['tools'])
+    row['tool_times'] = " ".join("%s:%s" % (tool, t)
+        for tool, t in report['tool_times'])
+    return row
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h?j:f:o:e:bt:l",
+            ['help', 'jobs=', 'format=', 'output=', 'extensions=',
+             'block-delete', 'tool-change=', 'line-times'])
+    except getopt.GetoptError, detail:
+        print detail
+        usage(99)
+
+    jobs = None
+    fmt = "json"
+    output = None
+    extensions = ".ngc,.nc,.tap"
+    bd = 0
+    tool_change_time = 0
+    line_times = False
+    for o, a in opts:
+        if o in ('-h', '-?', '--help'): usage(0)
+        elif o in ('-j', '--jobs'): jobs = int(a)
+        elif o in ('-f', '--format'): fmt = a
+        elif o in ('-o', '--output'): output = a
+        elif o in ('-e', '--extensions'): extensions = a
+        elif o in ('-b', '--block-delete'): bd = 1
+        elif o in ('-t', '--tool-change'): tool_change_time = float(a)
+        elif o in ('-l', '--line-times'): line_times = True
+    if len(args) < 2 or fmt not in ('json', 'csv'): usage(99)
+
+    inifile = os.path.abspath(args[0])
+    extensions = [e.strip().lower() for e in extensions.split(",")]
+    extensions = [e.startswith(".") and e or "." + e for e in extensions]
+    programs = list(find_programs(args[1:], extensions))
+
+    out = output and open(output, "w") or sys.stdout
+    # the interpreter reads [RS274NGC] from the ini file, and finds
+    # subroutines and relative paths from the configuration directory
+    os.environ['INI_FILE_NAME'] = inifile
+    os.chdir(os.path.dirname(inifile))
+
+    pool = multiprocessing.Pool(jobs, init_worker,
+        (inifile, bd, tool_change_time, line_times))
+    failed = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(out, csv_fields)
+            writer.writeheader()
+        else:
+            out.write("[")
+        for i, report in enumerate(pool.imap(report_file, programs)):
+            if report['status'] != 'ok' or report['limit_violations']:
+                failed += 1
+            if fmt == "csv":
+                writer.writerow(csv_row(report))
+            else:
+                if i: out.write(",")
+                out.write("\n")
+                json.dump(report, out, sort_keys=True)
+            out.flush()
+        if fmt == "json": out.write("\n]\n")
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise SystemExit, 130
+    pool.join()
+    if output: out.close()
+    # like a compiler: non-zero when any program needs looking at
+    raise SystemExit, failed and 1 or 0
+
+if __name__ == '__main__':
+    main()
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,74 @@
+#!/usr/bin/env python2
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Usage: status-broker [-ini inifile] [-rate polls_per_second] [-socket path]
+                     [-foreground]
+
+Poll the LinuxCNC status and share it with the programs that read it
+through statusbroker.stat.  Unless -foreground is given, the broker goes
+into the background once its socket is ready."""
+
+import sys, os, signal
+import linuxcnc, statusbroker
+
+def usage():
+    print >>sys.stderr, __doc__
+    sys.exit(1)
+
+rate = 20.
+path = None
+foreground = False
+args = sys.argv[1:]
+while args:
+    opt = args.pop(0)
+    if opt == '-foreground':
+        foreground = True
+        continue
+    if not args: usage()
+    value = args.pop(0)
+    if opt == '-ini':
+        ini = linuxcnc.ini(value)
+        linuxcnc.nmlfile = ini.find("EMC", "NML_FILE") or linuxcnc.nmlfile
+        rate = float(ini.find("DISPLAY", "STATUS_BROKER_RATE") or rate)
+    elif opt == '-rate':
+        rate = float(value)
+    elif opt == '-socket':
+        path = value
+    else:
+        usage()
+if rate <= 0: usage()
+
+broker = statusbroker.Broker(path, 1. / rate)
+try:
+    broker.listen()
+except (RuntimeError, EnvironmentError), detail:
+    print >>sys.stderr, "status-broker: %s" % detail
+    sys.exit(1)
+
+if not foreground and os.fork():
+    os._exit(0)
+
+def stop(*args):
+    broker.close()
+    sys.exit(0)
+signal.signal(signal.SIGTERM, stop)
+signal.signal(signal.SIGINT, stop)
+
+try:
+    broker.serve()
+finally:
+    broker.close()
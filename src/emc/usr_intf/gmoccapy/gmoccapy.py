@@ -40,6 +40,7 @@ import linuxcnc            # to get our own error system
 import gobject             # needed to add the timer for periodic
 import locale              # for setting the language of the GUI
 import gettext             # to extract the strings to be translated
+import pollpolicy          # how often the status and the pins are polled
 
 from gladevcp.gladebuilder import GladeBuilder
 
@@ -160,7 +161,7 @@ class gmoccapy(object):
 
         # needed components to comunicate with hal and linuxcnc
         self.halcomp = hal.component("gmoccapy")
-        self.command = linuxcnc.command()
+        self.command = pollpolicy.WakingCommand(linuxcnc.command())
         self.stat = linuxcnc.stat()
 
         self.error_channel = linuxcnc.error_channel()
@@ -2088,6 +2089,7 @@ class gmoccapy(object):
             pass
         self.widgets.window1.connect("key_press_event", self.on_key_event, 1)
         self.widgets.window1.connect("key_release_event", self.on_key_event, 0)
+        self.widgets.window1.connect("window-state-event", self.on_window1_state_event)
 
     # Initialize the file to load dialog, setting an title and the correct
     # folder as well as a file filter
@@ -2752,6 +2754,10 @@ class gmoccapy(object):
 
         self.initialized = True
 
+    # poll slowly while the window is iconified
+    def on_window1_state_event(self, widget, event):
+        pollpolicy.POLICY.set_hidden(bool(event.new_window_state & gtk.gdk.WINDOW_STATE_ICONIFIED))
+
     # kill keyboard and estop machine before closing
     def on_window1_destroy(self, widget, data=None):
         print "estoping / killing gmoccapy"
@@ -56,6 +56,7 @@ import tempfile
 import shutil
 import os
 import sys
+import traceback
 
 import thread
 
@@ -102,7 +103,7 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
             C('backplotarc'),
             C('backplottoolchange'),
             C('backplotprobing'),
-            self.get_geometry()
+            self.get_geometry(), **rs274.glcanon.live_plot_options(self.inifile)
         )
         thread.start_new_thread(self.logger.start, (.01,))
 
@@ -154,6 +155,8 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
         self.show_offsets = False
         self.use_default_controls = True
         self.mouse_btn_mode = 0
+        # parse programs on a worker thread, drawing the preview as it grows
+        self.background_load = False
 
         self.a_axis_wrapped = inifile.find("AXIS_A", "WRAPPED_ROTARY")
         self.b_axis_wrapped = inifile.find("AXIS_B", "WRAPPED_ROTARY")
@@ -205,6 +208,12 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
         gobject.timeout_add(50, self.poll)
 
     def poll(self):
+        if self.preview_loader is not None:
+            done = self.poll_preview()
+            if done is True:
+                self.queue_draw()
+            elif done:
+                self.preview_loaded(done)
         s = self.stat
         try:
             s.poll()
@@ -253,6 +262,11 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
         elif not filename and not s.file:
             return
 
+        old = self.cancel_preview()
+        if old is not None:
+            shutil.rmtree(old.tempdir, ignore_errors=True)
+        self.begin_load_timing(filename)
+
         td = tempfile.mkdtemp()
         self._current_file = filename
         try:
@@ -266,13 +280,33 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
 
             unitcode = "G%d" % (20 + (s.linear_units == 1))
             initcode = self.inifile.find("RS274NGC", "RS274NGC_STARTUP_CODE") or ""
+            if self.background_load:
+                # the interpreter writes the parameter file when it is done,
+                # so the temporary directory lives as long as the loader
+                loader = self.start_preview(filename, canon, unitcode, initcode)
+                loader.filename = filename
+                loader.tempdir, td = td, None
+                if self.preview_loader is not loader:
+                    self.preview_loaded(loader)
+                else:
+                    self.queue_draw()
+                return
             result, seq = self.load_preview(filename, canon, unitcode, initcode)
             if result > gcode.MIN_ERROR:
                 self.report_gcode_error(result, seq, filename)
 
         finally:
-            shutil.rmtree(td)
+            if td: shutil.rmtree(td)
+
+        self.set_current_view()
 
+    def preview_loaded(self, loader):
+        shutil.rmtree(loader.tempdir, ignore_errors=True)
+        if loader.exc_info:
+            traceback.print_exception(*loader.exc_info)
+        elif loader.result and loader.result[0] > gcode.MIN_ERROR:
+            self.report_gcode_error(loader.result[0], loader.result[1],
+                                    loader.filename)
         self.set_current_view()
 
     def get_program_alpha(self): return self.program_alpha
@@ -157,7 +157,7 @@ class Lcnc_3dGraphics(QGLWidget,  glcanon.GlCanonDraw, glnav.GlNavBase):
             C('backplotarc'),
             C('backplottoolchange'),
             C('backplotprobing'),
-            self.get_geometry()
+            self.get_geometry(), **glcanon.live_plot_options(self.inifile)
         )
         # start tracking linuxcnc position so we can plot it
         thread.start_new_thread(self.logger.start, (.01,))
@@ -196,6 +196,8 @@ class Lcnc_3dGraphics(QGLWidget,  glcanon.GlCanonDraw, glnav.GlNavBase):
         self.enable_dro = False
         self.use_default_controls = True
         self.mouse_btn_mode = 0
+        # parse programs on a worker thread, drawing the preview as it grows
+        self.background_load = False
         self.cancel_rotate = False
         self.use_gradient_background = False
         self.gradient_color1 = (0.0, 0.0, 1)
@@ -224,6 +226,12 @@ class Lcnc_3dGraphics(QGLWidget,  glcanon.GlCanonDraw, glnav.GlNavBase):
         self.inhibit_selection = True
 
     def poll(self):
+        if self.preview_loader is not None:
+            done = self.poll_preview()
+            if done is True:
+                self.update()
+            elif done:
+                self.preview_loaded(done)
         s = self.stat
         try:
             s.poll()
@@ -252,6 +260,11 @@ class Lcnc_3dGraphics(QGLWidget,  glcanon.GlCanonDraw, glnav.GlNavBase):
         elif not filename and not s.file:
             return
 
+        old = self.cancel_preview()
+        if old is not None:
+            shutil.rmtree(old.tempdir, ignore_errors=True)
+        self.begin_load_timing(filename)
+
         td = tempfile.mkdtemp()
         self._current_file = filename
         try:
@@ -264,6 +277,17 @@ class Lcnc_3dGraphics(QGLWidget,  glcanon.GlCanonDraw, glnav.GlNavBase):
             canon.parameter_file = temp_parameter
             unitcode = "G%d" % (20 + (s.linear_units == 1))
             initcode = self.inifile.find("RS274NGC", "RS274NGC_STARTUP_CODE") or ""
+            if self.background_load:
+                # the interpreter writes the parameter file when it is done,
+                # so the temporary directory lives as long as the loader
+                loader = self.start_preview(filename, canon, unitcode, initcode)
+                loader.filename = filename
+                loader.tempdir, td = td, None
+                if self.preview_loader is not loader:
+                    self.preview_loaded(loader)
+                else:
+                    self._redraw()
+                return
             result, seq = self.load_preview(filename, canon, unitcode, initcode)
             if result > gcode.MIN_ERROR:
                 self.report_gcode_error(result, seq, filename)
@@ -271,8 +295,21 @@ class Lcnc_3dGraphics(QGLWidget,  glcanon.GlCanonDraw, glnav.GlNavBase):
         except:
             self.gcode_properties = None
         finally:
-            shutil.rmtree(td)
+            if td: shutil.rmtree(td)
+
+        self._redraw()
 
+    def preview_loaded(self, loader):
+        shutil.rmtree(loader.tempdir, ignore_errors=True)
+        try:
+            if loader.exc_info:
+                raise loader.exc_info[0], loader.exc_info[1], loader.exc_info[2]
+            if loader.result and loader.result[0] > gcode.MIN_ERROR:
+                self.report_gcode_error(loader.result[0], loader.result[1],
+                                        loader.filename)
+            self.calculate_gcode_properties(loader.canon)
+        except:
+            self.gcode_properties = None
         self._redraw()
 
     def calculate_gcode_properties(self, canon):
@@ -20,6 +20,7 @@
 #include <structmember.h>
 #include <string>
 #include <map>
+#include <vector>
 using namespace std;
 
 #include "config.h"
@@ -974,13 +975,123 @@ PyObject *set_p(PyObject *self, PyObject *args) {
 
 /*######################################*/
 /* Get a Pin, Param or signal value     */
-PyObject *get_value(PyObject *self, PyObject *args) {
-    char *name;
+
+/* Where the names read by get_value were found, so that each is looked up
+   in the HAL lists only once.  An entry is only used while the object at
+   its offset still has the name: HAL clears the name of an object it
+   frees.  An alias is looked up every time. */
+enum value_kind { VALUE_PARAM, VALUE_PIN, VALUE_SIG };
+
+struct value_location {
+    value_kind kind;
+    rtapi_intptr_t offset;
+};
+
+typedef map<string, value_location> valuemap;
+static valuemap value_locations;
+
+union valueunion {
+    hal_bit_t b;
+    hal_u32_t u32;
+    hal_s32_t s32;
+    hal_float_t f;
+};
+
+static bool read_location(const value_location &loc, const char *name,
+        hal_type_t *type, void **d_ptr) {
+    switch(loc.kind) {
+        case VALUE_PARAM: {
+            hal_param_t *param = (hal_param_t*)SHMPTR(loc.offset);
+            if(strcmp(param->name, name)) return false;
+            *type = param->type;
+            *d_ptr = SHMPTR(param->data_ptr);
+            return true;
+        }
+        case VALUE_PIN: {
+            hal_pin_t *pin = (hal_pin_t*)SHMPTR(loc.offset);
+            if(strcmp(pin->name, name)) return false;
+            *type = pin->type;
+            if (pin->signal != 0) {
+                hal_sig_t *sig = (hal_sig_t*)SHMPTR(pin->signal);
+                *d_ptr = SHMPTR(sig->data_ptr);
+            } else {
+                *d_ptr = &(pin->dummysig);
+            }
+            return true;
+        }
+        case VALUE_SIG: {
+            hal_sig_t *sig = (hal_sig_t*)SHMPTR(loc.offset);
+            if(strcmp(sig->name, name)) return false;
+            *type = sig->type;
+            *d_ptr = SHMPTR(sig->data_ptr);
+            return true;
+        }
+    }
+    return false;
+}
+
+/* Find the type and data of the param, pin or signal 'name', in that
+   order.  The mutex must be held. */
+static bool find_value(const char *name, hal_type_t *type, void **d_ptr) {
+    valuemap::iterator i = value_locations.find(name);
+    if(i != value_locations.end()) {
+        if(read_location(i->second, name, type, d_ptr)) return true;
+        value_locations.erase(i);
+    }
+
+    value_location loc;
     hal_param_t *param;
     hal_pin_t *pin;
     hal_sig_t *sig;
+    const char *found;
+    if((param = halpr_find_param_by_name(name))) {
+        loc.kind = VALUE_PARAM;
+        loc.offset = SHMOFF(param);
+        found = param->name;
+    } else if((pin = halpr_find_pin_by_name(name))) {
+        loc.kind = VALUE_PIN;
+        loc.offset = SHMOFF(pin);
+        found = pin->name;
+    } else if((sig = halpr_find_sig_by_name(name))) {
+        loc.kind = VALUE_SIG;
+        loc.offset = SHMOFF(sig);
+        found = sig->name;
+    } else {
+        return false;
+    }
+    /* an alias is not kept, the object does not have that name */
+    if(!strcmp(found, name)) value_locations[name] = loc;
+    return read_location(loc, found, type, d_ptr);
+}
+
+static void read_value(hal_type_t type, void *d_ptr, valueunion *value) {
+    switch(type) {
+        case HAL_BIT: value->b = *(hal_bit_t *)d_ptr; break;
+        case HAL_U32: value->u32 = *(hal_u32_t *)d_ptr; break;
+        case HAL_S32: value->s32 = *(hal_s32_t *)d_ptr; break;
+        case HAL_FLOAT: value->f = *(hal_float_t *)d_ptr; break;
+        case HAL_TYPE_UNSPECIFIED: /* fallthrough */ ;
+    }
+}
+
+/* convert to python value */
+static PyObject *value_to_python(hal_type_t type, const valueunion &value) {
+    switch(type) {
+        case HAL_BIT: return PyBool_FromLong((long)value.b);
+        case HAL_U32: return Py_BuildValue("l",  (unsigned long)value.u32);
+        case HAL_S32: return Py_BuildValue("l",  (long)value.s32);
+        case HAL_FLOAT: return Py_BuildValue("f",  (double)value.f);
+        case HAL_TYPE_UNSPECIFIED: /* fallthrough */ ;
+    }
+    PyErr_Format(pyhal_error_type, "Invalid item type %d", type);
+    return NULL;
+}
+
+PyObject *get_value(PyObject *self, PyObject *args) {
+    char *name;
     hal_type_t type;
     void *d_ptr;
+    valueunion value;
 
     if(!PyArg_ParseTuple(args, "s", &name)) return NULL;
     if(!SHMPTR(0)) {
@@ -990,70 +1101,74 @@ PyObject *get_value(PyObject *self, PyObject *args) {
     }
     /* get mutex before accessing shared data */
     rtapi_mutex_get(&(hal_data->mutex));
-    /* search param list for name */
-    param = halpr_find_param_by_name(name);
-    if (param) {
-        /* found it */
-        type = param->type;
-        d_ptr = SHMPTR(param->data_ptr);
+    if(!find_value(name, &type, &d_ptr)) {
         rtapi_mutex_give(&(hal_data->mutex));
-        /* convert to python value */
-        switch(type) {
-            case HAL_BIT: return PyBool_FromLong((long)*(hal_bit_t *)d_ptr);
-            case HAL_U32: return Py_BuildValue("l",  (unsigned long)*(hal_u32_t *)d_ptr);
-            case HAL_S32: return Py_BuildValue("l",  (long)*(hal_s32_t *)d_ptr);
-            case HAL_FLOAT: return Py_BuildValue("f",  (double)*(hal_float_t *)d_ptr);
-            case HAL_TYPE_UNSPECIFIED: /* fallthrough */ ;
-        }
+        PyErr_Format(PyExc_RuntimeError,
+        "Can't set value: pin / param %s not found", name);
+        return NULL;
     }
-    /* not found, search pin list for name */
-    pin = halpr_find_pin_by_name(name);
-    if(pin) {
-        /* found it */
-        type = pin->type;
-        if (pin->signal != 0) {
-            sig = (hal_sig_t*)SHMPTR(pin->signal);
-            d_ptr = SHMPTR(sig->data_ptr);
-        } else {
-            sig = 0;
-            d_ptr = &(pin->dummysig);
-        }
-        rtapi_mutex_give(&(hal_data->mutex));
-        /* convert to python value */
-        switch(type) {
-            case HAL_BIT: return PyBool_FromLong((long)*(hal_bit_t *)d_ptr);
-            case HAL_U32: return Py_BuildValue("l",  (unsigned long)*(hal_u32_t *)d_ptr);
-            case HAL_S32: return Py_BuildValue("l",  (long)*(hal_s32_t *)d_ptr);
-            case HAL_FLOAT: return Py_BuildValue("f",  (double)*(hal_float_t *)d_ptr);
-            case HAL_TYPE_UNSPECIFIED: /* fallthrough */ ;
+    read_value(type, d_ptr, &value);
+    rtapi_mutex_give(&(hal_data->mutex));
+    return value_to_python(type, value);
+}
+
+/* Get the values of a sequence of pins, params or signals, all read while
+   the mutex is held once */
+PyObject *get_values(PyObject *self, PyObject *args) {
+    PyObject *names;
+
+    if(!PyArg_ParseTuple(args, "O", &names)) return NULL;
+    if(!SHMPTR(0)) {
+	PyErr_Format(PyExc_RuntimeError,
+		"Cannot call before creating component");
+	return NULL;
+    }
+    PyObject *seq = PySequence_Fast(names, "get_values needs a sequence of names");
+    if(!seq) return NULL;
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(seq);
+    std::vector<const char *> cnames(n);
+    for(Py_ssize_t i = 0; i < n; i++) {
+        cnames[i] = PyString_AsString(PySequence_Fast_GET_ITEM(seq, i));
+        if(!cnames[i]) {
+            Py_DECREF(seq);
+            return NULL;
         }
     }
-    sig = halpr_find_sig_by_name(name);
-    if (sig != 0) {
-        /* found it */
-        type = sig->type;
-        d_ptr = SHMPTR(sig->data_ptr);
-        rtapi_mutex_give(&(hal_data->mutex));
-        /* convert to python value */
-        switch(type) {
-            case HAL_BIT: return PyBool_FromLong((long)*(hal_bit_t *)d_ptr);
-            case HAL_U32: return Py_BuildValue("l",  (unsigned long)*(hal_u32_t *)d_ptr);
-            case HAL_S32: return Py_BuildValue("l",  (long)*(hal_s32_t *)d_ptr);
-            case HAL_FLOAT: return Py_BuildValue("f",  (double)*(hal_float_t *)d_ptr);
-            case HAL_TYPE_UNSPECIFIED: /* fallthrough */ ;
+
+    std::vector<hal_type_t> types(n);
+    std::vector<valueunion> values(n);
+    rtapi_mutex_get(&(hal_data->mutex));
+    for(Py_ssize_t i = 0; i < n; i++) {
+        void *d_ptr;
+        if(!find_value(cnames[i], &types[i], &d_ptr)) {
+            rtapi_mutex_give(&(hal_data->mutex));
+            PyErr_Format(PyExc_RuntimeError,
+            "Can't get value: pin / param / signal %s not found", cnames[i]);
+            Py_DECREF(seq);
+            return NULL;
         }
+        read_value(types[i], d_ptr, &values[i]);
     }
-    /* error if here */
     rtapi_mutex_give(&(hal_data->mutex));
-    PyErr_Format(PyExc_RuntimeError,
-    "Can't set value: pin / param %s not found", name);
-	return NULL;
 
+    PyObject *result = PyList_New(n);
+    if(result) {
+        for(Py_ssize_t i = 0; i < n; i++) {
+            PyObject *value = value_to_python(types[i], values[i]);
+            if(!value) {
+                Py_DECREF(result);
+                result = NULL;
+                break;
+            }
+            PyList_SET_ITEM(result, i, value);
+        }
+    }
+    Py_DECREF(seq);
+    return result;
 }
 
 
 
-
 struct shmobject {
     PyObject_HEAD
     halobject *comp;
@@ -1432,6 +1547,162 @@ PyTypeObject stream_type = {
 };
 
 
+/* A set of pins and params whose values are watched.  changed() reads
+   them all and gives the ones that changed since it was last called, so
+   that GPin and QPin need not read and compare each one in Python. */
+struct watchitem {
+    halitem item;
+    PyObject *owner;        /* the hal.item, kept alive while watched */
+    valueunion last;
+    bool fresh;             /* not read yet: reported by the next changed() */
+};
+
+struct watchsetobject {
+    PyObject_HEAD
+    std::vector<watchitem> *items;
+};
+
+static std::vector<watchitem> &watch_items(watchsetobject *self) {
+    if(!self->items) self->items = new std::vector<watchitem>();
+    return *self->items;
+}
+
+static int pywatchset_init(PyObject *_self, PyObject *args, PyObject *kw) {
+    watchsetobject *self = (watchsetobject *)_self;
+    if(!PyArg_ParseTuple(args, ":hal.watchset")) return -1;
+    watch_items(self);
+    return 0;
+}
+
+static void pywatchset_delete(PyObject *_self) {
+    watchsetobject *self = (watchsetobject *)_self;
+    if(self->items) {
+        for(size_t i = 0; i < self->items->size(); i++)
+            Py_DECREF((*self->items)[i].owner);
+        delete self->items;
+    }
+    Py_TYPE(self)->tp_free(self);
+}
+
+static void *watch_data(halitem &item) {
+    if(item.is_pin) return item.u->pin.v;
+    return &item.u->param;
+}
+
+static bool watch_same(hal_type_t type, const valueunion &a, const valueunion &b) {
+    switch(type) {
+        case HAL_BIT: return a.b == b.b;
+        case HAL_U32: return a.u32 == b.u32;
+        case HAL_S32: return a.s32 == b.s32;
+        case HAL_FLOAT: return a.f == b.f;
+        default: return true;
+    }
+}
+
+static PyObject *watchset_add(PyObject *_self, PyObject *o) {
+    watchsetobject *self = (watchsetobject *)_self;
+    if(!PyObject_TypeCheck(o, &halpin_type)) {
+        PyErr_Format(PyExc_TypeError, "hal.item expected, not %s",
+                o->ob_type->tp_name);
+        return NULL;
+    }
+    watchitem w;
+    w.item = ((pyhalitem *)o)->pin;
+    w.owner = o;
+    w.fresh = true;
+    Py_INCREF(o);
+    std::vector<watchitem> &items = watch_items(self);
+    items.push_back(w);
+    return PyInt_FromLong(items.size() - 1);
+}
+
+static PyObject *watchset_changed(PyObject *_self, PyObject *o) {
+    watchsetobject *self = (watchsetobject *)_self;
+    std::vector<watchitem> &items = watch_items(self);
+    PyObject *result = PyList_New(0);
+    if(!result) return NULL;
+    for(size_t i = 0; i < items.size(); i++) {
+        watchitem &w = items[i];
+        valueunion value;
+        read_value(w.item.type, watch_data(w.item), &value);
+        if(!w.fresh && watch_same(w.item.type, value, w.last)) continue;
+        w.fresh = false;
+        w.last = value;
+        PyObject *pyvalue = value_to_python(w.item.type, value);
+        PyObject *entry = pyvalue ? Py_BuildValue("(nN)", (Py_ssize_t)i, pyvalue) : NULL;
+        if(!entry || PyList_Append(result, entry) < 0) {
+            Py_XDECREF(entry);
+            Py_DECREF(result);
+            return NULL;
+        }
+        Py_DECREF(entry);
+    }
+    return result;
+}
+
+static Py_ssize_t watchset_len(PyObject *_self) {
+    watchsetobject *self = (watchsetobject *)_self;
+    return watch_items(self).size();
+}
+
+static PySequenceMethods watchset_as_sequence = {
+    watchset_len,              /*sq_length*/
+};
+
+static PyMethodDef watchset_methods[] = {
+    {"add", watchset_add, METH_O,
+	"Watch a hal.item; returns its index in the set"},
+    {"changed", watchset_changed, METH_NOARGS,
+	"Read every item, returning a list of (index, value) for those that changed since the last call"},
+    {NULL},
+};
+
+static
+PyTypeObject watchset_type = {
+    PyObject_HEAD_INIT(NULL)
+    0,                         /*ob_size*/
+    "hal.watchset",            /*tp_name*/
+    sizeof(watchsetobject),    /*tp_basicsize*/
+    0,                         /*tp_itemsize*/
+    pywatchset_delete,         /*tp_dealloc*/
+    0,                         /*tp_print*/
+    0,                         /*tp_getattr*/
+    0,                         /*tp_setattr*/
+    0,                         /*tp_compare*/
+    0,                         /*tp_repr*/
+    0,                         /*tp_as_number*/
+    &watchset_as_sequence,     /*tp_as_sequence*/
+    0,                         /*tp_as_mapping*/
+    0,                         /*tp_hash */
+    0,                         /*tp_call*/
+    0,                         /*tp_str*/
+    0,                         /*tp_getattro*/
+    0,                         /*tp_setattro*/
+    0,                         /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT,        /*tp_flags*/
+    "A set of HAL pins and params whose changes are looked for together",
+                               /*tp_doc*/
+    0,                         /*tp_traverse*/
+    0,                         /*tp_clear*/
+    0,                         /*tp_richcompare*/
+    0,                         /*tp_weaklistoffset*/
+    0,                         /*tp_iter*/
+    0,                         /*tp_iternext*/
+    watchset_methods,          /*tp_methods*/
+    0,                         /*tp_members*/
+    0,                         /*tp_getset*/
+    0,                         /*tp_base*/
+    0,                         /*tp_dict*/
+    0,                         /*tp_descr_get*/
+    0,                         /*tp_descr_set*/
+    0,                         /*tp_dictoffset*/
+    pywatchset_init,           /*tp_init*/
+    0,                         /*tp_alloc*/
+    PyType_GenericNew,         /*tp_new*/
+    0,                         /*tp_free*/
+    0,                         /*tp_is_gc*/
+};
+
 PyMethodDef module_methods[] = {
     {"pin_has_writer", pin_has_writer, METH_VARARGS,
 	"Return a FALSE value if a pin has no writers and TRUE if it does"},
@@ -1451,6 +1722,8 @@ PyMethodDef module_methods[] = {
 	"set pin value"},
     {"get_value", get_value, METH_VARARGS,
 	".get_value('name'}: Gets the pin, param or signal value"},
+    {"get_values", get_values, METH_VARARGS,
+	".get_values(['name', ...]): Gets a list of the pin, param or signal values, all read at once"},
     {NULL},
 };
 
@@ -1492,10 +1765,12 @@ void init_hal(void) {
     PyType_Ready(&shm_type);
     PyType_Ready(&halpin_type);
     PyType_Ready(&stream_type);
+    PyType_Ready(&watchset_type);
     PyModule_AddObject(m, "component", (PyObject*)&halobject_type);
     PyModule_AddObject(m, "shm", (PyObject*)&shm_type);
     PyModule_AddObject(m, "item", (PyObject*)&halpin_type);
     PyModule_AddObject(m, "stream", (PyObject*)&stream_type);
+    PyModule_AddObject(m, "watchset", (PyObject*)&watchset_type);
 
     PyModule_AddIntConstant(m, "MSG_NONE", RTAPI_MSG_NONE);
     PyModule_AddIntConstant(m, "MSG_ERR", RTAPI_MSG_ERR);
@@ -0,0 +1,15 @@
+#!/bin/sh
+for ini in test.ini metric.ini; do
+    gcode-report -j 1 $ini tlo.ngc notlo.ngc > report.json
+    echo "$ini exit $?"
+    python - <<EOT
+import json, os
+for r in json.load(open("report.json")):
+    print os.path.basename(r['file']), r['status'], r['units']
+    print "extents", r['min_extents'][2], r['max_extents'][2]
+    print "with tool", r['min_extents_notool'][2], r['max_extents_notool'][2]
+    for v in r['limit_violations']:
+        print "past", v['axis'], v['limit'], v['extent']
+EOT
+done
+rm -f report.json
@@ -0,0 +1,69 @@
+#!/bin/sh
+realtime start
+python <<EOF
+import hal
+# keeps HAL attached while x is unloaded and loaded again
+keep = hal.component("keep")
+keep.ready()
+h = hal.component("x")
+try:
+    h.newpin("s", hal.HAL_S32, hal.HAL_OUT)
+    h.newpin("f", hal.HAL_FLOAT, hal.HAL_IN)
+    h.newpin("b", hal.HAL_BIT, hal.HAL_OUT)
+    h.newparam("p", hal.HAL_U32, hal.HAL_RW)
+    h.ready()
+    hal.new_sig("sig-s", hal.HAL_S32)
+    hal.connect("x.s", "sig-s")
+    h["s"] = -5
+    h["b"] = True
+    h["p"] = 7
+
+    print "get_values", hal.get_values(["x.s", "x.f", "x.b", "x.p", "sig-s"])
+    print "get_values", hal.get_values(("x.p", "x.p"))
+    print "get_values", hal.get_values([])
+    for name in "x.s", "x.f", "x.b", "x.p", "sig-s":
+        print "get_value", name, hal.get_value(name)
+
+    try:
+        hal.get_values(["x.s", "x.missing"])
+        print "get_values", "x.missing", "ok"
+    except RuntimeError, e:
+        print "get_values", "x.missing", e
+    try:
+        hal.get_values(["x.s", 3])
+        print "get_values", 3, "ok"
+    except TypeError:
+        print "get_values", 3, "fail"
+
+    h.exit()
+    try:
+        hal.get_value("x.s")
+        print "get_value", "x.s", "ok"
+    except RuntimeError:
+        print "get_value", "x.s", "fail"
+    print "get_value", "sig-s", hal.get_value("sig-s")
+
+    # the same names again, in other places and with other types
+    h = hal.component("x")
+    h.newpin("pad", hal.HAL_FLOAT, hal.HAL_OUT)
+    h.newpin("p", hal.HAL_FLOAT, hal.HAL_OUT)
+    h.newparam("s", hal.HAL_S32, hal.HAL_RW)
+    h.ready()
+    h["pad"] = 9.5
+    h["p"] = 1.5
+    h["s"] = -3
+    print "get_values", hal.get_values(["x.s", "x.p", "x.pad", "sig-s"])
+    try:
+        hal.get_values(["x.f"])
+        print "get_values", "x.f", "ok"
+    except RuntimeError:
+        print "get_values", "x.f", "fail"
+except:
+    import traceback
+    print "Exception:", traceback.format_exc()
+    raise
+finally:
+    h.exit()
+    keep.exit()
+EOF
+realtime stop
@@ -0,0 +1,63 @@
+#!/bin/sh
+realtime start
+python <<EOF
+import hal
+h = hal.component("x")
+try:
+    h.newpin("out", hal.HAL_S32, hal.HAL_OUT)
+    h.newpin("in", hal.HAL_S32, hal.HAL_IN)
+    h.newpin("b", hal.HAL_BIT, hal.HAL_OUT)
+    h.newpin("f", hal.HAL_FLOAT, hal.HAL_OUT)
+    h.newparam("u", hal.HAL_U32, hal.HAL_RW)
+    h.ready()
+
+    w = hal.watchset()
+    print "add", w.add(h.getitem("out")), w.add(h.getitem("in")), \
+        w.add(h.getitem("b"))
+    print "len", len(w)
+    print "changed", w.changed()
+    print "changed", w.changed()
+
+    h["out"] = 3
+    h["out"] = 3
+    print "changed", w.changed()
+
+    # changed and changed back between reads
+    h["b"] = True
+    h["b"] = False
+    print "changed", w.changed()
+
+    print "add", w.add(h.getitem("f")), w.add(h.getitem("u"))
+    print "len", len(w)
+    h["out"] = 4
+    print "changed", w.changed()
+
+    hal.new_sig("sig", hal.HAL_S32)
+    hal.connect("x.out", "sig")
+    hal.connect("x.in", "sig")
+    h["out"] = 6
+    print "changed", w.changed()
+
+    h["f"] = 0.5
+    h["u"] = 1 << 31
+    print "changed", w.changed()
+
+    # each set keeps its own last values
+    other = hal.watchset()
+    other.add(h.getitem("out"))
+    print "other", other.changed()
+    print "changed", w.changed()
+
+    try:
+        w.add(3)
+        print "add", 3, "ok"
+    except TypeError:
+        print "add", 3, "fail"
+except:
+    import traceback
+    print "Exception:", traceback.format_exc()
+    raise
+finally:
+    h.exit()
+EOF
+realtime stop
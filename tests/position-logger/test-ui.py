@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+import linuxcnc
+import linuxcnc_util
+
+import os
+import sys
+import math
+import time
+import struct
+import threading
+
+retval = 0
+
+
+c = linuxcnc.command()
+s = linuxcnc.stat()
+e = linuxcnc.error_channel()
+l = linuxcnc_util.LinuxCNC(command=c, status=s, error=e)
+
+l.wait_for_linuxcnc_startup()
+
+c.state(linuxcnc.STATE_ESTOP_RESET)
+c.state(linuxcnc.STATE_ON)
+c.home(-1)
+c.wait_complete()
+l.wait_for_home([1, 1, 1, 0, 0, 0, 0, 0, 0])
+
+colors = [(255, 255, 255, 255)] * 6
+point = struct.Struct(linuxcnc.positionlogger.point_format)
+tolerance = .001
+
+def logger(capacity):
+    p = linuxcnc.positionlogger(linuxcnc.stat(), *(colors + ["XYZ", 0]),
+        capacity=capacity, tolerance=tolerance)
+    t = threading.Thread(target=p.start, args=(.001,))
+    t.start()
+    return p, t
+
+def points(p):
+    data = p.snapshot()
+    if len(data) != p.npts * point.size:
+        print "Expected %d points in the snapshot, got %d bytes" % (
+            p.npts, len(data))
+        sys.exit(1)
+    return [point.unpack_from(data, i * point.size)[:3]
+        for i in range(p.npts)]
+
+def mdi(command, x, y):
+    c.mdi(command)
+    c.wait_complete()
+    l.wait_for_axis_to_stop_at("x", x)
+    l.wait_for_axis_to_stop_at("y", y)
+    time.sleep(.1)
+
+c.mode(linuxcnc.MODE_MDI)
+c.wait_complete()
+
+# a straight line is a few points, however many samples it took
+p, t = logger(1000)
+time.sleep(.1)
+mdi("G20 G90 G61 G1 X1 F60", 1, 0)
+print "line: %d points" % p.npts
+if p.npts > 8:
+    print "Expected a few points for a straight line"
+    retval = 1
+
+# an arc is chords that stray no more than the tolerance from it
+mdi("G2 X1 Y0 I.5 J0 F60", 1, 0)
+p.stop()
+t.join()
+r = .5
+on_arc = [q for q in points(p)
+    if abs(math.hypot(q[0] - 1.5, q[1]) - r) < 1e-4]
+worst = 0
+for a, b in zip(on_arc, on_arc[1:]):
+    half = math.hypot(b[0] - a[0], b[1] - a[1]) / 2
+    worst = max(worst, r - math.sqrt(max(0, r * r - half * half)))
+print "arc: %d points" % len(on_arc)
+if not 10 < len(on_arc) < 200 or worst > tolerance + 1e-4:
+    print "Expected the arc as chords within %g, got %d straying %g" % (
+        tolerance, len(on_arc), worst)
+    retval = 1
+if p.coarsen != 1:
+    print "Expected no coarsening in a plot with room, got %g" % p.coarsen
+    retval = 1
+del p
+
+# more corners than the ring holds
+p, t = logger(16)
+time.sleep(.1)
+c.mode(linuxcnc.MODE_AUTO)
+c.wait_complete()
+c.program_open(os.path.join(os.getcwd(), "zigzag.ngc"))
+c.auto(linuxcnc.AUTO_RUN, 0)
+c.wait_complete()
+l.wait_for_interp_state(linuxcnc.INTERP_IDLE, 30)
+l.wait_for_axis_to_stop_at("x", 3)
+time.sleep(.1)
+p.stop()
+t.join()
+plot = points(p)
+xs = [q[0] for q in plot]
+print "ring: %d of %d points, coarsened %g times" % (
+    p.npts, p.capacity, p.coarsen)
+if p.npts > p.capacity or p.coarsen != 4:
+    print "Expected at most %d points coarsened 4 times" % p.capacity
+    retval = 1
+if xs != sorted(xs):
+    print "Expected the points oldest first, got x %s" % xs
+    retval = 1
+if xs[0] <= 1 + 1e-4:
+    print "Expected the oldest points to be dropped"
+    retval = 1
+last = p.last(False)
+if abs(last[0] - 3) > 1e-4 or abs(last[1]) > 1e-4:
+    print "Expected the last point at X3 Y0, got %s" % (last,)
+    retval = 1
+del p
+
+sys.exit(retval)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+import linuxcnc
+import linuxcnc_util
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import positionlog
+
+retval = 0
+
+
+c = linuxcnc.command()
+s = linuxcnc.stat()
+e = linuxcnc.error_channel()
+l = linuxcnc_util.LinuxCNC(command=c, status=s, error=e)
+
+l.wait_for_linuxcnc_startup()
+
+d = tempfile.mkdtemp()
+
+text = "this is not a position log, but it is longer than the header\n" * 4
+not_a_log = os.path.join(d, "not-a-log")
+f = open(not_a_log, "w")
+f.write(text)
+f.close()
+
+bad = [
+    (os.path.join(d, "missing", "log"), IOError),
+    (d, IOError),
+    (not_a_log, ValueError),
+]
+
+# a failed recorder must not release the stat it was given
+refs = sys.getrefcount(s)
+for path, error in bad:
+    for i in range(10):
+        try:
+            linuxcnc.positionrecorder(s, path)
+        except error, detail:
+            if i == 0: print "%s: %s" % (error.__name__, detail)
+        else:
+            print "Expected %s for %s" % (error.__name__, path)
+            retval = 1
+        # and neither must one given a temporary stat, as AXIS does
+        try:
+            linuxcnc.positionrecorder(linuxcnc.stat(), path)
+        except error:
+            pass
+if sys.getrefcount(s) != refs:
+    print "Expected %d references to the stat object, got %d" % (
+        refs, sys.getrefcount(s))
+    retval = 1
+s.poll()
+
+if open(not_a_log).read() != text:
+    print "The file that is not a position log was changed"
+    retval = 1
+
+log = os.path.join(d, "log")
+r = linuxcnc.positionrecorder(s, log)
+if r.filename != log or r.count != 0:
+    print "Expected an empty log %s, got %d records in %s" % (
+        log, r.count, r.filename)
+    retval = 1
+del r
+# and it is a position log now
+r = linuxcnc.positionrecorder(linuxcnc.stat(), log)
+del r
+
+# record a few moves, and read them back in the order they were made
+c.state(linuxcnc.STATE_ESTOP_RESET)
+c.state(linuxcnc.STATE_ON)
+c.home(-1)
+c.wait_complete()
+l.wait_for_home([1, 1, 1, 0, 0, 0, 0, 0, 0])
+c.mode(linuxcnc.MODE_MDI)
+c.wait_complete()
+
+r = linuxcnc.positionrecorder(linuxcnc.stat(), log)
+errors = []
+def record():
+    try:
+        r.start(.001)
+    except Exception, detail:
+        errors.append(detail)
+t = threading.Thread(target=record)
+t.start()
+
+targets = [(1, 0, 0), (1, 1, 0), (0, 1, -.5), (.5, .5, .5)]
+for x, y, z in targets:
+    c.mdi("G1 X%s Y%s Z%s F120" % (x, y, z))
+    c.wait_complete()
+    for letter, target in zip("xyz", (x, y, z)):
+        l.wait_for_axis_to_stop_at(letter, target)
+time.sleep(.1)
+r.stop()
+t.join()
+if errors:
+    print "Recording failed: %s" % errors[0]
+    retval = 1
+
+p = positionlog.PositionLog(log)
+if len(p) != r.count or not len(p):
+    print "Expected %d records in the log, read %d" % (r.count, len(p))
+    retval = 1
+def at(position, target):
+    return max(abs(a - b) for a, b in zip(position[:3], target)) < 1e-6
+records = list(p)
+i = 0
+for target in targets:
+    while i < len(records) and not at(records[i].commanded, target):
+        i += 1
+    if i == len(records):
+        print "The log does not reach %s after the moves before it" % (target,)
+        retval = 1
+        break
+times = [record.time for record in records]
+if times != sorted(times):
+    print "The records are not in time order"
+    retval = 1
+last = records and records[-1]
+if not last or not at(last.commanded, targets[-1]) \
+        or not at(last.actual, targets[-1]):
+    print "Expected the last record at %s, got %s" % (targets[-1], last)
+    retval = 1
+p.close()
+del r
+
+shutil.rmtree(d)
+
+sys.exit(retval)
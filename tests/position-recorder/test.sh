@@ -0,0 +1,4 @@
+#!/bin/bash
+
+linuxcnc -r test.ini
+
@@ -0,0 +1,60 @@
+"""The canon and machine the preview tests parse their programs with: an
+inch machine with tool 1 in pocket 1, like gcode-report's ReportCanon"""
+
+import gcode
+from rs274.previewcanon import PreviewCanon
+from rs274.interpret import StatMixin
+
+EMPTY_TOOL = (-1, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0)
+TOOL_1 = (1, 0.0, 0.0, 0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.25, 0.0, 0.0, 0)
+INITCODES = ["G20", "G90"]
+
+class Machine:
+    linear_units = 1/25.4
+    angular_units = 1.0
+    axis_mask = 7
+    block_delete = 0
+    tool_table = [EMPTY_TOOL, TOOL_1]
+
+class TestCanon(PreviewCanon, StatMixin):
+    def __init__(self):
+        PreviewCanon.__init__(self,
+            {'dwell': (1.0, 0.5, 0.5), 'm1xx': (0.5, 0.5, 1.0)}, "XYZ")
+        StatMixin.__init__(self, Machine(), 0)
+        # runtests removes the .var files the interpreter leaves
+        self.parameter_file = "test.var"
+
+    def is_lathe(self): return False
+
+    def change_tool(self, pocket):
+        PreviewCanon.change_tool(self, pocket)
+        StatMixin.change_tool(self, pocket)
+
+def parse(filename, canon=None):
+    """Parse 'filename' into 'canon', or a new TestCanon; returns the
+    canon and the (result, seq) of gcode.parse"""
+    if canon is None: canon = TestCanon()
+    return canon, gcode.parse(filename, canon, list(INITCODES), "")
+
+PARTS = ('traverse', 'feed', 'arcfeed', 'motion_order', 'dwells',
+    'dwell_marks', 'tool_marks', 'motion_modes')
+
+def _rounded(value):
+    if isinstance(value, float): return round(value, 9)
+    if isinstance(value, (tuple, list)): return tuple(map(_rounded, value))
+    return value
+
+def summary(canon):
+    """What 'canon' recorded, as a dictionary of PARTS that compares equal
+    for the same program"""
+    result = {}
+    for name in PARTS:
+        value = getattr(canon, name)
+        if name == 'motion_order': value = value.runs.tolist()
+        result[name] = _rounded(list(value))
+    return result
+
+def differences(a, b):
+    """The names of the PARTS in which canons 'a' and 'b' differ"""
+    a, b = summary(a), summary(b)
+    return [name for name in PARTS if a[name] != b[name]]
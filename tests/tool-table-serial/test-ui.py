@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import linuxcnc
+import linuxcnc_util
+
+import sys
+import time
+
+retval = 0
+
+
+c = linuxcnc.command()
+s = linuxcnc.stat()
+e = linuxcnc.error_channel()
+l = linuxcnc_util.LinuxCNC(command=c, status=s, error=e)
+
+l.wait_for_linuxcnc_startup()
+
+def wait_for_serial(serial, timeout=5.0):
+    """Poll until the tool table serial moves past 'serial'"""
+    start = time.time()
+    while time.time() - start < timeout:
+        s.poll()
+        if s.tool_table_serial > serial:
+            return True
+        time.sleep(.05)
+    print "tool_table_serial stayed at %d" % s.tool_table_serial
+    return False
+
+s.poll()
+table = s.tool_table
+serial = s.tool_table_serial
+if abs(s.tool(1).zoffset - 0.1234) > 1e-6:
+    print "Expected tool 1 at Z0.1234, got %s" % (s.tool(1),)
+    retval = 1
+s.poll()
+if s.tool_table is not table or s.tool_table_serial != serial:
+    print "Expected the same tool table from an unchanged tool table"
+    retval = 1
+
+# reload a changed tool table file
+f = open("simpockets.tbl", "w")
+f.write("T1 P1 Z0.5\nT2 P2 Z0.25 D0.125\n")
+f.close()
+c.load_tool_table()
+c.wait_complete()
+if not wait_for_serial(serial):
+    retval = 1
+if s.tool_table is table:
+    print "Expected a new tool table after reloading it"
+    retval = 1
+if abs(s.pocket(1).zoffset - 0.5) > 1e-6 or s.tool(2) is None \
+        or abs(s.tool(2).diameter - 0.125) > 1e-6:
+    print "Expected the reloaded tools, got %s" % (s.tool_table[:3],)
+    retval = 1
+print "reload: serial went up"
+
+# set an entry from G-code
+table = s.tool_table
+serial = s.tool_table_serial
+c.state(linuxcnc.STATE_ESTOP_RESET)
+c.state(linuxcnc.STATE_ON)
+c.mode(linuxcnc.MODE_MDI)
+c.wait_complete()
+c.mdi("G10 L1 P1 Z0.75")
+c.wait_complete()
+if not wait_for_serial(serial):
+    retval = 1
+if s.tool_table is table or abs(s.tool(1).zoffset - 0.75) > 1e-6:
+    print "Expected a new tool table with tool 1 at Z0.75, got %s" % (
+        s.tool(1),)
+    retval = 1
+print "G10 L1: serial went up"
+
+sys.exit(retval)
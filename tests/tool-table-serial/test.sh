@@ -0,0 +1,5 @@
+#!/bin/bash
+
+cp -f simpockets.tbl.original simpockets.tbl
+
+linuxcnc -r test.ini